@@ -4,10 +4,12 @@ from pydantic import BaseModel
 from app.services.cnpj_service import CNPJService
 from app.services.cnpj.base import CNPJNotFoundError, CNPJAPIError
 from app.services.robust_validator import RobustValidator
+from app.services.matching_rules import get_matching_rules
 from app.services.batch_audit_service import BatchAuditService, BatchAuditRequest
-from app.services.pluggy_service import PluggyService
+from app.services.transaction_cache import LocalTransactionStore
 from supabase import create_client, Client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
 from datetime import datetime
 from decimal import Decimal
 
@@ -15,7 +17,10 @@ router = APIRouter()
 settings = get_settings()
 
 def get_supabase() -> Client:
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
+
+def get_transaction_store(supabase: Client) -> LocalTransactionStore:
+    return LocalTransactionStore(supabase, max_staleness=settings.TRANSACTION_FRESHNESS_SECONDS)
 
 class ExpenseAuditRequest(BaseModel):
     transaction_id_pluggy: str
@@ -47,13 +52,13 @@ async def audit_expense(
     Audita uma despesa (saída de dinheiro) com validação robusta.
     
     Fluxo:
-    1. Busca transação na Pluggy
+    1. Busca transação (banco local, sincronizado com a Pluggy)
     2. Valida CNPJ na RFB (CNPJ.ws)
     3. Verifica CNAE vs Serviço (Regra de Ouro)
     4. Retorna status paranoico
     """
     
-    # PASSO 1: Buscar transação na Pluggy
+    # PASSO 1: Buscar transação
     try:
         account_result = supabase.table("condominio_contas_bancarias").select("*").eq(
             "condominio_id", request.condominio_id
@@ -68,14 +73,10 @@ async def audit_expense(
         account_data = account_result.data[0]
         pluggy_account_id = account_data["pluggy_account_id"]
         
-        pluggy_service = PluggyService()
-        transactions = await pluggy_service.get_transactions(pluggy_account_id)
-        
-        transaction = None
-        for tx in transactions:
-            if tx["id"] == request.transaction_id_pluggy:
-                transaction = tx
-                break
+        # Busca pelo id no banco local (índice único), sem baixar o extrato
+        transaction = await get_transaction_store(supabase).get_transaction(
+            pluggy_account_id, request.transaction_id_pluggy, request.condominio_id
+        )
         
         if not transaction:
             raise HTTPException(
@@ -198,7 +199,7 @@ async def validate_receipt(
     Valida um comprovante de pagamento com lógica robusta.
     
     Implementa:
-    - Tolerância de valor (R$ 0,05)
+    - Tolerância de valor (regras do condomínio, padrão R$ 0,05)
     - Detecção de taxas de boleto
     - Validação de CPF do pagador
     - Detecção de ambiguidade
@@ -215,16 +216,17 @@ async def validate_receipt(
         account_data = account_result.data[0]
         pluggy_account_id = account_data["pluggy_account_id"]
         
-        # Buscar transações
-        pluggy_service = PluggyService()
+        # Buscar transações (banco local; delta da Pluggy só se o sync estiver velho)
         from datetime import datetime, timedelta
         receipt_date = datetime.strptime(request.receipt_date, "%Y-%m-%d").date()
-        from_date = (receipt_date - timedelta(days=5)).strftime("%Y-%m-%d")
+        from_date = receipt_date - timedelta(days=5)
         
-        transactions = await pluggy_service.get_transactions(pluggy_account_id, from_date=from_date)
+        transactions = await get_transaction_store(supabase).get_transactions(
+            pluggy_account_id, from_date, request.condominio_id
+        )
         
-        # Validar com lógica robusta
-        validator = RobustValidator()
+        # Validar com lógica robusta (regras do condomínio)
+        validator = RobustValidator(rules=get_matching_rules(request.condominio_id, supabase))
         result = validator.validate_payment(
             receipt_amount=Decimal(str(request.receipt_amount)),
             receipt_date=receipt_date,
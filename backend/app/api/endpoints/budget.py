@@ -5,12 +5,13 @@ from io import BytesIO
 from app.models.schemas import BudgetCreate, BudgetResponse
 from supabase import create_client, Client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
 
 router = APIRouter()
 settings = get_settings()
 
 def get_supabase() -> Client:
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
 
 @router.post("/upload", response_model=Dict[str, int])
 async def upload_budget(
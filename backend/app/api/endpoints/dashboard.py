@@ -7,6 +7,7 @@ from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
 from supabase import create_client, Client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
 from datetime import datetime, timedelta
 from decimal import Decimal
 
@@ -15,7 +16,7 @@ settings = get_settings()
 
 def get_supabase() -> Client:
     try:
-        return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
     except Exception:
         return None
 
@@ -1,17 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import date, timedelta
+from pydantic import BaseModel
 from app.models.schemas import BankStatementResponse, BankTransactionResponse
 from app.services.open_finance import OpenFinanceService
+from app.services.auto_reconciler import AutoReconciler
+from app.services.match_suggestions import MatchSuggestionService
+from app.services.open_finance_sync import OpenFinanceSyncService
+from app.services.open_finance_aggregator import OpenFinanceAggregator, ProviderAccount
 from supabase import create_client, Client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase, timed, RECONCILED_TOTAL
 import hashlib
 
 router = APIRouter()
 settings = get_settings()
 
 def get_supabase() -> Client:
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
 
 @router.post("/connect")
 async def connect_bank_account(
@@ -45,15 +51,26 @@ async def sync_transactions(
     """
     Sync transactions from Open Finance provider.
     This can be called manually or scheduled to run periodically.
+    Incremental: only the delta since the account's watermark (plus a short
+    overlap) is fetched; `days_back` only applies to the first sync.
     """
     try:
         of_service = OpenFinanceService(provider="pluggy")
+        sync_service = OpenFinanceSyncService(supabase, provider="pluggy")
         
-        # Fetch transactions
-        transactions = await of_service.sync_transactions(account_id, days_back)
+        # Fetch transactions since the watermark
+        watermark = sync_service.load_watermark(account_id)
+        since = sync_service.sync_from(watermark, days_back)
+        transactions = await of_service.sync_transactions(account_id, from_date=since)
         
         if not transactions:
-            return {"message": "No new transactions", "count": 0}
+            return {"message": "No new transactions", "count": 0, "from_date": since.isoformat()}
+        
+        # Condominium that owns this account (scopes auto-reconciliation)
+        account = supabase.table("condominio_contas_bancarias").select("condominio_id").eq(
+            "pluggy_account_id", account_id
+        ).limit(1).execute()
+        condominio_id = account.data[0]["condominio_id"] if account.data else None
         
         # Create or get extrato record
         extrato_hash = hashlib.sha256(f"open_finance_{account_id}_{date.today()}".encode()).hexdigest()
@@ -68,45 +85,62 @@ async def sync_transactions(
             extrato_data = {
                 "arquivo_nome": f"Open Finance Sync - {date.today()}",
                 "arquivo_hash": extrato_hash,
-                "periodo_inicio": (date.today() - timedelta(days=days_back)).isoformat(),
+                "periodo_inicio": since.isoformat(),
                 "periodo_fim": date.today().isoformat(),
-                "fonte": "open_finance"
+                "fonte": "open_finance",
+                "condominio_id": condominio_id
             }
             result = supabase.table("extratos_bancarios").insert(extrato_data).execute()
             extrato_id = result.data[0]['id']
         
-        # Insert transactions
-        inserted_count = 0
-        for txn in transactions:
-            txn['extrato_id'] = extrato_id
-            txn['data_transacao'] = txn['data_transacao'].isoformat()
-            txn['valor'] = float(txn['valor'])
-            
-            # Check if transaction already exists (by provider ID or NSU)
-            existing_txn = None
-            if txn.get('nsu'):
-                existing_txn = supabase.table("transacoes_bancarias").select("id").eq(
-                    "nsu", txn['nsu']
-                ).eq("extrato_id", extrato_id).execute()
-            
-            if not existing_txn or not existing_txn.data:
-                supabase.table("transacoes_bancarias").insert(txn).execute()
-                inserted_count += 1
+        # Insert new transactions (one upsert, deduped by provider transaction id)
+        # and refresh the ones the provider changed since they were stored
+        inserted, result = sync_service.store(
+            account_id, transactions, watermark, since,
+            condominio_id=condominio_id, extrato_id=extrato_id
+        )
         
-        # Run auto-reconciliation in background
+        # Run auto-reconciliation in background, then refresh suggestions
+        # for the receipts the new transactions can match (runs in order)
         if background_tasks:
-            background_tasks.add_task(auto_reconcile_transactions, extrato_id, supabase)
+            background_tasks.add_task(auto_reconcile_transactions, extrato_id, supabase, condominio_id)
+            if inserted:
+                background_tasks.add_task(MatchSuggestionService(supabase).refresh_for_transactions, inserted, condominio_id)
         
         return {
             "message": "Transactions synced successfully",
             "total_fetched": len(transactions),
-            "inserted": inserted_count,
+            "inserted": len(inserted),
+            "unchanged": result.inalteradas,
+            "updated": result.atualizadas,
+            "from_date": since.isoformat(),
             "extrato_id": extrato_id
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
 
+class AggregateRequest(BaseModel):
+    accounts: List[ProviderAccount]
+    days_back: int = 30
+
+@router.post("/aggregate")
+async def aggregate_transactions(request: AggregateRequest):
+    """
+    Unified statement of accounts spread over several aggregators (Pluggy, Belvo).
+    Providers are queried concurrently; a slow or failing one is reported in
+    `sources` and does not hold back the others.
+    """
+    from_date = date.today() - timedelta(days=request.days_back)
+    feed = await OpenFinanceAggregator().get_transactions(request.accounts, from_date)
+
+    return {
+        "complete": feed.complete,
+        "duplicates_dropped": feed.duplicadas,
+        "sources": [source.model_dump() for source in feed.fontes],
+        "transactions": [tx.model_dump(mode="json") for tx in feed.transactions]
+    }
+
 @router.get("/balance/{account_id}")
 async def get_balance(account_id: str):
     """Get real-time balance from the bank"""
@@ -123,61 +157,20 @@ async def get_balance(account_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get balance: {str(e)}")
 
-async def auto_reconcile_transactions(extrato_id: str, supabase: Client):
+@timed("auto_reconcile")
+async def auto_reconcile_transactions(extrato_id: str, supabase: Client, condominio_id: Optional[str] = None) -> Dict:
     """
     Background task to auto-reconcile transactions.
-    Matches bank transactions with pending receipts.
+    Hash-joins the extrato's pending transactions with the condominium's pending
+    receipts (NSU, then value bucket + date window) and applies every link in
+    a single transactional RPC.
     """
-    # Get all pending transactions from this extrato
-    transactions = supabase.table("transacoes_bancarias").select("*").eq(
-        "extrato_id", extrato_id
-    ).eq("status_reconciliacao", "pendente").execute()
-    
-    # Get all pending receipts with OCR data
-    receipts = supabase.table("comprovantes").select("*").eq(
-        "status", "pendente"
-    ).eq("ocr_processado", True).execute()
-    
-    for txn in transactions.data:
-        for receipt in receipts.data:
-            # Try to match
-            if await is_match(txn, receipt):
-                # Auto-approve if high confidence
-                supabase.table("comprovantes").update({
-                    "status": "aprovado",
-                    "transacao_id": txn['id'],
-                    "motivo_decisao": "Auto-reconciliado via Open Finance"
-                }).eq("id", receipt['id']).execute()
-                
-                supabase.table("transacoes_bancarias").update({
-                    "status_reconciliacao": "reconciliado",
-                    "comprovante_id": receipt['id']
-                }).eq("id", txn['id']).execute()
-                
-                break
-
-async def is_match(txn: Dict, receipt: Dict) -> bool:
-    """Check if transaction matches receipt"""
-    from decimal import Decimal
-    
-    # Exact NSU match
-    if txn.get('nsu') and receipt.get('ocr_nsu'):
-        if txn['nsu'] == receipt['ocr_nsu']:
-            return True
-    
-    # Value + date match
-    if receipt.get('ocr_valor') and receipt.get('ocr_data'):
-        txn_valor = Decimal(str(txn['valor']))
-        receipt_valor = Decimal(str(receipt['ocr_valor']))
-        
-        # 1% tolerance
-        if abs(txn_valor - receipt_valor) <= txn_valor * Decimal('0.01'):
-            # Date within 3 days
-            from datetime import datetime
-            txn_date = datetime.fromisoformat(txn['data_transacao']).date()
-            receipt_date = datetime.fromisoformat(receipt['ocr_data']).date()
-            
-            if abs((txn_date - receipt_date).days) <= 3:
-                return True
-    
-    return False
+    report = AutoReconciler(supabase).run(extrato_id, condominio_id)
+    RECONCILED_TOTAL.inc(report.aplicados, source="auto_reconcile", outcome="aplicado")
+    RECONCILED_TOTAL.inc(report.ambiguos, source="auto_reconcile", outcome="ambiguo")
+    print(
+        f"✅ [Auto Reconcile] Extrato {extrato_id}: {report.aplicados} conciliados "
+        f"(NSU {report.vinculos_nsu}, valor/data {report.vinculos_valor_data}), "
+        f"{report.ambiguos} ambíguos, {report.sem_candidato} sem candidato"
+    )
+    return report.model_dump()
@@ -4,12 +4,13 @@ from app.models.schemas import PaymentCreate, PaymentValidationResult
 from app.services.rfb_validator import RFBValidator
 from supabase import create_client, Client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
 
 router = APIRouter()
 settings = get_settings()
 
 def get_supabase() -> Client:
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
 
 @router.post("/validate", response_model=List[PaymentValidationResult])
 async def validate_payments(
@@ -4,15 +4,19 @@ from pydantic import BaseModel
 from datetime import datetime, timedelta
 from decimal import Decimal
 from app.services.pluggy_service import PluggyService
+from app.services.open_finance_sync import OpenFinanceSyncService
+from app.services.transaction_cache import LocalTransactionStore, to_provider_shape
+from app.services.matching_rules import get_matching_rules, to_cents
 from supabase import create_client, Client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
 
 router = APIRouter()
 settings = get_settings()
 
 def get_supabase() -> Client:
     try:
-        return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
     except Exception:
         # Fallback para o demo se o Supabase não estiver configurado
         return None
@@ -144,8 +148,8 @@ async def validate_receipt(
     
     Flow:
     1. Get the condominium's connected account
-    2. Fetch transactions from Pluggy
-    3. Look for matching transaction (value +- 0.05, date +- 2 days)
+    2. Read the account's transactions from the local store (Pluggy delta only if the last sync is stale)
+    3. Look for matching transaction (condominium rules, default value +- 0.05, date +- 2 days)
     """
     try:
         # 1. Get condominium's bank account
@@ -162,18 +166,21 @@ async def validate_receipt(
         account_data = account_result.data[0]
         pluggy_account_id = account_data["pluggy_account_id"]
         
-        # 2. Fetch transactions from Pluggy
-        service = PluggyService()
+        # 2. Read transactions (in-memory window -> local store -> Pluggy delta if stale)
         receipt_date = datetime.strptime(request.data, "%Y-%m-%d")
-        from_date = (receipt_date - timedelta(days=5)).strftime("%Y-%m-%d")
+        from_date = (receipt_date - timedelta(days=5)).date()
         
-        transactions = await service.get_transactions(pluggy_account_id, from_date=from_date)
+        transactions = await LocalTransactionStore(
+            supabase, max_staleness=settings.TRANSACTION_FRESHNESS_SECONDS
+        ).get_transactions(pluggy_account_id, from_date, request.condominio_id)
         
         # 3. Validation Logic
+        rules = get_matching_rules(request.condominio_id, supabase)
         match_found = False
         match_details = None
         
         receipt_val = Decimal(str(request.valor))
+        receipt_cents = to_cents(receipt_val)
         
         for tx in transactions:
             # Only check CREDIT transactions (money coming IN)
@@ -181,17 +188,17 @@ async def validate_receipt(
             if tx_amount <= 0:
                 continue
             
-            # Check value (tolerance 0.05)
+            # Check value (exact within tolerance, no fee)
             val_diff = abs(tx_amount - receipt_val)
             
-            if val_diff <= Decimal("0.05"):
-                # Check date (tolerance 2 days)
+            if rules.match_amount(receipt_cents, to_cents(tx_amount)) == ("exact", None):
+                # Check date
                 tx_date_str = tx["date"].split("T")[0]
                 tx_date = datetime.strptime(tx_date_str, "%Y-%m-%d")
                 
                 date_diff = abs((tx_date - receipt_date).days)
                 
-                if date_diff <= 2:
+                if rules.within_date_tolerance(date_diff):
                     match_found = True
                     match_details = {
                         "id": tx["id"],
@@ -219,6 +226,26 @@ async def validate_receipt(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+DISPLAY_DAYS = 30
+
+async def sync_account_incremental(supabase: Client, pluggy_account_id: str, condominio_id: str) -> int:
+    """Fetches the delta since the account's watermark and stores the new transactions"""
+    inserted, _ = await OpenFinanceSyncService(supabase, provider="pluggy").sync_account(
+        pluggy_account_id, condominio_id, days_back=DISPLAY_DAYS
+    )
+    return len(inserted)
+
+def list_synced_transactions(supabase: Client, pluggy_account_id: str) -> List[Dict[str, Any]]:
+    """Stored transactions of the account (Pluggy shape, as the frontend expects)"""
+    since = (datetime.now() - timedelta(days=DISPLAY_DAYS)).date().isoformat()
+    rows = supabase.table("transacoes_bancarias").select(
+        "provider_transacao_id, descricao, valor, tipo, data_transacao, metadata"
+    ).eq("provider_conta_id", pluggy_account_id).gte(
+        "data_transacao", since
+    ).order("data_transacao", desc=True).execute().data or []
+
+    return [to_provider_shape(row) for row in rows]
+
 @router.get("/sync-transactions/{condominio_id}")
 async def sync_transactions(
     condominio_id: str,
@@ -227,8 +254,12 @@ async def sync_transactions(
     """
     Manually sync transactions for a condominium.
     This can also be scheduled to run automatically (e.g., every hour).
+    Connected accounts sync incrementally (delta since the watermark) and
+    the response lists the stored transactions of the last DISPLAY_DAYS.
     """
     try:
+        account_data = None
+        new_transactions = None
         if not supabase or not (account_result := supabase.table("condominio_contas_bancarias").select("*").eq(
             "condominio_id", condominio_id
         ).eq("ativo", True).execute()).data:
@@ -243,8 +274,13 @@ async def sync_transactions(
         # Tentar buscar transações reais
         service = PluggyService()
         try:
-            transactions = await service.get_transactions(pluggy_account_id)
-            print(f"[Pluggy] ✅ {len(transactions)} transações reais obtidas.")
+            if account_data:
+                new_transactions = await sync_account_incremental(supabase, pluggy_account_id, condominio_id)
+                transactions = list_synced_transactions(supabase, pluggy_account_id)
+                print(f"[Pluggy] ✅ {new_transactions} transações novas, {len(transactions)} no período.")
+            else:
+                transactions = await service.get_transactions(pluggy_account_id)
+                print(f"[Pluggy] ✅ {len(transactions)} transações reais obtidas.")
         except Exception as e:
             print(f"[Pluggy] ⚠️  Falha ao buscar transações reais: {e}")
             # MODO DEMO: Se falhar ou for demo, injetar transações fakes ricas para a apresentação
@@ -296,6 +332,7 @@ async def sync_transactions(
             "status": "success",
             "transactions": transactions,
             "transactions_count": len(transactions),
+            "new_transactions": new_transactions,
             "message": f"Sincronizadas {len(transactions)} transações (Modo Demo)"
         }
         
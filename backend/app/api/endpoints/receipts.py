@@ -1,26 +1,35 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form, BackgroundTasks, Query
 from typing import List, Optional
 from app.models.schemas import ReceiptResponse, ReceiptCreate, ReceiptOCRResult
 from app.services.ocr_service import OCRService
+from app.services.match_suggestions import MatchSuggestionService
+from app.services.reconciliation_queue import ReconciliationQueueService
+from app.services.queue_events import queue_event_bus
+from app.services.queue_priority import compute_priority, FRAUD_SUSPECT_SCORE
+from app.services.matching_rules import get_matching_rules
+from app.services.tenant_scope import scoped, with_tenant
 from supabase import create_client, Client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
 import hashlib
 
 router = APIRouter()
 settings = get_settings()
 
 def get_supabase() -> Client:
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
 
 @router.post("/upload", response_model=ReceiptResponse)
 async def upload_receipt(
     file: UploadFile = File(...),
     unidade: Optional[str] = Form(None),
+    condominio_id: str = Form(...),
     supabase: Client = Depends(get_supabase)
 ):
     """
     Upload a receipt (PDF, JPG, PNG).
     Stores the file and creates a record for processing.
+    Duplicate detection is scoped to the receipt's condominium.
     """
     # Validate file type
     file_ext = file.filename.split('.')[-1].lower()
@@ -34,8 +43,10 @@ async def upload_receipt(
     # Calculate hash
     file_hash = hashlib.sha256(contents).hexdigest()
     
-    # Check for duplicates
-    existing = supabase.table("comprovantes").select("id, status, arquivo_hash").eq("arquivo_hash", file_hash).execute()
+    # Check for duplicates (idx_comprovantes_condominio_hash)
+    existing = scoped(
+        supabase.table("comprovantes").select("id, status, arquivo_hash, arquivo_url"), condominio_id
+    ).eq("arquivo_hash", file_hash).limit(1).execute()
     if existing.data:
         existing_receipt = existing.data[0]
         # Mark as duplicate
@@ -51,22 +62,20 @@ async def upload_receipt(
             "fraud_score": 100,
             "fraud_flags": {"flags": ["duplicate_file"]}
         }
-        result = supabase.table("comprovantes").insert(duplicate_data).execute()
+        result = supabase.table("comprovantes").insert(with_tenant(duplicate_data, condominio_id)).execute()
         return result.data[0]
     
     # Run fraud detection
     from app.services.fraud_detector import FraudDetector
     
-    # Get existing hashes for duplicate detection
-    all_receipts = supabase.table("comprovantes").select("arquivo_hash").execute()
-    existing_hashes = [r['arquivo_hash'] for r in all_receipts.data]
-    
+    # The indexed hash lookup above already ruled out duplicates,
+    # so the detector doesn't need every hash on the platform
     fraud_detector = FraudDetector()
     fraud_result = await fraud_detector.analyze_receipt(
         file_content=contents,
         file_type=file_ext,
         file_hash=file_hash,
-        existing_hashes=existing_hashes
+        existing_hashes=[]
     )
     
     # Upload to Supabase Storage
@@ -85,30 +94,42 @@ async def upload_receipt(
         "tipo_arquivo": file_ext,
         "tamanho_bytes": file_size,
         "unidade": unidade,
-        "status": "suspeito" if fraud_result['fraud_score'] > 70 else "pendente",
+        "status": "suspeito" if fraud_result['fraud_score'] > FRAUD_SUSPECT_SCORE else "pendente",
         "fraud_score": fraud_result['fraud_score'],
         "fraud_flags": {"flags": fraud_result['fraud_flags']},
         "documento_alterado": fraud_result['documento_alterado']
     }
     
-    result = supabase.table("comprovantes").insert(receipt_data).execute()
-    receipt_id = result.data[0]['id']
+    result = supabase.table("comprovantes").insert(with_tenant(receipt_data, condominio_id)).execute()
+    receipt = result.data[0]
+    receipt_id = receipt['id']
     
-    # If high fraud score, add to reconciliation queue with high priority
-    if fraud_result['fraud_score'] > 70:
-        supabase.table("fila_reconciliacao").insert({
+    # If high fraud score, add to reconciliation queue above every routine item
+    # (same composite score the periodic rescore computes)
+    if fraud_result['fraud_score'] > FRAUD_SUSPECT_SCORE:
+        rules = get_matching_rules(condominio_id, supabase)
+        queued = supabase.table("fila_reconciliacao").insert(with_tenant({
             "comprovante_id": receipt_id,
             "tipo": "fraude_suspeita",
-            "prioridade": 10,  # Highest priority
+            "prioridade": compute_priority(
+                valor=receipt.get("ocr_valor"),
+                fraud_score=fraud_result['fraud_score'],
+                criado_em=receipt.get("criado_em"),
+                sla_hours=rules.review_sla_hours
+            ),
             "matches_sugeridos": [],
             "status": "pendente"
-        }).execute()
+        }, condominio_id)).execute()
+        ReconciliationQueueService.invalidate()
+        queue_event_bus.publish("insert", receipt_id, queued.data[0] if queued.data else None)
     
-    return result.data[0]
+    return receipt
 
 @router.post("/{receipt_id}/process-ocr", response_model=ReceiptOCRResult)
 async def process_receipt_ocr(
     receipt_id: str,
+    background_tasks: BackgroundTasks,
+    condominio_id: str = Query(...),
     supabase: Client = Depends(get_supabase)
 ):
     """
@@ -116,7 +137,7 @@ async def process_receipt_ocr(
     Extracts valor, data, NSU, etc.
     """
     # Get receipt
-    receipt_result = supabase.table("comprovantes").select("*").eq("id", receipt_id).execute()
+    receipt_result = scoped(supabase.table("comprovantes").select("*"), condominio_id).eq("id", receipt_id).execute()
     if not receipt_result.data:
         raise HTTPException(status_code=404, detail="Receipt not found")
     
@@ -174,15 +195,19 @@ async def process_receipt_ocr(
     # Update receipt with OCR results
     supabase.table("comprovantes").update(ocr_result).eq("id", receipt_id).execute()
     
+    # Precompute match suggestions so the review screen is a plain read
+    background_tasks.add_task(MatchSuggestionService(supabase).refresh_receipts, [receipt_id])
+    
     return ocr_result
 
 @router.get("/{receipt_id}", response_model=ReceiptResponse)
 async def get_receipt(
     receipt_id: str,
+    condominio_id: str = Query(...),
     supabase: Client = Depends(get_supabase)
 ):
     """Get receipt details"""
-    result = supabase.table("comprovantes").select("*").eq("id", receipt_id).execute()
+    result = scoped(supabase.table("comprovantes").select("*"), condominio_id).eq("id", receipt_id).execute()
     if not result.data:
         raise HTTPException(status_code=404, detail="Receipt not found")
     return result.data[0]
@@ -191,10 +216,11 @@ async def get_receipt(
 async def list_receipts(
     status: Optional[str] = None,
     unidade: Optional[str] = None,
+    condominio_id: str = Query(...),
     supabase: Client = Depends(get_supabase)
 ):
-    """List receipts with optional filters"""
-    query = supabase.table("comprovantes").select("*")
+    """List receipts with optional filters (condominio_id uses idx_comprovantes_condominio_envio)"""
+    query = scoped(supabase.table("comprovantes").select("*"), condominio_id)
     
     if status:
         query = query.eq("status", status)
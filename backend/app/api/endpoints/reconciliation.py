@@ -1,203 +1,201 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from decimal import Decimal
-from datetime import timedelta
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Header, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from app.models.schemas import (
-    ReconciliationQueueItem, 
+    ReconciliationQueuePage, 
     ReconciliationApproval, 
     ReconciliationRejection,
+    BulkApprovalRequest,
+    BulkRejectionRequest,
+    BulkDecisionResponse,
     TransactionMatch
 )
+from app.services.matching_rules import MatchingRuleProfile, MatchingRulesService, get_matching_rules
+from app.services.reconciliation_queue import ReconciliationQueueService
+from app.services.reconciliation_decisions import ReconciliationDecisionService
+from app.services.match_suggestions import MatchSuggestionService
+from app.services.queue_events import queue_event_bus
+from app.services.tenant_scope import scoped
 from supabase import create_client, Client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
 
 router = APIRouter()
 settings = get_settings()
 
+SSE_HEARTBEAT_SECONDS = 15
+SUGGESTIONS_COMPUTED_HEADER = "X-Suggestions-Computed"
+
 def get_supabase() -> Client:
     try:
-        return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
     except Exception:
         return None
 
-@router.get("/queue", response_model=List[ReconciliationQueueItem])
+@router.get("/queue", response_model=ReconciliationQueuePage)
 async def get_reconciliation_queue(
     status: str = "pendente",
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    condominio_id: str = Query(...),
     supabase: Client = Depends(get_supabase)
 ):
     """
     Get the reconciliation queue.
-    Returns receipts that need manual review.
+    Returns receipts that need manual review, highest priority first,
+    keyset-paginated: pass `next_cursor` back as `cursor` for the next page.
+    Only the `condominio_id` condominium's queue is read.
     """
     if not supabase:
         print("⚠️ [Reconciliation] Demo Mode: Supabase offline, returning empty queue.")
-        return []
+        return ReconciliationQueuePage(items=[])
     
     try:
-        result = supabase.table("fila_reconciliacao").select(
-            "*, comprovantes(*)"
-        ).eq("status", status).order("prioridade", desc=True).execute()
-        return result.data
+        return ReconciliationQueueService(supabase).get_page(condominio_id, status, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"⚠️ [Reconciliation] Error: {e}")
-        return []
+        return ReconciliationQueuePage(items=[])
+
+@router.get("/queue/events")
+async def stream_queue_events(
+    request: Request,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Server-Sent Events for the reconciliation queue.
+    Emits incremental `insert` / `update` / `remove` events; `resync` means
+    the client fell behind and must reload the queue via GET /queue.
+    Browsers resume automatically with the Last-Event-ID header; an id issued
+    by another API worker (or before a restart) also gets `resync`.
+    """
+    async def event_stream():
+        subscription = queue_event_bus.subscribe(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                # Comment line keeps proxies from closing idle connections
+                yield event.to_sse() if event else ": ping\n\n"
+        finally:
+            subscription.close()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/matches/{receipt_id}", response_model=List[TransactionMatch])
 async def get_suggested_matches(
     receipt_id: str,
+    response: Response,
+    limit: int = Query(10, ge=1, le=50),
+    condominio_id: str = Query(...),
     supabase: Client = Depends(get_supabase)
 ):
     """
     Get suggested transaction matches for a receipt.
-    Uses fuzzy matching on valor and data.
+    Suggestions are precomputed when OCR finishes and when new transactions
+    arrive (sugestoes_conciliacao); this is an indexed read with no side effects.
+    Receipts older than precomputation return an empty list with
+    `X-Suggestions-Computed: false` until the reconciliation.backfill_suggestions
+    task reaches them.
     """
-    # Get receipt with OCR data
-    receipt_result = supabase.table("comprovantes").select("*").eq("id", receipt_id).execute()
+    receipt_result = scoped(supabase.table("comprovantes").select(
+        "id, sugestoes_calculadas_em"
+    ), condominio_id).eq("id", receipt_id).execute()
     if not receipt_result.data:
         raise HTTPException(status_code=404, detail="Receipt not found")
     
-    receipt = receipt_result.data[0]
-    
-    # If no OCR data, can't match
-    if not receipt['ocr_processado'] or not receipt['ocr_valor']:
+    if not receipt_result.data[0].get("sugestoes_calculadas_em"):
+        response.headers[SUGGESTIONS_COMPUTED_HEADER] = "false"
         return []
     
-    ocr_valor = Decimal(str(receipt['ocr_valor']))
-    ocr_data = receipt['ocr_data']
-    ocr_nsu = receipt['ocr_nsu']
-    
-    # Find potential matches
-    matches = []
-    
-    # Strategy 1: Exact NSU match (highest confidence)
-    if ocr_nsu:
-        nsu_matches = supabase.table("transacoes_bancarias").select("*").eq(
-            "nsu", ocr_nsu
-        ).eq("status_reconciliacao", "pendente").execute()
-        
-        for txn in nsu_matches.data:
-            matches.append(TransactionMatch(
-                transacao_id=txn['id'],
-                data_transacao=txn['data_transacao'],
-                valor=Decimal(str(txn['valor'])),
-                descricao=txn['descricao'],
-                nsu=txn['nsu'],
-                match_score=Decimal('95'),
-                match_reasons=["nsu_exato"]
-            ))
-    
-    # Strategy 2: Valor exato + data próxima (±3 dias)
-    if ocr_data:
-        date_range_start = (ocr_data - timedelta(days=3)).isoformat()
-        date_range_end = (ocr_data + timedelta(days=3)).isoformat()
-        
-        valor_tolerance = ocr_valor * Decimal('0.01')  # 1% tolerance
-        valor_min = float(ocr_valor - valor_tolerance)
-        valor_max = float(ocr_valor + valor_tolerance)
-        
-        # Supabase doesn't support range queries easily, so we fetch and filter
-        date_matches = supabase.table("transacoes_bancarias").select("*").gte(
-            "data_transacao", date_range_start
-        ).lte("data_transacao", date_range_end).eq("status_reconciliacao", "pendente").execute()
-        
-        for txn in date_matches.data:
-            txn_valor = Decimal(str(txn['valor']))
-            if valor_min <= float(txn_valor) <= valor_max:
-                # Calculate match score
-                valor_diff = abs(txn_valor - ocr_valor)
-                date_diff = abs((txn['data_transacao'] - ocr_data).days) if ocr_data else 999
-                
-                score = Decimal('80')
-                if valor_diff == 0:
-                    score += Decimal('15')
-                if date_diff == 0:
-                    score += Decimal('5')
-                
-                reasons = []
-                if valor_diff < ocr_valor * Decimal('0.01'):
-                    reasons.append("valor_exato")
-                if date_diff <= 1:
-                    reasons.append("data_proxima")
-                
-                # Avoid duplicates
-                if not any(m.transacao_id == txn['id'] for m in matches):
-                    matches.append(TransactionMatch(
-                        transacao_id=txn['id'],
-                        data_transacao=txn['data_transacao'],
-                        valor=txn_valor,
-                        descricao=txn['descricao'],
-                        nsu=txn['nsu'],
-                        match_score=score,
-                        match_reasons=reasons
-                    ))
-    
-    # Sort by score descending
-    matches.sort(key=lambda m: m.match_score, reverse=True)
-    
-    # If multiple high-confidence matches, add to queue as "multiplos_matches"
-    if len(matches) > 1 and matches[0].match_score > 80:
-        # Check if already in queue
-        queue_check = supabase.table("fila_reconciliacao").select("id").eq(
-            "comprovante_id", receipt_id
-        ).execute()
-        
-        if not queue_check.data:
-            supabase.table("fila_reconciliacao").insert({
-                "comprovante_id": receipt_id,
-                "tipo": "multiplos_matches",
-                "prioridade": 5,
-                "matches_sugeridos": [m.model_dump() for m in matches],
-                "status": "pendente"
-            }).execute()
-    
-    return matches
+    response.headers[SUGGESTIONS_COMPUTED_HEADER] = "true"
+    return [TransactionMatch(**match) for match in MatchSuggestionService(supabase).get(receipt_id, limit)]
+
+def _raise_if_skipped(report: dict):
+    """Single-item decisions keep the old contract: 409 when the item was not applied"""
+    outcome = report["resultados"][0]["resultado"] if report["resultados"] else "sem_resultado"
+    if outcome != "aplicado":
+        raise HTTPException(status_code=409, detail=f"Decisão não aplicada: {outcome}")
 
 @router.post("/approve")
 async def approve_reconciliation(
     approval: ReconciliationApproval,
+    condominio_id: str = Query(...),
     supabase: Client = Depends(get_supabase)
 ):
     """
     Approve a reconciliation match.
-    Links the receipt to the transaction.
+    Links the receipt to the transaction (atomically, via the bulk decision RPC).
     """
-    # Update receipt
-    supabase.table("comprovantes").update({
-        "status": "aprovado",
-        "transacao_id": approval.transacao_id,
-        "motivo_decisao": approval.motivo_decisao
-    }).eq("id", approval.comprovante_id).execute()
-    
-    # Update transaction
-    supabase.table("transacoes_bancarias").update({
-        "status_reconciliacao": "reconciliado",
-        "comprovante_id": approval.comprovante_id
-    }).eq("id", approval.transacao_id).execute()
-    
-    # Mark queue item as complete
-    supabase.table("fila_reconciliacao").update({
-        "status": "concluido"
-    }).eq("comprovante_id", approval.comprovante_id).execute()
-    
+    report = ReconciliationDecisionService(supabase).approve([approval.model_dump()], condominio_id)
+    _raise_if_skipped(report)
     return {"status": "approved"}
 
 @router.post("/reject")
 async def reject_receipt(
     rejection: ReconciliationRejection,
+    condominio_id: str = Query(...),
     supabase: Client = Depends(get_supabase)
 ):
     """
     Reject a receipt.
     Marks it as rejected with a reason.
     """
-    supabase.table("comprovantes").update({
-        "status": "rejeitado",
-        "motivo_decisao": rejection.motivo_decisao
-    }).eq("id", rejection.comprovante_id).execute()
-    
-    # Mark queue item as complete
-    supabase.table("fila_reconciliacao").update({
-        "status": "concluido"
-    }).eq("comprovante_id", rejection.comprovante_id).execute()
-    
+    report = ReconciliationDecisionService(supabase).reject([rejection.model_dump()], condominio_id)
+    _raise_if_skipped(report)
     return {"status": "rejected"}
+
+@router.post("/approve/bulk", response_model=BulkDecisionResponse)
+async def bulk_approve_reconciliations(
+    request: BulkApprovalRequest,
+    condominio_id: str = Query(...),
+    supabase: Client = Depends(get_supabase)
+):
+    """
+    Approve many matches in a single transaction.
+    Invalid items (already decided, transaction taken, duplicated in the batch,
+    outside `condominio_id`) are skipped and reported per item; the rest are applied.
+    """
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase indisponível")
+    return ReconciliationDecisionService(supabase).approve([item.model_dump() for item in request.items], condominio_id)
+
+@router.post("/reject/bulk", response_model=BulkDecisionResponse)
+async def bulk_reject_receipts(
+    request: BulkRejectionRequest,
+    condominio_id: str = Query(...),
+    supabase: Client = Depends(get_supabase)
+):
+    """Reject many receipts in a single transaction, with per-item outcomes"""
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase indisponível")
+    return ReconciliationDecisionService(supabase).reject([item.model_dump() for item in request.items], condominio_id)
+
+@router.get("/rules/{condominio_id}", response_model=MatchingRuleProfile)
+async def get_matching_rules_profile(
+    condominio_id: str,
+    supabase: Client = Depends(get_supabase)
+):
+    """Get the matching rule profile (tolerances and boleto fees) for a condominium"""
+    return get_matching_rules(condominio_id, supabase).profile
+
+@router.put("/rules/{condominio_id}", response_model=MatchingRuleProfile)
+async def update_matching_rules_profile(
+    condominio_id: str,
+    profile: MatchingRuleProfile,
+    supabase: Client = Depends(get_supabase)
+):
+    """
+    Update the matching rule profile for a condominium.
+    Recompiles the rule set and invalidates the cached copy.
+    """
+    if not supabase:
+        raise HTTPException(status_code=503, detail="Supabase indisponível")
+    
+    rules = MatchingRulesService(supabase).save_profile(condominio_id, profile)
+    return rules.profile
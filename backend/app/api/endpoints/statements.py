@@ -1,25 +1,31 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks, Form, Query
 from typing import List
 from app.models.schemas import BankStatementResponse, BankTransactionResponse
 from app.services.statement_parser import StatementParser
+from app.services.match_suggestions import MatchSuggestionService
+from app.services.tenant_scope import scoped, with_tenant
 from supabase import create_client, Client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
 import hashlib
 
 router = APIRouter()
 settings = get_settings()
 
 def get_supabase() -> Client:
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
 
 @router.post("/upload", response_model=BankStatementResponse)
 async def upload_statement(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    condominio_id: str = Form(...),
     supabase: Client = Depends(get_supabase)
 ):
     """
     Upload a bank statement (CSV, OFX, or PDF).
     Parses the file and extracts transactions.
+    Statement and transactions are stamped with the condominium.
     """
     # Validate file type
     file_ext = file.filename.split('.')[-1].lower()
@@ -32,7 +38,7 @@ async def upload_statement(
     # Calculate hash for deduplication
     file_hash = hashlib.sha256(contents).hexdigest()
     
-    # Check if already uploaded
+    # Check if already uploaded (arquivo_hash is UNIQUE platform-wide: a single index probe)
     existing = supabase.table("extratos_bancarios").select("id").eq("arquivo_hash", file_hash).execute()
     if existing.data:
         raise HTTPException(status_code=400, detail="This statement has already been uploaded")
@@ -68,34 +74,43 @@ async def upload_statement(
         "fonte": "manual"
     }
     
-    result = supabase.table("extratos_bancarios").insert(statement_data).execute()
+    result = supabase.table("extratos_bancarios").insert(with_tenant(statement_data, condominio_id)).execute()
     statement_id = result.data[0]['id']
     
     # Insert transactions
     for txn in transactions:
         txn['extrato_id'] = statement_id
+        with_tenant(txn, condominio_id)
         # Convert date to ISO string
         txn['data_transacao'] = txn['data_transacao'].isoformat()
         txn['valor'] = float(txn['valor'])
     
     if transactions:
         supabase.table("transacoes_bancarias").insert(transactions).execute()
+        # Recalculate suggestions only for the receipts these transactions can match
+        background_tasks.add_task(MatchSuggestionService(supabase).refresh_for_transactions, transactions, condominio_id)
     
     return result.data[0]
 
 @router.get("/{statement_id}/transactions", response_model=List[BankTransactionResponse])
 async def get_statement_transactions(
     statement_id: str,
+    condominio_id: str = Query(...),
     supabase: Client = Depends(get_supabase)
 ):
     """Get all transactions from a specific statement"""
-    result = supabase.table("transacoes_bancarias").select("*").eq("extrato_id", statement_id).execute()
+    result = scoped(supabase.table("transacoes_bancarias").select("*"), condominio_id).eq(
+        "extrato_id", statement_id
+    ).execute()
     return result.data
 
 @router.get("/", response_model=List[BankStatementResponse])
 async def list_statements(
+    condominio_id: str = Query(...),
     supabase: Client = Depends(get_supabase)
 ):
-    """List all uploaded bank statements"""
-    result = supabase.table("extratos_bancarios").select("*").order("data_importacao", desc=True).execute()
+    """List the condominium's uploaded bank statements"""
+    result = scoped(supabase.table("extratos_bancarios").select("*"), condominio_id).order(
+        "data_importacao", desc=True
+    ).execute()
     return result.data
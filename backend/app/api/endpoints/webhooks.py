@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, Header
+from typing import Dict, Any, List, Optional, Callable
+from app.services.pluggy_webhooks import (
+    PluggyWebhookService, InvalidWebhookSecretError, verify_secret, parse_event, SECRET_HEADER
+)
+from app.services.sync_scheduler import ScheduledAccount
+from supabase import create_client, Client
+from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
+
+router = APIRouter()
+settings = get_settings()
+
+def get_supabase() -> Client:
+    return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
+
+def get_webhook_secret() -> str:
+    return settings.PLUGGY_WEBHOOK_SECRET
+
+def get_sync_enqueuer() -> Callable[[List[ScheduledAccount]], None]:
+    """Enfileira um sync.account por conta (import tardio: a API não depende do broker para subir)"""
+    from app.tasks.sync_tasks import sync_single_account
+
+    def enqueue(accounts: List[ScheduledAccount]):
+        for account in accounts:
+            sync_single_account.delay(account.model_dump())
+    return enqueue
+
+@router.post("/pluggy", status_code=202)
+async def receive_pluggy_webhook(
+    request: Request,
+    provided_secret: Optional[str] = Header(default=None, alias=SECRET_HEADER),
+    supabase: Client = Depends(get_supabase),
+    secret: str = Depends(get_webhook_secret),
+    enqueue: Callable[[List[ScheduledAccount]], None] = Depends(get_sync_enqueuer)
+) -> Dict[str, Any]:
+    """
+    Recebe item/updated e transactions/created da Pluggy.
+
+    Responde 202 assim que o sync das contas afetadas está enfileirado; a
+    Pluggy reentrega o que não recebe 2xx, e reentregas de um eventId já
+    aceito só são confirmadas.
+    """
+    try:
+        verify_secret(provided_secret, secret)
+    except InvalidWebhookSecretError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    body = await request.body()
+
+    try:
+        event = parse_event(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Payload inválido: {e}")
+
+    service = PluggyWebhookService(supabase)
+    if not service.register(event):
+        return {"status": "duplicado", "event_id": event.event_id, "contas": 0}
+
+    accounts = service.affected_accounts(event)
+    try:
+        enqueue(accounts)
+    except Exception as e:
+        service.forget(event)
+        raise HTTPException(status_code=503, detail=f"Falha ao enfileirar sincronização: {e}")
+
+    return {
+        "status": "aceito" if accounts else "ignorado",
+        "event_id": event.event_id,
+        "contas": len(accounts)
+    }
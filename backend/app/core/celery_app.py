@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_process_init
 import os
 import redis
 import logging
@@ -20,10 +21,14 @@ except (redis.ConnectionError, ValueError):
     logger.warning("⚠️ Isso bloqueará a API durante o processamento. Use apenas para testes.")
     use_eager_mode = True
 
+# Exportador de métricas por processo do pool (0 desliga)
+CELERY_METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT", "9540"))
+
 celery_app = Celery(
     "audi_home_worker",
     broker=CELERY_BROKER_URL,
-    backend=CELERY_RESULT_BACKEND
+    backend=CELERY_RESULT_BACKEND,
+    include=["app.tasks.audit_tasks", "app.tasks.reconciliation_tasks", "app.tasks.sync_tasks"]
 )
 
 celery_app.conf.update(
@@ -41,3 +46,50 @@ celery_app.conf.task_routes = {
     "app.tasks.audit_tasks.*": {"queue": "audit_queue"},
     "app.tasks.ocr_tasks.*": {"queue": "ocr_queue"},
 }
+
+# Tarefas periódicas (celery -A app.core.celery_app beat)
+INCREMENTAL_RECONCILE_INTERVAL = int(os.getenv("INCREMENTAL_RECONCILE_INTERVAL", "60"))
+QUEUE_RESCORE_INTERVAL = int(os.getenv("QUEUE_RESCORE_INTERVAL", "300"))
+FLEET_SYNC_INTERVAL = int(os.getenv("FLEET_SYNC_INTERVAL", "60"))
+FLEET_SYNC_SHARDS = int(os.getenv("FLEET_SYNC_SHARDS", "8"))
+PROVIDER_SYNC_BUDGET_PER_MINUTE = int(os.getenv("PROVIDER_SYNC_BUDGET_PER_MINUTE", "120"))
+# Bem acima da janela de reentrega dos webhooks da Pluggy
+WEBHOOK_EVENT_RETENTION_DAYS = int(os.getenv("WEBHOOK_EVENT_RETENTION_DAYS", "7"))
+WEBHOOK_PURGE_INTERVAL = int(os.getenv("WEBHOOK_PURGE_INTERVAL", "3600"))
+
+celery_app.conf.beat_schedule = {
+    "conciliacao-incremental": {
+        "task": "reconciliation.incremental",
+        "schedule": INCREMENTAL_RECONCILE_INTERVAL,
+    },
+    "prioridade-fila": {
+        "task": "reconciliation.rescore_queue",
+        "schedule": QUEUE_RESCORE_INTERVAL,
+    },
+    "sincronizacao-frota": {
+        "task": "sync.dispatch",
+        "schedule": FLEET_SYNC_INTERVAL,
+    },
+    "limpeza-webhooks": {
+        "task": "webhooks.purge_events",
+        "schedule": WEBHOOK_PURGE_INTERVAL,
+    },
+}
+
+@worker_process_init.connect
+def start_worker_metrics(**kwargs):
+    """
+    Cada processo do pool expõe o próprio registro (conciliação incremental,
+    sync da frota, chamadas de saída) em CELERY_METRICS_PORT + índice do
+    processo: o /metrics da API não vê o que roda aqui.
+    """
+    if not CELERY_METRICS_PORT:
+        return
+    from billiard.process import current_process
+    from app.services.metrics import start_metrics_server
+
+    port = CELERY_METRICS_PORT + (getattr(current_process(), "index", None) or 0)
+    try:
+        start_metrics_server(port)
+    except OSError as e:
+        logger.warning(f"⚠️ Métricas do worker indisponíveis na porta {port}: {e}")
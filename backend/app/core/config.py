@@ -17,6 +17,8 @@ class Settings(BaseSettings):
     # Pluggy (Open Finance)
     PLUGGY_CLIENT_ID: str = ""
     PLUGGY_CLIENT_SECRET: str = ""
+    PLUGGY_WEBHOOK_SECRET: str = ""  # Cadastrado no webhook da Pluggy como header X-Webhook-Secret
+    TRANSACTION_FRESHNESS_SECONDS: int = 1200  # Idade máxima do sync local antes de buscar o delta no provider
     
     # Belvo (Open Finance - Alternative)
     BELVO_SECRET_ID: str = ""
@@ -1,7 +1,15 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from app.core.config import get_settings
-from app.api.endpoints import budget, payments, statements, receipts, reconciliation, open_finance, pluggy_routes, audit, dashboard
+from app.services.http_client import close_async_clients
+from app.services.resilience import health_snapshot
+from app.services.queue_events import queue_event_bus
+from app.services.reconciliation_queue import ReconciliationQueueService
+from app.services.metrics import registry, request_breakdown, log_breakdown, HTTP_SECONDS, CONTENT_TYPE
+from app.api.endpoints import budget, payments, statements, receipts, reconciliation, open_finance, pluggy_routes, audit, dashboard, webhooks
 
 settings = get_settings()
 
@@ -19,6 +27,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def stage_timing(request: Request, call_next):
+    """Histograma por rota + uma linha JSON com o tempo de cada etapa da request"""
+    start = time.perf_counter()
+    status = 500
+    with request_breakdown() as breakdown:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            # Rota com placeholders ({receipt_id}) para não explodir a cardinalidade
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.observe(elapsed, method=request.method, route=route, status=str(status))
+            if breakdown:
+                log_breakdown(
+                    "request_stages",
+                    breakdown,
+                    method=request.method,
+                    route=route,
+                    status=status,
+                    duration_ms=round(elapsed * 1000, 3)
+                )
+
+@app.on_event("startup")
+async def start_queue_event_relay():
+    """Eventos da fila publicados por outros processos (tasks Celery) chegam aos clientes SSE deste worker"""
+    relay = queue_event_bus.relay
+    if relay is not None:
+        app.state.queue_event_relay = asyncio.create_task(
+            relay.listen(queue_event_bus, ReconciliationQueueService.invalidate)
+        )
+
+@app.on_event("shutdown")
+async def stop_queue_event_relay():
+    task = getattr(app.state, "queue_event_relay", None)
+    if task is not None:
+        task.cancel()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Fecha o pool HTTP compartilhado (Pluggy/Open Finance)"""
+    await close_async_clients()
+
 # Routers
 app.include_router(dashboard.router, prefix=f"{settings.API_V1_STR}/dashboard", tags=["dashboard"])
 app.include_router(budget.router, prefix=f"{settings.API_V1_STR}/budget", tags=["budget"])
@@ -29,7 +82,18 @@ app.include_router(reconciliation.router, prefix=f"{settings.API_V1_STR}/reconci
 app.include_router(open_finance.router, prefix=f"{settings.API_V1_STR}/open-finance", tags=["open-finance"])
 app.include_router(pluggy_routes.router, prefix=f"{settings.API_V1_STR}/pluggy", tags=["pluggy"])
 app.include_router(audit.router, prefix=f"{settings.API_V1_STR}/audit", tags=["audit"])
+app.include_router(webhooks.router, prefix=f"{settings.API_V1_STR}/webhooks", tags=["webhooks"])
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/health/providers")
+def providers_health():
+    """Per-host state of outbound providers (circuit, concurrency limit, latency, retry budget) in this worker"""
+    return {"hosts": health_snapshot()}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint (per-worker registry)"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
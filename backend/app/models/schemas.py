@@ -75,6 +75,7 @@ class BankStatementBase(BaseModel):
     periodo_inicio: Optional[date] = None
     periodo_fim: Optional[date] = None
     fonte: Literal['manual', 'open_finance'] = 'manual'
+    condominio_id: Optional[str] = None
 
 class BankStatementCreate(BankStatementBase):
     arquivo_url: Optional[str] = None
@@ -107,6 +108,7 @@ class BankTransactionResponse(BankTransactionBase):
     extrato_id: str
     status_reconciliacao: Literal['pendente', 'reconciliado', 'divergente', 'ignorado']
     comprovante_id: Optional[str] = None
+    condominio_id: Optional[str] = None
     criado_em: datetime
     
     class Config:
@@ -117,6 +119,7 @@ class ReceiptBase(BaseModel):
     arquivo_nome: str
     tipo_arquivo: Literal['pdf', 'jpg', 'jpeg', 'png']
     unidade: Optional[str] = None
+    condominio_id: Optional[str] = None
 
 class ReceiptCreate(ReceiptBase):
     arquivo_hash: str
@@ -177,19 +180,37 @@ class TransactionMatch(BaseModel):
     match_score: Decimal  # 0-100
     match_reasons: List[str]  # e.g., ["valor_exato", "data_proxima", "nsu_match"]
 
+class QueueReceiptSummary(BaseModel):
+    """Receipt fields shown in the queue (no large text columns)"""
+    id: str
+    unidade: Optional[str] = None
+    arquivo_nome: Optional[str] = None
+    ocr_valor: Optional[Decimal] = None
+    ocr_data: Optional[date] = None
+    ocr_nsu: Optional[str] = None
+    fraud_score: Optional[Decimal] = None
+    data_envio: Optional[datetime] = None
+
 class ReconciliationQueueItem(BaseModel):
     id: str
     comprovante_id: str
+    condominio_id: Optional[str] = None
     prioridade: int
     tipo: Literal['manual', 'excecao', 'duplicado', 'fraude_suspeita', 'multiplos_matches', 'baixa_confianca']
     matches_sugeridos: List[TransactionMatch]
     status: Literal['pendente', 'em_revisao', 'concluido', 'cancelado']
     criado_em: datetime
     atribuido_a: Optional[str] = None
+    comprovante: Optional[QueueReceiptSummary] = None
     
     class Config:
         from_attributes = True
 
+class ReconciliationQueuePage(BaseModel):
+    """Keyset-paginated queue page"""
+    items: List[ReconciliationQueueItem]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= to get the next page
+
 class ReconciliationApproval(BaseModel):
     """Request to approve a reconciliation"""
     comprovante_id: str
@@ -200,3 +221,30 @@ class ReconciliationRejection(BaseModel):
     """Request to reject a receipt"""
     comprovante_id: str
     motivo_decisao: str
+
+DecisionOutcome = Literal[
+    'aplicado', 'comprovante_inexistente', 'comprovante_ja_decidido', 'comprovante_repetido',
+    'transacao_obrigatoria', 'transacao_inexistente', 'transacao_ja_conciliada', 'transacao_repetida',
+    'decisao_invalida'
+]
+
+class BulkApprovalRequest(BaseModel):
+    """Approve many reconciliations in one atomic call"""
+    items: List[ReconciliationApproval] = Field(..., min_length=1, max_length=500)
+
+class BulkRejectionRequest(BaseModel):
+    """Reject many receipts in one atomic call"""
+    items: List[ReconciliationRejection] = Field(..., min_length=1, max_length=500)
+
+class ReconciliationDecisionResult(BaseModel):
+    """Outcome of one item of a bulk decision"""
+    comprovante_id: str
+    transacao_id: Optional[str] = None
+    decisao: Literal['aprovar', 'rejeitar']
+    resultado: DecisionOutcome
+
+class BulkDecisionResponse(BaseModel):
+    lote_id: str  # Groups the audit rows in decisoes_reconciliacao
+    aplicados: int
+    ignorados: int
+    resultados: List[ReconciliationDecisionResult]
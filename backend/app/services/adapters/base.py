@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from datetime import date
 from decimal import Decimal
 from pydantic import BaseModel
@@ -46,6 +46,18 @@ class BankDataProvider(ABC):
         MUST return List[StandardTransaction].
         """
         pass
+
+    async def iter_transaction_pages(
+        self,
+        account_id: str,
+        from_date: date,
+        to_date: Optional[date] = None
+    ) -> AsyncIterator[List[StandardTransaction]]:
+        """
+        Stream transactions page by page.
+        Default: a single page with get_transactions(); paginated providers override it.
+        """
+        yield await self.get_transactions(account_id, from_date, to_date)
     
     @abstractmethod
     async def get_balance(self, account_id: str) -> Decimal:
@@ -2,68 +2,83 @@ from typing import List, Dict, Any, Optional
 from datetime import date, datetime
 from decimal import Decimal
 import httpx
+from app.services.http_client import request_with_retry
 from .base import BankDataProvider, StandardTransaction
 
+BELVO_PAGE_SIZE = 1000  # Belvo's maximum page_size
+
 class BelvoAdapter(BankDataProvider):
     """
     Adapter for Belvo Open Finance API.
     Normalizes data to StandardTransaction.
     """
-    
+
     def __init__(self, secret_id: str, secret_password: str):
         self.secret_id = secret_id
         self.secret_password = secret_password
         self.base_url = "https://api.belvo.com"
-    
-    async def create_connect_token(self, user_id: str) -> Dict[str, str]:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/api/token/",
-                auth=(self.secret_id, self.secret_password),
-                json={
-                    "scopes": "read_accounts,read_transactions",
-                    "external_id": user_id
-                }
-            )
-            response.raise_for_status()
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Request authenticated with HTTP Basic (Belvo has no short-lived token to cache)"""
+        if url.startswith("/"):
+            url = f"{self.base_url}{url}"
+        response = await request_with_retry(method, url, auth=(self.secret_id, self.secret_password), **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def _get_all(self, path: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Follows Belvo's `next` links until the last page"""
+        results: List[Dict[str, Any]] = []
+        response = await self._request("GET", path, params={**params, "page_size": BELVO_PAGE_SIZE})
+        while True:
             data = response.json()
-            return {
-                "access_token": data['access'],
-                "widget_url": f"https://widget.belvo.com?access_token={data['access']}"
+            results.extend(data.get('results', []))
+            if not data.get('next'):
+                return results
+            response = await self._request("GET", data['next'])
+
+    async def create_connect_token(self, user_id: str) -> Dict[str, str]:
+        response = await self._request(
+            "POST",
+            "/api/token/",
+            json={
+                "scopes": "read_accounts,read_transactions",
+                "external_id": user_id
             }
+        )
+        data = response.json()
+        return {
+            "access_token": data['access'],
+            "widget_url": f"https://widget.belvo.com?access_token={data['access']}"
+        }
 
     async def get_accounts(self, item_id: str) -> List[Dict[str, Any]]:
-        # Belvo implementation for accounts
-        # Simplified for this example
-        return []
+        # Belvo's "link" is the equivalent of Pluggy's item
+        return await self._get_all("/api/accounts/", {"link": item_id})
 
     async def get_transactions(
-        self, 
-        account_id: str, 
-        from_date: date, 
+        self,
+        account_id: str,
+        from_date: date,
         to_date: Optional[date] = None
     ) -> List[StandardTransaction]:
         if not to_date:
             to_date = date.today()
-            
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/api/transactions/",
-                auth=(self.secret_id, self.secret_password),
-                params={
-                    "link": account_id,
-                    "date_from": from_date.isoformat(),
-                    "date_to": to_date.isoformat()
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            return [self._to_internal_model(tx) for tx in data['results']]
+
+        results = await self._get_all(
+            "/api/transactions/",
+            {
+                "link": account_id,
+                "value_date__gte": from_date.isoformat(),
+                "value_date__lte": to_date.isoformat()
+            }
+        )
+        return [self._to_internal_model(tx) for tx in results]
 
     async def get_balance(self, account_id: str) -> Decimal:
-        # Belvo implementation for balance
-        return Decimal('0.00')
+        response = await self._request("GET", f"/api/accounts/{account_id}/")
+        balance = response.json().get('balance') or {}
+        return Decimal(str(balance.get('current') or 0))
 
     def _to_internal_model(self, belvo_tx: Dict[str, Any]) -> StandardTransaction:
         """
@@ -71,7 +86,7 @@ class BelvoAdapter(BankDataProvider):
         """
         # Belvo explicit types: 'INFLOW' or 'OUTFLOW'
         tx_type = 'CREDIT' if belvo_tx['type'] == 'INFLOW' else 'DEBIT'
-        
+
         return StandardTransaction(
             id=belvo_tx['id'],
             amount=abs(Decimal(str(belvo_tx['amount']))),
@@ -1,7 +1,10 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from datetime import date, datetime
 from decimal import Decimal
 import httpx
+from app.services.http_client import request_with_retry
+from app.services.credential_cache import credential_cache, PLUGGY_API_KEY_TTL
+from app.services.pluggy_service import iter_pages, pluggy_credential_name, TRANSACTIONS_PAGE_SIZE
 from .base import BankDataProvider, StandardTransaction
 
 class PluggyAdapter(BankDataProvider):
@@ -14,51 +17,49 @@ class PluggyAdapter(BankDataProvider):
         self.client_id = client_id
         self.client_secret = client_secret
         self.base_url = "https://api.pluggy.ai"
-        self.access_token: Optional[str] = None
     
     async def _get_access_token(self) -> str:
-        if self.access_token:
-            return self.access_token
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/auth",
-                json={
-                    "clientId": self.client_id,
-                    "clientSecret": self.client_secret
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-            self.access_token = data['apiKey']
-            return self.access_token
+        # Same process-wide cache entry as PluggyService (same client, same API key)
+        return await credential_cache.get(
+            pluggy_credential_name(self.client_id), self._authenticate, PLUGGY_API_KEY_TTL
+        )
 
-    async def create_connect_token(self, user_id: str) -> Dict[str, str]:
-        token = await self._get_access_token()
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/connect_token",
-                headers={"X-API-KEY": token},
-                json={"clientUserId": user_id}
-            )
-            response.raise_for_status()
-            data = response.json()
-            return {
-                "access_token": data['accessToken'],
-                "widget_url": f"https://connect.pluggy.ai?connectToken={data['accessToken']}"
+    async def _authenticate(self) -> str:
+        response = await request_with_retry(
+            "POST",
+            f"{self.base_url}/auth",
+            json={
+                "clientId": self.client_id,
+                "clientSecret": self.client_secret
             }
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data['apiKey']
 
-    async def get_accounts(self, item_id: str) -> List[Dict[str, Any]]:
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Authorized request; a 401 refreshes the API key and retries once"""
         token = await self._get_access_token()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/accounts",
-                headers={"X-API-KEY": token},
-                params={"itemId": item_id}
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data['results']
+        response = await request_with_retry(method, f"{self.base_url}{path}", headers={"X-API-KEY": token}, **kwargs)
+        if response.status_code == 401:
+            credential_cache.invalidate(pluggy_credential_name(self.client_id), token)
+            token = await self._get_access_token()
+            response = await request_with_retry(method, f"{self.base_url}{path}", headers={"X-API-KEY": token}, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def create_connect_token(self, user_id: str) -> Dict[str, str]:
+        response = await self._request("POST", "/connect_token", json={"clientUserId": user_id})
+        data = response.json()
+        return {
+            "access_token": data['accessToken'],
+            "widget_url": f"https://connect.pluggy.ai?connectToken={data['accessToken']}"
+        }
+
+    async def get_accounts(self, item_id: str) -> List[Dict[str, Any]]:
+        response = await self._request("GET", "/accounts", params={"itemId": item_id})
+        data = response.json()
+        return data['results']
 
     async def get_transactions(
         self, 
@@ -66,35 +67,41 @@ class PluggyAdapter(BankDataProvider):
         from_date: date, 
         to_date: Optional[date] = None
     ) -> List[StandardTransaction]:
-        token = await self._get_access_token()
+        transactions: List[StandardTransaction] = []
+        async for page in self.iter_transaction_pages(account_id, from_date, to_date):
+            transactions.extend(page)
+        return transactions
+
+    async def iter_transaction_pages(
+        self,
+        account_id: str,
+        from_date: date,
+        to_date: Optional[date] = None
+    ) -> AsyncIterator[List[StandardTransaction]]:
         if not to_date:
             to_date = date.today()
-            
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/transactions",
-                headers={"X-API-KEY": token},
+
+        async def fetch_page(page: int) -> Dict[str, Any]:
+            response = await self._request(
+                "GET",
+                "/transactions",
                 params={
                     "accountId": account_id,
                     "from": from_date.isoformat(),
-                    "to": to_date.isoformat()
+                    "to": to_date.isoformat(),
+                    "pageSize": TRANSACTIONS_PAGE_SIZE,
+                    "page": page
                 }
             )
-            response.raise_for_status()
-            data = response.json()
-            
-            return [self._to_internal_model(tx) for tx in data['results']]
+            return response.json()
+
+        async for page in iter_pages(fetch_page):
+            yield [self._to_internal_model(tx) for tx in page]
 
     async def get_balance(self, account_id: str) -> Decimal:
-        token = await self._get_access_token()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/accounts/{account_id}",
-                headers={"X-API-KEY": token}
-            )
-            response.raise_for_status()
-            data = response.json()
-            return Decimal(str(data['balance']))
+        response = await self._request("GET", f"/accounts/{account_id}")
+        data = response.json()
+        return Decimal(str(data['balance']))
 
     def _to_internal_model(self, pluggy_tx: Dict[str, Any]) -> StandardTransaction:
         """
@@ -116,6 +123,7 @@ class PluggyAdapter(BankDataProvider):
             provider_name='pluggy',
             metadata={
                 "category": pluggy_tx.get('category'),
-                "payment_data": pluggy_tx.get('paymentData')
+                "payment_data": pluggy_tx.get('paymentData'),
+                "updated_at": pluggy_tx.get('updatedAt')
             }
         )
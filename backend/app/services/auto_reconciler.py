@@ -0,0 +1,252 @@
+"""
+Auto Reconciler - Conciliação Automática em Lote (Set-Based)
+Substitui o loop transação × comprovante por hash joins:
+1. NSU exato
+2. Bucket de centavos (com taxas de boleto) + janela de data
+Os vínculos são aplicados de uma vez numa RPC transacional.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import List, Dict, Any, Optional, Set, Tuple
+from pydantic import BaseModel
+from app.services.matching_rules import CompiledRuleSet, get_matching_rules, to_cents, is_credit
+from app.services.reconciliation_queue import ReconciliationQueueService
+from app.services.queue_events import queue_event_bus
+
+APPLY_RPC = "conciliar_automaticamente"
+DEFAULT_REASON = "Auto-reconciliado via Open Finance"
+
+class ReconciliationLink(BaseModel):
+    """Vínculo transação ↔ comprovante proposto pelo join"""
+    transacao_id: str
+    comprovante_id: str
+    method: str  # "nsu" ou "valor_data"
+
+class AutoReconcileReport(BaseModel):
+    """Resumo de uma execução de auto-conciliação"""
+    extrato_id: str
+    condominio_id: Optional[str] = None
+    transacoes_pendentes: int = 0
+    comprovantes_pendentes: int = 0
+    vinculos_nsu: int = 0
+    vinculos_valor_data: int = 0
+    ambiguos: int = 0          # Comprovantes com mais de um candidato (ficam para revisão)
+    sem_candidato: int = 0
+    aplicados: int = 0         # Confirmados pela RPC
+    ignorados: int = 0         # Rejeitados pela RPC (linha já conciliada por outra execução)
+
+def _parse_date(value: Any) -> Optional[date]:
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+def plan_links(
+    transactions: List[Dict[str, Any]],
+    receipts: List[Dict[str, Any]],
+    rules: CompiledRuleSet,
+    nsu_receipts: Optional[List[Dict[str, Any]]] = None
+) -> Tuple[List[ReconciliationLink], int, int]:
+    """
+    Calcula os vínculos sem I/O.
+
+    Só vincula pares mutuamente únicos: o comprovante tem um único candidato
+    e a transação é candidata de um único comprovante. Valores repetidos
+    (várias cotas iguais no mesmo dia) ficam para revisão em vez de
+    vincular o primeiro par encontrado.
+
+    nsu_receipts: comprovantes com NSU das transações carregados sem filtro
+    de data (OCR sem data ou com data errada ainda vincula pelo NSU, e a
+    unicidade do NSU vale para todos os pendentes). Só entram no join por NSU.
+
+    Returns:
+        (vínculos, comprovantes ambíguos, comprovantes sem candidato)
+    """
+    links: List[ReconciliationLink] = []
+    used_txns: Set[str] = set()
+    linked_receipts: Set[str] = set()
+
+    credits = [t for t in transactions if is_credit(t)]
+
+    # 1. Hash join por NSU
+    txns_by_nsu: Dict[str, List[str]] = {}
+    for txn in credits:
+        if txn.get("nsu"):
+            txns_by_nsu.setdefault(str(txn["nsu"]), []).append(txn["id"])
+
+    receipts_by_nsu: Dict[str, List[str]] = {}
+    seen_receipts: Set[str] = set()
+    for receipt in list(receipts) + list(nsu_receipts or []):
+        if receipt.get("ocr_nsu") and receipt["id"] not in seen_receipts:
+            seen_receipts.add(receipt["id"])
+            receipts_by_nsu.setdefault(str(receipt["ocr_nsu"]), []).append(receipt["id"])
+
+    ambiguous_nsu: Set[str] = set()
+    for nsu, receipt_ids in receipts_by_nsu.items():
+        txn_ids = txns_by_nsu.get(nsu, [])
+        if len(receipt_ids) == 1 and len(txn_ids) == 1:
+            links.append(ReconciliationLink(transacao_id=txn_ids[0], comprovante_id=receipt_ids[0], method="nsu"))
+            used_txns.add(txn_ids[0])
+            linked_receipts.add(receipt_ids[0])
+        elif txn_ids and len(receipt_ids) > 1:
+            # Mesmo NSU em vários comprovantes pendentes (reenvio?): revisão, nem por valor/data
+            ambiguous_nsu.update(receipt_ids)
+
+    # 2. Hash join por bucket de centavos, filtrando a janela de data com bisect
+    buckets: Dict[int, List[Tuple[int, str]]] = {}
+    for txn in credits:
+        txn_date = _parse_date(txn.get("data_transacao"))
+        if txn["id"] in used_txns or not txn_date:
+            continue
+        buckets.setdefault(to_cents(txn["valor"]), []).append((txn_date.toordinal(), txn["id"]))
+    for entries in buckets.values():
+        entries.sort()
+
+    receipt_candidates: Dict[str, Set[str]] = {}
+    txn_candidates: Dict[str, Set[str]] = {}
+    sem_candidato = 0
+
+    ambiguos = 0
+    for receipt in receipts:
+        if receipt["id"] in linked_receipts:
+            continue
+        if receipt["id"] in ambiguous_nsu:
+            ambiguos += 1
+            continue
+        receipt_date = _parse_date(receipt.get("ocr_data"))
+        if not receipt.get("ocr_valor") or not receipt_date:
+            sem_candidato += 1
+            continue
+
+        receipt_cents = to_cents(receipt["ocr_valor"])
+        day = receipt_date.toordinal()
+        lo_day = day - rules.date_tolerance_days
+        hi_day = day + rules.date_tolerance_days
+
+        found: Set[str] = set()
+        for delta in rules.amount_deltas_cents:
+            entries = buckets.get(receipt_cents - delta)
+            if not entries:
+                continue
+            start = bisect_left(entries, lo_day, key=lambda entry: entry[0])
+            end = bisect_right(entries, hi_day, key=lambda entry: entry[0])
+            found.update(txn_id for _, txn_id in entries[start:end])
+
+        if not found:
+            sem_candidato += 1
+            continue
+
+        receipt_candidates[receipt["id"]] = found
+        for txn_id in found:
+            txn_candidates.setdefault(txn_id, set()).add(receipt["id"])
+
+    for receipt_id, found in receipt_candidates.items():
+        txn_id = next(iter(found))
+        if len(found) == 1 and len(txn_candidates[txn_id]) == 1:
+            links.append(ReconciliationLink(transacao_id=txn_id, comprovante_id=receipt_id, method="valor_data"))
+        else:
+            ambiguos += 1
+
+    return links, ambiguos, sem_candidato
+
+class AutoReconciler:
+    """
+    Auto-conciliação de um extrato contra os comprovantes pendentes
+    do mesmo condomínio.
+    """
+
+    def __init__(self, supabase, rules: Optional[CompiledRuleSet] = None):
+        self.supabase = supabase
+        self.rules = rules
+
+    def resolve_condominio(self, extrato_id: str) -> Optional[str]:
+        """Condomínio dono do extrato (None para extratos antigos sem vínculo)"""
+        result = self.supabase.table("extratos_bancarios").select("condominio_id").eq("id", extrato_id).limit(1).execute()
+        if result.data:
+            return result.data[0].get("condominio_id")
+        return None
+
+    def run(
+        self,
+        extrato_id: str,
+        condominio_id: Optional[str] = None,
+        reason: str = DEFAULT_REASON
+    ) -> AutoReconcileReport:
+        condominio_id = condominio_id or self.resolve_condominio(extrato_id)
+        rules = self.rules or get_matching_rules(condominio_id, self.supabase)
+
+        transactions = self.supabase.table("transacoes_bancarias").select(
+            "id, data_transacao, valor, tipo, nsu"
+        ).eq("extrato_id", extrato_id).eq("status_reconciliacao", "pendente").execute().data
+
+        report = AutoReconcileReport(
+            extrato_id=extrato_id,
+            condominio_id=condominio_id,
+            transacoes_pendentes=len(transactions)
+        )
+        if not transactions:
+            return report
+
+        # Só comprovantes do condomínio e dentro do período do extrato (± tolerância)
+        dates = [d for d in (_parse_date(t.get("data_transacao")) for t in transactions) if d]
+        query = self.supabase.table("comprovantes").select(
+            "id, ocr_valor, ocr_data, ocr_nsu"
+        ).eq("status", "pendente").eq("ocr_processado", True)
+        if dates:
+            window = rules.date_tolerance_days
+            query = query.gte("ocr_data", date.fromordinal(min(dates).toordinal() - window).isoformat()).lte(
+                "ocr_data", date.fromordinal(max(dates).toordinal() + window).isoformat()
+            )
+        if condominio_id:
+            query = query.eq("condominio_id", condominio_id)
+        else:
+            print(f"⚠️ [Auto Reconcile] Extrato {extrato_id} sem condomínio: buscando comprovantes de todos os condomínios")
+        receipts = query.execute().data
+
+        # NSU não depende da data do OCR: candidatos por NSU entre todos os pendentes do condomínio
+        nsu_receipts: List[Dict[str, Any]] = []
+        nsus = list({str(t["nsu"]) for t in transactions if t.get("nsu")})
+        if nsus:
+            nsu_query = self.supabase.table("comprovantes").select(
+                "id, ocr_valor, ocr_data, ocr_nsu"
+            ).eq("status", "pendente").eq("ocr_processado", True).in_("ocr_nsu", nsus)
+            if condominio_id:
+                nsu_query = nsu_query.eq("condominio_id", condominio_id)
+            nsu_receipts = nsu_query.execute().data
+
+        links, report.ambiguos, report.sem_candidato = plan_links(transactions, receipts, rules, nsu_receipts)
+        report.comprovantes_pendentes = len(receipts)
+        report.vinculos_nsu = sum(1 for link in links if link.method == "nsu")
+        report.vinculos_valor_data = len(links) - report.vinculos_nsu
+
+        report.aplicados, report.ignorados = self.apply_links(links, reason)
+        return report
+
+    def apply_links(self, links: List[ReconciliationLink], reason: str = DEFAULT_REASON) -> Tuple[int, int]:
+        """
+        Aplica os vínculos numa única RPC transacional.
+
+        Returns:
+            (aplicados, ignorados)
+        """
+        if not links:
+            return 0, 0
+
+        result = self.supabase.rpc(APPLY_RPC, {
+            "p_vinculos": [link.model_dump(include={"transacao_id", "comprovante_id"}) for link in links],
+            "p_motivo": reason
+        }).execute()
+        counts = result.data or {}
+
+        # Itens desses comprovantes saíram da fila (fechados pela RPC). Rodando no
+        # Celery (conciliação incremental), os "remove" chegam aos workers da API
+        # pelo canal Redis do barramento, que descartam o cache de páginas deles
+        if counts.get("comprovantes"):
+            ReconciliationQueueService.invalidate()
+            queue_event_bus.publish_many("remove", counts["comprovantes"])
+
+        return counts.get("aplicados", 0), counts.get("ignorados", 0)
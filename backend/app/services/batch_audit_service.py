@@ -2,11 +2,12 @@
 Batch Audit Service - Processamento em Lote com Rate Limiting
 """
 import asyncio
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
 from app.services.cnpj_service import CNPJService
-from app.services.cnpj.base import CNPJRateLimitError, CNPJAPIError
+from app.services.cnpj.base import CNPJRateLimitError, CNPJAPIError, SupplierData
+from app.services.robust_validator import RobustValidator
 
 class BatchAuditRequest(BaseModel):
     """Request para auditoria em lote"""
@@ -39,20 +40,23 @@ class BatchAuditService:
         """
         Processa lista de CNPJs em lote.
         
+        Consulta os CNPJs um a um (rate limit do provider) e valida o CNAE
+        x serviço de todos numa única consulta em lote ao índice CNAE.
+        
         Args:
             items: Lista de dicts com {cnpj, transaction_id, service_type}
             progress_callback: Função para reportar progresso
         """
         total = len(items)
         processed = 0
+        suppliers: List[Tuple[Dict[str, Any], SupplierData]] = []
         
         print(f"[Batch Audit] Iniciando processamento de {total} itens...")
         
         for i, item in enumerate(items):
             try:
-                # Processar item
-                result = await self._process_single_item(item)
-                self.results.append(result)
+                # Consultar CNPJ
+                suppliers.append((item, await self._fetch_supplier(item)))
                 processed += 1
                 
                 # Reportar progresso
@@ -74,8 +78,7 @@ class BatchAuditService:
                 
                 # Tentar novamente
                 try:
-                    result = await self._process_single_item(item)
-                    self.results.append(result)
+                    suppliers.append((item, await self._fetch_supplier(item)))
                     processed += 1
                 except Exception as retry_error:
                     self.errors.append({
@@ -90,6 +93,7 @@ class BatchAuditService:
                     "error": str(e)
                 })
         
+        self.results.extend(self._build_results(suppliers))
         pending = total - processed
         
         return BatchAuditStatus(
@@ -100,27 +104,34 @@ class BatchAuditService:
             errors=self.errors
         )
     
-    async def _process_single_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
-        """Processa um único item"""
+    async def _fetch_supplier(self, item: Dict[str, Any]) -> SupplierData:
+        """Consulta o CNPJ de um item (cache de 30 dias ou provider)"""
+        return await self.cnpj_service.validate_cnpj(item.get("cnpj"))
+    
+    def _build_results(self, suppliers: List[Tuple[Dict[str, Any], SupplierData]]) -> List[Dict[str, Any]]:
+        """Risco e CNAE x serviço de todos os fornecedores consultados (uma chamada ao índice CNAE)"""
+        cnae_results = RobustValidator().validate_cnae_services([
+            (supplier_data.cnae_principal.codigo, [], item.get("service_type", ""))  # TODO: Pegar CNAEs secundários da API
+            for item, supplier_data in suppliers
+        ])
+        return [
+            self._item_result(item, supplier_data, cnae_valid, cnae_reason)
+            for (item, supplier_data), (cnae_valid, cnae_reason) in zip(suppliers, cnae_results)
+        ]
+    
+    def _item_result(
+        self,
+        item: Dict[str, Any],
+        supplier_data: SupplierData,
+        cnae_valid: Optional[bool],
+        cnae_reason: str
+    ) -> Dict[str, Any]:
+        """Resultado de um item"""
         cnpj = item.get("cnpj")
-        service_type = item.get("service_type", "")
-        
-        # Validar CNPJ
-        supplier_data = await self.cnpj_service.validate_cnpj(cnpj)
         
         # Determinar risco
         risk_level = self.cnpj_service.get_risk_level(supplier_data)
         
-        # Validar CNAE vs Serviço
-        from app.services.robust_validator import RobustValidator
-        validator = RobustValidator()
-        
-        cnae_valid, cnae_reason = validator.validate_cnae_service(
-            cnae_principal=supplier_data.cnae_principal.codigo,
-            cnaes_secundarios=[],  # TODO: Pegar CNAEs secundários da API
-            service_type=service_type
-        )
-        
         # Determinar status final
         if risk_level == "CRITICAL_RISK":
             status = "REJECTED"
@@ -3,9 +3,10 @@ BrasilAPI Service
 Integração com BrasilAPI para validação de CNPJ (Receita Federal)
 API Pública: https://brasilapi.com.br/api/cnpj/v1/{cnpj}
 """
-import httpx
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
+from app.services.cnae.index import get_cnae_index
+from app.services.http_client import request_with_retry
 
 class BrasilAPIService:
     """
@@ -44,26 +45,25 @@ class BrasilAPIService:
         
         # Buscar na API
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.BASE_URL}/{cnpj_clean}")
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    result = self._normalize_response(data)
-                    
-                    # Salvar no cache
-                    self._save_to_cache(cnpj_clean, result)
-                    
-                    return result
-                elif response.status_code == 404:
-                    return {
-                        "valid": False,
-                        "error": "CNPJ não encontrado na Receita Federal",
-                        "alerta_critico": True
-                    }
-                else:
-                    raise Exception(f"API Error: {response.status_code}")
-                    
+            response = await request_with_retry("GET", f"{self.BASE_URL}/{cnpj_clean}", timeout=10.0)
+            
+            if response.status_code == 200:
+                data = response.json()
+                result = self._normalize_response(data)
+
+                # Salvar no cache
+                self._save_to_cache(cnpj_clean, result)
+
+                return result
+            elif response.status_code == 404:
+                return {
+                    "valid": False,
+                    "error": "CNPJ não encontrado na Receita Federal",
+                    "alerta_critico": True
+                }
+            else:
+                raise Exception(f"API Error: {response.status_code}")
+
         except Exception as e:
             print(f"BrasilAPI Error: {str(e)}")
             # Fallback para mock em caso de erro
@@ -150,42 +150,25 @@ class BrasilAPIService:
         
         Regra de Ouro: Detectar fraude quando CNAE não bate com serviço.
         Ex: CNAE "Padaria" + Serviço "Elevador" = FRAUDE
-        """
-        # Mapeamento CNAE -> Palavras-chave de serviços compatíveis
-        CNAE_MAPPING = {
-            "4321": ["eletric", "instalacao", "manutencao", "energia", "fiacao"],
-            "4329": ["hidraulic", "encanamento", "agua", "esgoto", "cano"],
-            "4330": ["pintura", "reforma", "acabamento", "gesso"],
-            "4391": ["telhado", "cobertura", "impermeabilizacao"],
-            "4399": ["construcao", "obra", "alvenaria"],
-            "8112": ["limpeza", "conservacao", "higienizacao", "faxina"],
-            "8011": ["seguranca", "vigilancia", "portaria", "monitoramento"],
-            "8020": ["jardinagem", "paisagismo", "jardim"],
-            "4329": ["elevador", "manutencao", "ascensor"],
-            "1091": ["padaria", "panificacao", "pao"],
-            "5611": ["restaurante", "alimentacao", "refeicao"],
-        }
         
-        # Pegar primeiros 4 dígitos do CNAE
-        cnae_prefix = cnae[:4] if len(cnae) >= 4 else cnae
+        Usa o índice CNAE único (mesmo do RobustValidator): identifica os
+        serviços citados na descrição e verifica o CNAE na trie.
+        """
+        index = get_cnae_index()
         
-        # Buscar palavras-chave compatíveis
-        keywords = CNAE_MAPPING.get(cnae_prefix, [])
+        # Serviços citados na descrição (por palavra-chave)
+        services = index.services_from_description(service_description)
         
-        if not keywords:
-            # CNAE não mapeado - retornar como "desconhecido"
+        if not services:
+            # Serviço não mapeado - retornar como "desconhecido"
             return {
                 "compatible": None,
                 "confidence": 0,
-                "reason": f"CNAE {cnae} não mapeado no sistema"
+                "reason": f"Serviço '{service_description}' não mapeado no sistema"
             }
         
-        # Verificar se alguma palavra-chave está na descrição do serviço
-        import unicodedata
-        service_normalized = unicodedata.normalize('NFD', service_description.lower())
-        service_normalized = ''.join(c for c in service_normalized if not unicodedata.combining(c))
-        
-        matches = [kw for kw in keywords if kw.lower() in service_normalized]
+        compatible_services = index.services_for(cnae)
+        matches = [kw for service, keywords in services.items() if service in compatible_services for kw in keywords]
         
         if matches:
             return {
@@ -194,8 +177,10 @@ class BrasilAPIService:
                 "reason": f"CNAE compatível com serviço (matches: {', '.join(matches)})"
             }
         else:
+            classification = index.classify(cnae)
+            atividade = classification.descricao if classification else "não classificado"
             return {
                 "compatible": False,
                 "confidence": 80,
-                "reason": f"CNAE incompatível: esperado {', '.join(keywords)}, recebido '{service_description}'"
+                "reason": f"CNAE incompatível: {cnae} ({atividade}) não atende {', '.join(services)}, recebido '{service_description}'"
             }
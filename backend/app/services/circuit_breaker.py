@@ -0,0 +1,123 @@
+"""
+Circuit Breaker - Corte Rápido de Dependências Externas Fora do Ar
+Depois de `failure_threshold` falhas seguidas o circuito abre e as
+chamadas falham na hora (CircuitOpenError), sem esperar timeout. Passado
+`reset_timeout`, uma única chamada de teste passa (meio aberto): sucesso
+fecha o circuito, falha abre de novo.
+
+Os breakers são do processo, por nome (get_breaker), para que todas as
+requests do worker vejam o mesmo estado da dependência.
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Any, Callable, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio_aberto"
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+class CircuitOpenError(Exception):
+    """Chamada recusada: o circuito da dependência está aberto"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuito '{name}' aberto (nova tentativa em {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return FECHADO
+        if self.clock() - self._opened_at >= self.reset_timeout:
+            return MEIO_ABERTO
+        return ABERTO
+
+    def acquire(self):
+        """Libera a chamada ou levanta CircuitOpenError (no meio aberto, só uma chamada de teste por vez)"""
+        with self._lock:
+            state = self._state()
+            if state == FECHADO:
+                return
+            if state == MEIO_ABERTO and not self._probing:
+                self._probing = True
+                return
+            retry_in = max(0.0, self._opened_at + self.reset_timeout - self.clock())
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+            self._probing = False
+
+    def release(self):
+        """Resultado neutro (nem sucesso nem falha da dependência): só libera o teste do meio aberto"""
+        with self._lock:
+            self._probing = False
+
+    async def call(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        self.acquire()
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            # Cancelada por quem chamou: não é falha da dependência
+            self.release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"name": self.name, "state": self._state(), "failures": self._failures}
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+def get_breaker(name: str, **kwargs: Any) -> CircuitBreaker:
+    """Breaker do processo para `name` (criado na primeira chamada)"""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
+
+def reset_breakers():
+    with _registry_lock:
+        _breakers.clear()
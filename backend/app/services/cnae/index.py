@@ -0,0 +1,222 @@
+"""
+CNAE Index - Índice de Classificação CNAE (IBGE)
+Trie de prefixos sobre a hierarquia CNAE (seção/divisão/grupo/classe/subclasse)
+carregada de um arquivo de dados embarcado. Responde compatibilidade
+CNAE × Serviço em O(dígitos) e suporta consultas em lote.
+"""
+import json
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, Tuple
+from pydantic import BaseModel
+
+DATA_FILE = Path(__file__).parent / "cnae_2_3.json"
+
+# Nível hierárquico pelo número de dígitos do código
+LEVEL_BY_DIGITS = {2: "divisao", 3: "grupo", 5: "classe", 7: "subclasse"}
+
+class CNAEClassification(BaseModel):
+    """Classificação hierárquica de um código CNAE"""
+    codigo: str
+    nivel: str  # "divisao", "grupo", "classe", "subclasse"
+    descricao: str
+    secao: Optional[str] = None
+    secao_descricao: Optional[str] = None
+    divisao: Optional[str] = None
+    grupo: Optional[str] = None
+    classe: Optional[str] = None
+    subclasse: Optional[str] = None
+
+class _TrieNode:
+    __slots__ = ("children", "code", "description", "services")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.code: Optional[str] = None
+        self.description: Optional[str] = None
+        self.services: Set[str] = set()
+
+def clean_cnae(code: Any) -> str:
+    """Remove formatação do CNAE ('4321-5/00' -> '4321500')"""
+    return ''.join(filter(str.isdigit, str(code or "")))
+
+def normalize_text(text: str) -> str:
+    """Minúsculas e sem acentos (para casar palavras-chave)"""
+    normalized = unicodedata.normalize('NFD', (text or "").lower())
+    return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+class CNAEIndex:
+    """
+    Índice CNAE único para todo o sistema.
+
+    - Trie de dígitos: cada nó da divisão (2), grupo (3), classe (5) e
+      subclasse (7) guarda código e descrição.
+    - Serviços são marcados no nó do prefixo permitido; uma consulta
+      percorre os dígitos do CNAE acumulando as marcas do caminho.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.version = data.get("versao", "")
+        self._root = _TrieNode()
+        self._sections: Dict[str, Tuple[str, str]] = {}  # divisão -> (seção, descrição)
+        self._service_prefixes: Dict[str, List[str]] = {}
+        self._service_keywords: Dict[str, List[str]] = {}
+
+        for secao in data.get("secoes", []):
+            for divisao in secao.get("divisoes", []):
+                self._sections[clean_cnae(divisao["codigo"])] = (secao["codigo"], secao["descricao"])
+                self._insert(divisao)
+                for grupo in divisao.get("grupos", []):
+                    self._insert(grupo)
+                    for classe in grupo.get("classes", []):
+                        self._insert(classe)
+                        for subclasse in classe.get("subclasses", []):
+                            self._insert(subclasse)
+
+        for service, spec in data.get("servicos", {}).items():
+            prefixes = [clean_cnae(code) for code in spec.get("cnaes", [])]
+            self._service_prefixes[service] = prefixes
+            self._service_keywords[service] = [normalize_text(kw) for kw in spec.get("palavras_chave", [])]
+            for prefix in prefixes:
+                self._node_for(prefix, create=True).services.add(service)
+
+    @classmethod
+    def from_file(cls, path: Path = DATA_FILE) -> "CNAEIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _node_for(self, digits: str, create: bool = False) -> Optional[_TrieNode]:
+        node = self._root
+        for digit in digits:
+            child = node.children.get(digit)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[digit] = _TrieNode()
+            node = child
+        return node
+
+    def _insert(self, entry: Dict[str, Any]):
+        node = self._node_for(clean_cnae(entry["codigo"]), create=True)
+        node.code = entry["codigo"]
+        node.description = entry.get("descricao")
+
+    # --- Consultas ---
+
+    @property
+    def services(self) -> List[str]:
+        """Serviços mapeados"""
+        return list(self._service_prefixes)
+
+    def has_service(self, service_type: str) -> bool:
+        return service_type in self._service_prefixes
+
+    def services_for(self, cnae: str) -> Set[str]:
+        """Serviços compatíveis com o CNAE (percorre a trie uma vez: O(dígitos))"""
+        services: Set[str] = set()
+        node = self._root
+        for digit in clean_cnae(cnae):
+            node = node.children.get(digit)
+            if node is None:
+                break
+            services |= node.services
+        return services
+
+    def classify(self, cnae: str) -> Optional[CNAEClassification]:
+        """Classificação mais profunda conhecida do CNAE (até a subclasse)"""
+        digits = clean_cnae(cnae)
+        if len(digits) < 2:
+            return None
+
+        path: Dict[str, str] = {}
+        deepest: Optional[_TrieNode] = None
+        deepest_level = None
+        node = self._root
+        for depth, digit in enumerate(digits, start=1):
+            node = node.children.get(digit)
+            if node is None:
+                break
+            level = LEVEL_BY_DIGITS.get(depth)
+            if level and node.code:
+                path[level] = node.code
+                deepest, deepest_level = node, level
+
+        if not deepest:
+            return None
+
+        secao, secao_descricao = self._sections.get(digits[:2], (None, None))
+        return CNAEClassification(
+            codigo=deepest.code,
+            nivel=deepest_level,
+            descricao=deepest.description or "",
+            secao=secao,
+            secao_descricao=secao_descricao,
+            **path
+        )
+
+    def is_compatible(self, cnae: str, service_type: str) -> bool:
+        return service_type in self.services_for(cnae)
+
+    def check_service(self, cnaes: List[str], service_type: str) -> Tuple[Optional[bool], Optional[str]]:
+        """
+        Verifica se algum dos CNAEs (principal primeiro) atende o serviço.
+
+        Returns:
+            (None, None) se o serviço não é mapeado,
+            (True, cnae_compatível) ou (False, None)
+        """
+        if not self.has_service(service_type):
+            return (None, None)
+        for cnae in cnaes:
+            if cnae and self.is_compatible(cnae, service_type):
+                return (True, clean_cnae(cnae))
+        return (False, None)
+
+    def check_batch(self, items: List[Tuple[List[str], str]]) -> List[Tuple[Optional[bool], Optional[str]]]:
+        """
+        Versão em lote de check_service para auditorias em massa.
+        Cada CNAE distinto é resolvido na trie uma única vez.
+        """
+        resolved: Dict[str, Set[str]] = {}
+        results = []
+        for cnaes, service_type in items:
+            if not self.has_service(service_type):
+                results.append((None, None))
+                continue
+            match = None
+            for cnae in cnaes:
+                digits = clean_cnae(cnae)
+                if not digits:
+                    continue
+                if digits not in resolved:
+                    resolved[digits] = self.services_for(digits)
+                if service_type in resolved[digits]:
+                    match = digits
+                    break
+            results.append((True, match) if match else (False, None))
+        return results
+
+    def services_from_description(self, description: str) -> Dict[str, List[str]]:
+        """
+        Identifica serviços citados numa descrição livre.
+
+        Returns:
+            {serviço: [palavras-chave encontradas]}
+        """
+        text = normalize_text(description)
+        found: Dict[str, List[str]] = {}
+        for service, keywords in self._service_keywords.items():
+            hits = [kw for kw in keywords if kw in text]
+            if hits:
+                found[service] = hits
+        return found
+
+    def allowed_prefixes(self, service_type: str) -> List[str]:
+        """Prefixos CNAE permitidos para o serviço"""
+        return list(self._service_prefixes.get(service_type, []))
+
+@lru_cache
+def get_cnae_index() -> CNAEIndex:
+    """Índice carregado uma única vez por processo"""
+    return CNAEIndex.from_file()
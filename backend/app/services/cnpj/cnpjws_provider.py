@@ -2,10 +2,10 @@
 CNPJ.ws Provider
 Implementação do provider usando CNPJ.ws (grátis e pago)
 """
-import httpx
 import asyncio
 from typing import Dict, Any
 from datetime import datetime
+from app.services.http_client import request_with_retry
 from app.services.cnpj.base import (
     CNPJProvider, 
     SupplierData, 
@@ -62,26 +62,26 @@ class CNPJWSProvider(CNPJProvider):
             if self.is_paid:
                 params['token'] = self.token
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url, params=params)
-                
-                # Tratar rate limit
-                if response.status_code == 429:
-                    raise CNPJRateLimitError("Rate limit atingido. Aguarde alguns segundos.")
-                
-                # CNPJ não encontrado
-                if response.status_code == 404:
-                    raise CNPJNotFoundError(f"CNPJ {cnpj} não encontrado na Receita Federal")
-                
-                # Outros erros
-                if response.status_code != 200:
-                    raise CNPJAPIError(f"Erro na API CNPJ.ws: {response.status_code}")
-                
-                data = response.json()
-                
-                # Normalizar resposta
-                return self._normalize_response(data, cnpj_clean)
-                
+            # Pool compartilhado: circuito, limite e orçamento de retries do host
+            response = await request_with_retry("GET", url, params=params, timeout=30.0)
+            
+            # Tratar rate limit
+            if response.status_code == 429:
+                raise CNPJRateLimitError("Rate limit atingido. Aguarde alguns segundos.")
+            
+            # CNPJ não encontrado
+            if response.status_code == 404:
+                raise CNPJNotFoundError(f"CNPJ {cnpj} não encontrado na Receita Federal")
+            
+            # Outros erros
+            if response.status_code != 200:
+                raise CNPJAPIError(f"Erro na API CNPJ.ws: {response.status_code}")
+            
+            data = response.json()
+            
+            # Normalizar resposta
+            return self._normalize_response(data, cnpj_clean)
+            
         except (CNPJNotFoundError, CNPJRateLimitError, CNPJAPIError):
             raise
         except Exception as e:
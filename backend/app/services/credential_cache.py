@@ -0,0 +1,86 @@
+"""
+Credential Cache - API Keys de Provedores com Ciclo de Vida
+Cache do processo (não da instância) para chaves de API com validade
+conhecida, como a apiKey da Pluggy (2h):
+
+- renovação proativa: dentro da margem final da validade, a chave atual
+  continua sendo entregue e uma renovação roda em segundo plano
+- single-flight: requests concorrentes que precisam de chave nova
+  aguardam a mesma autenticação em andamento
+- invalidate(): usado no 401, descarta só a chave que falhou (outra
+  request pode já ter renovado)
+
+As renovações em andamento são por event loop (as tasks do Celery rodam
+num asyncio.run() novo a cada execução); as chaves valem para o processo.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from typing import Dict, Optional, Callable, Awaitable, Tuple
+
+PLUGGY_API_KEY_TTL = 2 * 60 * 60        # apiKey da Pluggy expira em 2 horas
+DEFAULT_REFRESH_MARGIN = 10 * 60        # Renova nos últimos 10 minutos
+
+class CredentialCache:
+    """Chaves de API por nome, com validade e renovação única em andamento"""
+
+    def __init__(self, refresh_margin: float = DEFAULT_REFRESH_MARGIN, clock: Callable[[], float] = time.monotonic):
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self._entries: Dict[str, Tuple[str, float]] = {}       # {nome: (chave, expira_em)}
+        self._lock = threading.Lock()
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+
+    async def get(self, name: str, fetch: Callable[[], Awaitable[str]], ttl: float) -> str:
+        """
+        Chave válida para `name`; `fetch` autentica no provedor e só é
+        chamado quando a chave falta, expirou ou está na margem de renovação.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+        now = self.clock()
+
+        if entry and now < entry[1] - self.refresh_margin:
+            return entry[0]
+
+        task = self._refresh(name, fetch, ttl)
+        if entry and now < entry[1]:
+            return entry[0]             # Ainda válida: a renovação segue em segundo plano
+        return await asyncio.shield(task)
+
+    def _refresh(self, name: str, fetch: Callable[[], Awaitable[str]], ttl: float) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.setdefault(loop, {})
+        task = inflight.get(name)
+        if task is not None:
+            return task
+
+        async def run() -> str:
+            value = await fetch()
+            with self._lock:
+                self._entries[name] = (value, self.clock() + ttl)
+            return value
+
+        task = inflight[name] = loop.create_task(run())
+
+        def done(finished: asyncio.Task):
+            inflight.pop(name, None)
+            if not finished.cancelled():
+                finished.exception()    # Renovação em segundo plano que falhou não vira warning
+
+        task.add_done_callback(done)
+        return task
+
+    def invalidate(self, name: str, value: Optional[str] = None):
+        """Descarta a chave (só se ainda for `value`, quando informado)"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and (value is None or entry[0] == value):
+                del self._entries[name]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+credential_cache = CredentialCache()
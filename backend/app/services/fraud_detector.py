@@ -9,6 +9,7 @@ from PIL import Image
 from PIL.ExifTags import TAGS
 from io import BytesIO
 import re
+from app.services.metrics import timed
 
 class FraudDetector:
     """
@@ -35,6 +36,7 @@ class FraudDetector:
         self.fraud_flags: List[str] = []
         self.fraud_score: float = 0.0
     
+    @timed("fraud_analysis")
     async def analyze_receipt(
         self, 
         file_content: bytes, 
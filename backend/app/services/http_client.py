@@ -0,0 +1,218 @@
+"""
+HTTP Client - Pool Assíncrono Compartilhado
+Um httpx.AsyncClient por event loop (e por modo de verificação SSL),
+reaproveitado entre requests: conexões keep-alive e TLS ficam no pool
+em vez de um handshake por chamada.
+
+Por loop porque as tasks do Celery rodam cada execução num asyncio.run()
+novo, e um client não pode atravessar loops.
+"""
+import asyncio
+import ssl
+import time
+import weakref
+from typing import Dict, Any, Optional
+import httpx
+from app.services.circuit_breaker import CircuitOpenError, FECHADO, ABERTO
+from app.services.metrics import OUTBOUND_SECONDS, OUTBOUND_EVENTS
+from app.services.resilience import HostResilience, host_state, backoff_delay
+
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+
+# Mesmas tentativas e status do antigo urllib3.Retry(total=3, status_forcelist=[500, 502, 503, 504]);
+# o backoff agora é com jitter (resilience.backoff_delay)
+RETRY_TOTAL = 3
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+HEDGE_METHODS = frozenset({"GET", "HEAD"})
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[bool, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+def get_async_client(verify: bool = True) -> httpx.AsyncClient:
+    """Client compartilhado do loop corrente (criado na primeira chamada)"""
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    client = clients.get(verify)
+    if client is None or client.is_closed:
+        client = clients[verify] = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=DEFAULT_LIMITS,
+            verify=verify
+        )
+    return client
+
+async def close_async_clients():
+    """Fecha os clients do loop corrente (shutdown da API / fim da task)"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    for client in _clients.pop(loop, {}).values():
+        await client.aclose()
+
+def is_ssl_error(exc: BaseException) -> bool:
+    """httpx embrulha falhas de TLS em ConnectError; procura o ssl.SSLError na cadeia"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, ssl.SSLError):
+            return True
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+async def _send(
+    client: httpx.AsyncClient,
+    state: HostResilience,
+    method: str,
+    url: str,
+    slot_held: bool = False,
+    **kwargs: Any
+) -> httpx.Response:
+    """
+    Uma tentativa, dentro do limite de concorrência do host, com o resultado
+    registrado no limite e na latência (o circuito fica com request_with_retry)
+    """
+    if not slot_held:
+        await state.limiter.acquire()
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.TransportError as e:
+        if not is_ssl_error(e):         # Certificado, não disponibilidade: não mexe no limite
+            state.record_failure()
+        OUTBOUND_SECONDS.observe(time.perf_counter() - start, host=state.host, outcome="erro")
+        raise
+    finally:
+        state.limiter.release()
+
+    elapsed = time.perf_counter() - start
+    state.record_response(response.status_code, elapsed)
+    outcome = "ok" if response.status_code < 400 else f"http_{response.status_code // 100}xx"
+    OUTBOUND_SECONDS.observe(elapsed, host=state.host, outcome=outcome)
+    return response
+
+async def _send_hedged(
+    client: httpx.AsyncClient,
+    state: HostResilience,
+    method: str,
+    url: str,
+    **kwargs: Any
+) -> httpx.Response:
+    """
+    GET/HEAD que passa do p95 do host ganha uma segunda tentativa; vale a
+    primeira que responder. O hedge sai do orçamento de retries e só usa
+    vaga livre do limite (nunca espera na fila).
+    """
+    delay = state.hedge_delay() if method in HEDGE_METHODS and state.breaker.state == FECHADO else None
+    if delay is None:
+        return await _send(client, state, method, url, **kwargs)
+
+    first = asyncio.ensure_future(_send(client, state, method, url, **kwargs))
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+    except BaseException:
+        first.cancel()
+        raise
+    if done or not state.budget.withdraw() or not state.limiter.try_acquire():
+        return await first
+
+    OUTBOUND_EVENTS.inc(host=state.host, event="hedge")
+    second = asyncio.ensure_future(_send(client, state, method, url, slot_held=True, **kwargs))
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        return first.result()           # As duas falharam: relança o erro da original
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def request_with_retry(
+    method: str,
+    url: str,
+    *,
+    verify: bool = True,
+    retries: int = RETRY_TOTAL,
+    **kwargs: Any
+) -> httpx.Response:
+    """
+    Request pelo client compartilhado, com a camada de resiliência do host
+    (app.services.resilience):
+    - circuito aberto: CircuitOpenError na hora, sem tocar a rede
+    - falha de conexão: repete qualquer método (nada chegou ao servidor)
+    - timeout de leitura / 5xx da lista: repete só métodos idempotentes
+    - cada repetição sai do orçamento de retries do host, com backoff
+      exponencial e jitter; GET/HEAD lentos ganham hedge
+    Após esgotar as tentativas (ou o orçamento), devolve a última resposta
+    ou relança o erro. O circuito registra só esse desfecho final: uma
+    request que falhou e deu certo no retry conta como sucesso.
+    """
+    state = host_state(httpx.URL(url).host)
+    try:
+        state.breaker.acquire()
+    except CircuitOpenError:
+        OUTBOUND_EVENTS.inc(host=state.host, event="circuito_aberto")
+        raise
+
+    try:
+        response = await _attempts(state, method.upper(), url, verify, retries, **kwargs)
+    except httpx.TransportError as e:
+        if is_ssl_error(e):
+            state.breaker.release()     # Certificado, não disponibilidade: quem chamou decide o fallback
+        else:
+            state.breaker.record_failure()
+        raise
+    except BaseException:
+        state.breaker.release()
+        raise
+    state.record_outcome(response.status_code)
+    return response
+
+async def _attempts(
+    state: HostResilience,
+    method: str,
+    url: str,
+    verify: bool,
+    retries: int,
+    **kwargs: Any
+) -> httpx.Response:
+    """Tentativas de uma request lógica (retries com backoff e orçamento)"""
+    idempotent = method in IDEMPOTENT_METHODS
+    client = get_async_client(verify)
+    state.budget.deposit()
+    attempt = 0
+
+    while True:
+        error: Optional[Exception] = None
+        try:
+            response = await _send_hedged(client, state, method, url, **kwargs)
+        except httpx.ConnectError as e:
+            if attempt >= retries or is_ssl_error(e):
+                raise
+            error = e
+        except (httpx.TimeoutException, httpx.RemoteProtocolError, httpx.ReadError) as e:
+            if attempt >= retries or not idempotent:
+                raise
+            error = e
+        else:
+            if response.status_code not in RETRY_STATUSES or not idempotent or attempt >= retries:
+                return response
+
+        if state.breaker.state == ABERTO:
+            # Outras requests abriram o circuito enquanto esta tentava: não insistir
+            OUTBOUND_EVENTS.inc(host=state.host, event="circuito_aberto")
+        elif not state.budget.withdraw():
+            # Host degradado para o processo inteiro: não multiplicar a carga com repetições
+            OUTBOUND_EVENTS.inc(host=state.host, event="sem_orcamento")
+        else:
+            attempt += 1
+            OUTBOUND_EVENTS.inc(host=state.host, event="retry")
+            await asyncio.sleep(backoff_delay(attempt))
+            continue
+        if error is not None:
+            raise error
+        return response
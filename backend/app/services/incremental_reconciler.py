@@ -0,0 +1,204 @@
+"""
+Incremental Reconciler - Conciliação Dirigida por Feed de Alterações
+Consome as linhas novas/alteradas de transacoes_bancarias e comprovantes
+a partir de um cursor durável (xid, seq) e reconcilia só a vizinhança
+delas. O trabalho por execução é proporcional ao que mudou, não ao
+histórico do condomínio.
+"""
+from bisect import bisect_right
+from datetime import date
+from typing import List, Dict, Any, Optional, Tuple
+from pydantic import BaseModel
+from app.services.auto_reconciler import AutoReconciler, plan_links
+from app.services.matching_rules import CompiledRuleSet, get_matching_rules, is_credit
+from app.services.metrics import timed
+
+CURSOR_TABLE = "cursores_conciliacao"
+FEEDS = {
+    "transacoes_bancarias": "alteracoes_transacoes",
+    "comprovantes": "alteracoes_comprovantes",
+}
+DEFAULT_BATCH_SIZE = 500
+INCREMENTAL_REASON = "Auto-reconciliado (incremental)"
+
+class IncrementalReconcileReport(BaseModel):
+    """Resumo de uma execução do conciliador incremental"""
+    transacoes_alteradas: int = 0
+    comprovantes_alterados: int = 0
+    condominios: int = 0
+    transacoes_avaliadas: int = 0     # Vizinhança carregada (alteradas + janela)
+    comprovantes_avaliados: int = 0
+    vinculos: int = 0
+    aplicados: int = 0
+    ignorados: int = 0
+    pendente: bool = False            # Algum feed encheu o lote: há mais a consumir
+
+def _parse_date(value: Any) -> Optional[date]:
+    if not value or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def merge_windows(days: List[int], radius: int) -> List[Tuple[int, int]]:
+    """Intervalos [d - radius, d + radius] unidos (dias ordinais)"""
+    windows: List[Tuple[int, int]] = []
+    for day in sorted(set(days)):
+        lo, hi = day - radius, day + radius
+        if windows and lo <= windows[-1][1] + 1:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], hi))
+        else:
+            windows.append((lo, hi))
+    return windows
+
+def in_windows(day: int, windows: List[Tuple[int, int]]) -> bool:
+    index = bisect_right(windows, (day, float("inf"))) - 1
+    return index >= 0 and windows[index][0] <= day <= windows[index][1]
+
+def _range_filter(column: str, windows: List[Tuple[int, int]]) -> str:
+    """Filtro PostgREST (or=) com uma faixa de datas por janela"""
+    return ",".join(
+        f"and({column}.gte.{date.fromordinal(lo).isoformat()},{column}.lte.{date.fromordinal(hi).isoformat()})"
+        for lo, hi in windows
+    )
+
+class IncrementalReconciler:
+    """
+    Conciliador CDC.
+
+    Para cada lote do feed:
+    1. Agrupa as linhas alteradas que ainda podem conciliar por condomínio
+    2. Carrega as pendentes a até 2× a tolerância de data das datas alteradas
+    3. Roda o mesmo hash join do AutoReconciler e aplica só os vínculos cujos
+       dois lados estão a até 1× a tolerância (todos os candidatos deles
+       estão carregados, então a regra de par mutuamente único vale)
+    4. Avança o cursor com compare-and-set (execuções concorrentes não
+       voltam o cursor; a RPC de aplicação ignora vínculos já aplicados)
+    """
+
+    def __init__(self, supabase, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.supabase = supabase
+        self.batch_size = batch_size
+        self.applier = AutoReconciler(supabase)
+
+    # --- Cursor ---
+
+    def load_cursors(self) -> Dict[str, Tuple[int, int]]:
+        rows = self.supabase.table(CURSOR_TABLE).select("nome, ultimo_xid, ultimo_seq").in_("nome", list(FEEDS)).execute().data
+        cursors = {name: (0, 0) for name in FEEDS}
+        cursors.update({row["nome"]: (row["ultimo_xid"], row["ultimo_seq"]) for row in rows})
+        return cursors
+
+    def advance_cursor(self, name: str, previous: Tuple[int, int], current: Tuple[int, int]) -> bool:
+        """Compare-and-set; False se outra execução já avançou o cursor"""
+        if previous == (0, 0):
+            existing = self.supabase.table(CURSOR_TABLE).select("nome").eq("nome", name).execute().data
+            if not existing:
+                self.supabase.table(CURSOR_TABLE).insert({"nome": name, "ultimo_xid": 0, "ultimo_seq": 0}).execute()
+        updated = self.supabase.table(CURSOR_TABLE).update({
+            "ultimo_xid": current[0],
+            "ultimo_seq": current[1]
+        }).eq("nome", name).eq("ultimo_xid", previous[0]).eq("ultimo_seq", previous[1]).execute().data
+        return bool(updated)
+
+    def read_feed(self, name: str, cursor: Tuple[int, int]) -> List[Dict[str, Any]]:
+        return self.supabase.rpc(FEEDS[name], {
+            "p_xid": cursor[0],
+            "p_seq": cursor[1],
+            "p_limite": self.batch_size
+        }).execute().data or []
+
+    # --- Execução ---
+
+    @timed("incremental_batch")
+    def run_once(self, reason: str = INCREMENTAL_REASON) -> IncrementalReconcileReport:
+        cursors = self.load_cursors()
+        changes = {name: self.read_feed(name, cursors[name]) for name in FEEDS}
+        transactions, receipts = changes["transacoes_bancarias"], changes["comprovantes"]
+
+        report = IncrementalReconcileReport(
+            transacoes_alteradas=len(transactions),
+            comprovantes_alterados=len(receipts),
+            pendente=any(len(rows) >= self.batch_size for rows in changes.values())
+        )
+
+        # Só o que ainda pode conciliar define vizinhanças
+        changed_days: Dict[Optional[str], List[int]] = {}
+        for txn in transactions:
+            txn_date = _parse_date(txn.get("data_transacao"))
+            if txn.get("status_reconciliacao") == "pendente" and is_credit(txn) and txn_date:
+                changed_days.setdefault(txn.get("condominio_id"), []).append(txn_date.toordinal())
+        for receipt in receipts:
+            receipt_date = _parse_date(receipt.get("ocr_data"))
+            if receipt.get("status") == "pendente" and receipt.get("ocr_processado") and receipt.get("ocr_valor") and receipt_date:
+                changed_days.setdefault(receipt.get("condominio_id"), []).append(receipt_date.toordinal())
+
+        report.condominios = len(changed_days)
+        for condominio_id, days in changed_days.items():
+            evaluated_txns, evaluated_receipts, applied, skipped, links = self._reconcile_neighbourhood(
+                condominio_id, days, get_matching_rules(condominio_id, self.supabase), reason
+            )
+            report.transacoes_avaliadas += evaluated_txns
+            report.comprovantes_avaliados += evaluated_receipts
+            report.vinculos += links
+            report.aplicados += applied
+            report.ignorados += skipped
+
+        # Cursor só avança depois de aplicar: uma falha reprocessa o lote
+        for name, rows in changes.items():
+            if rows:
+                last = (rows[-1]["xid_alteracao"], rows[-1]["seq_alteracao"])
+                if not self.advance_cursor(name, cursors[name], last):
+                    print(f"⚠️ [Incremental] Cursor {name} já avançado por outra execução (vínculos repetidos são ignorados pela RPC)")
+
+        return report
+
+    def run(self, max_batches: int = 20, reason: str = INCREMENTAL_REASON) -> IncrementalReconcileReport:
+        """Consome o feed até esvaziar (ou max_batches lotes)"""
+        total = IncrementalReconcileReport()
+        for _ in range(max_batches):
+            report = self.run_once(reason)
+            for field in IncrementalReconcileReport.model_fields:
+                if field != "pendente":
+                    setattr(total, field, getattr(total, field) + getattr(report, field))
+            total.pendente = report.pendente
+            if not report.pendente:
+                break
+        return total
+
+    def _reconcile_neighbourhood(
+        self,
+        condominio_id: Optional[str],
+        days: List[int],
+        rules: CompiledRuleSet,
+        reason: str
+    ) -> Tuple[int, int, int, int, int]:
+        tolerance = rules.date_tolerance_days
+        load_windows = merge_windows(days, 2 * tolerance)
+        apply_windows = merge_windows(days, tolerance)
+
+        txn_query = self.supabase.table("transacoes_bancarias").select(
+            "id, data_transacao, valor, tipo, nsu"
+        ).eq("status_reconciliacao", "pendente").or_(_range_filter("data_transacao", load_windows))
+        receipt_query = self.supabase.table("comprovantes").select(
+            "id, ocr_valor, ocr_data, ocr_nsu"
+        ).eq("status", "pendente").eq("ocr_processado", True).or_(_range_filter("ocr_data", load_windows))
+        if condominio_id:
+            txn_query = txn_query.eq("condominio_id", condominio_id)
+            receipt_query = receipt_query.eq("condominio_id", condominio_id)
+        else:
+            txn_query = txn_query.is_("condominio_id", "null")
+            receipt_query = receipt_query.is_("condominio_id", "null")
+
+        transactions = txn_query.execute().data
+        receipts = receipt_query.execute().data
+        links, _, _ = plan_links(transactions, receipts, rules)
+
+        txn_days = {t["id"]: _parse_date(t["data_transacao"]).toordinal() for t in transactions}
+        receipt_days = {r["id"]: _parse_date(r["ocr_data"]).toordinal() for r in receipts if r.get("ocr_data")}
+        safe = [
+            link for link in links
+            if in_windows(txn_days[link.transacao_id], apply_windows)
+            and in_windows(receipt_days[link.comprovante_id], apply_windows)
+        ]
+
+        applied, skipped = self.applier.apply_links(safe, reason)
+        return len(transactions), len(receipts), applied, skipped, len(safe)
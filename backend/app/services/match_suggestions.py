@@ -0,0 +1,266 @@
+"""
+Match Suggestions - Sugestões de Match Pré-Calculadas
+As sugestões deixam de ser calculadas quando o admin abre a tela:
+- OCR concluído → calcula o top-k do comprovante
+- Transações novas (sync/upload) → recalcula só os comprovantes que elas alcançam
+- Tela do admin → leitura indexada de sugestoes_conciliacao
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List, Dict, Any, Optional, Tuple
+from app.services.matching_rules import CompiledRuleSet, get_matching_rules, to_cents
+from app.services.reconciliation_queue import ReconciliationQueueService
+from app.services.queue_events import queue_event_bus
+from app.services.queue_priority import compute_priority
+from app.services.tenant_scope import scoped_or_all, with_tenant
+
+CANDIDATE_SEARCH_RPC = "buscar_candidatos_conciliacao"
+SUGGESTIONS_TABLE = "sugestoes_conciliacao"
+RECEIPT_COLUMNS = "id, condominio_id, status, ocr_processado, ocr_valor, ocr_data, ocr_nsu, fraud_score"
+
+STORED_SUGGESTIONS = 50        # = limite máximo do GET /matches
+QUEUED_SUGGESTIONS = 10        # Cópia guardada no item da fila
+MULTIPLE_MATCH_SCORE = 80      # Mais de um candidato acima disso → fila "multiplos_matches"
+REVIEWABLE_STATUSES = ["pendente", "suspeito"]
+BACKFILL_BATCH_SIZE = 200
+
+def _parse_date(value: Any) -> Optional[date]:
+    if not value or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+class MatchSuggestionService:
+    """
+    Cálculo e leitura das sugestões de match.
+
+    O cálculo roda fora do request do admin (BackgroundTasks do OCR e do
+    sync). Transações conciliadas depois do cálculo são descartadas na
+    leitura, sem precisar recalcular.
+    """
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    # --- Cálculo ---
+
+    def search_candidates(self, receipt: Dict[str, Any], rules: CompiledRuleSet, limit: int) -> List[Dict[str, Any]]:
+        """Top-k pontuado no banco (buscar_candidatos_conciliacao)"""
+        ocr_valor = Decimal(str(receipt["ocr_valor"]))
+        ocr_data = _parse_date(receipt["ocr_data"])
+        window = timedelta(days=rules.suggestion_date_window_days)
+        valor_min_cents, valor_max_cents = rules.suggestion_amount_bounds(to_cents(ocr_valor))
+
+        result = self.supabase.rpc(CANDIDATE_SEARCH_RPC, {
+            "p_valor": float(ocr_valor),
+            "p_data": ocr_data.isoformat(),
+            "p_valor_min": valor_min_cents / 100,
+            "p_valor_max": valor_max_cents / 100,
+            "p_data_inicio": (ocr_data - window).isoformat(),
+            "p_data_fim": (ocr_data + window).isoformat(),
+            "p_tolerancia_valor": rules.value_tolerance_cents / 100,
+            "p_nsu": receipt.get("ocr_nsu"),
+            "p_condominio_id": receipt.get("condominio_id"),
+            "p_limite": limit
+        }).execute()
+        return result.data or []
+
+    def refresh_receipts(self, receipt_ids: List[str]) -> int:
+        """Recalcula as sugestões dos comprovantes informados (ex.: OCR concluído)"""
+        if not receipt_ids:
+            return 0
+        receipts = self.supabase.table("comprovantes").select(RECEIPT_COLUMNS).in_("id", list(receipt_ids)).execute().data
+        return self._refresh(receipts)
+
+    def backfill(self, batch_size: int = BACKFILL_BATCH_SIZE, max_batches: Optional[int] = None) -> int:
+        """
+        Calcula as sugestões dos comprovantes anteriores ao pré-cálculo
+        (sugestoes_calculadas_em nulo), em lotes. Cada lote grava a marca,
+        então a próxima consulta já não o devolve.
+        """
+        total = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            receipts = self._open_receipts().is_("sugestoes_calculadas_em", "null").order("id").limit(batch_size).execute().data
+            if not receipts:
+                break
+            total += self._refresh(receipts)
+            batches += 1
+            if len(receipts) < batch_size:
+                break
+        return total
+
+    def refresh_for_transactions(
+        self,
+        transactions: List[Dict[str, Any]],
+        condominio_id: Optional[str] = None
+    ) -> int:
+        """
+        Invalidação incremental: recalcula só os comprovantes em aberto que
+        alguma das transações novas alcança (faixa de valor + janela de data
+        da sugestão, ou NSU igual).
+
+        Returns:
+            Quantidade de comprovantes recalculados
+        """
+        rules = get_matching_rules(condominio_id, self.supabase)
+        points = sorted(
+            (to_cents(t["valor"]), _parse_date(t["data_transacao"]).toordinal())
+            for t in transactions
+            if t.get("valor") and t.get("data_transacao")
+        )
+        affected: Dict[str, Dict[str, Any]] = {}
+
+        if points:
+            # Um comprovante de valor A aceita T se |T - A| <= pct·A, logo A ∈ [T/(1+pct), T/(1-pct)]
+            pct = float(rules.suggestion_value_tolerance_pct)
+            window = rules.suggestion_date_window_days
+            days = [ordinal for _, ordinal in points]
+            query = self._open_receipts(condominio_id).gte(
+                "ocr_valor", points[0][0] / (1 + pct) / 100 - 0.01
+            ).lte(
+                "ocr_valor", points[-1][0] / max(1 - pct, 0.01) / 100 + 0.01
+            ).gte(
+                "ocr_data", date.fromordinal(min(days) - window).isoformat()
+            ).lte(
+                "ocr_data", date.fromordinal(max(days) + window).isoformat()
+            )
+            for receipt in query.execute().data:
+                if self._reaches(receipt, points, rules):
+                    affected[receipt["id"]] = receipt
+
+        # NSU prevalece sobre a faixa no cálculo, então também invalida
+        nsus = list({str(t["nsu"]) for t in transactions if t.get("nsu")})
+        if nsus:
+            for receipt in self._open_receipts(condominio_id).in_("ocr_nsu", nsus).execute().data:
+                affected[receipt["id"]] = receipt
+
+        return self._refresh(list(affected.values()))
+
+    def _open_receipts(self, condominio_id: Optional[str] = None):
+        return scoped_or_all(self.supabase.table("comprovantes").select(RECEIPT_COLUMNS), condominio_id).in_(
+            "status", REVIEWABLE_STATUSES
+        ).eq("ocr_processado", True)
+
+    @staticmethod
+    def _reaches(receipt: Dict[str, Any], points: List[Tuple[int, int]], rules: CompiledRuleSet) -> bool:
+        receipt_date = _parse_date(receipt.get("ocr_data"))
+        if not receipt.get("ocr_valor") or not receipt_date:
+            return False
+        lo_cents, hi_cents = rules.suggestion_amount_bounds(to_cents(receipt["ocr_valor"]))
+        day = receipt_date.toordinal()
+        window = rules.suggestion_date_window_days
+        start = bisect_left(points, (lo_cents, -1))
+        end = bisect_right(points, (hi_cents, float("inf")))
+        return any(abs(ordinal - day) <= window for _, ordinal in points[start:end])
+
+    def _refresh(self, receipts: List[Dict[str, Any]]) -> int:
+        if not receipts:
+            return 0
+
+        rows: List[Dict[str, Any]] = []
+        suggestions: Dict[str, List[Dict[str, Any]]] = {}
+        for receipt in receipts:
+            candidates: List[Dict[str, Any]] = []
+            if receipt.get("ocr_processado") and receipt.get("ocr_valor") and receipt.get("ocr_data"):
+                rules = get_matching_rules(receipt.get("condominio_id"), self.supabase)
+                candidates = self.search_candidates(receipt, rules, STORED_SUGGESTIONS)
+            suggestions[receipt["id"]] = candidates
+            rows.extend(
+                {
+                    "comprovante_id": receipt["id"],
+                    "transacao_id": candidate["transacao_id"],
+                    "posicao": position,
+                    "match_score": candidate["match_score"],
+                    "match_reasons": candidate["match_reasons"] or []
+                }
+                for position, candidate in enumerate(candidates, start=1)
+            )
+
+        # Substitui o top-k inteiro de cada comprovante (três idas ao banco para o lote todo)
+        receipt_ids = list(suggestions)
+        self.supabase.table(SUGGESTIONS_TABLE).delete().in_("comprovante_id", receipt_ids).execute()
+        if rows:
+            self.supabase.table(SUGGESTIONS_TABLE).insert(rows).execute()
+        self.supabase.table("comprovantes").update({
+            "sugestoes_calculadas_em": datetime.now().isoformat()
+        }).in_("id", receipt_ids).execute()
+
+        self._sync_queue(suggestions, {receipt["id"]: receipt for receipt in receipts})
+        return len(receipt_ids)
+
+    def _sync_queue(self, suggestions: Dict[str, List[Dict[str, Any]]], receipts: Dict[str, Dict[str, Any]]):
+        """Múltiplos matches fortes vão para a fila (ou atualizam o item em aberto)"""
+        strong = {
+            receipt_id: candidates
+            for receipt_id, candidates in suggestions.items()
+            if len(candidates) > 1 and Decimal(str(candidates[0]["match_score"])) > MULTIPLE_MATCH_SCORE
+        }
+        if not strong:
+            return
+
+        existing = self.supabase.table("fila_reconciliacao").select("id, comprovante_id, status, criado_em").in_(
+            "comprovante_id", list(strong)
+        ).execute().data
+        queued = {item["comprovante_id"]: item for item in existing}
+
+        events: List[Tuple[str, str, Optional[Dict[str, Any]]]] = []
+        for receipt_id, candidates in strong.items():
+            matches = candidates[:QUEUED_SUGGESTIONS]
+            receipt = receipts[receipt_id]
+            item = queued.get(receipt_id)
+            rules = get_matching_rules(receipt.get("condominio_id"), self.supabase)
+            priority = compute_priority(
+                valor=receipt.get("ocr_valor"),
+                fraud_score=receipt.get("fraud_score"),
+                criado_em=item.get("criado_em") if item else None,
+                matches=matches,
+                sla_hours=rules.review_sla_hours
+            )
+            if item is None:
+                inserted = self.supabase.table("fila_reconciliacao").insert(with_tenant({
+                    "comprovante_id": receipt_id,
+                    "tipo": "multiplos_matches",
+                    "prioridade": priority,
+                    "matches_sugeridos": matches,
+                    "status": "pendente"
+                }, receipt.get("condominio_id"))).execute()
+                events.append(("insert", receipt_id, inserted.data[0] if inserted.data else None))
+            elif item["status"] in ("pendente", "em_revisao"):
+                self.supabase.table("fila_reconciliacao").update({
+                    "matches_sugeridos": matches,
+                    "prioridade": priority
+                }).eq("id", item["id"]).execute()
+                events.append(("update", receipt_id, {"id": item["id"], "matches_sugeridos": matches, "prioridade": priority}))
+
+        if events:
+            ReconciliationQueueService.invalidate()
+            for event_type, receipt_id, item in events:
+                queue_event_bus.publish(event_type, receipt_id, item)
+
+    # --- Leitura ---
+
+    def get(self, receipt_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Top-k gravado, sem transações conciliadas depois do cálculo"""
+        rows = self.supabase.table(SUGGESTIONS_TABLE).select(
+            "transacao_id, posicao, match_score, match_reasons, "
+            "transacao:transacoes_bancarias(data_transacao, valor, descricao, nsu, status_reconciliacao)"
+        ).eq("comprovante_id", receipt_id).order("posicao").limit(STORED_SUGGESTIONS).execute().data
+
+        matches = []
+        for row in rows:
+            transaction = row.get("transacao")
+            if not transaction or transaction["status_reconciliacao"] != "pendente":
+                continue
+            matches.append({
+                "transacao_id": row["transacao_id"],
+                "data_transacao": transaction["data_transacao"],
+                "valor": transaction["valor"],
+                "descricao": transaction.get("descricao"),
+                "nsu": transaction.get("nsu"),
+                "match_score": row["match_score"],
+                "match_reasons": row.get("match_reasons") or []
+            })
+            if len(matches) >= limit:
+                break
+        return matches
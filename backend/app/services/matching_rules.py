@@ -0,0 +1,218 @@
+"""
+Matching Rules - Regras de Conciliação por Condomínio
+Perfis de tolerância configuráveis, compilados em tabelas de consulta
+(centavos) e cacheados por condomínio com invalidação na alteração.
+"""
+from typing import List, Dict, Any, Optional, Tuple, Annotated
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import datetime, timedelta
+from pydantic import BaseModel, Field, ValidationError
+
+class MatchingRuleProfile(BaseModel):
+    """
+    Perfil de regras de matching de um condomínio.
+    Os valores padrão são os mesmos usados historicamente pelo RobustValidator.
+    """
+    # Limites: perfis absurdos (tolerâncias negativas, tabelas de taxa enormes)
+    # voltam 422 no PUT em vez de quebrar a compilação ou o matching
+
+    # Tolerância de valor (R$ 0,05)
+    value_tolerance: Decimal = Field(Decimal("0.05"), ge=0, le=10)
+
+    # Tolerância de data (2 dias)
+    date_tolerance_days: int = Field(2, ge=0, le=30)
+
+    # Tolerância de timestamp (30 minutos)
+    timestamp_tolerance_minutes: int = Field(30, ge=0, le=24 * 60)
+
+    # Taxas comuns de boleto (ordem = prioridade)
+    common_fees: List[Annotated[Decimal, Field(gt=0, le=100)]] = Field([
+        Decimal("2.50"),   # Taxa padrão
+        Decimal("3.00"),
+        Decimal("1.50"),
+        Decimal("5.00"),
+    ], max_length=20)
+
+    # Janela de sugestões para revisão manual (mais larga que a de aprovação)
+    suggestion_value_tolerance_pct: Decimal = Field(Decimal("0.01"), ge=0, lt=1)  # 1%
+    suggestion_date_window_days: int = Field(3, ge=0, le=30)
+
+    # SLA de revisão manual (horas) usado na prioridade da fila
+    review_sla_hours: int = Field(72, ge=1, le=30 * 24)
+
+def to_cents(amount: Any) -> int:
+    """Converte valor monetário para centavos (inteiro)"""
+    return int((Decimal(str(amount or 0)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def is_credit(transaction: Dict[str, Any]) -> bool:
+    """
+    Entrada na conta, pelo tipo da transação. O sinal do valor só decide
+    quando não há tipo: o sync do Open Finance grava débitos com valor positivo.
+    """
+    tipo = transaction.get("tipo")
+    if tipo:
+        return tipo == "credito"
+    return to_cents(transaction.get("valor")) > 0
+
+class CompiledRuleSet:
+    """
+    Perfil compilado em tabelas pré-calculadas.
+
+    - Tolerâncias convertidas para centavos/segundos
+    - Tabela de offsets de taxa: diferença (centavos) -> taxa detectada
+
+    Assim cada comparação de valor é uma conta inteira + lookup O(1).
+    """
+
+    def __init__(self, profile: MatchingRuleProfile):
+        self.profile = profile
+        self.value_tolerance_cents = to_cents(profile.value_tolerance)
+        self.date_tolerance_days = profile.date_tolerance_days
+        self.timestamp_tolerance_seconds = profile.timestamp_tolerance_minutes * 60
+        self.suggestion_value_tolerance_pct = profile.suggestion_value_tolerance_pct
+        self.suggestion_date_window_days = profile.suggestion_date_window_days
+        self.review_sla_hours = profile.review_sla_hours
+
+        # Para cada taxa F, qualquer diferença em [F - tol, F + tol] é "com taxa".
+        # A primeira taxa da lista tem prioridade em caso de sobreposição.
+        self.fee_offsets_cents: Tuple[int, ...] = tuple(to_cents(fee) for fee in profile.common_fees)
+        self.fee_table: Dict[int, int] = {}
+        for fee_cents in self.fee_offsets_cents:
+            for delta in range(fee_cents - self.value_tolerance_cents, fee_cents + self.value_tolerance_cents + 1):
+                self.fee_table.setdefault(delta, fee_cents)
+
+        # Todas as diferenças aceitas (exato primeiro), para sondar buckets de centavos em joins
+        exact_deltas = sorted(range(-self.value_tolerance_cents, self.value_tolerance_cents + 1), key=abs)
+        self.amount_deltas_cents: Tuple[int, ...] = tuple(exact_deltas) + tuple(
+            delta for delta in self.fee_table if abs(delta) > self.value_tolerance_cents
+        )
+
+    def match_amount(self, receipt_cents: int, transaction_cents: int) -> Optional[Tuple[str, Optional[int]]]:
+        """
+        Compara valor do comprovante com valor da transação (centavos).
+
+        Returns:
+            ("exact", None), ("with_fee", taxa_em_centavos) ou None
+        """
+        delta = receipt_cents - transaction_cents
+        if abs(delta) <= self.value_tolerance_cents:
+            return ("exact", None)
+
+        fee_cents = self.fee_table.get(delta)
+        if fee_cents is not None:
+            return ("with_fee", fee_cents)
+
+        return None
+
+    def within_date_tolerance(self, days_diff: int) -> bool:
+        """Verifica se a diferença em dias está dentro da tolerância"""
+        return abs(days_diff) <= self.date_tolerance_days
+
+    def suggestion_amount_bounds(self, amount_cents: int) -> Tuple[int, int]:
+        """Faixa de valores (centavos) aceita para sugestões de match"""
+        tolerance = int((Decimal(abs(amount_cents)) * self.suggestion_value_tolerance_pct).to_integral_value(rounding=ROUND_HALF_UP))
+        return (amount_cents - tolerance, amount_cents + tolerance)
+
+DEFAULT_PROFILE = MatchingRuleProfile()
+DEFAULT_RULES = CompiledRuleSet(DEFAULT_PROFILE)
+
+class MatchingRulesService:
+    """
+    Carrega e cacheia regras compiladas por condomínio.
+
+    - Carrega da tabela `regras_conciliacao` uma única vez por condomínio
+    - Cache em memória com TTL (outros workers enxergam alterações após o TTL)
+    - Invalidação imediata no worker que altera as regras
+    """
+
+    TABLE = "regras_conciliacao"
+
+    # Cache em memória (compartilhado pelo processo)
+    _cache: Dict[str, Dict[str, Any]] = {}
+    _cache_ttl = timedelta(minutes=5)
+
+    def __init__(self, supabase=None):
+        self.supabase = supabase
+
+    def get_rules(self, condominio_id: Optional[str]) -> CompiledRuleSet:
+        """Retorna as regras compiladas do condomínio (ou as regras padrão)"""
+        if not condominio_id or not self.supabase:
+            return DEFAULT_RULES
+
+        cached = self._cache.get(condominio_id)
+        if cached and datetime.now() - cached["cached_at"] < self._cache_ttl:
+            return cached["rules"]
+
+        profile = self._load_profile(condominio_id)
+        rules = CompiledRuleSet(profile) if profile else DEFAULT_RULES
+        self._cache[condominio_id] = {"rules": rules, "cached_at": datetime.now()}
+        return rules
+
+    def save_profile(self, condominio_id: str, profile: MatchingRuleProfile) -> CompiledRuleSet:
+        """Persiste um novo perfil e invalida o cache do condomínio"""
+        if self.supabase:
+            row = {
+                "condominio_id": condominio_id,
+                "tolerancia_valor": float(profile.value_tolerance),
+                "tolerancia_dias": profile.date_tolerance_days,
+                "tolerancia_timestamp_minutos": profile.timestamp_tolerance_minutes,
+                "taxas_comuns": [float(fee) for fee in profile.common_fees],
+                "sugestao_tolerancia_pct": float(profile.suggestion_value_tolerance_pct),
+                "sugestao_janela_dias": profile.suggestion_date_window_days,
+                "sla_revisao_horas": profile.review_sla_hours,
+                "atualizado_em": datetime.now().isoformat()
+            }
+            self.supabase.table(self.TABLE).upsert(row, on_conflict="condominio_id").execute()
+
+        # Invalida e já aquece o cache com a versão nova
+        self.invalidate(condominio_id)
+        rules = CompiledRuleSet(profile)
+        self._cache[condominio_id] = {"rules": rules, "cached_at": datetime.now()}
+        return rules
+
+    @classmethod
+    def invalidate(cls, condominio_id: Optional[str] = None):
+        """
+        Invalida o cache.
+
+        Args:
+            condominio_id: Se fornecido, invalida apenas esse condomínio. Senão, tudo.
+        """
+        if condominio_id:
+            cls._cache.pop(condominio_id, None)
+        else:
+            cls._cache.clear()
+
+    def _load_profile(self, condominio_id: str) -> Optional[MatchingRuleProfile]:
+        """Busca o perfil no banco; None se não existir ou em caso de erro"""
+        try:
+            result = self.supabase.table(self.TABLE).select("*").eq(
+                "condominio_id", condominio_id
+            ).limit(1).execute()
+        except Exception as e:
+            print(f"⚠️ [Matching Rules] Erro ao carregar regras de {condominio_id}: {e}")
+            return None
+
+        if not result.data:
+            return None
+
+        row = result.data[0]
+        fields = {
+            "value_tolerance": row.get("tolerancia_valor"),
+            "date_tolerance_days": row.get("tolerancia_dias"),
+            "timestamp_tolerance_minutes": row.get("tolerancia_timestamp_minutos"),
+            "common_fees": row.get("taxas_comuns"),
+            "suggestion_value_tolerance_pct": row.get("sugestao_tolerancia_pct"),
+            "suggestion_date_window_days": row.get("sugestao_janela_dias"),
+            "review_sla_hours": row.get("sla_revisao_horas"),
+        }
+        # Colunas nulas herdam o padrão
+        try:
+            return MatchingRuleProfile(**{k: v for k, v in fields.items() if v is not None})
+        except ValidationError as e:
+            print(f"⚠️ [Matching Rules] Regras de {condominio_id} fora dos limites, usando o padrão: {e}")
+            return None
+
+def get_matching_rules(condominio_id: Optional[str] = None, supabase=None) -> CompiledRuleSet:
+    """Atalho para obter as regras compiladas de um condomínio"""
+    return MatchingRulesService(supabase).get_rules(condominio_id)
@@ -0,0 +1,354 @@
+"""
+Metrics - Instrumentação de Tempo e Vazão da Conciliação
+Histogramas e contadores em memória, expostos no formato texto do
+Prometheus em GET /metrics, e um detalhamento por request (tempo gasto
+em cada etapa: OCR, fraude, busca de candidatos, cascata, Supabase...)
+logado em JSON ao fim de cada request.
+
+Escopo: processo (um registro por worker). O Prometheus raspa cada worker
+da API em /metrics e cada processo do Celery no exportador próprio
+(start_metrics_server, porta CELERY_METRICS_PORT + índice do processo);
+a agregação é feita nas queries.
+Etapas podem ser aninhadas (validate_payment contém candidate_search e
+cascade_resolution): cada uma mede o próprio tempo total.
+"""
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, Tuple, List, Iterator
+
+logger = logging.getLogger("app.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Etapas vão de < 1ms (cascata em memória) a segundos (OCR, lotes grandes)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """Contador monotônico por combinação de labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+class Histogram:
+    """
+    Histograma de buckets cumulativos (_bucket/_sum/_count), como o
+    client oficial. observe() é O(log buckets) sob um lock curto.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # {labels: [contagem por bucket (não cumulativa, +Inf no fim), soma]}
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(str(labels.get(name, "")) for name in self.labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Métricas do processo, na ordem de registro"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        """Formato de exposição texto do Prometheus (0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Exportador do registro deste processo em GET /metrics (thread daemon),
+    para processos sem a API, como os workers do Celery.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"metrics-{port}", daemon=True).start()
+    return server
+
+STAGE_SECONDS = registry.histogram(
+    "reconciliation_stage_duration_seconds",
+    "Tempo por etapa da conciliação (ocr, fraud_analysis, validate_payment, candidate_search, cascade_resolution, auto_reconcile...)",
+    ("stage",)
+)
+STAGE_TOTAL = registry.counter(
+    "reconciliation_stage_total",
+    "Execuções por etapa e resultado (ok/error)",
+    ("stage", "outcome")
+)
+SUPABASE_SECONDS = registry.histogram(
+    "supabase_request_duration_seconds",
+    "Tempo de cada chamada ao Supabase (tabela ou rpc:<função>)",
+    ("target", "operation")
+)
+SUPABASE_ERRORS = registry.counter(
+    "supabase_request_errors_total",
+    "Chamadas ao Supabase que lançaram exceção",
+    ("target", "operation")
+)
+HTTP_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "Tempo total por rota da API",
+    ("method", "route", "status")
+)
+RECONCILED_TOTAL = registry.counter(
+    "reconciliation_items_total",
+    "Vazão: comprovantes conciliados/encaminhados por origem e resultado",
+    ("source", "outcome")
+)
+OUTBOUND_SECONDS = registry.histogram(
+    "outbound_request_duration_seconds",
+    "Tempo de cada tentativa a provedores externos por host e resultado (ok/http_4xx/http_5xx/erro)",
+    ("host", "outcome")
+)
+OUTBOUND_EVENTS = registry.counter(
+    "outbound_resilience_events_total",
+    "Eventos da camada de resiliência por host (retry, hedge, circuito_aberto, sem_orcamento)",
+    ("host", "event")
+)
+
+# --- Detalhamento por request ---
+
+_breakdown: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("metrics_breakdown", default=None)
+
+@contextmanager
+def request_breakdown() -> Iterator[Dict[str, List[float]]]:
+    """
+    Coleta o tempo de cada etapa executada dentro do bloco:
+    {etapa: [chamadas, segundos]}. Usado pelo middleware HTTP e por tasks.
+    """
+    breakdown: Dict[str, List[float]] = {}
+    token = _breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _breakdown.reset(token)
+
+def _record_breakdown(stage: str, seconds: float):
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        entry = breakdown.setdefault(stage, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+def log_breakdown(event: str, breakdown: Dict[str, List[float]], **fields: Any):
+    """Uma linha JSON por request/task com o tempo de cada etapa"""
+    payload = {
+        "event": event,
+        **fields,
+        "stages": {
+            stage: {"calls": int(calls), "ms": round(seconds * 1000, 3)}
+            for stage, (calls, seconds) in sorted(breakdown.items(), key=lambda item: -item[1][1])
+        },
+    }
+    logger.info(json.dumps(payload, ensure_ascii=False, default=str))
+
+# --- Etapas ---
+
+@contextmanager
+def stage(name: str):
+    """Mede um bloco como etapa da conciliação"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        STAGE_TOTAL.inc(stage=name, outcome=outcome)
+        _record_breakdown(name, elapsed)
+
+def timed(name: str):
+    """Decorator de etapa para funções síncronas e async"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# --- Supabase ---
+
+QUERY_OPERATIONS = ("select", "insert", "upsert", "update", "delete")
+
+class InstrumentedQuery:
+    """
+    Proxy de um query builder do Supabase: repassa o encadeamento e mede
+    o execute() com a tabela e a operação (select/insert/update/...).
+    """
+
+    def __init__(self, query, target: str, operation: str):
+        self._query = query
+        self._target = target
+        self._operation = operation
+
+    def _wrap(self, result, operation: Optional[str] = None):
+        if hasattr(result, "execute") and not isinstance(result, InstrumentedQuery):
+            return InstrumentedQuery(result, self._target, operation or self._operation)
+        return result
+
+    def execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._query.execute(*args, **kwargs)
+        except Exception:
+            SUPABASE_ERRORS.inc(target=self._target, operation=self._operation)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            SUPABASE_SECONDS.observe(elapsed, target=self._target, operation=self._operation)
+            _record_breakdown("supabase", elapsed)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            # Propriedades de encadeamento (ex.: .not_) devolvem o próprio builder
+            return self._wrap(attr)
+
+        operation = name if name in QUERY_OPERATIONS else None
+
+        def chain(*args, **kwargs):
+            return self._wrap(attr(*args, **kwargs), operation)
+        return chain
+
+class InstrumentedClient:
+    """
+    Proxy do supabase.Client: table()/rpc() devolvem builders medidos;
+    o resto (storage, auth...) é repassado sem alteração.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str) -> InstrumentedQuery:
+        return InstrumentedQuery(self._client.table(name), name, "select")
+
+    def from_(self, name: str) -> InstrumentedQuery:
+        return self.table(name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> InstrumentedQuery:
+        return InstrumentedQuery(self._client.rpc(name, params or {}), f"rpc:{name}", "rpc")
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+def instrument_supabase(client):
+    """Envolve o client para medir cada chamada (None e clients já envolvidos passam direto)"""
+    if client is None or isinstance(client, InstrumentedClient):
+        return client
+    return InstrumentedClient(client)
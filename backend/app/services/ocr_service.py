@@ -5,6 +5,7 @@ from datetime import datetime, date
 from PIL import Image
 from io import BytesIO
 import hashlib
+from app.services.metrics import timed
 
 # Note: For production, install pytesseract and tesseract-ocr
 # pip install pytesseract pillow
@@ -26,6 +27,7 @@ class OCRService:
                 print("Warning: pytesseract not installed. Using mock OCR.")
                 self.use_tesseract = False
     
+    @timed("ocr")
     async def process_receipt(self, file_content: bytes, file_type: str) -> Dict[str, Any]:
         """
         Process a receipt image/PDF and extract structured data.
@@ -2,7 +2,7 @@
 Open Finance Service
 Integrates with Open Finance providers using the Adapter Pattern.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import date, timedelta
 from decimal import Decimal
 from app.core.config import get_settings
@@ -12,6 +12,30 @@ from app.services.adapters.belvo import BelvoAdapter
 
 settings = get_settings()
 
+PROVIDERS = ("pluggy", "belvo")
+
+def build_provider(provider: str) -> BankDataProvider:
+    """Adapter configured with the credentials from settings"""
+    if provider == "pluggy":
+        return PluggyAdapter(
+            client_id=settings.PLUGGY_CLIENT_ID or "",
+            client_secret=settings.PLUGGY_CLIENT_SECRET or ""
+        )
+    elif provider == "belvo":
+        return BelvoAdapter(
+            secret_id=settings.BELVO_SECRET_ID or "",
+            secret_password=settings.BELVO_SECRET_PASSWORD or ""
+        )
+    raise ValueError(f"Unknown provider: {provider}")
+
+def configured_providers() -> List[str]:
+    """Providers with credentials set"""
+    configured = {
+        "pluggy": bool(settings.PLUGGY_CLIENT_ID and settings.PLUGGY_CLIENT_SECRET),
+        "belvo": bool(settings.BELVO_SECRET_ID and settings.BELVO_SECRET_PASSWORD),
+    }
+    return [name for name in PROVIDERS if configured[name]]
+
 class OpenFinanceService:
     """
     Main service for Open Finance operations.
@@ -20,20 +44,7 @@ class OpenFinanceService:
     
     def __init__(self, provider: str = "pluggy"):
         self.provider_name = provider
-        self.provider: BankDataProvider
-        
-        if provider == "pluggy":
-            self.provider = PluggyAdapter(
-                client_id=settings.PLUGGY_CLIENT_ID or "",
-                client_secret=settings.PLUGGY_CLIENT_SECRET or ""
-            )
-        elif provider == "belvo":
-            self.provider = BelvoAdapter(
-                secret_id=settings.BELVO_SECRET_ID or "",
-                secret_password=settings.BELVO_SECRET_PASSWORD or ""
-            )
-        else:
-            raise ValueError(f"Unknown provider: {provider}")
+        self.provider: BankDataProvider = build_provider(provider)
     
     async def create_bank_connection(self, user_id: str) -> Dict[str, str]:
         """
@@ -45,13 +56,15 @@ class OpenFinanceService:
     async def sync_transactions(
         self, 
         account_id: str, 
-        days_back: int = 30
+        days_back: int = 30,
+        from_date: Optional[date] = None
     ) -> List[Dict[str, Any]]:
         """
         Sync transactions from the bank.
         Returns normalized dictionary format ready for database insertion.
+        `from_date` (incremental sync watermark) takes precedence over `days_back`.
         """
-        from_date = date.today() - timedelta(days=days_back)
+        from_date = from_date or date.today() - timedelta(days=days_back)
         
         # Get standardized transactions from adapter
         standard_txs: List[StandardTransaction] = await self.provider.get_transactions(
@@ -81,5 +94,6 @@ class OpenFinanceService:
             "codigo_barras": None,
             "conta_origem": None,
             "conta_destino": None,
-            "metadata": tx.metadata
+            "metadata": tx.metadata,
+            "provider_atualizado_em": tx.metadata.get("updated_at")
         }
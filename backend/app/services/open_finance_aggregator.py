@@ -0,0 +1,159 @@
+"""
+Open Finance Aggregator - Extrato Único de Vários Agregadores
+Um condomínio pode ter contas em instituições diferentes, conectadas por
+agregadores diferentes (Pluggy, Belvo). O agregador busca todas as contas
+ao mesmo tempo, cada provider com o seu timeout e o seu circuit breaker, e
+junta tudo num único feed de StandardTransaction:
+
+- um provider lento ou fora do ar não segura os outros: o feed sai com o
+  que chegou e o status de cada fonte (ok, timeout, erro, circuito_aberto)
+- repetidas do mesmo provider (mesmo id) entram uma vez
+- a mesma conta bancária conectada por dois agregadores (mesmo
+  `bank_account_key`) não duplica o extrato: por (data, valor, tipo), fica
+  o maior número de ocorrências visto por uma fonte, e a fonte listada
+  primeiro tem preferência
+"""
+import asyncio
+import time
+from collections import Counter
+from datetime import date
+from typing import List, Dict, Optional, Tuple
+from pydantic import BaseModel
+from app.services.adapters.base import BankDataProvider, StandardTransaction
+from app.services.circuit_breaker import get_breaker, CircuitOpenError
+from app.services.open_finance import build_provider, configured_providers
+
+DEFAULT_PROVIDER_TIMEOUT = 20.0
+PROVIDER_TIMEOUTS = {
+    "pluggy": 20.0,
+    "belvo": 25.0,      # Belvo pagina em páginas de até 1000 seguindo `next`, sem paralelismo
+}
+
+class ProviderAccount(BaseModel):
+    """Conta a buscar num provider"""
+    provider: str
+    account_id: str
+    bank_account_key: Optional[str] = None   # Mesma conta bancária por mais de um agregador (ex.: "341/1234/56789-0")
+
+class SourceStatus(BaseModel):
+    provider: str
+    account_id: str
+    status: str             # "ok" | "timeout" | "erro" | "circuito_aberto"
+    transacoes: int = 0
+    duracao_ms: int = 0
+    erro: Optional[str] = None
+
+class AggregatedFeed(BaseModel):
+    transactions: List[StandardTransaction] = []
+    fontes: List[SourceStatus] = []
+    duplicadas: int = 0     # Descartadas no merge
+
+    @property
+    def complete(self) -> bool:
+        return all(source.status == "ok" for source in self.fontes)
+
+def _fingerprint(tx: StandardTransaction) -> Tuple[date, str, str]:
+    # Sem a descrição: cada agregador formata o histórico do banco do seu jeito
+    return (tx.date, str(tx.amount), tx.type)
+
+def merge_transactions(
+    sources: List[Tuple[ProviderAccount, List[StandardTransaction]]]
+) -> Tuple[List[StandardTransaction], int]:
+    """
+    Junta os extratos (na ordem de preferência das fontes) sem duplicar.
+
+    Returns:
+        (transações ordenadas por data, quantidade descartada)
+    """
+    seen_ids = set()
+    kept_per_account: Dict[str, Counter] = {}
+    merged: List[StandardTransaction] = []
+    duplicates = 0
+
+    for account, transactions in sources:
+        account_key = account.bank_account_key or f"{account.provider}:{account.account_id}"
+        kept = kept_per_account.setdefault(account_key, Counter())
+        source_counts: Counter = Counter()
+
+        for tx in transactions:
+            tx_key = (tx.provider_name, tx.provider_original_id)
+            if tx_key in seen_ids:
+                duplicates += 1
+                continue
+            seen_ids.add(tx_key)
+
+            fingerprint = _fingerprint(tx)
+            source_counts[fingerprint] += 1
+            if source_counts[fingerprint] <= kept[fingerprint]:
+                duplicates += 1     # Já veio por uma fonte anterior da mesma conta bancária
+                continue
+
+            kept[fingerprint] += 1
+            merged.append(tx.model_copy(update={
+                "metadata": {**tx.metadata, "provider_account_id": account.account_id, "bank_account_key": account_key}
+            }))
+
+    merged.sort(key=lambda tx: (tx.date, tx.provider_name, tx.id))
+    return merged, duplicates
+
+class OpenFinanceAggregator:
+    """
+    Busca concorrente em todos os providers configurados.
+    """
+
+    def __init__(
+        self,
+        providers: Optional[Dict[str, BankDataProvider]] = None,
+        timeouts: Optional[Dict[str, float]] = None
+    ):
+        if providers is None:
+            providers = {name: build_provider(name) for name in configured_providers()}
+        self.providers = providers
+        self.timeouts = {**PROVIDER_TIMEOUTS, **(timeouts or {})}
+
+    async def get_transactions(
+        self,
+        accounts: List[ProviderAccount],
+        from_date: date,
+        to_date: Optional[date] = None
+    ) -> AggregatedFeed:
+        results = await asyncio.gather(*(self._fetch(account, from_date, to_date) for account in accounts))
+
+        statuses = [status for status, _ in results]
+        ok_sources = [(account, txs) for account, (status, txs) in zip(accounts, results) if status.status == "ok"]
+        transactions, duplicates = merge_transactions(ok_sources)
+        return AggregatedFeed(transactions=transactions, fontes=statuses, duplicadas=duplicates)
+
+    async def _fetch(
+        self,
+        account: ProviderAccount,
+        from_date: date,
+        to_date: Optional[date]
+    ) -> Tuple[SourceStatus, List[StandardTransaction]]:
+        status = SourceStatus(provider=account.provider, account_id=account.account_id, status="ok")
+        provider = self.providers.get(account.provider)
+        if provider is None:
+            status.status, status.erro = "erro", f"Provider não configurado: {account.provider}"
+            return status, []
+
+        timeout = self.timeouts.get(account.provider, DEFAULT_PROVIDER_TIMEOUT)
+        breaker = get_breaker(f"open_finance:{account.provider}")
+
+        # Timeout dentro do breaker: estourar o tempo conta como falha do provider
+        async def fetch() -> List[StandardTransaction]:
+            return await asyncio.wait_for(provider.get_transactions(account.account_id, from_date, to_date), timeout)
+
+        start = time.perf_counter()
+        transactions: List[StandardTransaction] = []
+        try:
+            transactions = await breaker.call(fetch)
+        except CircuitOpenError as e:
+            status.status, status.erro = "circuito_aberto", str(e)
+        except asyncio.TimeoutError:
+            status.status, status.erro = "timeout", f"Sem resposta em {timeout:.0f}s"
+        except Exception as e:
+            status.status, status.erro = "erro", str(e)
+
+        status.duracao_ms = int((time.perf_counter() - start) * 1000)
+        status.transacoes = len(transactions)
+        return status, transactions
@@ -0,0 +1,233 @@
+"""
+Open Finance Sync - Sincronização Incremental por Conta
+Cada conta tem uma marca d'água (sincronizacao_contas): última data/id de
+transação e o maior updatedAt do provider. O sync pede ao provider só o
+delta desde a marca, menos uma janela de sobreposição (transações que o
+banco lança com data retroativa ou que mudam de pendente para lançada).
+As transações novas entram num único insert deduplicado pelo índice único
+(provider, provider_transacao_id); as já gravadas que o provider alterou
+(updatedAt maior que o gravado) têm os campos do provider atualizados.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple
+from pydantic import BaseModel
+from app.services.open_finance import OpenFinanceService
+
+SYNC_STATE_TABLE = "sincronizacao_contas"
+TRANSACTIONS_TABLE = "transacoes_bancarias"
+TRANSACTION_KEY = "provider,provider_transacao_id"
+OVERLAP_DAYS = 3
+
+# Campos que vêm do provider; conciliação, extrato e condomínio são nossos
+PROVIDER_FIELDS = (
+    "data_transacao", "valor", "tipo", "descricao", "nsu", "codigo_barras",
+    "conta_origem", "conta_destino", "metadata", "provider_atualizado_em",
+)
+
+class SyncWatermark(BaseModel):
+    """Marca d'água de uma conta no provider"""
+    provider: str
+    conta_id: str
+    condominio_id: Optional[str] = None
+    ultima_data_transacao: Optional[date] = None
+    ultimo_transacao_id: Optional[str] = None
+    ultimo_atualizado_em: Optional[datetime] = None
+    transacoes_sincronizadas: int = 0
+    sincronizado_em: Optional[datetime] = None
+
+class SyncResult(BaseModel):
+    """Resumo de um sync incremental"""
+    desde: date
+    recebidas: int = 0          # Devolvidas pelo provider (delta + sobreposição)
+    inalteradas: int = 0        # Descartadas pela marca d'água antes do upsert
+    novas: int = 0              # Efetivamente inseridas
+    atualizadas: int = 0        # Já gravadas, alteradas no provider depois da gravação
+    watermark: SyncWatermark
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def _parse_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if value is None or isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+class OpenFinanceSyncService:
+    """
+    Marca d'água e gravação deduplicada das transações de uma conta.
+
+    Fluxo: sync_from() -> buscar no provider -> store(), ou sync_account()
+    para as três etapas de uma vez.
+    """
+
+    def __init__(self, supabase, provider: str = "pluggy"):
+        self.supabase = supabase
+        self.provider = provider
+
+    def load_watermark(self, conta_id: str) -> Optional[SyncWatermark]:
+        result = self.supabase.table(SYNC_STATE_TABLE).select("*").eq(
+            "provider", self.provider
+        ).eq("conta_id", conta_id).limit(1).execute()
+        return SyncWatermark(**result.data[0]) if result.data else None
+
+    def sync_from(self, watermark: Optional[SyncWatermark], days_back: int = 30, today: Optional[date] = None) -> date:
+        """
+        Primeira sincronização: `days_back` dias. Depois: a partir da última
+        transação vista, menos OVERLAP_DAYS (nunca antes da janela inicial
+        de uma conta nova, nunca depois de hoje).
+        """
+        today = today or date.today()
+        if watermark is None or watermark.ultima_data_transacao is None:
+            return today - timedelta(days=days_back)
+        return min(watermark.ultima_data_transacao - timedelta(days=OVERLAP_DAYS), today)
+
+    async def sync_account(
+        self,
+        conta_id: str,
+        condominio_id: Optional[str] = None,
+        days_back: int = 30,
+        extrato_id: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], SyncResult]:
+        """Busca no provider o delta desde a marca d'água e grava as transações novas"""
+        watermark = self.load_watermark(conta_id)
+        since = self.sync_from(watermark, days_back)
+        rows = await OpenFinanceService(provider=self.provider).sync_transactions(conta_id, from_date=since)
+        return self.store(conta_id, rows, watermark, since, condominio_id=condominio_id, extrato_id=extrato_id)
+
+    def store(
+        self,
+        conta_id: str,
+        rows: List[Dict[str, Any]],
+        watermark: Optional[SyncWatermark],
+        since: date,
+        condominio_id: Optional[str] = None,
+        extrato_id: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], SyncResult]:
+        """
+        Grava as transações ainda não vistas, atualiza as que o provider
+        alterou e avança a marca d'água.
+
+        Args:
+            rows: Linhas no formato de transacoes_bancarias; `id` é o id da
+                transação no provider e `provider_atualizado_em` o updatedAt
+                (quando o provider informa)
+
+        Returns:
+            (linhas inseridas, com o id do banco; resumo do sync)
+        """
+        known_until = watermark.ultimo_atualizado_em if watermark else None
+        pending: List[Dict[str, Any]] = []
+        unchanged = 0
+
+        for row in rows:
+            row = dict(row)
+            provider_id = str(row.pop("id"))
+            updated_at = _parse_datetime(row.get("provider_atualizado_em"))
+            if known_until and updated_at and updated_at <= known_until:
+                unchanged += 1      # Já gravada nesta versão numa execução anterior
+                continue
+
+            row.update({
+                "provider": self.provider,
+                "provider_transacao_id": provider_id,
+                "provider_conta_id": conta_id,
+                "provider_atualizado_em": updated_at.isoformat() if updated_at else None,
+            })
+            if condominio_id is not None:
+                row["condominio_id"] = condominio_id
+            if extrato_id is not None:
+                row["extrato_id"] = extrato_id
+            if isinstance(row.get("data_transacao"), date):
+                row["data_transacao"] = row["data_transacao"].isoformat()
+            if row.get("valor") is not None:
+                row["valor"] = float(row["valor"])
+            pending.append(row)
+
+        inserted: List[Dict[str, Any]] = []
+        if pending:
+            # ON CONFLICT DO NOTHING: só as linhas realmente novas voltam
+            inserted = self.supabase.table(TRANSACTIONS_TABLE).upsert(
+                pending, on_conflict=TRANSACTION_KEY, ignore_duplicates=True
+            ).execute().data or []
+
+        new_ids = {row["provider_transacao_id"] for row in inserted}
+        changed = [
+            row for row in pending
+            if row["provider_transacao_id"] not in new_ids and row["provider_atualizado_em"]
+        ]
+        updated = sum(self._update_changed(row) for row in changed)
+
+        if inserted or updated:
+            # Import tardio: transaction_cache depende deste módulo
+            from app.services.transaction_cache import transaction_cache
+            transaction_cache.invalidate((self.provider, conta_id))
+
+        advanced = self._advance(conta_id, watermark, rows, len(inserted), condominio_id)
+        return inserted, SyncResult(
+            desde=since,
+            recebidas=len(rows),
+            inalteradas=unchanged,
+            novas=len(inserted),
+            atualizadas=updated,
+            watermark=advanced
+        )
+
+    def _update_changed(self, row: Dict[str, Any]) -> bool:
+        """
+        Atualiza uma transação já gravada que o provider alterou. Só vale se
+        o updatedAt gravado for mais antigo: dois syncs concorrentes da mesma
+        conta não voltam a transação para uma versão anterior.
+        """
+        values = {field: row[field] for field in PROVIDER_FIELDS if field in row}
+        result = self.supabase.table(TRANSACTIONS_TABLE).update(values).eq(
+            "provider", self.provider
+        ).eq("provider_transacao_id", row["provider_transacao_id"]).or_(
+            f'provider_atualizado_em.is.null,provider_atualizado_em.lt."{row["provider_atualizado_em"]}"'
+        ).execute()
+        return bool(result.data)
+
+    def _advance(
+        self,
+        conta_id: str,
+        watermark: Optional[SyncWatermark],
+        rows: List[Dict[str, Any]],
+        inserted: int,
+        condominio_id: Optional[str]
+    ) -> SyncWatermark:
+        current = watermark or SyncWatermark(provider=self.provider, conta_id=conta_id)
+        latest: Optional[Tuple[date, str]] = (
+            (current.ultima_data_transacao, current.ultimo_transacao_id or "")
+            if current.ultima_data_transacao else None
+        )
+        updated_at = current.ultimo_atualizado_em
+
+        for row in rows:
+            tx_date = _parse_date(row.get("data_transacao"))
+            if tx_date is not None and (latest is None or (tx_date, str(row["id"])) > latest):
+                latest = (tx_date, str(row["id"]))
+            row_updated = _parse_datetime(row.get("provider_atualizado_em"))
+            if row_updated is not None and (updated_at is None or row_updated > updated_at):
+                updated_at = row_updated
+
+        advanced = current.model_copy(update={
+            "condominio_id": condominio_id or current.condominio_id,
+            "ultima_data_transacao": latest[0] if latest else None,
+            "ultimo_transacao_id": latest[1] if latest else None,
+            "ultimo_atualizado_em": updated_at,
+            "transacoes_sincronizadas": current.transacoes_sincronizadas + inserted,
+            "sincronizado_em": datetime.now(timezone.utc),
+        })
+
+        state = advanced.model_dump(mode="json")
+        self.supabase.table(SYNC_STATE_TABLE).upsert(state, on_conflict="provider,conta_id").execute()
+        return advanced
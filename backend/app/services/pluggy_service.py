@@ -1,214 +1,244 @@
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from typing import Dict, List, Any, Optional
+import asyncio
+import httpx
+from typing import Dict, List, Any, Optional, Callable, Awaitable, AsyncIterator
 from datetime import datetime, timedelta
 from app.core.config import get_settings
-import urllib3
-
-# Suprimir warnings de SSL
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from app.services.http_client import request_with_retry, is_ssl_error
+from app.services.credential_cache import credential_cache, PLUGGY_API_KEY_TTL
 
 settings = get_settings()
 
-def create_session():
-    """Cria uma sessão HTTP com retry configurado"""
-    session = requests.Session()
-    
-    # Configurar retry
-    retry = Retry(
-        total=3,
-        backoff_factor=0.5,
-        status_forcelist=[500, 502, 503, 504],
-    )
-    
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('https://', adapter)
-    session.mount('http://', adapter)
-    
-    return session
+TRANSACTIONS_PAGE_SIZE = 500    # Máximo aceito pela Pluggy em /transactions
+MAX_PARALLEL_PAGES = 4          # Páginas buscadas ao mesmo tempo por conta
+
+async def iter_pages(
+    fetch_page: Callable[[int], Awaitable[Dict[str, Any]]],
+    max_parallel: int = MAX_PARALLEL_PAGES
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Streams the `results` of every page of a Pluggy paginated endpoint.
+
+    Page 1 is fetched alone to learn `totalPages`; pages 2..N are then
+    fetched concurrently (at most `max_parallel` in flight) and yielded in
+    page order as each one is ready. If the caller stops early, pending
+    fetches are cancelled.
+    """
+    first = await fetch_page(1)
+    yield first.get("results") or []
+
+    total_pages = int(first.get("totalPages") or 1)
+    if total_pages <= 1:
+        return
+
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+    async def fetch(page: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await fetch_page(page)
+
+    tasks = [asyncio.create_task(fetch(page)) for page in range(2, total_pages + 1)]
+    try:
+        for task in tasks:
+            yield (await task).get("results") or []
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def pluggy_credential_name(client_id: str) -> str:
+    """Credential cache key of a Pluggy client (shared by PluggyService and PluggyAdapter)"""
+    return f"pluggy:{client_id}"
 
 class PluggyService:
     """
     Service to interact with Pluggy API.
     Handles authentication, token generation, and transaction fetching.
+
+    Fully async: every call goes through the shared pooled httpx client
+    (app.services.http_client), so Pluggy round trips never block the
+    event loop and concurrent syncs reuse the same connections.
+    The API key lives in the process-wide credential cache, shared by
+    every instance (and by PluggyAdapter).
     """
-    
+
     BASE_URL = "https://api.pluggy.ai"
-    
+
     def __init__(self):
         self.client_id = settings.PLUGGY_CLIENT_ID
         self.client_secret = settings.PLUGGY_CLIENT_SECRET
-        self._access_token = None
-        self._session = create_session()
-        
-    def _get_auth_token_sync(self) -> str:
-        """
-        Authenticates with Pluggy and returns the API Key (access token).
-        """
-        if self._access_token:
-            return self._access_token
-        
-        print(f"[Pluggy] Autenticando com Client ID: {self.client_id[:8]}...")
-        
+
+    @property
+    def _credential_name(self) -> str:
+        return pluggy_credential_name(self.client_id)
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        return await request_with_retry(method, f"{self.BASE_URL}{path}", **kwargs)
+
+    async def _authorized_request(
+        self,
+        method: str,
+        path: str,
+        ssl_fallback_label: Optional[str] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """Request with the cached API key; on a 401 the key is refreshed and the call retried once"""
+        async def send(api_key: str) -> httpx.Response:
+            headers = {"X-API-KEY": api_key}
+            if ssl_fallback_label is not None:
+                return await self._request_with_ssl_fallback(method, path, ssl_fallback_label, headers=headers, **kwargs)
+            return await self._request(method, path, headers=headers, **kwargs)
+
+        api_key = await self._get_auth_token()
+        response = await send(api_key)
+        if response.status_code == 401:
+            print(f"[Pluggy] API key recusada (401), renovando...")
+            credential_cache.invalidate(self._credential_name, api_key)
+            response = await send(await self._get_auth_token())
+        return response
+
+    async def _request_with_ssl_fallback(self, method: str, path: str, label: str, **kwargs) -> httpx.Response:
+        """Same request; on a TLS failure, one more try without certificate verification"""
         try:
-            response = self._session.post(
-                f"{self.BASE_URL}/auth",
-                json={
-                    "clientId": self.client_id,
-                    "clientSecret": self.client_secret
-                },
-                timeout=30,
-                verify=True  # Mantém verificação SSL
-            )
-            
-            print(f"[Pluggy] Auth response status: {response.status_code}")
-            
-            if response.status_code != 200:
-                print(f"[Pluggy] Auth error: {response.text}")
-                raise Exception(f"Pluggy auth failed: {response.status_code}")
-                
-            data = response.json()
-            self._access_token = data["apiKey"]
-            print(f"[Pluggy] ✅ Autenticado com sucesso!")
-            return self._access_token
-            
-        except requests.exceptions.SSLError as e:
-            print(f"[Pluggy] ❌ Erro SSL: {e}")
-            # Tentar sem verificação SSL como fallback
+            return await self._request(method, path, **kwargs)
+        except httpx.ConnectError as e:
+            if not is_ssl_error(e):
+                print(f"[Pluggy] ❌ Erro de conexão{label}: {e}")
+                raise Exception(f"Connection error to Pluggy API: {e}")
+
+            print(f"[Pluggy] ❌ Erro SSL{label}: {e}")
             print(f"[Pluggy] Tentando sem verificação SSL...")
             try:
-                response = self._session.post(
-                    f"{self.BASE_URL}/auth",
-                    json={
-                        "clientId": self.client_id,
-                        "clientSecret": self.client_secret
-                    },
-                    timeout=30,
-                    verify=False
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    self._access_token = data["apiKey"]
-                    print(f"[Pluggy] ✅ Autenticado (sem SSL verify)!")
-                    return self._access_token
+                return await self._request(method, path, verify=False, **kwargs)
             except Exception as e2:
                 print(f"[Pluggy] ❌ Fallback falhou: {e2}")
             raise Exception(f"SSL error connecting to Pluggy: {e}")
-            
-        except requests.exceptions.ConnectionError as e:
-            print(f"[Pluggy] ❌ Erro de conexão: {e}")
-            raise Exception(f"Connection error to Pluggy API: {e}")
-        except Exception as e:
-            print(f"[Pluggy] ❌ Erro: {type(e).__name__}: {e}")
-            raise
-        
+
     async def _get_auth_token(self) -> str:
-        """Async wrapper around sync auth"""
-        return self._get_auth_token_sync()
+        """
+        Returns a valid API Key (access token), authenticating only when the
+        cached one is missing or about to expire.
+        """
+        return await credential_cache.get(self._credential_name, self._authenticate, PLUGGY_API_KEY_TTL)
+
+    async def _authenticate(self) -> str:
+        """
+        Authenticates with Pluggy and returns the API Key (access token).
+        """
+        print(f"[Pluggy] Autenticando com Client ID: {self.client_id[:8]}...")
+
+        response = await self._request_with_ssl_fallback(
+            "POST",
+            "/auth",
+            "",
+            json={
+                "clientId": self.client_id,
+                "clientSecret": self.client_secret
+            }
+        )
+
+        print(f"[Pluggy] Auth response status: {response.status_code}")
+
+        if response.status_code != 200:
+            print(f"[Pluggy] Auth error: {response.text}")
+            raise Exception(f"Pluggy auth failed: {response.status_code}")
+
+        data = response.json()
+        print(f"[Pluggy] ✅ Autenticado com sucesso!")
+        return data["apiKey"]
 
     async def create_connect_token(self, item_id: Optional[str] = None) -> str:
         """
         Creates a Connect Token to initialize the Pluggy Widget.
         """
-        api_key = await self._get_auth_token()
-        
         payload = {}
         if item_id:
             payload["itemId"] = item_id
-        
+
         print(f"[Pluggy] Criando Connect Token...")
-        
-        try:
-            response = self._session.post(
-                f"{self.BASE_URL}/connect_token",
-                headers={"X-API-KEY": api_key},
-                json=payload,
-                timeout=30,
-                verify=True
-            )
-            
-            print(f"[Pluggy] Connect Token response: {response.status_code}")
-            
-            if response.status_code != 200:
-                print(f"[Pluggy] Connect Token error: {response.text}")
-                raise Exception(f"Failed to create connect token: {response.status_code}")
-                
-            data = response.json()
-            print(f"[Pluggy] ✅ Connect Token criado!")
-            return data["accessToken"]
-            
-        except requests.exceptions.SSLError as e:
-            print(f"[Pluggy] ❌ Erro SSL no Connect Token, tentando fallback...")
-            try:
-                response = self._session.post(
-                    f"{self.BASE_URL}/connect_token",
-                    headers={"X-API-KEY": api_key},
-                    json=payload,
-                    timeout=30,
-                    verify=False
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    print(f"[Pluggy] ✅ Connect Token criado (sem SSL verify)!")
-                    return data["accessToken"]
-            except Exception as e2:
-                print(f"[Pluggy] ❌ Fallback Connect Token falhou: {e2}")
-            raise Exception(f"SSL error creating connect token: {e}")
-            
-        except requests.exceptions.ConnectionError as e:
-            print(f"[Pluggy] ❌ Erro de conexão no Connect Token: {e}")
-            raise Exception(f"Connection error creating connect token: {e}")
-
-    async def get_transactions(self, account_id: str, from_date: Optional[str] = None) -> List[Dict[str, Any]]:
+
+        response = await self._authorized_request(
+            "POST",
+            "/connect_token",
+            ssl_fallback_label=" no Connect Token",
+            json=payload
+        )
+
+        print(f"[Pluggy] Connect Token response: {response.status_code}")
+
+        if response.status_code != 200:
+            print(f"[Pluggy] Connect Token error: {response.text}")
+            raise Exception(f"Failed to create connect token: {response.status_code}")
+
+        data = response.json()
+        print(f"[Pluggy] ✅ Connect Token criado!")
+        return data["accessToken"]
+
+    async def iter_transaction_pages(
+        self,
+        account_id: str,
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None,
+        max_parallel: int = MAX_PARALLEL_PAGES
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
         """
-        Fetches transactions for a specific account.
+        Streams every page of transactions for an account (see iter_pages).
         """
-        api_key = await self._get_auth_token()
-        
         if not from_date:
             from_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-        
-        try:
-            response = self._session.get(
-                f"{self.BASE_URL}/transactions",
-                headers={"X-API-KEY": api_key},
-                params={
-                    "accountId": account_id,
-                    "from": from_date,
-                    "pageSize": 500
-                },
-                timeout=30,
-                verify=True
+
+        params = {
+            "accountId": account_id,
+            "from": from_date,
+            "pageSize": TRANSACTIONS_PAGE_SIZE
+        }
+        if to_date:
+            params["to"] = to_date
+
+        async def fetch_page(page: int) -> Dict[str, Any]:
+            response = await self._authorized_request(
+                "GET",
+                "/transactions",
+                params={**params, "page": page}
             )
-            
             if response.status_code != 200:
-                raise Exception(f"Failed to fetch transactions: {response.text}")
-                
-            data = response.json()
-            return data["results"]
+                raise Exception(f"Failed to fetch transactions (page {page}): {response.text}")
+            return response.json()
+
+        try:
+            async for page in iter_pages(fetch_page, max_parallel):
+                yield page
         except Exception as e:
             print(f"[Pluggy] Erro ao buscar transações: {e}")
             raise
 
+    async def get_transactions(
+        self,
+        account_id: str,
+        from_date: Optional[str] = None,
+        to_date: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetches all transactions for a specific account (every page).
+        """
+        transactions: List[Dict[str, Any]] = []
+        async for page in self.iter_transaction_pages(account_id, from_date, to_date):
+            transactions.extend(page)
+        return transactions
+
     async def get_accounts(self, item_id: str) -> List[Dict[str, Any]]:
         """
         Fetches accounts for a specific item (connection).
         """
-        api_key = await self._get_auth_token()
-        
         try:
-            response = self._session.get(
-                f"{self.BASE_URL}/accounts",
-                headers={"X-API-KEY": api_key},
-                params={"itemId": item_id},
-                timeout=30,
-                verify=True
+            response = await self._authorized_request(
+                "GET",
+                "/accounts",
+                params={"itemId": item_id}
             )
-            
+
             if response.status_code != 200:
                 raise Exception(f"Failed to fetch accounts: {response.text}")
-                
+
             data = response.json()
             return data["results"]
         except Exception as e:
@@ -0,0 +1,114 @@
+"""
+Pluggy Webhooks - Ingestão de Eventos de Item e Transações
+A Pluggy avisa quando um item sincronizou (item/updated) ou quando chegaram
+transações novas numa conta (transactions/created). Cada entrega aceita:
+
+1. tem o segredo conferido: a Pluggy não assina o corpo, mas reenvia em
+   toda entrega os headers cadastrados no webhook (POST /webhooks, campo
+   `headers`); cadastramos SECRET_HEADER com o segredo compartilhado
+2. é registrada em webhook_eventos; reentregas do mesmo eventId param aqui
+3. vira um sync.account para cada conta afetada, e a resposta sai na hora
+
+O sync em si é o mesmo do agendador (marca d'água, orçamento do provider,
+histórico de execuções); o webhook só antecipa a vez da conta.
+
+O registro só precisa durar a janela de reentrega da Pluggy: a task
+webhooks.purge_events apaga o que passou dela (idx_webhook_eventos_recebido_em).
+"""
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field, ConfigDict
+from app.services.sync_scheduler import ScheduledAccount, ACCOUNTS_TABLE
+
+PROVIDER = "pluggy"
+EVENTS_TABLE = "webhook_eventos"
+SECRET_HEADER = "X-Webhook-Secret"
+SUPPORTED_EVENTS = {"item/updated", "transactions/created"}
+
+class InvalidWebhookSecretError(Exception):
+    """Entrega sem o segredo, com segredo errado ou sem segredo configurado"""
+    pass
+
+def verify_secret(provided: Optional[str], secret: str):
+    """Compara o header com o segredo em tempo constante"""
+    if not secret:
+        raise InvalidWebhookSecretError("Segredo do webhook não configurado")
+    if not provided:
+        raise InvalidWebhookSecretError("Segredo ausente")
+    if not hmac.compare_digest(provided.encode(), secret.encode()):
+        raise InvalidWebhookSecretError("Segredo inválido")
+
+class PluggyWebhookEvent(BaseModel):
+    """Corpo de um webhook da Pluggy (campos em camelCase no JSON)"""
+    model_config = ConfigDict(populate_by_name=True, extra="allow")
+
+    event: str
+    event_id: Optional[str] = Field(default=None, alias="eventId")
+    item_id: Optional[str] = Field(default=None, alias="itemId")
+    account_id: Optional[str] = Field(default=None, alias="accountId")
+
+def parse_event(body: bytes) -> PluggyWebhookEvent:
+    event = PluggyWebhookEvent.model_validate(json.loads(body))
+    if not event.event_id:
+        # Sem eventId, o próprio corpo identifica a entrega (reentrega é byte a byte igual)
+        event.event_id = "sha256:" + hashlib.sha256(body).hexdigest()
+    return event
+
+class PluggyWebhookService:
+    """Deduplicação das entregas e resolução das contas afetadas"""
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def register(self, event: PluggyWebhookEvent) -> bool:
+        """Grava a entrega; False se o eventId já tinha sido aceito"""
+        row = {
+            "provider": PROVIDER,
+            "evento_id": event.event_id,
+            "evento": event.event,
+            "item_id": event.item_id,
+            "conta_id": event.account_id,
+            "payload": event.model_dump(mode="json", by_alias=True),
+            "recebido_em": datetime.now().isoformat(),
+        }
+        inserted = self.supabase.table(EVENTS_TABLE).upsert(
+            row, on_conflict="provider,evento_id", ignore_duplicates=True
+        ).execute().data
+        return bool(inserted)
+
+    def forget(self, event: PluggyWebhookEvent):
+        """Desfaz o registro quando o enfileiramento falha (a reentrega da Pluggy tenta de novo)"""
+        self.supabase.table(EVENTS_TABLE).delete().eq(
+            "provider", PROVIDER
+        ).eq("evento_id", event.event_id).execute()
+
+    def purge(self, retention: timedelta) -> int:
+        """Apaga as entregas recebidas antes da retenção; devolve quantas"""
+        cutoff = (datetime.now() - retention).isoformat()
+        deleted = self.supabase.table(EVENTS_TABLE).delete().eq(
+            "provider", PROVIDER
+        ).lt("recebido_em", cutoff).execute().data
+        return len(deleted or [])
+
+    def affected_accounts(self, event: PluggyWebhookEvent) -> List[ScheduledAccount]:
+        if event.event not in SUPPORTED_EVENTS:
+            return []
+
+        query = self.supabase.table(ACCOUNTS_TABLE).select(
+            "id, condominio_id, pluggy_account_id"
+        ).eq("ativo", True)
+        if event.event == "transactions/created" and event.account_id:
+            query = query.eq("pluggy_account_id", event.account_id)
+        elif event.item_id:
+            query = query.eq("pluggy_item_id", event.item_id)
+        else:
+            return []
+
+        rows: List[Dict[str, Any]] = query.execute().data or []
+        return [
+            ScheduledAccount(id=row["id"], conta_id=row["pluggy_account_id"], condominio_id=row.get("condominio_id"))
+            for row in rows if row.get("pluggy_account_id")
+        ]
@@ -0,0 +1,297 @@
+"""
+Queue Events - Barramento Pub/Sub da Fila de Reconciliação
+Eventos incrementais (insert/update/remove) publicados pelos fluxos de
+aprovação, rejeição, upload e auto-conciliação, consumidos pelo endpoint
+SSE. Cada cliente tem um buffer limitado: um cliente lento nunca segura
+os publicadores nem cresce a memória do worker.
+
+Um barramento por processo. Com Redis configurado (QUEUE_EVENTS_REDIS_URL,
+ou o broker do Celery), cada evento também vai para um canal pub/sub: os
+publicados por tasks Celery (conciliação, recálculo de prioridades) chegam
+aos clientes SSE de todos os workers da API, que descartam o cache de
+páginas ao recebê-los. Sem Redis, o escopo é o processo.
+
+Ids dos eventos: "<época>-<seq>", com a época sorteada por barramento.
+Cada worker numera os eventos (inclusive os repassados) à sua maneira,
+então um Last-Event-ID de outra época (outro worker, atrás do balanceador,
+ou processo reiniciado) recebe "resync" em vez de eventos trocados.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, Set, Deque, List, Callable, Tuple
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ("insert", "update", "remove", "resync")
+
+RELAY_CHANNEL = "fila_reconciliacao:eventos"
+RELAY_RECONNECT_SECONDS = 5
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """"<época>-<seq>" -> (época, seq); None se malformado"""
+    epoch, _, seq = (event_id or "").rpartition("-")
+    if not epoch or not seq.isdigit():
+        return None
+    return epoch, int(seq)
+
+class QueueEvent(BaseModel):
+    """Evento da fila (id "<época>-<seq>" do worker, usado como Last-Event-ID)"""
+    id: str
+    type: str  # "insert", "update", "remove" ou "resync"
+    comprovante_id: Optional[str] = None
+    item: Dict[str, Any] = {}
+    at: datetime
+
+    def to_sse(self) -> str:
+        payload = json.dumps(self.model_dump(mode="json"), ensure_ascii=False)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+class QueueSubscription:
+    """
+    Buffer de um cliente.
+
+    Ao encher, o buffer é descartado e o cliente recebe um único "resync"
+    (deve recarregar a fila pelo GET paginado) em vez de bloquear quem publica.
+    """
+
+    def __init__(self, bus: "QueueEventBus", max_buffer: int):
+        self.bus = bus
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self.overflowed = False
+        self.dropped = 0
+
+    def offer(self, event: QueueEvent):
+        if self.overflowed:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(self.bus.resync_event())
+            self.overflowed = True
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[QueueEvent]:
+        """Próximo evento; None se o timeout expirar (hora do heartbeat)"""
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event.type == "resync":
+            self.overflowed = False
+        return event
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+class QueueEventBus:
+    """
+    Pub/sub em memória.
+
+    - publish() nunca bloqueia; pode ser chamado de qualquer thread
+      (tasks Celery em modo eager, BackgroundTasks)
+    - Histórico curto em anel para retomar conexões via Last-Event-ID
+    """
+
+    DEFAULT_BUFFER = 100
+    HISTORY_SIZE = 500
+
+    def __init__(
+        self,
+        max_buffer: int = DEFAULT_BUFFER,
+        history_size: int = HISTORY_SIZE,
+        relay: Optional["QueueEventRelay"] = None
+    ):
+        self.max_buffer = max_buffer
+        self.relay = relay
+        self._subscribers: Set[QueueSubscription] = set()
+        self._history: Deque[Tuple[int, QueueEvent]] = deque(maxlen=history_size)
+        self._sequence = itertools.count(1)
+        self.epoch = uuid.uuid4().hex[:12]
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> QueueSubscription:
+        """
+        Registra um cliente (chamar dentro do event loop).
+        Com last_event_id, reenvia o que ele perdeu, ou "resync" se já saiu
+        do histórico ou é de outra época (outro worker/processo reiniciado).
+        """
+        subscription = QueueSubscription(self, self.max_buffer)
+
+        if last_event_id is not None:
+            parsed = parse_event_id(last_event_id)
+            oldest = self._history[0][0] if self._history else 1
+            latest = self._history[-1][0] if self._history else 0
+            if parsed is None or parsed[0] != self.epoch or not oldest - 1 <= parsed[1] <= latest:
+                subscription.offer(self.resync_event())
+            else:
+                for seq, event in self._history:
+                    if seq > parsed[1]:
+                        subscription.offer(event)
+
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: QueueSubscription):
+        self._subscribers.discard(subscription)
+
+    def resync_event(self) -> QueueEvent:
+        seq = self._history[-1][0] if self._history else 0
+        return QueueEvent(id=f"{self.epoch}-{seq}", type="resync", at=datetime.now())
+
+    def publish(
+        self,
+        event_type: str,
+        comprovante_id: Optional[str] = None,
+        item: Optional[Dict[str, Any]] = None,
+        relay: bool = True
+    ) -> QueueEvent:
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Tipo de evento inválido: {event_type}")
+
+        seq = next(self._sequence)
+        event = QueueEvent(
+            id=f"{self.epoch}-{seq}",
+            type=event_type,
+            comprovante_id=comprovante_id,
+            item=item or {},
+            at=datetime.now()
+        )
+        self._history.append((seq, event))
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        for subscription in list(self._subscribers):
+            if subscription.loop is current_loop:
+                subscription.offer(event)
+            elif not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+
+        if relay and self.relay is not None:
+            self.relay.send(event)
+        return event
+
+    def publish_many(self, event_type: str, comprovante_ids: List[str], relay: bool = True):
+        """Um evento por comprovante; para os outros processos vai uma mensagem só"""
+        for comprovante_id in comprovante_ids:
+            self.publish(event_type, comprovante_id=comprovante_id, relay=False)
+        if relay and self.relay is not None and comprovante_ids:
+            self.relay.send_many(event_type, comprovante_ids)
+
+class QueueEventRelay:
+    """
+    Repasse dos eventos entre processos por Redis pub/sub.
+
+    - send(): PUBLISH no canal; dentro de um event loop vai para uma thread
+      própria (uma só, para manter a ordem), e o publish() do barramento
+      continua sem bloquear
+    - listen(): roda no event loop da API; cada mensagem de outro processo
+      chama on_remote (descartar o cache de páginas) e é entregue aos
+      assinantes locais. Ao reconectar, manda "resync": o que passou no
+      canal enquanto estava fora se perdeu
+    Mensagens do próprio processo são ignoradas (já foram entregues).
+    """
+
+    def __init__(self, url: str, channel: str = RELAY_CHANNEL):
+        self.url = url
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._client = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["QueueEventRelay"]:
+        url = os.getenv("QUEUE_EVENTS_REDIS_URL") or os.getenv("CELERY_BROKER_URL", "")
+        return cls(url) if url.startswith(("redis://", "rediss://")) else None
+
+    def encode(self, event: QueueEvent) -> str:
+        payload = event.model_dump(mode="json", include={"type", "comprovante_id", "item"})
+        payload["origin"] = self.origin
+        return json.dumps(payload, ensure_ascii=False)
+
+    def send(self, event: QueueEvent):
+        self._dispatch(self.encode(event))
+
+    def send_many(self, event_type: str, comprovante_ids: List[str]):
+        """Lote (ex.: "remove" dos comprovantes fechados por apply_links) num único PUBLISH"""
+        self._dispatch(json.dumps({"origin": self.origin, "type": event_type, "comprovante_ids": list(comprovante_ids)}))
+
+    def _dispatch(self, message: str):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._publish(message)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="queue-relay")
+            loop.run_in_executor(self._executor, self._publish, message)
+
+    def _publish(self, message: str):
+        import redis
+
+        try:
+            if self._client is None:
+                self._client = redis.from_url(self.url, socket_timeout=1)
+            self._client.publish(self.channel, message)
+        except (redis.RedisError, ValueError) as e:
+            logger.warning(f"⚠️ Evento da fila não repassado aos outros processos: {e}")
+
+    def deliver(self, bus: QueueEventBus, message: Any, on_remote: Callable[[], None]) -> bool:
+        """Entrega uma mensagem do canal aos assinantes locais; False se for do próprio processo"""
+        data = json.loads(message)
+        if data.get("origin") == self.origin:
+            return False
+        on_remote()
+        if "comprovante_ids" in data:
+            bus.publish_many(data["type"], data["comprovante_ids"], relay=False)
+        else:
+            bus.publish(data["type"], data.get("comprovante_id"), data.get("item"), relay=False)
+        return True
+
+    async def listen(self, bus: QueueEventBus, on_remote: Callable[[], None]):
+        import redis.asyncio as aioredis
+        from redis.exceptions import RedisError
+
+        reconnecting = False
+        while True:
+            client = aioredis.from_url(self.url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                if reconnecting:
+                    on_remote()
+                    bus.publish("resync", relay=False)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        self.deliver(bus, message["data"], on_remote)
+                    except (ValueError, KeyError) as e:
+                        logger.warning(f"⚠️ Evento da fila inválido no canal {self.channel}: {e}")
+            except (RedisError, OSError) as e:
+                logger.warning(f"⚠️ Canal de eventos da fila indisponível ({e}); reconectando em {RELAY_RECONNECT_SECONDS}s")
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+            reconnecting = True
+            await asyncio.sleep(RELAY_RECONNECT_SECONDS)
+
+# Barramento do processo
+queue_event_bus = QueueEventBus(relay=QueueEventRelay.from_env())
@@ -0,0 +1,157 @@
+"""
+Queue Priority - Prioridade Composta da Fila de Reconciliação
+Score 0-1000 gravado em fila_reconciliacao.prioridade (coluna do índice
+keyset da fila). Calculado na inserção do item e recalculado em lote por
+um job periódico (a componente de idade muda com o tempo); a leitura da
+fila nunca calcula nada.
+"""
+import math
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel
+from app.services.matching_rules import get_matching_rules
+from app.services.reconciliation_queue import ReconciliationQueueService
+from app.services.queue_events import queue_event_bus
+
+UPDATE_PRIORITIES_RPC = "atualizar_prioridades_fila"
+OPEN_STATUSES = ["pendente", "em_revisao"]
+DEFAULT_BATCH_SIZE = 500
+
+# Pesos (somam 1000)
+AMOUNT_WEIGHT = 250            # Valor em escala log até AMOUNT_CAP
+FRAUD_WEIGHT = 300             # fraud_score 0-100
+AGE_WEIGHT = 200               # Por SLA decorrido...
+AGE_CAP = 1.5                  # ...até 1,5× o SLA (300 pontos)
+AMBIGUITY_WEIGHT = 150         # Top-2 dos matches sugeridos empatados
+
+AMOUNT_CAP = 100_000           # R$ a partir do qual o valor não pesa mais
+
+# Suspeita de fraude (mesmo corte que marca o comprovante como 'suspeito'):
+# o score vai para a faixa acima do máximo de um item comum
+FRAUD_SUSPECT_SCORE = 70
+SUSPECT_FLOOR = AMOUNT_WEIGHT + AGE_WEIGHT * AGE_CAP + AMBIGUITY_WEIGHT     # 700
+
+class QueueRescoreReport(BaseModel):
+    """Resumo de um recálculo de prioridades"""
+    avaliados: int = 0
+    atualizados: int = 0
+    lotes: int = 0
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def match_ambiguity(matches: Optional[List[Dict[str, Any]]]) -> float:
+    """0 = um candidato claro (ou nenhum), 1 = os dois melhores empatados"""
+    scores = sorted((float(Decimal(str(m.get("match_score") or 0))) for m in matches or []), reverse=True)
+    if len(scores) < 2:
+        return 0.0
+    return max(0.0, 1 - (scores[0] - scores[1]) / 100)
+
+def compute_priority(
+    valor: Any = None,
+    fraud_score: Any = None,
+    criado_em: Any = None,
+    matches: Optional[List[Dict[str, Any]]] = None,
+    sla_hours: int = 72,
+    now: Optional[datetime] = None
+) -> int:
+    """
+    Prioridade composta (0-1000, maior = mais urgente):
+    - Valor: log10, para R$ 100 e R$ 100.000 não ficarem a 1000× de distância
+    - Fraude: proporcional ao fraud_score
+    - Idade: fração do SLA do condomínio já decorrida (passa do peso cheio se vencido)
+    - Ambiguidade: quanto mais próximos os dois melhores matches, mais urgente
+    Suspeita de fraude (fraud_score > FRAUD_SUSPECT_SCORE) fica acima de
+    qualquer item comum: o score é reescalado para SUSPECT_FLOOR-1000,
+    mantendo a ordem entre as suspeitas.
+    """
+    amount = float(valor or 0)
+    amount_part = AMOUNT_WEIGHT * min(1.0, math.log10(1 + max(amount, 0)) / math.log10(1 + AMOUNT_CAP))
+
+    fraud_part = FRAUD_WEIGHT * min(max(float(fraud_score or 0), 0.0), 100.0) / 100
+
+    age_part = 0.0
+    created = _parse_datetime(criado_em)
+    if created and sla_hours > 0:
+        elapsed_hours = ((now or datetime.now(timezone.utc)) - created).total_seconds() / 3600
+        age_part = AGE_WEIGHT * min(max(elapsed_hours / sla_hours, 0.0), AGE_CAP)
+
+    ambiguity_part = AMBIGUITY_WEIGHT * match_ambiguity(matches)
+
+    total = amount_part + fraud_part + age_part + ambiguity_part
+    if float(fraud_score or 0) > FRAUD_SUSPECT_SCORE:
+        total = SUSPECT_FLOOR + (1000 - SUSPECT_FLOOR) * total / 1000
+    return int(round(total))
+
+class QueuePriorityService:
+    """
+    Recálculo em lote das prioridades da fila.
+
+    Varre os itens em aberto por id (keyset), calcula o score com as regras
+    (SLA) de cada condomínio e grava só os que mudaram, num UPDATE por lote
+    (atualizar_prioridades_fila). Como a ordem da fila muda, invalida o
+    cache de páginas e manda os clientes recarregarem; rodando no Celery,
+    o "resync" chega aos workers da API pelo canal Redis do barramento
+    (QueueEventRelay), que também descartam o cache deles.
+    """
+
+    TABLE = "fila_reconciliacao"
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def score_item(self, item: Dict[str, Any], now: Optional[datetime] = None) -> int:
+        receipt = item.get("comprovante") or {}
+        rules = get_matching_rules(receipt.get("condominio_id"), self.supabase)
+        return compute_priority(
+            valor=receipt.get("ocr_valor"),
+            fraud_score=receipt.get("fraud_score"),
+            criado_em=item.get("criado_em"),
+            matches=item.get("matches_sugeridos"),
+            sla_hours=rules.review_sla_hours,
+            now=now
+        )
+
+    def rescore(self, batch_size: int = DEFAULT_BATCH_SIZE, now: Optional[datetime] = None) -> QueueRescoreReport:
+        report = QueueRescoreReport()
+        now = now or datetime.now(timezone.utc)
+        last_id: Optional[str] = None
+
+        while True:
+            query = self.supabase.table(self.TABLE).select(
+                "id, prioridade, criado_em, matches_sugeridos, "
+                "comprovante:comprovantes(ocr_valor, fraud_score, condominio_id)"
+            ).in_("status", OPEN_STATUSES)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            items = query.order("id").limit(batch_size).execute().data
+            if not items:
+                break
+
+            changed = []
+            for item in items:
+                priority = self.score_item(item, now)
+                if priority != item.get("prioridade"):
+                    changed.append({"id": item["id"], "prioridade": priority})
+
+            if changed:
+                result = self.supabase.rpc(UPDATE_PRIORITIES_RPC, {"p_itens": changed}).execute()
+                report.atualizados += result.data or 0
+
+            report.avaliados += len(items)
+            report.lotes += 1
+            last_id = items[-1]["id"]
+            if len(items) < batch_size:
+                break
+
+        if report.atualizados:
+            ReconciliationQueueService.invalidate()
+            queue_event_bus.publish("resync")
+        return report
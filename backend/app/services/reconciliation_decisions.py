@@ -0,0 +1,81 @@
+"""
+Reconciliation Decisions - Aprovação/Rejeição em Lote
+Todas as decisões de um lote vão numa única RPC transacional
+(comprovantes + transações + fila + trilha de auditoria), em vez de
+três chamadas PostgREST sem atomicidade por item.
+"""
+from typing import List, Dict, Any
+from app.services.reconciliation_queue import ReconciliationQueueService
+from app.services.queue_events import queue_event_bus
+from app.services.metrics import RECONCILED_TOTAL
+from app.services.tenant_scope import require_tenant
+
+DECISION_RPC = "decidir_conciliacoes_em_lote"
+
+class ReconciliationDecisionService:
+    """
+    Aplica decisões de revisão.
+
+    Itens inválidos (comprovante já decidido, transação já conciliada,
+    duplicados no lote) não abortam o lote: voltam com o motivo em
+    `resultado` e os demais são aplicados.
+    """
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def approve(self, approvals: List[Dict[str, Any]], condominio_id: str) -> Dict[str, Any]:
+        return self.apply([
+            {
+                "comprovante_id": item["comprovante_id"],
+                "transacao_id": item["transacao_id"],
+                "decisao": "aprovar",
+                "motivo_decisao": item.get("motivo_decisao")
+            }
+            for item in approvals
+        ], condominio_id)
+
+    def reject(self, rejections: List[Dict[str, Any]], condominio_id: str) -> Dict[str, Any]:
+        return self.apply([
+            {
+                "comprovante_id": item["comprovante_id"],
+                "transacao_id": None,
+                "decisao": "rejeitar",
+                "motivo_decisao": item.get("motivo_decisao")
+            }
+            for item in rejections
+        ], condominio_id)
+
+    def apply(self, decisions: List[Dict[str, Any]], condominio_id: str) -> Dict[str, Any]:
+        """
+        Args:
+            condominio_id: Condomínio do lote (obrigatório: p_condominio_id
+                nulo não restringe); itens de outro condomínio voltam como
+                inexistentes
+
+        Returns:
+            {"lote_id", "aplicados", "ignorados", "resultados": [...]} (resultados na ordem de entrada)
+        """
+        data = self.supabase.rpc(DECISION_RPC, {
+            "p_decisoes": decisions,
+            "p_condominio_id": require_tenant(condominio_id)
+        }).execute().data or {}
+        resultados: List[Dict[str, Any]] = data.get("resultados") or []
+
+        applied = [r["comprovante_id"] for r in resultados if r["resultado"] == "aplicado"]
+        for decision, result in zip(decisions, resultados):
+            RECONCILED_TOTAL.inc(source="revisao", outcome=decision["decisao"] if result["resultado"] == "aplicado" else "ignorado")
+        if applied:
+            ReconciliationQueueService.invalidate()
+            queue_event_bus.publish_many("remove", applied)
+
+        skipped = len(resultados) - len(applied)
+        if skipped:
+            print(f"⚠️ [Decisões] Lote {data.get('lote_id')}: {skipped} de {len(resultados)} itens ignorados")
+
+        return {
+            "lote_id": data.get("lote_id"),
+            "aplicados": len(applied),
+            "ignorados": skipped,
+            "resultados": resultados
+        }
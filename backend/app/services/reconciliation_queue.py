@@ -0,0 +1,108 @@
+"""
+Reconciliation Queue - Fila de Revisão Paginada
+Paginação keyset em (prioridade DESC, criado_em, id), projeção de colunas
+sem campos de texto grandes e cache curto de páginas, invalidado quando
+a fila muda (aprovação, rejeição, novo item). Com condomínio informado,
+a leitura usa idx_fila_condominio_keyset (migration 017).
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from app.services.tenant_scope import scoped
+
+# Sem ocr_texto_completo / fraud_flags: a tela da fila não usa e pesam por linha
+QUEUE_COLUMNS = "id, comprovante_id, condominio_id, prioridade, tipo, matches_sugeridos, status, criado_em, atribuido_a"
+RECEIPT_COLUMNS = "id, unidade, arquivo_nome, ocr_valor, ocr_data, ocr_nsu, fraud_score, data_envio"
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Cursor opaco com a chave de ordenação do último item da página"""
+    key = [row["prioridade"], row["criado_em"], row["id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[int, str, str]:
+    """Raises ValueError se o cursor for inválido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prioridade, criado_em, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(prioridade), str(criado_em), str(item_id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+def keyset_filter(prioridade: int, criado_em: str, item_id: str) -> str:
+    """
+    Filtro PostgREST (or=) para "depois de" (prioridade DESC, criado_em ASC, id ASC).
+    Valores entre aspas: timestamps têm ':' e '+'.
+    """
+    return (
+        f"prioridade.lt.{prioridade},"
+        f"and(prioridade.eq.{prioridade},criado_em.gt.\"{criado_em}\"),"
+        f"and(prioridade.eq.{prioridade},criado_em.eq.\"{criado_em}\",id.gt.\"{item_id}\")"
+    )
+
+class ReconciliationQueueService:
+    """
+    Leitura paginada da fila_reconciliacao.
+
+    - Keyset: cada página custa o mesmo, independente da profundidade
+    - Cache em memória com TTL curto (a fila muda com frequência)
+    - Invalidação total em qualquer alteração da fila neste worker
+    """
+
+    TABLE = "fila_reconciliacao"
+    MAX_CACHED_PAGES = 256
+
+    # Cache em memória (compartilhado pelo processo)
+    _cache: Dict[Tuple, Dict[str, Any]] = {}
+    _cache_ttl = timedelta(seconds=15)
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def get_page(
+        self,
+        condominio_id: str,
+        status: str = "pendente",
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            condominio_id: Fila do condomínio (obrigatório)
+
+        Returns:
+            {"items": [...], "next_cursor": str ou None}
+        """
+        key = (condominio_id, status, limit, cursor)
+        cached = self._cache.get(key)
+        if cached and datetime.now() - cached["cached_at"] < self._cache_ttl:
+            return cached["page"]
+
+        query = scoped(self.supabase.table(self.TABLE).select(
+            f"{QUEUE_COLUMNS}, comprovante:comprovantes({RECEIPT_COLUMNS})"
+        ), condominio_id).eq("status", status)
+
+        if cursor:
+            query = query.or_(keyset_filter(*decode_cursor(cursor)))
+
+        # Um item a mais só para saber se existe próxima página
+        rows = query.order("prioridade", desc=True).order("criado_em").order("id").limit(limit + 1).execute().data
+
+        items: List[Dict[str, Any]] = rows[:limit]
+        for item in items:
+            item["matches_sugeridos"] = item.get("matches_sugeridos") or []
+
+        page = {
+            "items": items,
+            "next_cursor": encode_cursor(items[-1]) if len(rows) > limit else None
+        }
+
+        if len(self._cache) >= self.MAX_CACHED_PAGES:
+            self._cache.clear()
+        self._cache[key] = {"page": page, "cached_at": datetime.now()}
+        return page
+
+    @classmethod
+    def invalidate(cls):
+        """Descarta as páginas cacheadas (a ordem de todas pode ter mudado)"""
+        cls._cache.clear()
@@ -0,0 +1,127 @@
+"""
+Refund Detector - Detecção Indexada de Estornos
+Indexa débitos por (valor absoluto em centavos, documento) e processa
+todos os créditos de um extrato em uma única passada.
+"""
+from bisect import bisect_right
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import date
+from pydantic import BaseModel
+from app.services.matching_rules import to_cents
+
+# Palavras-chave que identificam estorno explícito na descrição
+REFUND_KEYWORDS = ["ESTORNO", "DEVOLUCAO", "CANCELAMENTO", "REEMBOLSO", "ESTORNADO"]
+
+class RefundLink(BaseModel):
+    """Vínculo entre um crédito e o débito que ele estorna"""
+    credit_id: str
+    is_refund: bool
+    reason: Optional[str] = None
+    debit_id: Optional[str] = None
+    method: Optional[str] = None  # "keyword", "debit_match"
+
+def clean_document(doc: Optional[str]) -> str:
+    """Remove formatação de CPF/CNPJ"""
+    return ''.join(filter(str.isdigit, doc or ""))
+
+def parse_date(date_str: Optional[str]) -> Optional[date]:
+    """Parse date from string (aceita 'YYYY-MM-DD' ou ISO com hora)"""
+    try:
+        return date.fromisoformat(date_str.split('T')[0])
+    except Exception:
+        return None
+
+class RefundIndex:
+    """
+    Índice de débitos para detecção de estornos.
+
+    Chave: (valor absoluto em centavos, documento limpo)
+    Valor: lista ordenada por data de (ordinal da data, id do débito)
+
+    Construção O(D log D), consulta O(log k) por crédito.
+    """
+
+    def __init__(self, historical_debits: List[Dict[str, Any]]):
+        self._index: Dict[Tuple[int, str], List[Tuple[int, str]]] = {}
+
+        for debit in historical_debits:
+            # Débitos sem documento não são indexados (match só por valor é arriscado)
+            debit_doc = clean_document(debit.get("payer_document") or debit.get("receiver_document"))
+            debit_date = parse_date(debit.get("date"))
+            if not debit_doc or not debit_date:
+                continue
+
+            key = (abs(to_cents(debit.get("amount", 0))), debit_doc)
+            self._index.setdefault(key, []).append((debit_date.toordinal(), str(debit.get("id"))))
+
+        for entries in self._index.values():
+            entries.sort()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._index.values())
+
+    def find_debit(self, amount_cents: int, document: str, credit_date: date) -> Optional[str]:
+        """
+        Retorna o ID do débito mais recente com mesmo valor e documento
+        ocorrido ATÉ a data do crédito (inclusive).
+        """
+        entries = self._index.get((amount_cents, document))
+        if not entries:
+            return None
+
+        # Último débito com data <= data do crédito
+        pos = bisect_right(entries, credit_date.toordinal(), key=lambda entry: entry[0])
+        if pos == 0:
+            return None
+        return entries[pos - 1][1]
+
+class RefundDetector:
+    """
+    Detecta estornos para um extrato inteiro de uma vez.
+
+    Regras (mesmas de RobustValidator.detect_refund):
+    1. Descrição contém palavras-chave de estorno.
+    2. Valor idêntico a um débito anterior ou do mesmo dia.
+    3. Mesmo fornecedor/documento.
+    """
+
+    def __init__(self, historical_debits: List[Dict[str, Any]]):
+        self.index = RefundIndex(historical_debits)
+
+    def check(self, transaction: Dict[str, Any]) -> RefundLink:
+        """Verifica um único crédito contra o índice"""
+        credit_id = str(transaction.get("id", ""))
+        description = (transaction.get("description") or "").upper()
+
+        # 1. Palavras-chave
+        if any(kw in description for kw in REFUND_KEYWORDS):
+            return RefundLink(
+                credit_id=credit_id,
+                is_refund=True,
+                reason="Identificado por palavra-chave na descrição",
+                method="keyword"
+            )
+
+        # 2/3. Débito correspondente (valor idêntico, mesmo documento, data anterior)
+        credit_doc = clean_document(transaction.get("payer_document"))
+        credit_date = parse_date(transaction.get("date"))
+        if credit_doc and credit_date:
+            debit_id = self.index.find_debit(
+                to_cents(transaction.get("amount", 0)),
+                credit_doc,
+                credit_date
+            )
+            if debit_id:
+                return RefundLink(
+                    credit_id=credit_id,
+                    is_refund=True,
+                    reason=f"Estorno de transação anterior (ID: {debit_id})",
+                    debit_id=debit_id,
+                    method="debit_match"
+                )
+
+        return RefundLink(credit_id=credit_id, is_refund=False)
+
+    def detect_all(self, credits: List[Dict[str, Any]]) -> List[RefundLink]:
+        """Processa todos os créditos em uma única passada"""
+        return [self.check(tx) for tx in credits]
@@ -0,0 +1,257 @@
+"""
+Resilience - Proteção Compartilhada das Chamadas a Provedores Externos
+Estado por host, do processo, usado por request_with_retry (http_client)
+em todas as chamadas de saída (Pluggy, Belvo, CNPJ.ws, BrasilAPI):
+
+- circuit breaker: host fora do ar falha na hora, em vez de cada worker
+  esperar o próprio timeout. Conta requests lógicas (o desfecho depois dos
+  retries), não tentativas: uma falha transitória que o retry resolve não
+  soma no circuito
+- limite de concorrência adaptativo (AIMD): cresce devagar enquanto o host
+  responde bem, cai pela metade com timeout, 429 ou 5xx
+- orçamento de retries: numa janela deslizante, retries e hedges ficam
+  abaixo de BUDGET_RATIO das requests (mais um mínimo por segundo), para
+  que repetições não multipliquem a carga de um host já degradado
+- latência recente (p50/p95): o GET que passa do p95 ganha uma segunda
+  request (hedge) e vale a primeira resposta
+- health_snapshot(): estado de cada host para o dashboard (GET
+  /health/providers); contagens de retries/hedges/recusas vão para o
+  /metrics (OUTBOUND_EVENTS)
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+from app.services.circuit_breaker import CircuitBreaker, get_breaker
+
+LIMIT_INITIAL = 50
+LIMIT_MIN = 1
+LIMIT_MAX = 100                 # max_connections do pool compartilhado
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN = 1.0         # Uma redução por segundo: uma rajada de erros não zera o limite
+
+BUDGET_RATIO = 0.2
+BUDGET_MIN_PER_SECOND = 5
+BUDGET_WINDOW = 10.0
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.5
+LATENCY_SAMPLES = 200
+
+def backoff_delay(attempt: int) -> float:
+    """Exponencial com jitter total: workers que falharam juntos não repetem juntos"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** (attempt - 1))))
+
+class AdaptiveLimiter:
+    """
+    Semáforo de limite variável. O limite é do processo; quem espera é
+    acordado no próprio event loop (as tasks do Celery rodam em loops novos).
+    """
+
+    def __init__(self, initial: float = LIMIT_INITIAL, min_limit: int = LIMIT_MIN, max_limit: int = LIMIT_MAX, clock=time.monotonic):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.clock = clock
+        self.in_flight = 0
+        self._last_decrease = float("-inf")
+        self._waiters: "deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]" = deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight < int(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return True
+            return False
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = (loop, loop.create_future())
+                self._waiters.append(waiter)
+            try:
+                await waiter[1]
+            except asyncio.CancelledError:
+                with self._lock:
+                    woken = waiter not in self._waiters
+                    if not woken:
+                        self._waiters.remove(waiter)
+                if woken:
+                    self._wake(1)       # A vaga que era desta espera vai para a próxima
+                raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._wake(1)
+
+    def on_success(self):
+        """Aumento aditivo (~1 por janela de `limit` respostas), só se o limite está em uso"""
+        with self._lock:
+            if self.in_flight + 1 < int(self.limit):
+                return
+            before = int(self.limit)
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            grew = int(self.limit) - before
+        if grew:
+            self._wake(grew)
+
+    def on_overload(self):
+        with self._lock:
+            now = self.clock()
+            if now - self._last_decrease < DECREASE_COOLDOWN:
+                return
+            self._last_decrease = now
+            self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+
+    def _wake(self, count: int):
+        for _ in range(count):
+            with self._lock:
+                if not self._waiters:
+                    return
+                loop, future = self._waiters.popleft()
+            loop.call_soon_threadsafe(_resolve, future)
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class RetryBudget:
+    """Retries permitidos na janela: mínimo por segundo + fração das requests"""
+
+    def __init__(self, ratio: float = BUDGET_RATIO, min_per_second: float = BUDGET_MIN_PER_SECOND, window: float = BUDGET_WINDOW, clock=time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self.clock = clock
+        self._requests: "deque[float]" = deque()
+        self._retries: "deque[float]" = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def _allowance(self) -> float:
+        return self.min_per_second * self.window + self.ratio * len(self._requests)
+
+    def deposit(self):
+        with self._lock:
+            now = self.clock()
+            self._prune(now)
+            self._requests.append(now)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            now = self.clock()
+            self._prune(now)
+            if len(self._retries) + 1 > self._allowance():     # Cada retry custa um crédito inteiro
+                return False
+            self._retries.append(now)
+            return True
+
+    def available(self) -> int:
+        with self._lock:
+            self._prune(self.clock())
+            return max(0, int(self._allowance()) - len(self._retries))
+
+class LatencyTracker:
+    def __init__(self, size: int = LATENCY_SAMPLES):
+        self._samples: "deque[float]" = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+class HostResilience:
+    """Estado de resiliência de um host"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.breaker: CircuitBreaker = get_breaker(f"http:{host}")
+        self.limiter = AdaptiveLimiter()
+        self.budget = RetryBudget()
+        self.latency = LatencyTracker()
+
+    def record_response(self, status_code: int, seconds: float):
+        """Tentativa respondida: ajusta o limite e a latência"""
+        if status_code == 429 or status_code >= 500:
+            self.limiter.on_overload()
+        else:
+            self.latency.add(seconds)
+            self.limiter.on_success()
+
+    def record_failure(self):
+        """Tentativa sem resposta: conexão recusada, timeout, conexão derrubada"""
+        self.limiter.on_overload()
+
+    def record_outcome(self, status_code: int):
+        """Desfecho da request lógica (depois dos retries) no circuito"""
+        if status_code == 429:
+            self.breaker.release()          # Host vivo, só pedindo calma
+        elif status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Atraso até o hedge de um GET (p95 recente), ou None sem amostras suficientes"""
+        if len(self.latency) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.latency.percentile(0.95))
+
+    def snapshot(self) -> Dict[str, Any]:
+        breaker = self.breaker.snapshot()
+        p50, p95 = self.latency.percentile(0.5), self.latency.percentile(0.95)
+        return {
+            "host": self.host,
+            "circuito": breaker["state"],
+            "falhas_seguidas": breaker["failures"],
+            "limite_concorrencia": int(self.limiter.limit),
+            "em_andamento": self.limiter.in_flight,
+            "latencia_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latencia_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "orcamento_retries": self.budget.available(),
+        }
+
+_hosts: Dict[str, HostResilience] = {}
+_hosts_lock = threading.Lock()
+
+def host_state(host: str) -> HostResilience:
+    with _hosts_lock:
+        state = _hosts.get(host)
+        if state is None:
+            state = _hosts[host] = HostResilience(host)
+        return state
+
+def health_snapshot() -> List[Dict[str, Any]]:
+    with _hosts_lock:
+        hosts = list(_hosts.values())
+    return [state.snapshot() for state in sorted(hosts, key=lambda s: s.host)]
+
+def reset_resilience():
+    """Descarta o estado dos hosts (os breakers ficam no registro de circuit_breaker)"""
+    with _hosts_lock:
+        _hosts.clear()
@@ -1,6 +1,6 @@
-import httpx
 from typing import Dict, Any, Optional
 from app.core.config import get_settings
+from app.services.http_client import request_with_retry
 
 settings = get_settings()
 
@@ -22,17 +22,17 @@ class RFBValidator:
             # Mock behavior
             return self._mock_validation(cnpj)
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/cnpj/{cnpj}",
-                    headers={"Authorization": f"Bearer {self.api_key}"}
-                )
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                print(f"API Error: {e}")
-                return self._mock_validation(cnpj)
+        try:
+            response = await request_with_retry(
+                "GET",
+                f"{self.base_url}/cnpj/{cnpj}",
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            print(f"API Error: {e}")
+            return self._mock_validation(cnpj)
 
     def _mock_validation(self, cnpj: str) -> Dict[str, Any]:
         """Mock validation for development without API keys"""
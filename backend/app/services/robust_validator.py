@@ -6,46 +6,29 @@ from typing import List, Dict, Any, Optional, Tuple
 from decimal import Decimal
 from datetime import date, datetime, timedelta
 from pydantic import BaseModel
+from app.services.refund_detector import RefundDetector, RefundLink
+from app.services.cnae.index import get_cnae_index, normalize_text
+from app.services.matching_rules import CompiledRuleSet, DEFAULT_PROFILE, DEFAULT_RULES, to_cents
+from app.services.timestamp_index import TimestampIndex
+from app.services.metrics import stage, timed
 
 class ValidationConfig:
-    """Configurações de validação"""
+    """
+    Configurações de validação.
+    Tolerâncias padrão vêm do perfil default de regras de matching
+    (ver app.services.matching_rules para regras por condomínio).
+    """
     # Tolerância de valor (R$ 0,05)
-    VALUE_TOLERANCE = Decimal("0.05")
+    VALUE_TOLERANCE = DEFAULT_PROFILE.value_tolerance
     
     # Tolerância de data (2 dias)
-    DATE_TOLERANCE_DAYS = 2
+    DATE_TOLERANCE_DAYS = DEFAULT_PROFILE.date_tolerance_days
     
     # Tolerância de timestamp (30 minutos)
-    TIMESTAMP_TOLERANCE_MINUTES = 30
+    TIMESTAMP_TOLERANCE_MINUTES = DEFAULT_PROFILE.timestamp_tolerance_minutes
     
     # Taxas comuns de boleto
-    COMMON_FEES = [
-        Decimal("2.50"),   # Taxa padrão
-        Decimal("3.00"),
-        Decimal("1.50"),
-        Decimal("5.00"),
-    ]
-    
-    # Mapeamento Serviço → CNAEs permitidos
-    SERVICE_CNAE_MAP = {
-        "jardinagem": ["8130300", "8130-3/00"],
-        "paisagismo": ["8130300", "8130-3/00"],
-        "limpeza": ["8121400", "8121-4/00", "8129000"],
-        "conservacao": ["8121400", "8121-4/00"],
-        "seguranca": ["8011101", "8011-1/01", "8011102"],
-        "vigilancia": ["8011101", "8011-1/01"],
-        "portaria": ["8011101", "8011-1/01"],
-        "elevador": ["4329104", "4329-1/04"],
-        "manutencao_elevador": ["4329104", "4329-1/04"],
-        "eletrica": ["4321500", "4321-5/00"],
-        "instalacao_eletrica": ["4321500", "4321-5/00"],
-        "hidraulica": ["4322301", "4322-3/01", "4322302"],
-        "encanamento": ["4322301", "4322-3/01"],
-        "pintura": ["4330404", "4330-4/04", "4330405"],
-        "reforma": ["4330404", "4330-4/04"],
-        "construcao": ["4120400", "4120-4/00"],
-        "obra": ["4120400", "4120-4/00"],
-    }
+    COMMON_FEES = DEFAULT_PROFILE.common_fees
 
 class TransactionMatch(BaseModel):
     """Resultado de match de transação"""
@@ -87,14 +70,21 @@ class RobustValidator:
     Objetivo: <0.5% casos manuais
     """
     
-    def __init__(self, claimed_transactions: Optional[Dict[str, Dict]] = None):
+    def __init__(
+        self,
+        claimed_transactions: Optional[Dict[str, Dict]] = None,
+        rules: Optional[CompiledRuleSet] = None
+    ):
         """
         Args:
             claimed_transactions: Dict de transações já reivindicadas
                 {transaction_id: {claimed_by, claimed_at}}
+            rules: Regras de matching compiladas do condomínio (padrão se omitido)
         """
         self.claimed_transactions = claimed_transactions or {}
+        self.rules = rules or DEFAULT_RULES
     
+    @timed("validate_payment")
     def validate_payment(
         self,
         receipt_amount: Decimal,
@@ -121,22 +111,23 @@ class RobustValidator:
         matches = []
         
         # PASSO 1: Buscar matches potenciais
-        for tx in transactions:
-            match = self._check_transaction_match(
-                receipt_amount=receipt_amount,
-                receipt_date=receipt_date,
-                payer_cpf=payer_cpf,
-                transaction=tx
-            )
-            
-            if match:
-                # Verificar se transação já foi reivindicada
-                if match.transaction_id in self.claimed_transactions:
-                    claim_info = self.claimed_transactions[match.transaction_id]
-                    match.claimed_by = claim_info.get("claimed_by")
-                    match.claimed_at = claim_info.get("claimed_at")
+        with stage("candidate_search"):
+            for tx in transactions:
+                match = self._check_transaction_match(
+                    receipt_amount=receipt_amount,
+                    receipt_date=receipt_date,
+                    payer_cpf=payer_cpf,
+                    transaction=tx
+                )
                 
-                matches.append(match)
+                if match:
+                    # Verificar se transação já foi reivindicada
+                    if match.transaction_id in self.claimed_transactions:
+                        claim_info = self.claimed_transactions[match.transaction_id]
+                        match.claimed_by = claim_info.get("claimed_by")
+                        match.claimed_at = claim_info.get("claimed_at")
+                    
+                    matches.append(match)
         
         # PASSO 2: Analisar resultados
         if len(matches) == 0:
@@ -191,6 +182,7 @@ class RobustValidator:
                 receipt_id=receipt_id
             )
     
+    @timed("cascade_resolution")
     def _resolve_ambiguity_cascade(
         self,
         matches: List[TransactionMatch],
@@ -239,32 +231,20 @@ class RobustValidator:
         
         # NÍVEL 2: Match por Timestamp (±30min)
         if receipt_timestamp:
-            matches_with_timestamp = []
-            
-            for match in matches:
-                if match.timestamp and not match.claimed_by:
-                    time_diff = abs((match.timestamp - receipt_timestamp).total_seconds() / 60)
-                    
-                    if time_diff <= ValidationConfig.TIMESTAMP_TOLERANCE_MINUTES:
-                        match.match_level = "timestamp"
-                        match.match_score += 10  # Bonus por timestamp
-                        matches_with_timestamp.append((match, time_diff))
+            # Vizinho mais próximo via índice ordenado (bisect), sem ordenar todos os candidatos
+            nearest = TimestampIndex(matches).nearest(
+                receipt_timestamp,
+                self.rules.timestamp_tolerance_seconds,
+                is_available=lambda m: not m.claimed_by
+            )
             
-            if matches_with_timestamp:
-                # Pegar o match com menor diferença de tempo
-                matches_with_timestamp.sort(key=lambda x: x[1])
-                best_match = matches_with_timestamp[0][0]
+            if nearest:
+                best_match, time_diff_seconds = nearest
                 
                 # Reivindicar transação
                 self._claim_transaction(best_match.transaction_id, receipt_id)
                 
-                return ValidationResult(
-                    status="APPROVED",
-                    matches=[best_match],
-                    reason=f"Pagamento confirmado por timestamp (diferença: {matches_with_timestamp[0][1]:.0f}min) (Nível 2)",
-                    resolution_level="level_2_timestamp",
-                    requires_manual_review=False
-                )
+                return self._timestamp_result(best_match, time_diff_seconds)
         
         # NÍVEL 3: FIFO (First In First Out)
         # Verificar se alguma transação ainda não foi reivindicada
@@ -272,7 +252,8 @@ class RobustValidator:
         
         if unclaimed_matches:
             # Pegar a primeira transação não reivindicada (ordem cronológica)
-            unclaimed_matches.sort(key=lambda m: m.timestamp or m.date)
+            # Data primeiro: misturar datetime e date na mesma chave quebra a ordenação
+            unclaimed_matches.sort(key=lambda m: (m.date, m.timestamp.timestamp() if m.timestamp else 0))
             first_unclaimed = unclaimed_matches[0]
             first_unclaimed.match_level = "fifo"
             
@@ -310,6 +291,55 @@ class RobustValidator:
             fraud_flags=["multiple_matches", "no_resolution_criteria"]
         )
     
+    def resolve_timestamps_batch(
+        self,
+        matches: List[TransactionMatch],
+        receipts: List[Tuple[str, datetime]]
+    ) -> Dict[str, Optional[ValidationResult]]:
+        """
+        Nível 2 em lote: resolve vários comprovantes contra o mesmo conjunto
+        de transações ambíguas (ex: dezenas de PIX de mesmo valor no dia)
+        numa única varredura merge-join por horário.
+        
+        Args:
+            matches: Transações candidatas (mesmo valor/janela de data)
+            receipts: Lista de (receipt_id, timestamp do comprovante)
+        
+        Returns:
+            {receipt_id: ValidationResult aprovado no Nível 2, ou None se
+            o comprovante deve seguir para os próximos níveis do cascade}
+        """
+        resolved = TimestampIndex(matches).resolve_many(
+            receipts,
+            self.rules.timestamp_tolerance_seconds,
+            is_available=lambda m: not m.claimed_by and m.transaction_id not in self.claimed_transactions
+        )
+        
+        results: Dict[str, Optional[ValidationResult]] = {}
+        for receipt_id, nearest in resolved.items():
+            if not nearest:
+                results[receipt_id] = None
+                continue
+            
+            match, time_diff_seconds = nearest
+            self._claim_transaction(match.transaction_id, receipt_id)
+            results[receipt_id] = self._timestamp_result(match, time_diff_seconds)
+        
+        return results
+    
+    def _timestamp_result(self, match: TransactionMatch, time_diff_seconds: float) -> ValidationResult:
+        """Resultado aprovado no Nível 2 (timestamp)"""
+        match.match_level = "timestamp"
+        match.match_score += 10  # Bonus por timestamp
+        
+        return ValidationResult(
+            status="APPROVED",
+            matches=[match],
+            reason=f"Pagamento confirmado por timestamp (diferença: {time_diff_seconds / 60:.0f}min) (Nível 2)",
+            resolution_level="level_2_timestamp",
+            requires_manual_review=False
+        )
+    
     def _check_transaction_match(
         self,
         receipt_amount: Decimal,
@@ -327,50 +357,37 @@ class RobustValidator:
         if not tx_date:
             return None
         
-        # Verificar data (tolerância de 2 dias)
-        date_diff = abs((tx_date - receipt_date).days)
-        if date_diff > ValidationConfig.DATE_TOLERANCE_DAYS:
+        # Verificar data (tolerância configurável, padrão 2 dias)
+        date_diff = (tx_date - receipt_date).days
+        if not self.rules.within_date_tolerance(date_diff):
             return None
         
-        # Verificar valor
-        value_diff = abs(tx_amount - receipt_amount)
+        # Verificar valor (centavos + tabela de taxas pré-compilada)
+        amount_match = self.rules.match_amount(
+            to_cents(receipt_amount),
+            to_cents(tx_amount)
+        )
+        if not amount_match:
+            return None
+        
+        match_type, fee_cents = amount_match
         
         # Parse timestamp se disponível
         tx_timestamp = self._parse_timestamp(transaction.get("timestamp"))
         
-        # Match exato
-        if value_diff <= ValidationConfig.VALUE_TOLERANCE:
-            return TransactionMatch(
-                transaction_id=transaction.get("id", ""),
-                amount=tx_amount,
-                date=tx_date,
-                timestamp=tx_timestamp,
-                description=transaction.get("description", ""),
-                payer_document=transaction.get("payer_document"),
-                match_score=100,
-                match_type="exact",
-                match_level="pending",
-                confidence="high"
-            )
-        
-        # Match com taxa de boleto
-        for fee in ValidationConfig.COMMON_FEES:
-            if abs(tx_amount - (receipt_amount - fee)) <= ValidationConfig.VALUE_TOLERANCE:
-                return TransactionMatch(
-                    transaction_id=transaction.get("id", ""),
-                    amount=tx_amount,
-                    date=tx_date,
-                    timestamp=tx_timestamp,
-                    description=transaction.get("description", ""),
-                    payer_document=transaction.get("payer_document"),
-                    match_score=90,
-                    match_type="with_fee",
-                    match_level="pending",
-                    fee_detected=fee,
-                    confidence="high"
-                )
-        
-        return None
+        return TransactionMatch(
+            transaction_id=transaction.get("id", ""),
+            amount=tx_amount,
+            date=tx_date,
+            timestamp=tx_timestamp,
+            description=transaction.get("description", ""),
+            payer_document=transaction.get("payer_document"),
+            match_score=100 if match_type == "exact" else 90,
+            match_type=match_type,
+            match_level="pending",
+            fee_detected=Decimal(fee_cents).scaleb(-2) if fee_cents is not None else None,
+            confidence="high"
+        )
     
     def _claim_transaction(self, transaction_id: str, receipt_id: str):
         """Reivindica uma transação para um comprovante"""
@@ -387,24 +404,46 @@ class RobustValidator:
     ) -> Tuple[bool, str]:
         """
         Valida se o CNAE do fornecedor é compatível com o serviço.
+        Consulta o índice CNAE (trie) em O(dígitos) por CNAE.
         """
-        service_normalized = service_type.lower().strip()
-        allowed_cnaes = ValidationConfig.SERVICE_CNAE_MAP.get(service_normalized, [])
+        service_normalized = normalize_text(service_type).strip()
+        cnae_valid, cnae_match = get_cnae_index().check_service(
+            [cnae_principal] + list(cnaes_secundarios),
+            service_normalized
+        )
+        return self._cnae_result(cnae_valid, cnae_match, cnae_principal, service_type)
+    
+    def validate_cnae_services(
+        self,
+        items: List[Tuple[str, List[str], str]]
+    ) -> List[Tuple[Optional[bool], str]]:
+        """
+        Versão em lote de validate_cnae_service para auditorias em massa.
         
-        if not allowed_cnaes:
+        Args:
+            items: Lista de (cnae_principal, cnaes_secundarios, service_type)
+        """
+        results = get_cnae_index().check_batch([
+            ([cnae_principal] + list(cnaes_secundarios), normalize_text(service_type).strip())
+            for cnae_principal, cnaes_secundarios, service_type in items
+        ])
+        return [
+            self._cnae_result(cnae_valid, cnae_match, item[0], item[2])
+            for (cnae_valid, cnae_match), item in zip(results, items)
+        ]
+    
+    def _cnae_result(
+        self,
+        cnae_valid: Optional[bool],
+        cnae_match: Optional[str],
+        cnae_principal: str,
+        service_type: str
+    ) -> Tuple[Optional[bool], str]:
+        """Monta (válido, motivo) a partir da consulta ao índice"""
+        if cnae_valid is None:
             return (None, f"Serviço '{service_type}' não mapeado. Requer validação manual.")
-        
-        cnae_principal_clean = self._clean_cnae(cnae_principal)
-        cnaes_secundarios_clean = [self._clean_cnae(c) for c in cnaes_secundarios]
-        
-        all_cnaes = [cnae_principal_clean] + cnaes_secundarios_clean
-        
-        for cnae in all_cnaes:
-            for allowed in allowed_cnaes:
-                allowed_clean = self._clean_cnae(allowed)
-                if cnae.startswith(allowed_clean[:4]):
-                    return (True, f"CNAE {cnae} compatível com serviço '{service_type}'")
-        
+        if cnae_valid:
+            return (True, f"CNAE {cnae_match} compatível com serviço '{service_type}'")
         return (False, f"CNAE {cnae_principal} NÃO é compatível com serviço '{service_type}'. Possível fraude de desvio de função.")
     
     def _parse_date(self, date_str: str) -> Optional[date]:
@@ -442,36 +481,18 @@ class RobustValidator:
         2. Valor idêntico a um débito recente (últimos 30 dias).
         3. Mesmo fornecedor/documento.
         """
-        description = transaction.get("description", "").upper()
-        amount = Decimal(str(transaction.get("amount", 0)))
-        
-        # 1. Palavras-chave
-        refund_keywords = ["ESTORNO", "DEVOLUCAO", "CANCELAMENTO", "REEMBOLSO", "ESTORNADO"]
-        is_explicit_refund = any(kw in description for kw in refund_keywords)
+        link = RefundDetector(historical_debits).check(transaction)
+        return (link.is_refund, link.reason)
+    
+    def detect_refunds(
+        self,
+        credits: List[Dict[str, Any]],
+        historical_debits: List[Dict[str, Any]]
+    ) -> List[RefundLink]:
+        """
+        Versão em lote de detect_refund para um extrato inteiro.
         
-        if is_explicit_refund:
-            return (True, "Identificado por palavra-chave na descrição")
-            
-        # 2. Busca débito correspondente (valor idêntico, sinal oposto)
-        # Assumindo que 'amount' aqui é positivo (crédito). Buscamos débitos (negativos) com mesmo valor absoluto.
-        for debit in historical_debits:
-            debit_amount = Decimal(str(debit.get("amount", 0)))
-            if abs(debit_amount) == amount:
-                # Verificar se o débito ocorreu ANTES do crédito
-                debit_date = self._parse_date(debit.get("date"))
-                credit_date = self._parse_date(transaction.get("date"))
-                
-                if debit_date and credit_date and debit_date <= credit_date:
-                    # Se tiver documento/CNPJ, tem que bater
-                    debit_doc = debit.get("payer_document") or debit.get("receiver_document") # Depende da API
-                    credit_doc = transaction.get("payer_document")
-                    
-                    if debit_doc and credit_doc:
-                        if self._clean_document(debit_doc) == self._clean_document(credit_doc):
-                            return (True, f"Estorno de transação anterior (ID: {debit.get('id')})")
-                    else:
-                        # Sem documento, match por valor exato e descrição similar pode ser arriscado
-                        # Mas se a descrição for muito parecida, pode ser.
-                        pass
-                        
-        return (False, None)
+        Indexa os débitos uma única vez por (centavos, documento) e processa
+        todos os créditos em uma passada, evitando a varredura O(créditos × débitos).
+        """
+        return RefundDetector(historical_debits).detect_all(credits)
@@ -0,0 +1,297 @@
+"""
+Sync Scheduler - Sincronização Agendada da Frota de Contas
+Cada conta ativa de condominio_contas_bancarias sincroniza uma vez por
+ciclo (1h; 15 min se o condomínio tem comprovantes pendentes), no seu
+horário fixo dentro do ciclo: hash da conta mod ciclo. Assim 10k contas
+viram ~170 por minuto, sem rajada na virada da hora.
+
+A cada tick o dispatcher planeja as contas devidas, agrupa por shard
+(hash da conta mod shards) e enfileira um sync.run_shard por shard. Cada
+shard reserva de uma vez, no orçamento global do provider (RPC com a
+janela travada), o que vai consumir: o que não couber fica para os
+próximos ticks (conta atrasada é sempre devida), pendentes primeiro.
+
+Conta com erro espera ERROR_BACKOFF_BASE, dobrando a cada erro seguido
+(até ERROR_BACKOFF_CAP), antes de voltar a ser devida. Conta despachada
+fica reservada (sincronizacao_enfileirada_em) até o shard terminar: o
+dispatcher não a enfileira de novo enquanto o shard espera na fila. A
+reserva e a task do shard expiram em DISPATCH_LEASE_SECONDS, para que
+worker morto não prenda a conta nem um shard velho rode em duplicidade.
+"""
+import asyncio
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel
+from app.services.open_finance_sync import OpenFinanceSyncService
+from app.services.match_suggestions import MatchSuggestionService
+
+ACCOUNTS_TABLE = "condominio_contas_bancarias"
+RUNS_TABLE = "execucoes_sincronizacao"
+BUDGET_RPC = "reservar_orcamento_provider"
+PENDING_RPC = "comprovantes_pendentes_por_condominio"
+
+SYNC_PERIOD_SECONDS = 3600          # Ciclo padrão: toda conta uma vez por hora
+PRIORITY_PERIOD_SECONDS = 900       # Condomínio com comprovantes pendentes: a cada 15 min
+DEFAULT_TICK_SECONDS = 60
+DEFAULT_SHARDS = 8
+DEFAULT_BUDGET_PER_MINUTE = 120     # Syncs de conta por minuto, somando todos os workers
+SHARD_CONCURRENCY = 8               # Contas sincronizando ao mesmo tempo dentro de um shard
+ACCOUNTS_PAGE_SIZE = 1000           # max-rows padrão do PostgREST
+ERROR_BACKOFF_BASE = 300            # 1º erro: 5 min; dobra a cada erro seguido
+ERROR_BACKOFF_CAP = 6 * 3600
+DISPATCH_LEASE_SECONDS = PRIORITY_PERIOD_SECONDS
+
+def stable_hash(value: str) -> int:
+    """Hash estável entre processos (o hash() do Python é randomizado)"""
+    return zlib.crc32(value.encode())
+
+def account_shard(account_id: str, shards: int) -> int:
+    return stable_hash(account_id) % max(1, shards)
+
+def account_period(pending_receipts: int) -> int:
+    return PRIORITY_PERIOD_SECONDS if pending_receipts > 0 else SYNC_PERIOD_SECONDS
+
+def error_backoff(failures: int) -> int:
+    """Espera depois de `failures` erros seguidos"""
+    return min(ERROR_BACKOFF_CAP, ERROR_BACKOFF_BASE * 2 ** max(0, failures - 1))
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+def _epoch(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def is_due(account_id: str, last_sync: Optional[float], period: int, now: float, tick: int = DEFAULT_TICK_SECONDS) -> bool:
+    """
+    Devida se nunca sincronizou, se perdeu o próprio horário (adiada por
+    orçamento, erro, worker fora) ou se o horário cai neste tick e a
+    última sincronização foi no ciclo anterior.
+    """
+    if last_sync is None:
+        return True
+    elapsed = now - last_sync
+    if elapsed >= period + tick:
+        return True
+    if elapsed < period - tick:
+        return False
+    slot = stable_hash(account_id) % period
+    return (now - slot) % period < tick
+
+class ScheduledAccount(BaseModel):
+    """Conta devida neste tick (payload do sync.run_shard)"""
+    id: str
+    conta_id: str
+    condominio_id: Optional[str] = None
+    pendentes: int = 0
+    ultima_sincronizacao: Optional[float] = None
+
+class DispatchPlan(BaseModel):
+    ativas: int = 0
+    devidas: int = 0
+    enfileiradas: int = 0        # Shard anterior ainda não terminou
+    em_backoff: int = 0          # Erro recente: esperando proxima_tentativa
+    shards: Dict[int, List[ScheduledAccount]] = {}
+
+class ShardReport(BaseModel):
+    shard: int
+    devidas: int = 0
+    concedidas: int = 0          # Orçamento obtido
+    adiadas: int = 0             # Sem orçamento: voltam nos próximos ticks
+    sucesso: int = 0
+    erro: int = 0
+    novas: int = 0
+
+class SyncScheduler:
+    """
+    Planejamento (dispatcher) e execução (shards) do sync da frota.
+    """
+
+    def __init__(
+        self,
+        supabase,
+        provider: str = "pluggy",
+        shards: int = DEFAULT_SHARDS,
+        tick_seconds: int = DEFAULT_TICK_SECONDS,
+        budget_per_minute: int = DEFAULT_BUDGET_PER_MINUTE
+    ):
+        self.supabase = supabase
+        self.provider = provider
+        self.shards = shards
+        self.tick_seconds = tick_seconds
+        self.budget_per_minute = budget_per_minute
+
+    # --- Planejamento ---
+
+    def active_accounts(self) -> List[Dict[str, Any]]:
+        """Contas ativas, em páginas keyset por id"""
+        accounts: List[Dict[str, Any]] = []
+        last_id = None
+        while True:
+            query = self.supabase.table(ACCOUNTS_TABLE).select(
+                "id, condominio_id, pluggy_account_id, ultima_sincronizacao, "
+                "proxima_tentativa, sincronizacao_enfileirada_em"
+            ).eq("ativo", True)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            page = query.order("id").limit(ACCOUNTS_PAGE_SIZE).execute().data or []
+            accounts.extend(page)
+            if len(page) < ACCOUNTS_PAGE_SIZE:
+                return accounts
+            last_id = page[-1]["id"]
+
+    def pending_receipts(self) -> Dict[str, int]:
+        rows = self.supabase.rpc(PENDING_RPC, {}).execute().data or []
+        return {row["condominio_id"]: int(row["pendentes"]) for row in rows}
+
+    def plan(self, now: Optional[float] = None) -> DispatchPlan:
+        now = time.time() if now is None else now
+        accounts = self.active_accounts()
+        pending = self.pending_receipts()
+
+        due: List[ScheduledAccount] = []
+        enqueued = backing_off = 0
+        for account in accounts:
+            account_id = account.get("pluggy_account_id")
+            if not account_id:
+                continue
+            dispatched_at = _epoch(account.get("sincronizacao_enfileirada_em"))
+            if dispatched_at is not None and now - dispatched_at < DISPATCH_LEASE_SECONDS:
+                enqueued += 1
+                continue
+            retry_at = _epoch(account.get("proxima_tentativa"))
+            if retry_at is not None and now < retry_at:
+                backing_off += 1
+                continue
+            pendentes = pending.get(account.get("condominio_id"), 0)
+            last_sync = _epoch(account.get("ultima_sincronizacao"))
+            if is_due(account_id, last_sync, account_period(pendentes), now, self.tick_seconds):
+                due.append(ScheduledAccount(
+                    id=account["id"],
+                    conta_id=account_id,
+                    condominio_id=account.get("condominio_id"),
+                    pendentes=pendentes,
+                    ultima_sincronizacao=last_sync
+                ))
+
+        # Pendentes primeiro; depois quem está há mais tempo sem sincronizar
+        due.sort(key=lambda a: (-a.pendentes, a.ultima_sincronizacao or 0.0))
+
+        shards: Dict[int, List[ScheduledAccount]] = {}
+        for account in due:
+            shards.setdefault(account_shard(account.conta_id, self.shards), []).append(account)
+        return DispatchPlan(
+            ativas=len(accounts), devidas=len(due), enfileiradas=enqueued, em_backoff=backing_off, shards=shards
+        )
+
+    def dispatch(self, now: Optional[float] = None) -> DispatchPlan:
+        """Planeja e reserva as contas devidas para os shards que vão ser enfileirados"""
+        now = time.time() if now is None else now
+        plan = self.plan(now)
+        for accounts in plan.shards.values():
+            self.supabase.table(ACCOUNTS_TABLE).update({
+                "sincronizacao_enfileirada_em": _iso(now)
+            }).in_("id", [account.id for account in accounts]).execute()
+        return plan
+
+    # --- Execução ---
+
+    def reserve_budget(self, amount: int) -> int:
+        if amount <= 0:
+            return 0
+        granted = self.supabase.rpc(BUDGET_RPC, {
+            "p_provider": self.provider,
+            "p_quantidade": amount,
+            "p_limite": self.budget_per_minute,
+            "p_janela_segundos": 60
+        }).execute().data
+        return int(granted or 0)
+
+    async def run_shard(self, shard: int, accounts: List[ScheduledAccount]) -> ShardReport:
+        """
+        Sincroniza as contas do shard (já ordenadas por prioridade) até o
+        orçamento concedido; grava o histórico, ultima_sincronizacao e o
+        backoff das contas com erro, e libera a reserva de todas.
+        """
+        report = ShardReport(shard=shard, devidas=len(accounts))
+        granted = self.reserve_budget(len(accounts))
+        to_run = accounts[:granted]
+        report.concedidas = len(to_run)
+        report.adiadas = len(accounts) - len(to_run)
+
+        sync_service = OpenFinanceSyncService(self.supabase, provider=self.provider)
+        semaphore = asyncio.Semaphore(SHARD_CONCURRENCY)
+
+        async def run(account: ScheduledAccount) -> Dict[str, Any]:
+            async with semaphore:
+                started = datetime.now(timezone.utc)
+                start = time.perf_counter()
+                run_row = {
+                    "provider": self.provider,
+                    "conta_id": account.conta_id,
+                    "condominio_id": account.condominio_id,
+                    "shard": shard,
+                    "iniciado_em": started.isoformat(),
+                }
+                try:
+                    inserted, result = await sync_service.sync_account(account.conta_id, account.condominio_id)
+                    if inserted:
+                        MatchSuggestionService(self.supabase).refresh_for_transactions(inserted, account.condominio_id)
+                    run_row.update({
+                        "status": "sucesso",
+                        "desde": result.desde.isoformat(),
+                        "recebidas": result.recebidas,
+                        "novas": result.novas,
+                    })
+                except Exception as e:
+                    run_row.update({"status": "erro", "erro": str(e)[:500]})
+                run_row["duracao_ms"] = int((time.perf_counter() - start) * 1000)
+                return run_row
+
+        runs = await asyncio.gather(*(run(account) for account in to_run))
+
+        synced = [account.id for account, row in zip(to_run, runs) if row["status"] == "sucesso"]
+        failed = [account.id for account, row in zip(to_run, runs) if row["status"] == "erro"]
+        if synced:
+            self.supabase.table(ACCOUNTS_TABLE).update({
+                "ultima_sincronizacao": datetime.now(timezone.utc).isoformat(),
+                "falhas_sincronizacao": 0,
+                "proxima_tentativa": None,
+                "sincronizacao_enfileirada_em": None,
+            }).in_("id", synced).execute()
+        if failed:
+            self._back_off(failed)
+        deferred = [account.id for account in accounts[len(to_run):]]
+        if deferred:
+            # Sem orçamento: continuam devidas e voltam no próximo tick
+            self.supabase.table(ACCOUNTS_TABLE).update({
+                "sincronizacao_enfileirada_em": None
+            }).in_("id", deferred).execute()
+        if runs:
+            self.supabase.table(RUNS_TABLE).insert(list(runs)).execute()
+
+        report.sucesso = len(synced)
+        report.erro = len(runs) - len(synced)
+        report.novas = sum(row.get("novas", 0) for row in runs)
+        return report
+
+    def _back_off(self, account_ids: List[str]):
+        """Conta mais um erro seguido e adia a próxima tentativa"""
+        rows = self.supabase.table(ACCOUNTS_TABLE).select(
+            "id, falhas_sincronizacao"
+        ).in_("id", account_ids).execute().data or []
+        now = time.time()
+        for row in rows:
+            failures = int(row.get("falhas_sincronizacao") or 0) + 1
+            self.supabase.table(ACCOUNTS_TABLE).update({
+                "falhas_sincronizacao": failures,
+                "proxima_tentativa": _iso(now + error_backoff(failures)),
+                "sincronizacao_enfileirada_em": None,
+            }).eq("id", row["id"]).execute()
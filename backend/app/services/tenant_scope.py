@@ -0,0 +1,34 @@
+"""
+Tenant Scope - Escopo por Condomínio nas Consultas
+transacoes_bancarias, comprovantes, extratos_bancarios e fila_reconciliacao
+têm condominio_id, e os índices das leituras da API começam por ele
+(migration 017). Consultas com escopo custam o volume de um condomínio.
+
+Na API o condomínio é obrigatório: sem ele a consulta (ou a RPC, onde
+p_condominio_id nulo não restringe) alcançaria todos os condomínios.
+"""
+from typing import Any, Dict, Optional
+
+TENANT_COLUMN = "condominio_id"
+
+def require_tenant(condominio_id: Optional[str]) -> str:
+    if not condominio_id:
+        raise ValueError("condominio_id é obrigatório")
+    return condominio_id
+
+def scoped(query, condominio_id: str):
+    """Restringe a consulta ao condomínio (ValueError sem condomínio)"""
+    return query.eq(TENANT_COLUMN, require_tenant(condominio_id))
+
+def scoped_or_all(query, condominio_id: Optional[str]):
+    """
+    Só para jobs internos e dados legados sem condomínio (None = sem
+    escopo). Nunca com um valor vindo do cliente.
+    """
+    return query.eq(TENANT_COLUMN, condominio_id) if condominio_id else query
+
+def with_tenant(row: Dict[str, Any], condominio_id: Optional[str]) -> Dict[str, Any]:
+    """Carimba o condomínio numa linha a inserir (sem sobrescrever um valor já definido)"""
+    if condominio_id and not row.get(TENANT_COLUMN):
+        row[TENANT_COLUMN] = condominio_id
+    return row
@@ -0,0 +1,145 @@
+"""
+Timestamp Index - Resolução por Horário (Nível 2 do Cascade)
+Índice ordenado de horários por dia com busca do vizinho mais próximo
+via bisect, e modo em lote (merge-join) para vários comprovantes.
+"""
+from bisect import bisect_left
+from typing import List, Dict, Optional, Tuple, Callable, Any
+from datetime import datetime
+
+SECONDS_PER_DAY = 86400
+
+class TimestampIndex:
+    """
+    Índice de candidatos por horário.
+
+    - Chave: dia (UTC) do timestamp da transação
+    - Valor: lista ordenada de (epoch em segundos, posição original, candidato)
+
+    Consulta O(log k) por comprovante em vez de calcular e ordenar a
+    diferença de horário de todos os candidatos.
+    """
+
+    def __init__(self, candidates: List[Any], timestamp_of: Callable[[Any], Optional[datetime]] = lambda c: c.timestamp):
+        self._days: Dict[int, List[Tuple[float, int, Any]]] = {}
+        for position, candidate in enumerate(candidates):
+            ts = timestamp_of(candidate)
+            if not ts:
+                continue
+            epoch = ts.timestamp()
+            self._days.setdefault(int(epoch // SECONDS_PER_DAY), []).append((epoch, position, candidate))
+
+        self._times: Dict[int, List[float]] = {}
+        for day, entries in self._days.items():
+            entries.sort(key=lambda entry: (entry[0], entry[1]))
+            self._times[day] = [entry[0] for entry in entries]
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._days.values())
+
+    def nearest(
+        self,
+        timestamp: datetime,
+        tolerance_seconds: float,
+        is_available: Callable[[Any], bool] = lambda c: True
+    ) -> Optional[Tuple[Any, float]]:
+        """
+        Candidato disponível mais próximo do horário (dentro da tolerância).
+
+        Returns:
+            (candidato, diferença em segundos) ou None
+        """
+        target = timestamp.timestamp()
+        best: Optional[Tuple[float, int, Any]] = None  # (diferença, posição, candidato)
+
+        # A janela ±tolerância pode atravessar a meia-noite: consultar dias vizinhos
+        first_day = int((target - tolerance_seconds) // SECONDS_PER_DAY)
+        last_day = int((target + tolerance_seconds) // SECONDS_PER_DAY)
+
+        for day in range(first_day, last_day + 1):
+            entries = self._days.get(day)
+            if not entries:
+                continue
+            times = self._times[day]
+            pos = bisect_left(times, target)
+
+            # Vizinho à direita (>= alvo)
+            for epoch, position, candidate in entries[pos:]:
+                diff = epoch - target
+                if diff > tolerance_seconds or (best and diff > best[0]):
+                    break
+                if is_available(candidate):
+                    best = _closer(best, (diff, position, candidate))
+                    break
+
+            # Vizinho à esquerda (< alvo); empates de horário preferem a posição original menor
+            found_epoch = None
+            for epoch, position, candidate in reversed(entries[:pos]):
+                diff = target - epoch
+                if found_epoch is not None and epoch != found_epoch:
+                    break
+                if diff > tolerance_seconds or (best and diff > best[0]):
+                    break
+                if is_available(candidate):
+                    best = _closer(best, (diff, position, candidate))
+                    found_epoch = epoch
+
+        if not best:
+            return None
+        return (best[2], best[0])
+
+    def resolve_many(
+        self,
+        receipts: List[Tuple[str, datetime]],
+        tolerance_seconds: float,
+        is_available: Callable[[Any], bool] = lambda c: True
+    ) -> Dict[str, Optional[Tuple[Any, float]]]:
+        """
+        Resolve vários comprovantes numa única varredura (merge-join).
+
+        Comprovantes e transações são percorridos em ordem de horário; cada
+        comprovante fica com a transação disponível mais próxima e ela deixa
+        de estar disponível para os seguintes.
+
+        Args:
+            receipts: Lista de (receipt_id, timestamp do comprovante)
+
+        Returns:
+            {receipt_id: (candidato, diferença em segundos) ou None}
+        """
+        entries = [entry for day in sorted(self._days) for entry in self._days[day]]
+        taken = [False] * len(entries)
+        results: Dict[str, Optional[Tuple[Any, float]]] = {}
+
+        lo = 0
+        for receipt_id, timestamp in sorted(receipts, key=lambda r: r[1].timestamp()):
+            target = timestamp.timestamp()
+
+            # Ponteiro só avança: descarta transações antigas demais ou já usadas
+            while lo < len(entries) and (taken[lo] or entries[lo][0] < target - tolerance_seconds):
+                lo += 1
+
+            best_index = None
+            best_diff = None
+            k = lo
+            while k < len(entries) and entries[k][0] <= target + tolerance_seconds:
+                diff = abs(entries[k][0] - target)
+                if best_diff is not None and entries[k][0] > target and diff >= best_diff:
+                    break
+                if not taken[k] and is_available(entries[k][2]) and (best_diff is None or diff < best_diff):
+                    best_index, best_diff = k, diff
+                k += 1
+
+            if best_index is None:
+                results[receipt_id] = None
+            else:
+                taken[best_index] = True
+                results[receipt_id] = (entries[best_index][2], best_diff)
+
+        return results
+
+def _closer(best: Optional[Tuple[float, int, Any]], candidate: Tuple[float, int, Any]) -> Tuple[float, int, Any]:
+    """Menor diferença vence; empate fica com a posição original menor"""
+    if best is None or (candidate[0], candidate[1]) < (best[0], best[1]):
+        return candidate
+    return best
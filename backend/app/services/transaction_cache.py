@@ -0,0 +1,178 @@
+"""
+Transaction Cache - Transações da Conta Servidas do Banco Local
+A validação de comprovante lia o extrato na Pluggy a cada envio (segundos
+por request, quota do provider). As transações já chegam em
+transacoes_bancarias pelo agendador e pelos webhooks; aqui elas são lidas
+do banco, com uma janela por conta em memória:
+
+- janela em memória: transações da conta a partir de uma data, válidas por
+  WINDOW_TTL_SECONDS (outros processos também gravam) e descartadas na hora
+  quando um sync deste processo grava transações novas da conta
+- frescor: se o último sync da conta (sincronizacao_contas.sincronizado_em)
+  é mais antigo que `max_staleness`, o delta é buscado no provider antes da
+  leitura; se o provider falhar, o que já está no banco é servido
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from app.services.open_finance_sync import OpenFinanceSyncService, SyncWatermark, TRANSACTIONS_TABLE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_STALENESS = 20 * 60     # Acima do ciclo de 15 min do agendador para condomínios com pendências
+WINDOW_TTL_SECONDS = 60
+MAX_CACHED_ACCOUNTS = 1024
+MIN_SYNC_DAYS = 30                  # Janela do primeiro sync de uma conta sem marca d'água
+
+def to_provider_shape(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Linha de transacoes_bancarias no formato de transação da Pluggy (valor com sinal)"""
+    metadata = row.get("metadata") or {}
+    payment_data = metadata.get("payment_data") or {}
+    payer_document = ((payment_data.get("payer") or {}).get("documentNumber") or {}).get("value")
+    credit = row.get("tipo") == "credito"
+    return {
+        "id": row["provider_transacao_id"],
+        "description": row.get("descricao"),
+        "amount": float(row["valor"]) if credit else -float(row["valor"]),
+        "date": str(row["data_transacao"]),
+        "category": metadata.get("category"),
+        "type": "CREDIT" if credit else "DEBIT",
+        "paymentData": payment_data or None,
+        "payer_document": payer_document,
+    }
+
+class TransactionWindowCache:
+    """Janela de transações por conta (LRU), do processo"""
+
+    def __init__(self, ttl: float = WINDOW_TTL_SECONDS, max_accounts: int = MAX_CACHED_ACCOUNTS, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_accounts = max_accounts
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[date, List[Dict[str, Any]], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str], from_date: date) -> Optional[List[Dict[str, Any]]]:
+        """Transações desde `from_date`, se a janela em memória cobre a data e ainda vale"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            covered_from, rows, loaded_at = entry
+            if self.clock() - loaded_at >= self.ttl:
+                del self._entries[key]
+                return None
+            if from_date < covered_from:
+                return None
+            self._entries.move_to_end(key)
+        start = from_date.isoformat()
+        return [tx for tx in rows if tx["date"] >= start]
+
+    def put(self, key: Tuple[str, str], from_date: date, rows: List[Dict[str, Any]]):
+        with self._lock:
+            self._entries[key] = (from_date, rows, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_accounts:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Tuple[str, str]):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+transaction_cache = TransactionWindowCache()
+
+class LocalTransactionStore:
+    """Leitura das transações de uma conta: memória -> banco -> (se velho) delta do provider"""
+
+    def __init__(
+        self,
+        supabase,
+        provider: str = "pluggy",
+        max_staleness: float = DEFAULT_MAX_STALENESS,
+        cache: TransactionWindowCache = transaction_cache
+    ):
+        self.supabase = supabase
+        self.provider = provider
+        self.max_staleness = max_staleness
+        self.cache = cache
+        self.sync = OpenFinanceSyncService(supabase, provider=provider)
+
+    async def get_transactions(
+        self,
+        conta_id: str,
+        from_date: date,
+        condominio_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Transações da conta desde `from_date`, no formato da Pluggy"""
+        key = (self.provider, conta_id)
+        cached = self.cache.get(key, from_date)
+        if cached is not None:
+            return cached
+
+        await self.ensure_fresh(conta_id, from_date, condominio_id)
+        rows = self.supabase.table(TRANSACTIONS_TABLE).select(
+            "provider_transacao_id, descricao, valor, tipo, data_transacao, metadata"
+        ).eq("provider", self.provider).eq("provider_conta_id", conta_id).gte(
+            "data_transacao", from_date.isoformat()
+        ).order("data_transacao").execute().data or []
+
+        transactions = [to_provider_shape(row) for row in rows]
+        self.cache.put(key, from_date, transactions)
+        return transactions
+
+    async def get_transaction(
+        self,
+        conta_id: str,
+        transaction_id: str,
+        condominio_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Uma transação pelo id no provider (índice único), sem ler o extrato inteiro"""
+        def lookup() -> Optional[Dict[str, Any]]:
+            rows = self.supabase.table(TRANSACTIONS_TABLE).select(
+                "provider_transacao_id, descricao, valor, tipo, data_transacao, metadata"
+            ).eq("provider", self.provider).eq("provider_transacao_id", transaction_id).eq(
+                "provider_conta_id", conta_id
+            ).limit(1).execute().data
+            return to_provider_shape(rows[0]) if rows else None
+
+        found = lookup()
+        if found is None and await self.ensure_fresh(conta_id, date.today() - timedelta(days=MIN_SYNC_DAYS), condominio_id):
+            found = lookup()
+        return found
+
+    async def ensure_fresh(self, conta_id: str, from_date: date, condominio_id: Optional[str] = None) -> bool:
+        """
+        Busca o delta no provider se o último sync da conta passou do limite.
+
+        Returns:
+            True se um sync foi feito agora
+        """
+        watermark = self.sync.load_watermark(conta_id)
+        if not self._is_stale(watermark):
+            return False
+
+        days_back = max(MIN_SYNC_DAYS, (date.today() - from_date).days)
+        try:
+            await self.sync.sync_account(conta_id, condominio_id, days_back=days_back)
+        except Exception as e:
+            if watermark is None:
+                raise
+            logger.warning(f"Sync de {self.provider}/{conta_id} falhou; servindo transações locais: {e}")
+            return False
+        finally:
+            self.cache.invalidate((self.provider, conta_id))
+        return True
+
+    def _is_stale(self, watermark: Optional[SyncWatermark]) -> bool:
+        if watermark is None or watermark.sincronizado_em is None:
+            return True
+        synced_at = watermark.sincronizado_em
+        if synced_at.tzinfo is None:
+            synced_at = synced_at.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - synced_at).total_seconds() > self.max_staleness
@@ -9,6 +9,7 @@ from app.services.cnpj_service import CNPJService
 from app.services.cnpj.base import CNPJRateLimitError, CNPJAPIError
 from supabase import create_client
 from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
 from typing import List, Dict, Any
 import logging
 
@@ -34,7 +35,7 @@ def process_batch_expenses(self, items: List[Dict[str, Any]], admin_id: str):
     async def _run_async():
         # Inicializar serviços
         batch_service = BatchAuditService()
-        supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        supabase = instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
         audit_logger = AuditLogService(supabase)
         
         # Processar
@@ -91,7 +92,7 @@ def validate_single_receipt_task(self, receipt_data: Dict[str, Any], condominio_
     Valida um único comprovante em background.
     """
     async def _run_async():
-        supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        supabase = instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
         audit_logger = AuditLogService(supabase)
         
         try:
@@ -0,0 +1,58 @@
+from app.core.celery_app import celery_app
+from app.services.incremental_reconciler import IncrementalReconciler
+from app.services.queue_priority import QueuePriorityService
+from app.services.match_suggestions import MatchSuggestionService
+from supabase import create_client
+from app.core.config import get_settings
+from app.services.metrics import instrument_supabase, request_breakdown, log_breakdown, RECONCILED_TOTAL
+from typing import Optional
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+@celery_app.task(name="reconciliation.incremental")
+def run_incremental_reconciliation(max_batches: int = 20):
+    """
+    Consome o feed de alterações (transações e comprovantes) a partir do
+    cursor durável e concilia só a vizinhança do que mudou.
+    Agendada pelo beat; execuções sobrepostas são seguras (cursor com
+    compare-and-set, RPC de aplicação idempotente).
+    """
+    supabase = instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
+    with request_breakdown() as breakdown:
+        report = IncrementalReconciler(supabase).run(max_batches=max_batches)
+    log_breakdown("task_stages", breakdown, task="reconciliation.incremental")
+    RECONCILED_TOTAL.inc(report.aplicados, source="incremental", outcome="aplicado")
+
+    logger.info(
+        f"Conciliação incremental: {report.transacoes_alteradas} transações e "
+        f"{report.comprovantes_alterados} comprovantes alterados, {report.aplicados} conciliados"
+    )
+    return report.model_dump()
+
+@celery_app.task(name="reconciliation.rescore_queue")
+def rescore_reconciliation_queue(batch_size: int = 500):
+    """
+    Recalcula em lote a prioridade composta dos itens em aberto da fila
+    (a componente de idade/SLA muda com o tempo). Só grava o que mudou;
+    a leitura da fila continua sendo um range scan em idx_fila_keyset.
+    """
+    supabase = instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
+    report = QueuePriorityService(supabase).rescore(batch_size=batch_size)
+
+    logger.info(f"Prioridades da fila: {report.avaliados} itens avaliados, {report.atualizados} atualizados")
+    return report.model_dump()
+
+@celery_app.task(name="reconciliation.backfill_suggestions")
+def backfill_match_suggestions(batch_size: int = 200, max_batches: Optional[int] = None):
+    """
+    Tarefa avulsa: calcula as sugestões de match dos comprovantes anteriores
+    ao pré-cálculo (sugestoes_calculadas_em nulo). O GET /matches só lê; até
+    o backfill chegar, esses comprovantes respondem lista vazia.
+    """
+    supabase = instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
+    total = MatchSuggestionService(supabase).backfill(batch_size=batch_size, max_batches=max_batches)
+
+    logger.info(f"Backfill de sugestões: {total} comprovantes calculados")
+    return {"comprovantes": total}
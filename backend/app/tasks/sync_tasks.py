@@ -0,0 +1,104 @@
+from app.core.celery_app import (
+    celery_app, FLEET_SYNC_SHARDS, FLEET_SYNC_INTERVAL, PROVIDER_SYNC_BUDGET_PER_MINUTE, WEBHOOK_EVENT_RETENTION_DAYS
+)
+from app.services.sync_scheduler import SyncScheduler, ScheduledAccount, account_shard, DISPATCH_LEASE_SECONDS
+from app.services.pluggy_webhooks import PluggyWebhookService
+from app.services.http_client import close_async_clients
+from supabase import create_client
+from app.core.config import get_settings
+from app.services.metrics import instrument_supabase
+from datetime import timedelta
+from typing import List, Dict, Any
+import asyncio
+import concurrent.futures
+import logging
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+def _supabase():
+    return instrument_supabase(create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY))
+
+def _scheduler() -> SyncScheduler:
+    return SyncScheduler(
+        _supabase(),
+        shards=FLEET_SYNC_SHARDS,
+        tick_seconds=FLEET_SYNC_INTERVAL,
+        budget_per_minute=PROVIDER_SYNC_BUDGET_PER_MINUTE
+    )
+
+@celery_app.task(name="sync.dispatch")
+def dispatch_fleet_sync():
+    """
+    Escolhe as contas devidas neste tick (horário da conta dentro do
+    ciclo, atrasadas e prioritárias), reserva e enfileira um sync.run_shard
+    por shard. O shard que não começar antes da reserva expirar é descartado
+    pelo worker: a conta já terá sido despachada de novo.
+    """
+    plan = _scheduler().dispatch()
+    for shard, accounts in plan.shards.items():
+        run_sync_shard.apply_async(
+            (shard, [account.model_dump() for account in accounts]),
+            expires=DISPATCH_LEASE_SECONDS
+        )
+
+    logger.info(
+        f"Sync da frota: {plan.devidas} de {plan.ativas} contas ativas devidas em {len(plan.shards)} shards "
+        f"({plan.enfileiradas} ainda na fila, {plan.em_backoff} em backoff por erro)"
+    )
+    return {
+        "ativas": plan.ativas, "devidas": plan.devidas, "shards": len(plan.shards),
+        "enfileiradas": plan.enfileiradas, "em_backoff": plan.em_backoff,
+    }
+
+def _run(scheduler: SyncScheduler, shard: int, accounts: List[ScheduledAccount]):
+    async def run():
+        try:
+            return await scheduler.run_shard(shard, accounts)
+        finally:
+            await close_async_clients()
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run())
+
+    # Modo eager (sem Redis): a task roda dentro do event loop de quem a
+    # enfileirou (ex.: webhook), onde asyncio.run() não pode ser chamado
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, run()).result()
+
+@celery_app.task(name="sync.run_shard")
+def run_sync_shard(shard: int, accounts: List[Dict[str, Any]]):
+    """Sincroniza um shard dentro do orçamento global do provider"""
+    report = _run(_scheduler(), shard, [ScheduledAccount(**a) for a in accounts])
+    logger.info(
+        f"Sync shard {shard}: {report.sucesso} ok, {report.erro} com erro, "
+        f"{report.adiadas} adiadas por orçamento, {report.novas} transações novas"
+    )
+    return report.model_dump()
+
+@celery_app.task(name="sync.account", bind=True, max_retries=5, default_retry_delay=FLEET_SYNC_INTERVAL)
+def sync_single_account(self, account: Dict[str, Any]):
+    """
+    Sync de uma conta antecipado por webhook. Consome o mesmo orçamento do
+    agendador; sem orçamento no minuto, tenta de novo no próximo.
+    """
+    scheduled = ScheduledAccount(**account)
+    scheduler = _scheduler()
+    report = _run(scheduler, account_shard(scheduled.conta_id, scheduler.shards), [scheduled])
+    if report.adiadas:
+        raise self.retry()
+
+    logger.info(f"Sync da conta {scheduled.conta_id} (webhook): {report.novas} transações novas")
+    return report.model_dump()
+
+@celery_app.task(name="webhooks.purge_events")
+def purge_webhook_events(retention_days: int = WEBHOOK_EVENT_RETENTION_DAYS):
+    """
+    Apaga de webhook_eventos as entregas mais antigas que a retenção: a
+    deduplicação só precisa cobrir a janela de reentrega da Pluggy.
+    """
+    removed = PluggyWebhookService(_supabase()).purge(timedelta(days=retention_days))
+    logger.info(f"Webhooks: {removed} entregas com mais de {retention_days} dias removidas")
+    return {"removidas": removed}
@@ -0,0 +1,26 @@
+-- Migration 008: Regras de Conciliação por Condomínio
+-- Perfis de tolerância usados pelo motor de matching (RobustValidator,
+-- auto-reconciliação e sugestões). Colunas nulas herdam o padrão da aplicação.
+
+CREATE TABLE IF NOT EXISTS regras_conciliacao (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    condominio_id VARCHAR(255) NOT NULL,
+    
+    -- Aprovação automática
+    tolerancia_valor DECIMAL(15, 2),              -- Padrão: 0.05
+    tolerancia_dias INT,                          -- Padrão: 2
+    tolerancia_timestamp_minutos INT,             -- Padrão: 30
+    taxas_comuns JSONB,                           -- Padrão: [2.50, 3.00, 1.50, 5.00]
+    
+    -- Sugestões para revisão manual
+    sugestao_tolerancia_pct DECIMAL(6, 4),        -- Padrão: 0.01 (1%)
+    sugestao_janela_dias INT,                     -- Padrão: 3
+    
+    criado_em TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    atualizado_em TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    
+    UNIQUE(condominio_id)
+);
+
+COMMENT ON TABLE regras_conciliacao IS 'Perfis de regras de matching por condomínio (carregados e compilados em cache pela aplicação)';
+COMMENT ON COLUMN regras_conciliacao.taxas_comuns IS 'Taxas de boleto descontadas do valor creditado, em ordem de prioridade';
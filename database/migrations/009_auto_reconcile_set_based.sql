@@ -0,0 +1,66 @@
+-- Migration 009: Auto-Conciliação em Lote
+-- A aplicação calcula os vínculos (hash join por NSU e por valor/data) e
+-- aplica todos de uma vez nesta função, numa única transação.
+
+-- Escopo por condomínio (extratos vindos do Open Finance e comprovantes enviados)
+ALTER TABLE extratos_bancarios ADD COLUMN IF NOT EXISTS condominio_id VARCHAR(255);
+ALTER TABLE comprovantes ADD COLUMN IF NOT EXISTS condominio_id VARCHAR(255);
+
+-- Comprovantes pendentes com OCR de um condomínio, por data (busca do auto-reconcile)
+CREATE INDEX IF NOT EXISTS idx_comprovantes_auto_reconcile
+ON comprovantes (condominio_id, ocr_data)
+WHERE status = 'pendente' AND ocr_processado = TRUE;
+
+-- Aplica os vínculos transação <-> comprovante em lote.
+-- p_vinculos: [{"transacao_id": "...", "comprovante_id": "..."}, ...]
+-- Só vincula linhas ainda pendentes (travadas com FOR UPDATE): execuções
+-- concorrentes nunca conciliam a mesma transação ou comprovante duas vezes.
+CREATE OR REPLACE FUNCTION conciliar_automaticamente(
+    p_vinculos JSONB,
+    p_motivo TEXT DEFAULT 'Auto-reconciliado via Open Finance'
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_total INT := COALESCE(jsonb_array_length(p_vinculos), 0);
+    v_aplicados INT;
+BEGIN
+    WITH vinculos AS (
+        SELECT v.transacao_id, v.comprovante_id
+        FROM jsonb_to_recordset(p_vinculos) AS v(transacao_id UUID, comprovante_id UUID)
+    ),
+    validos AS (
+        SELECT v.transacao_id, v.comprovante_id
+        FROM vinculos v
+        JOIN transacoes_bancarias t ON t.id = v.transacao_id AND t.status_reconciliacao = 'pendente'
+        JOIN comprovantes c ON c.id = v.comprovante_id AND c.status = 'pendente'
+        FOR UPDATE OF t, c
+    ),
+    comprovantes_atualizados AS (
+        UPDATE comprovantes c
+        SET status = 'aprovado',
+            transacao_id = v.transacao_id,
+            motivo_decisao = p_motivo
+        FROM validos v
+        WHERE c.id = v.comprovante_id
+        RETURNING c.id
+    ),
+    transacoes_atualizadas AS (
+        UPDATE transacoes_bancarias t
+        SET status_reconciliacao = 'reconciliado',
+            comprovante_id = v.comprovante_id
+        FROM validos v
+        WHERE t.id = v.transacao_id
+        RETURNING t.id
+    )
+    SELECT COUNT(*) INTO v_aplicados FROM transacoes_atualizadas;
+
+    RETURN jsonb_build_object(
+        'aplicados', v_aplicados,
+        'ignorados', v_total - v_aplicados
+    );
+END;
+$$;
+
+COMMENT ON FUNCTION conciliar_automaticamente IS 'Aplica vínculos da auto-conciliação em lote, numa única transação (chamada via RPC)';
@@ -0,0 +1,118 @@
+-- Migration 010: Busca de Candidatos no Servidor (Sugestões de Match)
+-- A pontuação NSU/valor/data roda no Postgres e só os top-k candidatos
+-- voltam para a API, em vez da janela inteira de transações pendentes.
+
+-- Escopo por condomínio nas transações (herdado do extrato)
+ALTER TABLE transacoes_bancarias ADD COLUMN IF NOT EXISTS condominio_id VARCHAR(255);
+
+UPDATE transacoes_bancarias t
+SET condominio_id = e.condominio_id
+FROM extratos_bancarios e
+WHERE t.extrato_id = e.id
+  AND t.condominio_id IS NULL
+  AND e.condominio_id IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION preencher_condominio_transacao()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.condominio_id IS NULL AND NEW.extrato_id IS NOT NULL THEN
+        SELECT condominio_id INTO NEW.condominio_id
+        FROM extratos_bancarios
+        WHERE id = NEW.extrato_id;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_transacoes_condominio ON transacoes_bancarias;
+CREATE TRIGGER trg_transacoes_condominio
+BEFORE INSERT ON transacoes_bancarias
+FOR EACH ROW EXECUTE FUNCTION preencher_condominio_transacao();
+
+-- Índice composto da busca por faixa (condomínio + status + data + valor)
+CREATE INDEX IF NOT EXISTS idx_transacoes_busca_candidatos
+ON transacoes_bancarias (condominio_id, status_reconciliacao, data_transacao, valor);
+
+-- NSU por condomínio (estratégia 1)
+CREATE INDEX IF NOT EXISTS idx_transacoes_condominio_nsu
+ON transacoes_bancarias (condominio_id, nsu)
+WHERE nsu IS NOT NULL;
+
+-- Candidatos pontuados para um comprovante.
+-- Faixas de valor/data são calculadas pela aplicação a partir das regras do
+-- condomínio (regras_conciliacao), então a função não duplica essa lógica.
+-- Pontuação (mesma da API):
+--   NSU exato                  -> 95, ["nsu_exato"]
+--   Valor/data dentro da faixa -> 80 (+15 valor igual, +5 mesma data)
+--                                 ["valor_exato"] se |diferença| <= tolerância
+--                                 ["data_proxima"] se |dias| <= 1
+-- p_condominio_id NULL = busca em todos os condomínios (dados legados).
+CREATE OR REPLACE FUNCTION buscar_candidatos_conciliacao(
+    p_valor NUMERIC,
+    p_data DATE,
+    p_valor_min NUMERIC,
+    p_valor_max NUMERIC,
+    p_data_inicio DATE,
+    p_data_fim DATE,
+    p_tolerancia_valor NUMERIC DEFAULT 0.05,
+    p_nsu VARCHAR DEFAULT NULL,
+    p_condominio_id VARCHAR DEFAULT NULL,
+    p_limite INT DEFAULT 10
+)
+RETURNS TABLE (
+    transacao_id UUID,
+    data_transacao DATE,
+    valor NUMERIC,
+    descricao TEXT,
+    nsu VARCHAR,
+    match_score NUMERIC,
+    match_reasons TEXT[]
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH candidatos AS (
+        -- Estratégia 1: NSU exato
+        SELECT t.id, t.data_transacao, t.valor, t.descricao, t.nsu,
+               95::NUMERIC AS score,
+               ARRAY['nsu_exato']::TEXT[] AS reasons,
+               0 AS prioridade
+        FROM transacoes_bancarias t
+        WHERE p_nsu IS NOT NULL
+          AND t.nsu = p_nsu
+          AND t.status_reconciliacao = 'pendente'
+          AND (p_condominio_id IS NULL OR t.condominio_id = p_condominio_id)
+
+        UNION ALL
+
+        -- Estratégia 2: faixa de valor + janela de data
+        SELECT t.id, t.data_transacao, t.valor, t.descricao, t.nsu,
+               80
+                 + CASE WHEN t.valor = p_valor THEN 15 ELSE 0 END
+                 + CASE WHEN t.data_transacao = p_data THEN 5 ELSE 0 END,
+               ARRAY_REMOVE(ARRAY[
+                   CASE WHEN ABS(t.valor - p_valor) <= p_tolerancia_valor THEN 'valor_exato' END,
+                   CASE WHEN ABS(t.data_transacao - p_data) <= 1 THEN 'data_proxima' END
+               ], NULL),
+               1
+        FROM transacoes_bancarias t
+        WHERE (p_condominio_id IS NULL OR t.condominio_id = p_condominio_id)
+          AND t.status_reconciliacao = 'pendente'
+          AND t.data_transacao BETWEEN p_data_inicio AND p_data_fim
+          AND t.valor BETWEEN p_valor_min AND p_valor_max
+    ),
+    unicos AS (
+        -- Uma linha por transação: o match por NSU prevalece
+        SELECT DISTINCT ON (c.id) c.*
+        FROM candidatos c
+        ORDER BY c.id, c.prioridade
+    )
+    SELECT u.id, u.data_transacao, u.valor, u.descricao, u.nsu, u.score, u.reasons
+    FROM unicos u
+    ORDER BY u.score DESC, u.prioridade, ABS(u.data_transacao - p_data), u.id
+    LIMIT p_limite;
+$$;
+
+COMMENT ON FUNCTION buscar_candidatos_conciliacao IS 'Top-k transações candidatas para um comprovante, pontuadas no servidor (chamada via RPC)';
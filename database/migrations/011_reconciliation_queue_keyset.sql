@@ -0,0 +1,8 @@
+-- Migration 011: Paginação Keyset da Fila de Reconciliação
+-- Ordem da fila: prioridade DESC, criado_em, id (desempate estável).
+-- Com este índice cada página é um range scan, sem OFFSET.
+
+CREATE INDEX IF NOT EXISTS idx_fila_keyset
+ON fila_reconciliacao (status, prioridade DESC, criado_em, id);
+
+COMMENT ON INDEX idx_fila_keyset IS 'Paginação keyset da fila (status + prioridade DESC, criado_em, id)';
@@ -0,0 +1,62 @@
+-- Migration 012: Auto-Conciliação Fecha Itens da Fila
+-- Comprovantes conciliados automaticamente saem da fila de revisão na
+-- mesma transação, e a função devolve quais foram aplicados para que a
+-- API publique os eventos da fila (SSE).
+
+CREATE OR REPLACE FUNCTION conciliar_automaticamente(
+    p_vinculos JSONB,
+    p_motivo TEXT DEFAULT 'Auto-reconciliado via Open Finance'
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_total INT := COALESCE(jsonb_array_length(p_vinculos), 0);
+    v_aplicados UUID[];
+BEGIN
+    WITH vinculos AS (
+        SELECT v.transacao_id, v.comprovante_id
+        FROM jsonb_to_recordset(p_vinculos) AS v(transacao_id UUID, comprovante_id UUID)
+    ),
+    validos AS (
+        SELECT v.transacao_id, v.comprovante_id
+        FROM vinculos v
+        JOIN transacoes_bancarias t ON t.id = v.transacao_id AND t.status_reconciliacao = 'pendente'
+        JOIN comprovantes c ON c.id = v.comprovante_id AND c.status = 'pendente'
+        FOR UPDATE OF t, c
+    ),
+    comprovantes_atualizados AS (
+        UPDATE comprovantes c
+        SET status = 'aprovado',
+            transacao_id = v.transacao_id,
+            motivo_decisao = p_motivo
+        FROM validos v
+        WHERE c.id = v.comprovante_id
+        RETURNING c.id
+    ),
+    transacoes_atualizadas AS (
+        UPDATE transacoes_bancarias t
+        SET status_reconciliacao = 'reconciliado',
+            comprovante_id = v.comprovante_id
+        FROM validos v
+        WHERE t.id = v.transacao_id
+        RETURNING t.id
+    ),
+    fila_atualizada AS (
+        UPDATE fila_reconciliacao f
+        SET status = 'concluido',
+            concluido_em = NOW()
+        FROM validos v
+        WHERE f.comprovante_id = v.comprovante_id
+          AND f.status IN ('pendente', 'em_revisao')
+        RETURNING f.id
+    )
+    SELECT COALESCE(array_agg(id), '{}') INTO v_aplicados FROM comprovantes_atualizados;
+
+    RETURN jsonb_build_object(
+        'aplicados', COALESCE(array_length(v_aplicados, 1), 0),
+        'ignorados', v_total - COALESCE(array_length(v_aplicados, 1), 0),
+        'comprovantes', to_jsonb(v_aplicados)
+    );
+END;
+$$;
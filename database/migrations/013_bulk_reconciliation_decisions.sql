@@ -0,0 +1,115 @@
+-- Migration 013: Decisões de Conciliação em Lote
+-- Aprovação/rejeição de N comprovantes numa única chamada (RPC), numa
+-- única transação: comprovantes, transações, fila e trilha de auditoria.
+-- Itens inválidos não abortam o lote: são reportados com o motivo.
+
+-- 1. Trilha de decisões (uma linha por item de cada lote, inclusive os ignorados)
+CREATE TABLE IF NOT EXISTS decisoes_reconciliacao (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    lote_id UUID NOT NULL,
+    comprovante_id UUID NOT NULL,
+    transacao_id UUID,
+    decisao VARCHAR(20) NOT NULL,
+    resultado VARCHAR(40) NOT NULL,
+    motivo_decisao TEXT,
+    decidido_por UUID, -- References auth.users(id)
+    decidido_em TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_decisoes_comprovante ON decisoes_reconciliacao (comprovante_id);
+CREATE INDEX IF NOT EXISTS idx_decisoes_lote ON decisoes_reconciliacao (lote_id);
+
+-- 2. Função de decisão em lote
+CREATE OR REPLACE FUNCTION decidir_conciliacoes_em_lote(p_decisoes JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_lote UUID := uuid_generate_v4();
+    v_resultados JSONB;
+BEGIN
+    WITH entrada AS (
+        SELECT d.ordem, d.comprovante_id, d.transacao_id, d.decisao, d.motivo_decisao
+        FROM ROWS FROM (
+            jsonb_to_recordset(p_decisoes) AS (comprovante_id UUID, transacao_id UUID, decisao TEXT, motivo_decisao TEXT)
+        ) WITH ORDINALITY AS d(comprovante_id, transacao_id, decisao, motivo_decisao, ordem)
+    ),
+    comprovantes_travados AS (
+        SELECT c.id, c.status
+        FROM comprovantes c
+        WHERE c.id IN (SELECT comprovante_id FROM entrada)
+        FOR UPDATE
+    ),
+    transacoes_travadas AS (
+        SELECT t.id, t.status_reconciliacao
+        FROM transacoes_bancarias t
+        WHERE t.id IN (SELECT transacao_id FROM entrada WHERE decisao = 'aprovar')
+        FOR UPDATE
+    ),
+    classificadas AS (
+        SELECT e.*,
+            CASE
+                WHEN e.decisao NOT IN ('aprovar', 'rejeitar') THEN 'decisao_invalida'
+                WHEN COUNT(*) OVER (PARTITION BY e.comprovante_id) > 1 THEN 'comprovante_repetido'
+                WHEN c.id IS NULL THEN 'comprovante_inexistente'
+                WHEN c.status IN ('aprovado', 'rejeitado') THEN 'comprovante_ja_decidido'
+                WHEN e.decisao = 'rejeitar' THEN 'aplicado'
+                WHEN e.transacao_id IS NULL THEN 'transacao_obrigatoria'
+                WHEN t.id IS NULL THEN 'transacao_inexistente'
+                WHEN t.status_reconciliacao NOT IN ('pendente', 'divergente') THEN 'transacao_ja_conciliada'
+                WHEN SUM(CASE WHEN e.decisao = 'aprovar' THEN 1 ELSE 0 END)
+                     OVER (PARTITION BY e.transacao_id) > 1 THEN 'transacao_repetida'
+                ELSE 'aplicado'
+            END AS resultado
+        FROM entrada e
+        LEFT JOIN comprovantes_travados c ON c.id = e.comprovante_id
+        LEFT JOIN transacoes_travadas t ON t.id = e.transacao_id AND e.decisao = 'aprovar'
+    ),
+    comprovantes_atualizados AS (
+        UPDATE comprovantes c
+        SET status = CASE WHEN k.decisao = 'aprovar' THEN 'aprovado' ELSE 'rejeitado' END,
+            transacao_id = CASE WHEN k.decisao = 'aprovar' THEN k.transacao_id ELSE c.transacao_id END,
+            motivo_decisao = k.motivo_decisao
+        FROM classificadas k
+        WHERE c.id = k.comprovante_id AND k.resultado = 'aplicado'
+        RETURNING c.id
+    ),
+    transacoes_atualizadas AS (
+        UPDATE transacoes_bancarias t
+        SET status_reconciliacao = 'reconciliado',
+            comprovante_id = k.comprovante_id
+        FROM classificadas k
+        WHERE t.id = k.transacao_id AND k.decisao = 'aprovar' AND k.resultado = 'aplicado'
+        RETURNING t.id
+    ),
+    fila_atualizada AS (
+        UPDATE fila_reconciliacao f
+        SET status = 'concluido',
+            concluido_em = NOW()
+        FROM classificadas k
+        WHERE f.comprovante_id = k.comprovante_id
+          AND k.resultado = 'aplicado'
+          AND f.status IN ('pendente', 'em_revisao')
+        RETURNING f.id
+    ),
+    auditoria AS (
+        INSERT INTO decisoes_reconciliacao (lote_id, comprovante_id, transacao_id, decisao, resultado, motivo_decisao, decidido_por)
+        SELECT v_lote, k.comprovante_id, k.transacao_id, k.decisao, k.resultado, k.motivo_decisao, auth.uid()
+        FROM classificadas k
+        RETURNING id
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'comprovante_id', k.comprovante_id,
+        'transacao_id', k.transacao_id,
+        'decisao', k.decisao,
+        'resultado', k.resultado
+    ) ORDER BY k.ordem), '[]'::jsonb)
+    INTO v_resultados
+    FROM classificadas k;
+
+    RETURN jsonb_build_object('lote_id', v_lote, 'resultados', v_resultados);
+END;
+$$;
+
+COMMENT ON FUNCTION decidir_conciliacoes_em_lote IS 'Aprova/rejeita comprovantes em lote numa única transação, com trilha em decisoes_reconciliacao (chamada via RPC)';
+COMMENT ON COLUMN decisoes_reconciliacao.resultado IS 'aplicado | comprovante_inexistente | comprovante_ja_decidido | comprovante_repetido | transacao_obrigatoria | transacao_inexistente | transacao_ja_conciliada | transacao_repetida | decisao_invalida';
@@ -0,0 +1,32 @@
+-- Migration 014: Sugestões de Match Pré-Calculadas
+-- As sugestões são calculadas quando o OCR termina ou quando chegam
+-- transações novas (só para os comprovantes afetados) e gravadas aqui.
+-- A tela do admin passa a ser uma leitura indexada.
+
+-- 1. Top-k por comprovante (posição 1 = melhor score)
+CREATE TABLE IF NOT EXISTS sugestoes_conciliacao (
+    comprovante_id UUID REFERENCES comprovantes(id) ON DELETE CASCADE,
+    transacao_id UUID REFERENCES transacoes_bancarias(id) ON DELETE CASCADE,
+    posicao INT NOT NULL,
+    match_score NUMERIC NOT NULL,
+    match_reasons TEXT[] DEFAULT '{}',
+    calculado_em TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (comprovante_id, transacao_id)
+);
+
+-- Leitura da tela: WHERE comprovante_id = ? ORDER BY posicao
+CREATE INDEX IF NOT EXISTS idx_sugestoes_leitura ON sugestoes_conciliacao (comprovante_id, posicao);
+
+-- 2. Marca de cálculo (NULL = nunca calculado; distingue de "calculado sem candidatos")
+ALTER TABLE comprovantes ADD COLUMN IF NOT EXISTS sugestoes_calculadas_em TIMESTAMP WITH TIME ZONE;
+
+-- 3. Busca reversa: quais comprovantes em aberto uma transação nova pode afetar
+CREATE INDEX IF NOT EXISTS idx_comprovantes_sugestoes_reverso
+ON comprovantes (condominio_id, ocr_data, ocr_valor)
+WHERE status IN ('pendente', 'suspeito') AND ocr_processado = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_comprovantes_ocr_nsu
+ON comprovantes (ocr_nsu)
+WHERE ocr_nsu IS NOT NULL;
+
+COMMENT ON TABLE sugestoes_conciliacao IS 'Top-k de buscar_candidatos_conciliacao por comprovante, recalculado no OCR e na chegada de transações';
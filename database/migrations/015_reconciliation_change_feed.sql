@@ -0,0 +1,110 @@
+-- Migration 015: Feed de Alterações para Conciliação Incremental
+-- Cada insert/update relevante em transacoes_bancarias e comprovantes recebe
+-- (xid da transação, sequência). O consumidor lê em ordem (xid, seq) só o que
+-- está abaixo do xmin do snapshot: toda transação com xid menor já terminou,
+-- então nenhuma linha ainda não commitada fica para trás do cursor.
+
+CREATE SEQUENCE IF NOT EXISTS seq_alteracoes_conciliacao;
+
+ALTER TABLE transacoes_bancarias ADD COLUMN IF NOT EXISTS xid_alteracao BIGINT;
+ALTER TABLE transacoes_bancarias ADD COLUMN IF NOT EXISTS seq_alteracao BIGINT;
+ALTER TABLE comprovantes ADD COLUMN IF NOT EXISTS xid_alteracao BIGINT;
+ALTER TABLE comprovantes ADD COLUMN IF NOT EXISTS seq_alteracao BIGINT;
+
+-- 1. Marca de alteração
+CREATE OR REPLACE FUNCTION marcar_alteracao_conciliacao()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.xid_alteracao := txid_current();
+    NEW.seq_alteracao := nextval('seq_alteracoes_conciliacao');
+    RETURN NEW;
+END;
+$$;
+
+-- Só colunas que mudam o resultado da conciliação
+DROP TRIGGER IF EXISTS alteracao_transacoes ON transacoes_bancarias;
+CREATE TRIGGER alteracao_transacoes
+BEFORE INSERT OR UPDATE OF valor, data_transacao, nsu, status_reconciliacao, condominio_id
+ON transacoes_bancarias
+FOR EACH ROW EXECUTE FUNCTION marcar_alteracao_conciliacao();
+
+DROP TRIGGER IF EXISTS alteracao_comprovantes ON comprovantes;
+CREATE TRIGGER alteracao_comprovantes
+BEFORE INSERT OR UPDATE OF status, ocr_processado, ocr_valor, ocr_data, ocr_nsu, condominio_id
+ON comprovantes
+FOR EACH ROW EXECUTE FUNCTION marcar_alteracao_conciliacao();
+
+-- Linhas existentes entram no feed uma vez
+UPDATE transacoes_bancarias
+SET xid_alteracao = txid_current(), seq_alteracao = nextval('seq_alteracoes_conciliacao')
+WHERE seq_alteracao IS NULL;
+
+UPDATE comprovantes
+SET xid_alteracao = txid_current(), seq_alteracao = nextval('seq_alteracoes_conciliacao')
+WHERE seq_alteracao IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_transacoes_feed ON transacoes_bancarias (xid_alteracao, seq_alteracao);
+CREATE INDEX IF NOT EXISTS idx_comprovantes_feed ON comprovantes (xid_alteracao, seq_alteracao);
+
+-- 2. Cursores duráveis (um por tabela)
+CREATE TABLE IF NOT EXISTS cursores_conciliacao (
+    nome VARCHAR(50) PRIMARY KEY,
+    ultimo_xid BIGINT NOT NULL DEFAULT 0,
+    ultimo_seq BIGINT NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO cursores_conciliacao (nome) VALUES ('transacoes_bancarias'), ('comprovantes')
+ON CONFLICT (nome) DO NOTHING;
+
+-- 3. Leitura do feed (colunas do matching apenas)
+CREATE OR REPLACE FUNCTION alteracoes_transacoes(p_xid BIGINT, p_seq BIGINT, p_limite INT DEFAULT 500)
+RETURNS TABLE (
+    id UUID,
+    condominio_id VARCHAR,
+    data_transacao DATE,
+    valor NUMERIC,
+    nsu VARCHAR,
+    status_reconciliacao VARCHAR,
+    xid_alteracao BIGINT,
+    seq_alteracao BIGINT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT t.id, t.condominio_id, t.data_transacao, t.valor, t.nsu, t.status_reconciliacao,
+           t.xid_alteracao, t.seq_alteracao
+    FROM transacoes_bancarias t
+    WHERE (t.xid_alteracao, t.seq_alteracao) > (p_xid, p_seq)
+      AND t.xid_alteracao < txid_snapshot_xmin(txid_current_snapshot())
+    ORDER BY t.xid_alteracao, t.seq_alteracao
+    LIMIT p_limite;
+$$;
+
+CREATE OR REPLACE FUNCTION alteracoes_comprovantes(p_xid BIGINT, p_seq BIGINT, p_limite INT DEFAULT 500)
+RETURNS TABLE (
+    id UUID,
+    condominio_id VARCHAR,
+    status VARCHAR,
+    ocr_processado BOOLEAN,
+    ocr_valor NUMERIC,
+    ocr_data DATE,
+    ocr_nsu VARCHAR,
+    xid_alteracao BIGINT,
+    seq_alteracao BIGINT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT c.id, c.condominio_id, c.status, c.ocr_processado, c.ocr_valor, c.ocr_data, c.ocr_nsu,
+           c.xid_alteracao, c.seq_alteracao
+    FROM comprovantes c
+    WHERE (c.xid_alteracao, c.seq_alteracao) > (p_xid, p_seq)
+      AND c.xid_alteracao < txid_snapshot_xmin(txid_current_snapshot())
+    ORDER BY c.xid_alteracao, c.seq_alteracao
+    LIMIT p_limite;
+$$;
+
+COMMENT ON TABLE cursores_conciliacao IS 'Último (xid, seq) consumido pelo conciliador incremental, por tabela';
@@ -0,0 +1,34 @@
+-- Migration 016: Prioridade Composta da Fila de Reconciliação
+-- A prioridade deixa de ser fixa (10 fraude / 5 múltiplos matches): é um
+-- score 0-1000 de valor, fraude, idade frente ao SLA do condomínio e
+-- ambiguidade dos matches, gravado em fila_reconciliacao.prioridade.
+-- O recálculo roda em lote (job periódico), então a leitura da fila segue
+-- sendo um range scan em idx_fila_keyset (migration 011).
+
+ALTER TABLE regras_conciliacao ADD COLUMN IF NOT EXISTS sla_revisao_horas INT;   -- Padrão: 72
+ALTER TABLE fila_reconciliacao ADD COLUMN IF NOT EXISTS prioridade_atualizada_em TIMESTAMP WITH TIME ZONE;
+
+-- Recálculo em lote: um UPDATE para todos os itens alterados.
+-- Só itens ainda em aberto (um item concluído no meio do job não é tocado).
+CREATE OR REPLACE FUNCTION atualizar_prioridades_fila(p_itens JSONB)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_atualizados INT;
+BEGIN
+    UPDATE fila_reconciliacao f
+    SET prioridade = i.prioridade,
+        prioridade_atualizada_em = NOW()
+    FROM jsonb_to_recordset(p_itens) AS i(id UUID, prioridade INT)
+    WHERE f.id = i.id
+      AND f.status IN ('pendente', 'em_revisao')
+      AND f.prioridade IS DISTINCT FROM i.prioridade;
+
+    GET DIAGNOSTICS v_atualizados = ROW_COUNT;
+    RETURN v_atualizados;
+END;
+$$;
+
+COMMENT ON COLUMN regras_conciliacao.sla_revisao_horas IS 'Prazo de revisão manual; itens da fila perto ou além dele sobem de prioridade';
+COMMENT ON COLUMN fila_reconciliacao.prioridade IS 'Score composto 0-1000 (valor, fraude, idade/SLA, ambiguidade), recalculado pelo job reconciliation.rescore_queue';
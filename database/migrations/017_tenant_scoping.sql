@@ -0,0 +1,165 @@
+-- Migration 017: Escopo por Condomínio nas Tabelas de Conciliação
+-- transacoes_bancarias, comprovantes e extratos_bancarios já têm
+-- condominio_id (migrations 009/010); falta a fila. Todos os índices
+-- das leituras da API passam a começar pelo condomínio, então o custo
+-- de cada consulta acompanha os dados de um condomínio, não da plataforma.
+--
+-- Por que índices compostos e não PARTITION BY LIST (condominio_id):
+-- a PK e os UNIQUE de uma tabela particionada precisam incluir a chave de
+-- partição, o que quebra as FKs que apontam para comprovantes(id) e
+-- transacoes_bancarias(id) (fila, sugestões, vínculo transação↔comprovante).
+-- Com milhares de condomínios seriam milhares de partições, e o ganho
+-- sobre um índice que começa pelo condomínio é só no VACUUM/DROP.
+
+-- 1. Condomínio na fila (herdado do comprovante)
+ALTER TABLE fila_reconciliacao ADD COLUMN IF NOT EXISTS condominio_id VARCHAR(255);
+
+UPDATE fila_reconciliacao f
+SET condominio_id = c.condominio_id
+FROM comprovantes c
+WHERE f.comprovante_id = c.id
+  AND f.condominio_id IS NULL
+  AND c.condominio_id IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION preencher_condominio_fila()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.condominio_id IS NULL AND NEW.comprovante_id IS NOT NULL THEN
+        SELECT condominio_id INTO NEW.condominio_id
+        FROM comprovantes
+        WHERE id = NEW.comprovante_id;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_fila_condominio ON fila_reconciliacao;
+CREATE TRIGGER trg_fila_condominio
+BEFORE INSERT ON fila_reconciliacao
+FOR EACH ROW EXECUTE FUNCTION preencher_condominio_fila();
+
+-- 2. Índices por condomínio
+-- Fila: mesma ordem keyset da migration 011, dentro do condomínio
+CREATE INDEX IF NOT EXISTS idx_fila_condominio_keyset
+ON fila_reconciliacao (condominio_id, status, prioridade DESC, criado_em, id);
+
+-- Duplicidade de comprovante no upload
+CREATE INDEX IF NOT EXISTS idx_comprovantes_condominio_hash
+ON comprovantes (condominio_id, arquivo_hash);
+
+-- Listagem de comprovantes (filtro opcional por status)
+CREATE INDEX IF NOT EXISTS idx_comprovantes_condominio_envio
+ON comprovantes (condominio_id, data_envio DESC);
+
+-- Listagem de extratos e transações de um extrato
+CREATE INDEX IF NOT EXISTS idx_extratos_condominio_importacao
+ON extratos_bancarios (condominio_id, data_importacao DESC);
+
+CREATE INDEX IF NOT EXISTS idx_transacoes_condominio_extrato
+ON transacoes_bancarias (condominio_id, extrato_id, status_reconciliacao);
+
+-- 3. Decisões em lote restritas ao condomínio
+-- Comprovante ou transação de outro condomínio é tratado como inexistente.
+-- p_condominio_id NULL = sem restrição (chamadas antigas).
+DROP FUNCTION IF EXISTS decidir_conciliacoes_em_lote(JSONB);
+
+CREATE OR REPLACE FUNCTION decidir_conciliacoes_em_lote(
+    p_decisoes JSONB,
+    p_condominio_id VARCHAR DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_lote UUID := uuid_generate_v4();
+    v_resultados JSONB;
+BEGIN
+    WITH entrada AS (
+        SELECT d.ordem, d.comprovante_id, d.transacao_id, d.decisao, d.motivo_decisao
+        FROM ROWS FROM (
+            jsonb_to_recordset(p_decisoes) AS (comprovante_id UUID, transacao_id UUID, decisao TEXT, motivo_decisao TEXT)
+        ) WITH ORDINALITY AS d(comprovante_id, transacao_id, decisao, motivo_decisao, ordem)
+    ),
+    comprovantes_travados AS (
+        SELECT c.id, c.status
+        FROM comprovantes c
+        WHERE c.id IN (SELECT comprovante_id FROM entrada)
+          AND (p_condominio_id IS NULL OR c.condominio_id = p_condominio_id)
+        FOR UPDATE
+    ),
+    transacoes_travadas AS (
+        SELECT t.id, t.status_reconciliacao
+        FROM transacoes_bancarias t
+        WHERE t.id IN (SELECT transacao_id FROM entrada WHERE decisao = 'aprovar')
+          AND (p_condominio_id IS NULL OR t.condominio_id = p_condominio_id)
+        FOR UPDATE
+    ),
+    classificadas AS (
+        SELECT e.*,
+            CASE
+                WHEN e.decisao NOT IN ('aprovar', 'rejeitar') THEN 'decisao_invalida'
+                WHEN COUNT(*) OVER (PARTITION BY e.comprovante_id) > 1 THEN 'comprovante_repetido'
+                WHEN c.id IS NULL THEN 'comprovante_inexistente'
+                WHEN c.status IN ('aprovado', 'rejeitado') THEN 'comprovante_ja_decidido'
+                WHEN e.decisao = 'rejeitar' THEN 'aplicado'
+                WHEN e.transacao_id IS NULL THEN 'transacao_obrigatoria'
+                WHEN t.id IS NULL THEN 'transacao_inexistente'
+                WHEN t.status_reconciliacao NOT IN ('pendente', 'divergente') THEN 'transacao_ja_conciliada'
+                WHEN SUM(CASE WHEN e.decisao = 'aprovar' THEN 1 ELSE 0 END)
+                     OVER (PARTITION BY e.transacao_id) > 1 THEN 'transacao_repetida'
+                ELSE 'aplicado'
+            END AS resultado
+        FROM entrada e
+        LEFT JOIN comprovantes_travados c ON c.id = e.comprovante_id
+        LEFT JOIN transacoes_travadas t ON t.id = e.transacao_id AND e.decisao = 'aprovar'
+    ),
+    comprovantes_atualizados AS (
+        UPDATE comprovantes c
+        SET status = CASE WHEN k.decisao = 'aprovar' THEN 'aprovado' ELSE 'rejeitado' END,
+            transacao_id = CASE WHEN k.decisao = 'aprovar' THEN k.transacao_id ELSE c.transacao_id END,
+            motivo_decisao = k.motivo_decisao
+        FROM classificadas k
+        WHERE c.id = k.comprovante_id AND k.resultado = 'aplicado'
+        RETURNING c.id
+    ),
+    transacoes_atualizadas AS (
+        UPDATE transacoes_bancarias t
+        SET status_reconciliacao = 'reconciliado',
+            comprovante_id = k.comprovante_id
+        FROM classificadas k
+        WHERE t.id = k.transacao_id AND k.decisao = 'aprovar' AND k.resultado = 'aplicado'
+        RETURNING t.id
+    ),
+    fila_atualizada AS (
+        UPDATE fila_reconciliacao f
+        SET status = 'concluido',
+            concluido_em = NOW()
+        FROM classificadas k
+        WHERE f.comprovante_id = k.comprovante_id
+          AND k.resultado = 'aplicado'
+          AND f.status IN ('pendente', 'em_revisao')
+        RETURNING f.id
+    ),
+    auditoria AS (
+        INSERT INTO decisoes_reconciliacao (lote_id, comprovante_id, transacao_id, decisao, resultado, motivo_decisao, decidido_por)
+        SELECT v_lote, k.comprovante_id, k.transacao_id, k.decisao, k.resultado, k.motivo_decisao, auth.uid()
+        FROM classificadas k
+        RETURNING id
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'comprovante_id', k.comprovante_id,
+        'transacao_id', k.transacao_id,
+        'decisao', k.decisao,
+        'resultado', k.resultado
+    ) ORDER BY k.ordem), '[]'::jsonb)
+    INTO v_resultados
+    FROM classificadas k;
+
+    RETURN jsonb_build_object('lote_id', v_lote, 'resultados', v_resultados);
+END;
+$$;
+
+COMMENT ON FUNCTION decidir_conciliacoes_em_lote IS 'Aprova/rejeita comprovantes em lote numa única transação, restrito ao condomínio quando informado (chamada via RPC)';
+COMMENT ON COLUMN fila_reconciliacao.condominio_id IS 'Condomínio do comprovante (preenchido por trg_fila_condominio); escopo das leituras da fila';
@@ -0,0 +1,68 @@
+-- Migration 018: Sincronização Incremental do Open Finance
+-- Cada sync relia os últimos `days_back` dias e deduplicava linha a linha
+-- (e só pelo NSU dentro do extrato sintético do dia). Agora cada conta tem
+-- uma marca d'água (última data/id de transação e o maior updatedAt do
+-- provider): o sync pede só o delta mais uma janela curta de sobreposição,
+-- e a deduplicação é feita pelo índice único do id da transação no provider
+-- (INSERT ... ON CONFLICT DO NOTHING num único upsert).
+
+-- 1. Identidade da transação no provider
+ALTER TABLE transacoes_bancarias ADD COLUMN IF NOT EXISTS provider VARCHAR(20);
+ALTER TABLE transacoes_bancarias ADD COLUMN IF NOT EXISTS provider_transacao_id VARCHAR(255);
+ALTER TABLE transacoes_bancarias ADD COLUMN IF NOT EXISTS provider_conta_id VARCHAR(255);
+ALTER TABLE transacoes_bancarias ADD COLUMN IF NOT EXISTS provider_atualizado_em TIMESTAMP WITH TIME ZONE;
+ALTER TABLE transacoes_bancarias ADD COLUMN IF NOT EXISTS metadata JSONB;
+
+-- Transações já sincronizadas usavam o id do provider como NSU. O mesmo NSU
+-- pode aparecer em vários extratos sintéticos (um por dia de sync): só uma
+-- cópia por NSU recebe o id (a já conciliada, senão a mais antiga); as
+-- demais ficam com provider_transacao_id NULL, como linhas de extrato
+-- importado, e não violam o índice único abaixo
+UPDATE transacoes_bancarias t
+SET provider = 'pluggy',
+    provider_transacao_id = t.nsu
+FROM (
+    SELECT DISTINCT ON (t.nsu) t.id
+    FROM transacoes_bancarias t
+    JOIN extratos_bancarios e ON e.id = t.extrato_id
+    WHERE e.fonte = 'open_finance'
+      AND t.nsu IS NOT NULL
+    ORDER BY t.nsu, (t.status_reconciliacao = 'pendente'), t.criado_em, t.id
+) escolhida
+WHERE t.id = escolhida.id
+  AND t.provider_transacao_id IS NULL
+  AND NOT EXISTS (
+      SELECT 1 FROM transacoes_bancarias d
+      WHERE d.provider = 'pluggy' AND d.provider_transacao_id = t.nsu
+  );
+
+-- UNIQUE sem predicado (o on_conflict do PostgREST não aceita índice parcial);
+-- linhas de extrato importado têm provider_transacao_id NULL e nunca conflitam
+ALTER TABLE transacoes_bancarias DROP CONSTRAINT IF EXISTS uq_transacoes_provider_id;
+ALTER TABLE transacoes_bancarias
+ADD CONSTRAINT uq_transacoes_provider_id UNIQUE (provider, provider_transacao_id);
+
+-- Listagem das transações sincronizadas de uma conta
+CREATE INDEX IF NOT EXISTS idx_transacoes_provider_conta
+ON transacoes_bancarias (provider_conta_id, data_transacao DESC)
+WHERE provider_conta_id IS NOT NULL;
+
+-- 2. Marca d'água por conta
+CREATE TABLE IF NOT EXISTS sincronizacao_contas (
+    provider VARCHAR(20) NOT NULL,
+    conta_id VARCHAR(255) NOT NULL,
+    condominio_id VARCHAR(255),
+    ultima_data_transacao DATE,
+    ultimo_transacao_id VARCHAR(255),
+    ultimo_atualizado_em TIMESTAMP WITH TIME ZONE,
+    transacoes_sincronizadas BIGINT NOT NULL DEFAULT 0,
+    sincronizado_em TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+
+    PRIMARY KEY (provider, conta_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sincronizacao_contas_condominio
+ON sincronizacao_contas (condominio_id);
+
+COMMENT ON TABLE sincronizacao_contas IS 'Marca d''água do sync incremental do Open Finance, por conta no provider';
+COMMENT ON COLUMN sincronizacao_contas.ultimo_atualizado_em IS 'Maior updatedAt visto: transações da janela de sobreposição sem alteração posterior são descartadas antes do upsert';
@@ -0,0 +1,94 @@
+-- Migration 019: Agendador de Sincronização da Frota de Contas
+-- O sync do Open Finance era manual, conta a conta. O job sync.dispatch
+-- (Celery Beat, a cada minuto) escolhe as contas ativas cujo horário cai
+-- no minuto corrente (espalhadas pela hora por hash da conta; contas de
+-- condomínios com comprovantes pendentes a cada 15 min), divide em shards
+-- e cada shard consome um orçamento global de chamadas ao provider.
+
+-- 1. Histórico de execuções por conta
+CREATE TABLE IF NOT EXISTS execucoes_sincronizacao (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    provider VARCHAR(20) NOT NULL,
+    conta_id VARCHAR(255) NOT NULL,
+    condominio_id VARCHAR(255),
+    shard INT,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('sucesso', 'erro')),
+    desde DATE,
+    recebidas INT NOT NULL DEFAULT 0,
+    novas INT NOT NULL DEFAULT 0,
+    erro TEXT,
+    iniciado_em TIMESTAMP WITH TIME ZONE NOT NULL,
+    duracao_ms INT
+);
+
+CREATE INDEX IF NOT EXISTS idx_execucoes_sincronizacao_conta
+ON execucoes_sincronizacao (provider, conta_id, iniciado_em DESC);
+
+-- 2. Orçamento global de chamadas ao provider (janela fixa por minuto)
+CREATE TABLE IF NOT EXISTS orcamento_provider (
+    provider VARCHAR(20) NOT NULL,
+    janela TIMESTAMP WITH TIME ZONE NOT NULL,
+    usado INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (provider, janela)
+);
+
+-- Reserva até p_quantidade unidades na janela corrente e devolve quantas
+-- foram concedidas (0..p_quantidade). A linha da janela é travada, então
+-- shards concorrentes nunca ultrapassam p_limite somados.
+CREATE OR REPLACE FUNCTION reservar_orcamento_provider(
+    p_provider VARCHAR,
+    p_quantidade INT,
+    p_limite INT,
+    p_janela_segundos INT DEFAULT 60
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_janela TIMESTAMP WITH TIME ZONE :=
+        to_timestamp(floor(extract(epoch FROM clock_timestamp()) / p_janela_segundos) * p_janela_segundos);
+    v_usado INT;
+    v_concedido INT;
+BEGIN
+    INSERT INTO orcamento_provider (provider, janela, usado)
+    VALUES (p_provider, v_janela, 0)
+    ON CONFLICT (provider, janela) DO NOTHING;
+
+    SELECT usado INTO v_usado
+    FROM orcamento_provider
+    WHERE provider = p_provider AND janela = v_janela
+    FOR UPDATE;
+
+    v_concedido := GREATEST(0, LEAST(p_quantidade, p_limite - v_usado));
+
+    UPDATE orcamento_provider
+    SET usado = usado + v_concedido
+    WHERE provider = p_provider AND janela = v_janela;
+
+    DELETE FROM orcamento_provider
+    WHERE provider = p_provider AND janela < v_janela - INTERVAL '1 hour';
+
+    RETURN v_concedido;
+END;
+$$;
+
+-- 3. Comprovantes pendentes por condomínio (prioridade do agendador)
+CREATE INDEX IF NOT EXISTS idx_comprovantes_pendentes_condominio
+ON comprovantes (condominio_id)
+WHERE status = 'pendente';
+
+CREATE OR REPLACE FUNCTION comprovantes_pendentes_por_condominio()
+RETURNS TABLE (condominio_id VARCHAR, pendentes BIGINT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT c.condominio_id, COUNT(*)
+    FROM comprovantes c
+    WHERE c.status = 'pendente'
+      AND c.condominio_id IS NOT NULL
+    GROUP BY c.condominio_id;
+$$;
+
+COMMENT ON TABLE execucoes_sincronizacao IS 'Uma linha por sincronização executada pelo agendador (sync.run_shard)';
+COMMENT ON FUNCTION reservar_orcamento_provider IS 'Rate limit global do sync: unidades concedidas na janela corrente, somadas entre todos os workers';
@@ -0,0 +1,26 @@
+-- Migration 020: Webhooks da Pluggy
+-- item/updated e transactions/created disparam o sync incremental só da
+-- conta afetada (task sync.account), em vez de esperar o horário dela no
+-- agendador. A Pluggy reentrega o mesmo evento quando não recebe 2xx a
+-- tempo: a chave (provider, evento_id) torna a ingestão idempotente.
+
+CREATE TABLE IF NOT EXISTS webhook_eventos (
+    provider VARCHAR(20) NOT NULL,
+    evento_id VARCHAR(255) NOT NULL,
+    evento VARCHAR(100) NOT NULL,
+    item_id VARCHAR(255),
+    conta_id VARCHAR(255),
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    recebido_em TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (provider, evento_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_webhook_eventos_recebido_em
+ON webhook_eventos (recebido_em);
+
+-- item/updated chega só com o itemId
+CREATE INDEX IF NOT EXISTS idx_condominio_contas_pluggy_item
+ON condominio_contas_bancarias (pluggy_item_id);
+
+COMMENT ON TABLE webhook_eventos IS 'Entregas de webhook já aceitas (deduplicação de reentregas)';
@@ -0,0 +1,16 @@
+-- Migration 021: Backoff de Erro e Reserva de Despacho no Agendador de Sync
+-- Conta com erro (item desconectado, credencial revogada) ficava devida em
+-- todo tick: era reenfileirada a cada minuto e gastava orçamento do provider
+-- que as contas saudáveis precisavam. E uma conta cujo shard ainda estava na
+-- fila do broker era despachada de novo no tick seguinte.
+-- Agora cada erro seguido dobra a espera até a próxima tentativa, e a conta
+-- despachada fica reservada até o shard terminar (ou a reserva expirar,
+-- se o worker morreu).
+
+ALTER TABLE condominio_contas_bancarias ADD COLUMN IF NOT EXISTS falhas_sincronizacao INT NOT NULL DEFAULT 0;
+ALTER TABLE condominio_contas_bancarias ADD COLUMN IF NOT EXISTS proxima_tentativa TIMESTAMP WITH TIME ZONE;
+ALTER TABLE condominio_contas_bancarias ADD COLUMN IF NOT EXISTS sincronizacao_enfileirada_em TIMESTAMP WITH TIME ZONE;
+
+COMMENT ON COLUMN condominio_contas_bancarias.falhas_sincronizacao IS 'Sincronizações seguidas com erro (zera no primeiro sucesso)';
+COMMENT ON COLUMN condominio_contas_bancarias.proxima_tentativa IS 'Depois de um erro, a conta só volta a ser devida a partir daqui (backoff exponencial)';
+COMMENT ON COLUMN condominio_contas_bancarias.sincronizacao_enfileirada_em IS 'Despachada para um shard ainda não concluído: o dispatcher não a enfileira de novo';
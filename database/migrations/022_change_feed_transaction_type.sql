@@ -0,0 +1,37 @@
+-- Migration 022: Tipo da Transação no Feed de Alterações
+-- O conciliador decide o que é crédito pelo tipo (o sync do Open Finance
+-- grava débitos com valor positivo); o feed passa a devolver a coluna e
+-- mudança de tipo volta a marcar a linha para o conciliador incremental.
+
+DROP TRIGGER IF EXISTS alteracao_transacoes ON transacoes_bancarias;
+CREATE TRIGGER alteracao_transacoes
+BEFORE INSERT OR UPDATE OF valor, tipo, data_transacao, nsu, status_reconciliacao, condominio_id
+ON transacoes_bancarias
+FOR EACH ROW EXECUTE FUNCTION marcar_alteracao_conciliacao();
+
+-- Tipo de retorno mudou: CREATE OR REPLACE não basta
+DROP FUNCTION IF EXISTS alteracoes_transacoes(BIGINT, BIGINT, INT);
+
+CREATE FUNCTION alteracoes_transacoes(p_xid BIGINT, p_seq BIGINT, p_limite INT DEFAULT 500)
+RETURNS TABLE (
+    id UUID,
+    condominio_id VARCHAR,
+    data_transacao DATE,
+    valor NUMERIC,
+    tipo VARCHAR,
+    nsu VARCHAR,
+    status_reconciliacao VARCHAR,
+    xid_alteracao BIGINT,
+    seq_alteracao BIGINT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT t.id, t.condominio_id, t.data_transacao, t.valor, t.tipo, t.nsu, t.status_reconciliacao,
+           t.xid_alteracao, t.seq_alteracao
+    FROM transacoes_bancarias t
+    WHERE (t.xid_alteracao, t.seq_alteracao) > (p_xid, p_seq)
+      AND t.xid_alteracao < txid_snapshot_xmin(txid_current_snapshot())
+    ORDER BY t.xid_alteracao, t.seq_alteracao
+    LIMIT p_limite;
+$$;
@@ -48,7 +48,7 @@ const mockQueue: QueueItem[] = [
         data: '2025-12-28',
         status: 'pendente',
         matchCount: 2,
-        prioridade: 8,
+        prioridade: 820,
         ocrConfianca: 96
     },
     {
@@ -59,7 +59,7 @@ const mockQueue: QueueItem[] = [
         data: '2025-12-27',
         status: 'pendente',
         matchCount: 1,
-        prioridade: 5,
+        prioridade: 510,
         ocrConfianca: 88
     },
     {
@@ -70,7 +70,7 @@ const mockQueue: QueueItem[] = [
         data: '2025-12-25',
         status: 'pendente',
         matchCount: 0,
-        prioridade: 3,
+        prioridade: 260,
         ocrConfianca: 72
     },
 ]
@@ -279,8 +279,8 @@ export function ReconciliationQueue() {
                                     </div>
                                     <span className={cn(
                                         "px-3 py-1 rounded-full text-xs font-medium",
-                                        selectedItem.prioridade >= 7 ? "bg-rose-100 text-rose-700" :
-                                            selectedItem.prioridade >= 4 ? "bg-amber-100 text-amber-700" : "bg-gray-100 text-gray-700"
+                                        selectedItem.prioridade >= 700 ? "bg-rose-100 text-rose-700" :
+                                            selectedItem.prioridade >= 400 ? "bg-amber-100 text-amber-700" : "bg-gray-100 text-gray-700"
                                     )}>
                                         Prioridade {selectedItem.prioridade}
                                     </span>
@@ -6,6 +6,7 @@ export function StatementUpload() {
     const [uploading, setUploading] = useState(false)
     const [uploadStatus, setUploadStatus] = useState<'idle' | 'success' | 'error'>('idle')
     const [message, setMessage] = useState('')
+    const condominioId = '00000000-0000-0000-0000-000000000001' // Em produção, vem do contexto/auth
 
     const handleFileUpload = async (file: File) => {
         setUploading(true)
@@ -13,6 +14,7 @@ export function StatementUpload() {
 
         const formData = new FormData()
         formData.append('file', file)
+        formData.append('condominio_id', condominioId)
 
         try {
             const response = await fetch('http://localhost:8000/api/v1/statements/upload', {
@@ -29,6 +29,7 @@ export function TenantReceiptUpload({ condominioId, unidadeId }: TenantReceiptUp
             // 1. Upload the file
             const formData = new FormData()
             formData.append('file', file)
+            formData.append('condominio_id', condominioId)
             if (unidadeId) formData.append('unidade', unidadeId)
 
             const uploadResponse = await fetch('http://localhost:8000/api/v1/receipts/upload', {
@@ -45,7 +46,7 @@ export function TenantReceiptUpload({ condominioId, unidadeId }: TenantReceiptUp
 
             // 2. Process OCR
             const ocrResponse = await fetch(
-                `http://localhost:8000/api/v1/receipts/${receiptId}/process-ocr`,
+                `http://localhost:8000/api/v1/receipts/${receiptId}/process-ocr?condominio_id=${condominioId}`,
                 { method: 'POST' }
             )
 
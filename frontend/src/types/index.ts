@@ -19,6 +19,7 @@ export interface BankStatement {
     periodo_inicio?: string
     periodo_fim?: string
     fonte: 'manual' | 'open_finance'
+    condominio_id?: string
     criado_por?: string
 }
 
@@ -36,6 +37,7 @@ export interface BankTransaction {
     conta_destino?: string
     status_reconciliacao: ReconciliationStatus
     comprovante_id?: string
+    condominio_id?: string
     criado_em: string
 }
 
@@ -49,6 +51,7 @@ export interface Receipt {
     tamanho_bytes?: number
     enviado_por?: string
     unidade?: string
+    condominio_id?: string
     data_envio: string
 
     // OCR
@@ -88,16 +91,45 @@ export interface TransactionMatch {
     match_reasons: string[]
 }
 
+// Receipt summary embedded in queue items (no OCR full text)
+export interface QueueReceiptSummary {
+    id: string
+    unidade?: string
+    arquivo_nome?: string
+    ocr_valor?: number
+    ocr_data?: string
+    ocr_nsu?: string
+    fraud_score?: number
+    data_envio?: string
+}
+
 // Reconciliation Queue Item
 export interface ReconciliationQueueItem {
     id: string
     comprovante_id: string
-    prioridade: number
+    condominio_id?: string
+    prioridade: number  // Score composto 0-1000 (maior = mais urgente)
     tipo: QueueType
     matches_sugeridos: TransactionMatch[]
     status: QueueStatus
     criado_em: string
     atribuido_a?: string
+    comprovante?: QueueReceiptSummary
+}
+
+// Keyset-paginated queue page (send next_cursor back as ?cursor=)
+export interface ReconciliationQueuePage {
+    items: ReconciliationQueueItem[]
+    next_cursor?: string
+}
+
+// Evento SSE de /reconciliation/queue/events ("resync" = recarregar a fila)
+export interface ReconciliationQueueEvent {
+    id: string  // "<época>-<seq>" do worker da API
+    type: 'insert' | 'update' | 'remove' | 'resync'
+    comprovante_id?: string
+    item: Partial<ReconciliationQueueItem>
+    at: string
 }
 
 // API Request types
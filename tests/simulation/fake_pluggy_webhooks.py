@@ -0,0 +1,60 @@
+"""
+Fake Pluggy Webhooks - Remetente Local de Eventos da Pluggy
+Monta entregas como as da Pluggy (item/updated, transactions/created),
+com o header de segredo cadastrado no webhook, e envia por qualquer
+cliente com a interface do httpx (httpx.Client apontando para a API local
+ou o TestClient do FastAPI). Também reproduz reentregas e segredos errados.
+
+    sender = FakePluggyWebhookSender(client, secret="segredo")
+    sender.transactions_created("item_1", "acc_1", count=3)
+    sender.redeliver()      # Mesma entrega, mesmo eventId
+"""
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+DEFAULT_PATH = "/api/v1/webhooks/pluggy"
+SECRET_HEADER = "X-Webhook-Secret"
+
+class FakePluggyWebhookSender:
+    def __init__(self, client, secret: str, path: str = DEFAULT_PATH):
+        self.client = client
+        self.secret = secret
+        self.path = path
+        self.deliveries: List[Dict[str, Any]] = []     # [{payload, body, response}]
+
+    def item_updated(self, item_id: str, **extra):
+        return self.send({"event": "item/updated", "itemId": item_id, **extra})
+
+    def transactions_created(self, item_id: str, account_id: str, count: int = 1, **extra):
+        now = datetime.now(timezone.utc).isoformat()
+        return self.send({
+            "event": "transactions/created",
+            "itemId": item_id,
+            "accountId": account_id,
+            "transactionsCount": count,
+            "transactionsCreatedAtFrom": now,
+            "createdTransactionsLink": f"https://api.pluggy.ai/transactions?accountId={account_id}&createdAtFrom={now}",
+            **extra
+        })
+
+    def send(self, payload: Dict[str, Any], secret: Optional[str] = None):
+        """`secret` substitui o header desta entrega ("" = sem o header)"""
+        payload = {"eventId": str(uuid.uuid4()), **payload}
+        body = json.dumps(payload).encode()
+        return self._post(payload, body, secret)
+
+    def redeliver(self, index: int = -1):
+        """Reenvia uma entrega anterior byte a byte (como a Pluggy faz sem 2xx a tempo)"""
+        delivery = self.deliveries[index]
+        return self._post(delivery["payload"], delivery["body"], None)
+
+    def _post(self, payload: Dict[str, Any], body: bytes, secret: Optional[str]):
+        headers = {"Content-Type": "application/json"}
+        secret = self.secret if secret is None else secret
+        if secret:
+            headers[SECRET_HEADER] = secret
+        response = self.client.post(self.path, content=body, headers=headers)
+        self.deliveries.append({"payload": payload, "body": body, "response": response})
+        return response
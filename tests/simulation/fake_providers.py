@@ -0,0 +1,418 @@
+"""
+Fake Providers - Pluggy, Belvo e CNPJ.ws Locais para Teste de Carga
+Um app ASGI (FastAPI) que responde os endpoints usados pelos adapters e
+pelo CNPJWSProvider, com dataset determinístico e perfil de carga por
+provider (latência com cauda, taxa de erro, rate limit):
+
+- Pluggy: POST /auth, POST /connect_token, GET /accounts, GET /accounts/{id},
+  GET /transactions (page/pageSize, total/totalPages)
+- Belvo: POST /api/token/, GET /api/accounts/, GET /api/accounts/{id}/,
+  GET /api/transactions/ (page/page_size, `next`)
+- CNPJ.ws: GET /cnpj/{cnpj} (pública e comercial)
+
+Roteia pelo host do provider real (api.pluggy.ai, api.belvo.com,
+publica.cnpj.ws...), então o código de produção roda sem mudar URLs:
+install() coloca o app no pool compartilhado do loop corrente
+(http_client), como os testes fazem com o MockTransport. Servido à parte
+(uvicorn), as rotas ficam sob /pluggy, /belvo e /cnpjws.
+
+Uso:
+    server = FakeProviderServer(FakeProvidersConfig(transactions_per_account=500))
+    server.install()                  # dentro do loop que vai rodar a carga
+    python3 tests/simulation/fake_providers.py --port 8099   # servidor standalone
+"""
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter, deque
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+import httpx
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+PROVIDER_HOSTS = {
+    "api.pluggy.ai": "pluggy",
+    "api.belvo.com": "belvo",
+    "publica.cnpj.ws": "cnpjws",
+    "comercial.cnpj.ws": "cnpjws",
+}
+PLUGGY_MAX_PAGE_SIZE = 500
+BELVO_MAX_PAGE_SIZE = 1000
+
+CNAES = [
+    ("4321500", "Instalação e manutenção elétrica"),
+    ("8121400", "Limpeza em prédios e em domicílios"),
+    ("8011101", "Atividades de vigilância e segurança privada"),
+    ("4329103", "Instalação, manutenção e reparação de elevadores"),
+    ("8130300", "Atividades paisagísticas"),
+]
+DESCRIPTIONS = {
+    "credito": ["PIX RECEBIDO", "TED RECEBIDA", "LIQUIDACAO BOLETO"],
+    "debito": ["PIX ENVIADO", "PAGAMENTO BOLETO", "TARIFA BANCARIA"],
+}
+
+class ProviderProfile(BaseModel):
+    """Comportamento de um provider sob carga"""
+    latency_ms: float = 80.0
+    jitter_ms: float = 40.0             # Média da cauda exponencial somada à latência base
+    error_rate: float = 0.0             # Fração de respostas 503
+    rate_limit_per_minute: int = 0      # 0 = sem limite; acima, 429 com Retry-After
+
+class FakeProvidersConfig(BaseModel):
+    pluggy: ProviderProfile = ProviderProfile()
+    belvo: ProviderProfile = ProviderProfile(latency_ms=120.0, jitter_ms=60.0)
+    cnpjws: ProviderProfile = ProviderProfile(latency_ms=150.0, jitter_ms=100.0)
+    items: int = 20
+    accounts_per_item: int = 2
+    transactions_per_account: int = 200
+    days: int = 30                      # Janela das transações (o primeiro sync busca 30 dias)
+    cnpjs: int = 100
+    inactive_cnpj_rate: float = 0.05    # Fornecedores com situação BAIXADA
+    seed: int = 42
+
+class FakeDataset:
+    """Itens, contas, transações e fornecedores gerados a partir da seed"""
+
+    def __init__(self, config: FakeProvidersConfig, today: Optional[date] = None):
+        self.config = config
+        self.today = today or date.today()
+        rng = random.Random(config.seed)
+
+        self.items = [f"item_{i:04d}" for i in range(config.items)]
+        self.accounts: Dict[str, str] = {
+            f"acc_{i:04d}_{n}": item
+            for i, item in enumerate(self.items)
+            for n in range(config.accounts_per_item)
+        }
+        self.balances = {account: round(rng.uniform(5_000, 250_000), 2) for account in self.accounts}
+        self.cnpjs: Dict[str, Dict[str, Any]] = {}
+        for i in range(config.cnpjs):
+            cnpj = f"{rng.randrange(10**7, 10**8)}0001{rng.randrange(10, 100)}"
+            code, description = rng.choice(CNAES)
+            self.cnpjs[cnpj] = {
+                "razao_social": f"FORNECEDOR {i:04d} LTDA",
+                "situacao": "Baixada" if rng.random() < config.inactive_cnpj_rate else "Ativa",
+                "cnae": (code, description),
+            }
+        self._transactions: Dict[str, List[Dict[str, Any]]] = {}
+
+    def transactions(self, account_id: str) -> List[Dict[str, Any]]:
+        """Transações da conta, mais recentes primeiro (geradas na primeira leitura)"""
+        cached = self._transactions.get(account_id)
+        if cached is not None:
+            return cached
+
+        rng = random.Random(f"{self.config.seed}:{account_id}")
+        rows = []
+        for n in range(self.config.transactions_per_account):
+            kind = "credito" if rng.random() < 0.7 else "debito"
+            tx_date = self.today - timedelta(days=rng.randrange(self.config.days))
+            amount = rng.choice([650.0, 850.0, 1200.0]) if kind == "credito" else round(rng.uniform(50, 8000), 2)
+            rows.append({
+                "id": f"{account_id}_tx_{n:05d}",
+                "date": tx_date,
+                "amount": amount if kind == "credito" else -amount,
+                "description": rng.choice(DESCRIPTIONS[kind]),
+                "kind": kind,
+                "updated_at": f"{tx_date.isoformat()}T{rng.randrange(6, 22):02d}:{rng.randrange(60):02d}:00.000Z",
+                "payer_document": f"{rng.randrange(10**10, 10**11)}" if kind == "credito" else None,
+            })
+        rows.sort(key=lambda row: (row["date"], row["id"]), reverse=True)
+        self._transactions[account_id] = rows
+        return rows
+
+    def window(self, account_id: str, since: Optional[str], until: Optional[str]) -> List[Dict[str, Any]]:
+        start = date.fromisoformat(since[:10]) if since else date.min
+        end = date.fromisoformat(until[:10]) if until else date.max
+        return [row for row in self.transactions(account_id) if start <= row["date"] <= end]
+
+def pluggy_transaction(row: Dict[str, Any]) -> Dict[str, Any]:
+    payment_data = None
+    if row["payer_document"]:
+        payment_data = {"paymentMethod": "PIX", "payer": {"documentNumber": {"type": "CPF", "value": row["payer_document"]}}}
+    return {
+        "id": row["id"],
+        "description": row["description"],
+        "amount": row["amount"],
+        "date": f"{row['date'].isoformat()}T12:00:00.000Z",
+        "type": "CREDIT" if row["kind"] == "credito" else "DEBIT",
+        "category": "Transfer",
+        "updatedAt": row["updated_at"],
+        "paymentData": payment_data,
+    }
+
+def belvo_transaction(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "amount": abs(row["amount"]),
+        "value_date": row["date"].isoformat(),
+        "description": row["description"],
+        "type": "INFLOW" if row["kind"] == "credito" else "OUTFLOW",
+        "category": "Transfers",
+        "merchant": None,
+    }
+
+def paginate(rows: List[Any], page: int, size: int) -> Tuple[List[Any], int]:
+    """(linhas da página, total de páginas)"""
+    total_pages = max(1, -(-len(rows) // size))
+    return rows[(page - 1) * size:page * size], total_pages
+
+class ProviderRouter:
+    """ASGI: requests para o host de um provider real viram /<provider>/<caminho>"""
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            host = dict(scope["headers"]).get(b"host", b"").decode().split(":")[0]
+            prefix = PROVIDER_HOSTS.get(host)
+            if prefix:
+                path = f"/{prefix}{scope['path']}"
+                scope = {**scope, "path": path, "raw_path": path.encode(), "state": {**scope.get("state", {}), "public_base": f"https://{host}"}}
+        await self.app(scope, receive, send)
+
+class FakeProviderServer:
+    """Servidor fake com dataset, perfis de carga e contadores por provider e status"""
+
+    def __init__(self, config: Optional[FakeProvidersConfig] = None):
+        self.config = config or FakeProvidersConfig()
+        self.dataset = FakeDataset(self.config)
+        self.stats: Counter = Counter()             # (provider, status) -> requests
+        self.in_flight: Counter = Counter()
+        self.max_in_flight: Counter = Counter()
+        self._rng = random.Random(self.config.seed)
+        self._windows: Dict[str, deque] = {}
+        self._api_keys = set()
+        self.app = ProviderRouter(self._build())
+
+    def profile(self, provider: str) -> ProviderProfile:
+        return getattr(self.config, provider)
+
+    def install(self):
+        """Serve o pool compartilhado do loop corrente por este app (clients com e sem verificação SSL)"""
+        from app.services import http_client
+        loop = asyncio.get_running_loop()
+        transport = httpx.ASGITransport(app=self.app)
+        http_client._clients[loop] = {
+            verify: httpx.AsyncClient(transport=transport, timeout=http_client.DEFAULT_TIMEOUT)
+            for verify in (True, False)
+        }
+
+    def requests(self, provider: Optional[str] = None, status: Optional[int] = None) -> int:
+        return sum(
+            count for (p, s), count in self.stats.items()
+            if (provider is None or p == provider) and (status is None or s == status)
+        )
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        providers = sorted({p for p, _ in self.stats})
+        return {
+            p: {
+                "requests": self.requests(p),
+                "por_status": {str(s): c for (q, s), c in sorted(self.stats.items()) if q == p},
+                "pico_concorrencia": self.max_in_flight[p],
+            }
+            for p in providers
+        }
+
+    def _rate_limited(self, provider: str, limit: int) -> Optional[float]:
+        """Segundos até liberar, se a janela de 60 s do provider está cheia"""
+        now = time.monotonic()
+        window = self._windows.setdefault(provider, deque())
+        while window and now - window[0] >= 60:
+            window.popleft()
+        if len(window) >= limit:
+            return 60 - (now - window[0])
+        window.append(now)
+        return None
+
+    async def _simulate(self, request: Request, call_next):
+        provider = request.url.path.split("/")[1]
+        if provider not in ("pluggy", "belvo", "cnpjws"):
+            return await call_next(request)
+
+        profile = self.profile(provider)
+        self.in_flight[provider] += 1
+        self.max_in_flight[provider] = max(self.max_in_flight[provider], self.in_flight[provider])
+        try:
+            delay = profile.latency_ms + (self._rng.expovariate(1 / profile.jitter_ms) if profile.jitter_ms > 0 else 0)
+            await asyncio.sleep(delay / 1000)
+
+            retry_after = self._rate_limited(provider, profile.rate_limit_per_minute) if profile.rate_limit_per_minute else None
+            if retry_after is not None:
+                response = JSONResponse({"message": "Too Many Requests"}, status_code=429, headers={"Retry-After": f"{retry_after:.0f}"})
+            elif profile.error_rate and self._rng.random() < profile.error_rate:
+                response = JSONResponse({"message": "Service Unavailable"}, status_code=503)
+            else:
+                response = await call_next(request)
+        finally:
+            self.in_flight[provider] -= 1
+        self.stats[(provider, response.status_code)] += 1
+        return response
+
+    def _public_base(self, request: Request, provider: str) -> str:
+        return request.scope.get("state", {}).get("public_base") or f"{str(request.base_url).rstrip('/')}/{provider}"
+
+    def _require_api_key(self, request: Request):
+        if request.headers.get("X-API-KEY") not in self._api_keys:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+
+    def _require_basic_auth(self, request: Request):
+        if not request.headers.get("authorization", "").startswith("Basic "):
+            raise HTTPException(status_code=401, detail="Missing credentials")
+
+    def _account(self, account_id: str) -> str:
+        if account_id not in self.dataset.accounts:
+            raise HTTPException(status_code=404, detail=f"Account {account_id} not found")
+        return account_id
+
+    def _build(self) -> FastAPI:
+        app = FastAPI(title="Fake Providers")
+        app.middleware("http")(self._simulate)
+        dataset = self.dataset
+
+        # --- Pluggy ---
+
+        @app.post("/pluggy/auth")
+        async def pluggy_auth():
+            api_key = uuid.uuid4().hex
+            self._api_keys.add(api_key)
+            return {"apiKey": api_key}
+
+        @app.post("/pluggy/connect_token")
+        async def pluggy_connect_token(request: Request):
+            self._require_api_key(request)
+            return {"accessToken": f"connect_{uuid.uuid4().hex}"}
+
+        @app.get("/pluggy/accounts")
+        async def pluggy_accounts(request: Request, itemId: str):
+            self._require_api_key(request)
+            accounts = [a for a, item in dataset.accounts.items() if item == itemId]
+            return {"total": len(accounts), "results": [
+                {"id": a, "itemId": itemId, "type": "BANK", "name": "Conta Corrente", "balance": dataset.balances[a]}
+                for a in accounts
+            ]}
+
+        @app.get("/pluggy/accounts/{account_id}")
+        async def pluggy_account(request: Request, account_id: str):
+            self._require_api_key(request)
+            self._account(account_id)
+            return {"id": account_id, "itemId": dataset.accounts[account_id], "balance": dataset.balances[account_id]}
+
+        @app.get("/pluggy/transactions")
+        async def pluggy_transactions(
+            request: Request,
+            accountId: str,
+            page: int = 1,
+            pageSize: int = 20,
+            to: Optional[str] = None
+        ):
+            self._require_api_key(request)
+            # `from` é palavra reservada: lido direto da query
+            rows = dataset.window(self._account(accountId), request.query_params.get("from"), to)
+            results, total_pages = paginate(rows, page, min(pageSize, PLUGGY_MAX_PAGE_SIZE))
+            return {
+                "total": len(rows), "totalPages": total_pages, "page": page,
+                "results": [pluggy_transaction(row) for row in results],
+            }
+
+        # --- Belvo ---
+
+        def belvo_page(request: Request, path: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+            page = int(request.query_params.get("page", 1))
+            size = min(int(request.query_params.get("page_size", 100)), BELVO_MAX_PAGE_SIZE)
+            results, total_pages = paginate(rows, page, size)
+            next_url = None
+            if page < total_pages:
+                params = {**request.query_params, "page": page + 1}
+                next_url = str(httpx.URL(f"{self._public_base(request, 'belvo')}{path}", params=params))
+            return {"count": len(rows), "next": next_url, "previous": None, "results": results}
+
+        @app.post("/belvo/api/token/")
+        async def belvo_token(request: Request):
+            self._require_basic_auth(request)
+            return {"access": f"widget_{uuid.uuid4().hex}", "refresh": uuid.uuid4().hex}
+
+        @app.get("/belvo/api/accounts/")
+        async def belvo_accounts(request: Request, link: str):
+            self._require_basic_auth(request)
+            accounts = [
+                {"id": a, "link": link, "category": "CHECKING_ACCOUNT", "balance": {"current": dataset.balances[a], "available": dataset.balances[a]}}
+                for a, item in dataset.accounts.items() if item == link
+            ]
+            return belvo_page(request, "/api/accounts/", accounts)
+
+        @app.get("/belvo/api/accounts/{account_id}/")
+        async def belvo_account(request: Request, account_id: str):
+            self._require_basic_auth(request)
+            self._account(account_id)
+            balance = dataset.balances[account_id]
+            return {"id": account_id, "link": dataset.accounts[account_id], "balance": {"current": balance, "available": balance}}
+
+        @app.get("/belvo/api/transactions/")
+        async def belvo_transactions(request: Request, link: str):
+            self._require_basic_auth(request)
+            params = request.query_params
+            rows = dataset.window(self._account(link), params.get("value_date__gte"), params.get("value_date__lte"))
+            return belvo_page(request, "/api/transactions/", [belvo_transaction(row) for row in rows])
+
+        # --- CNPJ.ws ---
+
+        @app.get("/cnpjws/cnpj/{cnpj}")
+        async def cnpjws_lookup(cnpj: str):
+            supplier = dataset.cnpjs.get(cnpj)
+            if supplier is None:
+                raise HTTPException(status_code=404, detail="CNPJ não encontrado")
+            code, description = supplier["cnae"]
+            return {
+                "razao_social": supplier["razao_social"],
+                "estabelecimento": {
+                    "cnpj": cnpj,
+                    "situacao_cadastral": supplier["situacao"],
+                    "nome_fantasia": None,
+                    "logradouro": "RUA DAS FLORES",
+                    "municipio": "São Paulo",
+                    "uf": "SP",
+                    "data_situacao_cadastral": "2015-01-01",
+                    "atividade_principal": {"id": code, "descricao": description},
+                },
+            }
+
+        @app.get("/_stats")
+        async def stats():
+            return self.summary()
+
+        return app
+
+def main():
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Pluggy/Belvo/CNPJ.ws fake (rotas sob /pluggy, /belvo, /cnpjws)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests por minuto por provider (0 = sem limite)")
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=200, help="Transações por conta")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    profile = ProviderProfile(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, rate_limit_per_minute=args.rate_limit
+    )
+    server = FakeProviderServer(FakeProvidersConfig(
+        pluggy=profile, belvo=profile, cnpjws=profile,
+        items=args.items, transactions_per_account=args.transactions, seed=args.seed
+    ))
+    uvicorn.run(server.app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
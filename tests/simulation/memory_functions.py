@@ -0,0 +1,230 @@
+"""
+Memory Functions - Emulação das funções SQL (RPC) no MemoryStore
+Cada função reproduz a semântica da versão em database/migrations,
+para que o replay exercite o mesmo contrato que o Postgres.
+"""
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional
+
+def conciliar_automaticamente(store, p_vinculos: List[Dict[str, Any]], p_motivo: str = "Auto-reconciliado via Open Finance") -> Dict[str, Any]:
+    """Migrations 009/012: aplica vínculos só em linhas ainda pendentes e fecha os itens da fila"""
+    transacoes = {t["id"]: t for t in store.tables.get("transacoes_bancarias", [])}
+    comprovantes = {c["id"]: c for c in store.tables.get("comprovantes", [])}
+
+    aplicados = []
+    for vinculo in p_vinculos:
+        txn = transacoes.get(vinculo["transacao_id"])
+        receipt = comprovantes.get(vinculo["comprovante_id"])
+        if not txn or not receipt:
+            continue
+        if txn["status_reconciliacao"] != "pendente" or receipt["status"] != "pendente":
+            continue
+        receipt.update({"status": "aprovado", "transacao_id": txn["id"], "motivo_decisao": p_motivo})
+        txn.update({"status_reconciliacao": "reconciliado", "comprovante_id": receipt["id"]})
+        aplicados.append(receipt["id"])
+
+    for item in store.tables.get("fila_reconciliacao", []):
+        if item["comprovante_id"] in aplicados and item["status"] in ("pendente", "em_revisao"):
+            item["status"] = "concluido"
+
+    return {"aplicados": len(aplicados), "ignorados": len(p_vinculos) - len(aplicados), "comprovantes": aplicados}
+
+def buscar_candidatos_conciliacao(
+    store,
+    p_valor: float,
+    p_data: str,
+    p_valor_min: float,
+    p_valor_max: float,
+    p_data_inicio: str,
+    p_data_fim: str,
+    p_tolerancia_valor: float = 0.05,
+    p_nsu: Optional[str] = None,
+    p_condominio_id: Optional[str] = None,
+    p_limite: int = 10
+) -> List[Dict[str, Any]]:
+    """Migration 010: top-k candidatos pontuados (NSU prevalece sobre a faixa)"""
+    target = date.fromisoformat(p_data)
+    candidates: Dict[str, Dict[str, Any]] = {}
+
+    for t in store.tables.get("transacoes_bancarias", []):
+        if t["status_reconciliacao"] != "pendente":
+            continue
+        if p_condominio_id is not None and t.get("condominio_id") != p_condominio_id:
+            continue
+
+        days = abs((date.fromisoformat(t["data_transacao"]) - target).days)
+        row = {
+            "transacao_id": t["id"],
+            "data_transacao": t["data_transacao"],
+            "valor": t["valor"],
+            "descricao": t.get("descricao"),
+            "nsu": t.get("nsu"),
+        }
+
+        if p_nsu and t.get("nsu") == p_nsu:
+            candidates[t["id"]] = {**row, "match_score": 95, "match_reasons": ["nsu_exato"], "_prioridade": 0, "_dias": days}
+        elif p_data_inicio <= t["data_transacao"] <= p_data_fim and round(p_valor_min, 2) <= t["valor"] <= round(p_valor_max, 2):
+            reasons = []
+            if round(abs(t["valor"] - p_valor), 2) <= p_tolerancia_valor:
+                reasons.append("valor_exato")
+            if days <= 1:
+                reasons.append("data_proxima")
+            score = 80 + (15 if t["valor"] == p_valor else 0) + (5 if days == 0 else 0)
+            candidates[t["id"]] = {**row, "match_score": score, "match_reasons": reasons, "_prioridade": 1, "_dias": days}
+
+    ordered = sorted(candidates.values(), key=lambda c: (-c["match_score"], c["_prioridade"], c["_dias"], c["transacao_id"]))
+    return [{k: v for k, v in c.items() if not k.startswith("_")} for c in ordered[:p_limite]]
+
+def decidir_conciliacoes_em_lote(store, p_decisoes: List[Dict[str, Any]], p_condominio_id: Optional[str] = None) -> Dict[str, Any]:
+    """Migrations 013/017: decisões em lote com resultado por item e trilha de auditoria, restritas ao condomínio"""
+    def do_condominio(row: Dict[str, Any]) -> bool:
+        return p_condominio_id is None or row.get("condominio_id") == p_condominio_id
+
+    transacoes = {t["id"]: t for t in store.tables.get("transacoes_bancarias", []) if do_condominio(t)}
+    comprovantes = {c["id"]: c for c in store.tables.get("comprovantes", []) if do_condominio(c)}
+    por_comprovante = Counter(d["comprovante_id"] for d in p_decisoes)
+    por_transacao = Counter(d["transacao_id"] for d in p_decisoes if d["decisao"] == "aprovar")
+
+    def classificar(d: Dict[str, Any]) -> str:
+        receipt = comprovantes.get(d["comprovante_id"])
+        txn = transacoes.get(d.get("transacao_id"))
+        if d["decisao"] not in ("aprovar", "rejeitar"):
+            return "decisao_invalida"
+        if por_comprovante[d["comprovante_id"]] > 1:
+            return "comprovante_repetido"
+        if not receipt:
+            return "comprovante_inexistente"
+        if receipt["status"] in ("aprovado", "rejeitado"):
+            return "comprovante_ja_decidido"
+        if d["decisao"] == "rejeitar":
+            return "aplicado"
+        if not d.get("transacao_id"):
+            return "transacao_obrigatoria"
+        if not txn:
+            return "transacao_inexistente"
+        if txn["status_reconciliacao"] not in ("pendente", "divergente"):
+            return "transacao_ja_conciliada"
+        if por_transacao[d["transacao_id"]] > 1:
+            return "transacao_repetida"
+        return "aplicado"
+
+    # Classificar tudo antes de aplicar (mesmo snapshot da versão SQL)
+    resultados = [
+        {"comprovante_id": d["comprovante_id"], "transacao_id": d.get("transacao_id"), "decisao": d["decisao"], "resultado": classificar(d)}
+        for d in p_decisoes
+    ]
+
+    lote_id = str(uuid.uuid4())
+    auditoria = store.tables.setdefault("decisoes_reconciliacao", [])
+    for d, r in zip(p_decisoes, resultados):
+        auditoria.append({**r, "id": str(uuid.uuid4()), "lote_id": lote_id, "motivo_decisao": d.get("motivo_decisao")})
+        if r["resultado"] != "aplicado":
+            continue
+        receipt = comprovantes[d["comprovante_id"]]
+        receipt.update({"status": "aprovado" if d["decisao"] == "aprovar" else "rejeitado", "motivo_decisao": d.get("motivo_decisao")})
+        if d["decisao"] == "aprovar":
+            receipt["transacao_id"] = d["transacao_id"]
+            transacoes[d["transacao_id"]].update({"status_reconciliacao": "reconciliado", "comprovante_id": d["comprovante_id"]})
+        for item in store.tables.get("fila_reconciliacao", []):
+            if item["comprovante_id"] == d["comprovante_id"] and item["status"] in ("pendente", "em_revisao"):
+                item["status"] = "concluido"
+
+    return {"lote_id": lote_id, "resultados": resultados}
+
+# --- Feed de alterações (migrations 015 e 022) ---
+
+FEED_COLUMNS = {
+    "transacoes_bancarias": {"valor", "tipo", "data_transacao", "nsu", "status_reconciliacao", "condominio_id"},
+    "comprovantes": {"status", "ocr_processado", "ocr_valor", "ocr_data", "ocr_nsu", "condominio_id"},
+}
+
+def marcar_alteracao_conciliacao(store, table: str, row: Dict[str, Any], changed: Optional[set]):
+    """Trigger BEFORE INSERT OR UPDATE OF <colunas do matching>; cada escrita é uma transação (xid = seq)"""
+    if changed is not None and not (changed & FEED_COLUMNS[table]):
+        return
+    store.sequence = getattr(store, "sequence", 0) + 1
+    row["xid_alteracao"] = store.sequence
+    row["seq_alteracao"] = store.sequence
+
+def _feed(table: str, columns: tuple):
+    def read(store, p_xid: int, p_seq: int, p_limite: int = 500) -> List[Dict[str, Any]]:
+        rows = sorted(
+            (r for r in store.tables.get(table, []) if (r.get("xid_alteracao") or 0, r.get("seq_alteracao") or 0) > (p_xid, p_seq)),
+            key=lambda r: (r["xid_alteracao"], r["seq_alteracao"])
+        )
+        return [{c: r.get(c) for c in columns} for r in rows[:p_limite]]
+    return read
+
+alteracoes_transacoes = _feed("transacoes_bancarias", (
+    "id", "condominio_id", "data_transacao", "valor", "tipo", "nsu", "status_reconciliacao", "xid_alteracao", "seq_alteracao"
+))
+alteracoes_comprovantes = _feed("comprovantes", (
+    "id", "condominio_id", "status", "ocr_processado", "ocr_valor", "ocr_data", "ocr_nsu", "xid_alteracao", "seq_alteracao"
+))
+
+def atualizar_prioridades_fila(store, p_itens: List[Dict[str, Any]]) -> int:
+    """Migration 016: grava prioridades recalculadas só em itens ainda abertos"""
+    prioridades = {i["id"]: i["prioridade"] for i in p_itens}
+    atualizados = 0
+    for item in store.tables.get("fila_reconciliacao", []):
+        prioridade = prioridades.get(item["id"])
+        if prioridade is None or item["status"] not in ("pendente", "em_revisao") or item.get("prioridade") == prioridade:
+            continue
+        item.update({"prioridade": prioridade, "prioridade_atualizada_em": datetime.now().isoformat()})
+        atualizados += 1
+    return atualizados
+
+def preencher_condominio_fila(store, table: str, row: Dict[str, Any], changed: Optional[set]):
+    """Migration 017: trigger BEFORE INSERT que herda o condomínio do comprovante"""
+    if changed is not None or row.get("condominio_id") or not row.get("comprovante_id"):
+        return
+    receipt = next(iter(store.lookup("comprovantes", "id", row["comprovante_id"])), None)
+    if receipt:
+        row["condominio_id"] = receipt.get("condominio_id")
+
+def reservar_orcamento_provider(store, p_provider: str, p_quantidade: int, p_limite: int, p_janela_segundos: int = 60) -> int:
+    """Migration 019: unidades concedidas na janela corrente do provider"""
+    janela = int(time.time() // p_janela_segundos) * p_janela_segundos
+    rows = store.tables.setdefault("orcamento_provider", [])
+    row = next((r for r in rows if r["provider"] == p_provider and r["janela"] == janela), None)
+    if row is None:
+        row = {"provider": p_provider, "janela": janela, "usado": 0}
+        rows.append(row)
+    concedido = max(0, min(p_quantidade, p_limite - row["usado"]))
+    row["usado"] += concedido
+    return concedido
+
+def comprovantes_pendentes_por_condominio(store) -> List[Dict[str, Any]]:
+    """Migration 019: contagem de comprovantes pendentes por condomínio"""
+    pendentes: Dict[str, int] = {}
+    for receipt in store.tables.get("comprovantes", []):
+        if receipt.get("status") == "pendente" and receipt.get("condominio_id"):
+            pendentes[receipt["condominio_id"]] = pendentes.get(receipt["condominio_id"], 0) + 1
+    return [{"condominio_id": c, "pendentes": n} for c, n in pendentes.items()]
+
+FUNCTIONS = {
+    "conciliar_automaticamente": conciliar_automaticamente,
+    "buscar_candidatos_conciliacao": buscar_candidatos_conciliacao,
+    "decidir_conciliacoes_em_lote": decidir_conciliacoes_em_lote,
+    "alteracoes_transacoes": alteracoes_transacoes,
+    "alteracoes_comprovantes": alteracoes_comprovantes,
+    "atualizar_prioridades_fila": atualizar_prioridades_fila,
+    "reservar_orcamento_provider": reservar_orcamento_provider,
+    "comprovantes_pendentes_por_condominio": comprovantes_pendentes_por_condominio,
+}
+
+TRIGGERS = {
+    "transacoes_bancarias": [marcar_alteracao_conciliacao],
+    "comprovantes": [marcar_alteracao_conciliacao],
+    "fila_reconciliacao": [preencher_condominio_fila],
+}
+
+def register_functions(store):
+    """Registra todas as funções e triggers emulados no store"""
+    store.functions.update(FUNCTIONS)
+    for table, triggers in TRIGGERS.items():
+        store.triggers.setdefault(table, []).extend(triggers)
+    return store
@@ -0,0 +1,317 @@
+"""
+Memory Store - Banco em memória com a interface do cliente Supabase
+Implementa só o subconjunto do query builder usado pelos engines de
+conciliação (select com embed/eq/gte/lte/or_/order/limit/update/insert/rpc),
+para que o harness de replay rode os endpoints reais sem Supabase.
+"""
+import copy
+import uuid
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Callable
+
+@lru_cache(maxsize=256)
+def _split_top_level(text: str) -> List[str]:
+    """Separa por vírgula ignorando parênteses e aspas"""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+def _coerce(raw: str, sample: Any) -> Any:
+    value = raw.strip('"')
+    if value == "null":
+        return None
+    if isinstance(sample, bool):
+        return value == "true"
+    if isinstance(sample, (int, float)):
+        return float(value)
+    return value
+
+_OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a is not None and a > b,
+    "gte": lambda a, b: a is not None and a >= b,
+    "lt": lambda a, b: a is not None and a < b,
+    "lte": lambda a, b: a is not None and a <= b,
+    "is": lambda a, b: a is b,
+}
+
+def _logic_filter(expression: str, combine=any) -> Callable[[Dict[str, Any]], bool]:
+    """Converte uma árvore lógica do PostgREST (a.eq.1,and(b.gt.2,...)) em predicado"""
+    predicates = []
+    for term in _split_top_level(expression):
+        if term.startswith(("and(", "or(")):
+            name, inner = term.split("(", 1)
+            predicates.append(_logic_filter(inner[:-1], all if name == "and" else any))
+            continue
+        column, op, raw = term.split(".", 2)
+        predicates.append(
+            lambda row, column=column, op=op, raw=raw: _OPERATORS[op](row.get(column), _coerce(raw, row.get(column)))
+        )
+    return lambda row: combine(p(row) for p in predicates)
+
+class MemoryResult:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+class MemoryQuery:
+    """Query builder encadeável (mesma forma do postgrest-py)"""
+
+    def __init__(self, store: "MemoryStore", table: str):
+        self.store = store
+        self.table = table
+        self.action = "select"
+        self.payload: Any = None
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.order_by: List[tuple] = []
+        self.limit_count: Optional[int] = None
+        self.columns = "*"
+        self.on_conflict: Optional[str] = None
+        self.ignore_duplicates = False
+        self.key_lookup: Optional[tuple] = None
+
+    # --- Ações ---
+
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.action = "select"
+        self.columns = columns
+        return self
+
+    def insert(self, rows):
+        self.action = "insert"
+        self.payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, ignore_duplicates: bool = False):
+        self.action = "upsert"
+        self.payload = rows
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self.action = "update"
+        self.payload = values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- Filtros ---
+
+    def eq(self, column: str, value: Any):
+        if column in self.store.key_columns(self.table) and self.key_lookup is None:
+            self.key_lookup = (column, value)
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value: Any):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def gt(self, column: str, value: Any):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def gte(self, column: str, value: Any):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lt(self, column: str, value: Any):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def lte(self, column: str, value: Any):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] <= value)
+        return self
+
+    def in_(self, column: str, values: List[Any]):
+        allowed = set(values)
+        self.filters.append(lambda row: row.get(column) in allowed)
+        return self
+
+    def is_(self, column: str, value: Any):
+        expected = None if value in (None, "null") else value
+        self.filters.append(lambda row: row.get(column) is expected)
+        return self
+
+    def or_(self, filters: str):
+        self.filters.append(_logic_filter(filters))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self.limit_count = count
+        return self
+
+    # --- Execução ---
+
+    def execute(self) -> MemoryResult:
+        rows = self.store.tables.setdefault(self.table, [])
+
+        if self.action in ("insert", "upsert"):
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            inserted = []
+            conflicts: Optional[Dict[tuple, Dict[str, Any]]] = None
+            if self.action == "upsert":
+                # on_conflict pode ser composto ("provider,provider_transacao_id"); NULL nunca conflita.
+                # Índice montado uma vez por execute: lotes grandes não varrem a tabela por linha
+                keys = [k.strip() for k in (self.on_conflict or "id").split(",")]
+                conflicts = {}
+                for r in rows:
+                    key = tuple(r.get(k) for k in keys)
+                    if None not in key:
+                        conflicts.setdefault(key, r)
+            for row in payload:
+                row = dict(row)
+                row.setdefault("id", str(uuid.uuid4()))
+                existing = None
+                if conflicts is not None:
+                    key = tuple(row.get(k) for k in keys)
+                    if None not in key:
+                        existing = conflicts.get(key)
+                if existing is not None and self.ignore_duplicates:
+                    continue            # ON CONFLICT DO NOTHING: só as linhas inseridas voltam
+                if existing is not None:
+                    existing.update(row)
+                    self.store.fire_triggers(self.table, existing, set(row))
+                    inserted.append(copy.deepcopy(existing))
+                else:
+                    self.store.fire_triggers(self.table, row, None)
+                    rows.append(row)
+                    inserted.append(copy.deepcopy(row))
+                    if conflicts is not None:
+                        new_key = tuple(row.get(k) for k in keys)
+                        if None not in new_key:
+                            conflicts.setdefault(new_key, row)
+            return MemoryResult(inserted)
+
+        # eq numa coluna-chave usa o índice (como o Postgres faria); os filtros continuam valendo
+        candidates = self.store.lookup(self.table, *self.key_lookup) if self.key_lookup else rows
+        matched = [row for row in candidates if all(f(row) for f in self.filters)]
+
+        if self.action == "update":
+            for row in matched:
+                row.update(self.payload)
+                self.store.fire_triggers(self.table, row, set(self.payload))
+            return MemoryResult(copy.deepcopy(matched))
+
+        if self.action == "delete":
+            self.store.tables[self.table] = [row for row in rows if row not in matched]
+            return MemoryResult(copy.deepcopy(matched))
+
+        # Ordenação estável: aplicar da última chave para a primeira
+        for column, desc in reversed(self.order_by):
+            matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+
+        if self.limit_count is not None:
+            matched = matched[:self.limit_count]
+
+        if self.columns.strip() != "*":
+            matched = [self.store.project(self.columns, row) for row in matched]
+
+        return MemoryResult(copy.deepcopy(matched), count=len(matched))
+
+class MemoryRPC:
+    def __init__(self, store: "MemoryStore", name: str, params: Dict[str, Any]):
+        self.store = store
+        self.name = name
+        self.params = params
+
+    def execute(self) -> MemoryResult:
+        function = self.store.functions.get(self.name)
+        if not function:
+            raise Exception(f"function {self.name} does not exist")
+        return MemoryResult(function(self.store, **(self.params or {})))
+
+class MemoryStore:
+    """
+    Substituto em memória do supabase.Client.
+
+    - `tables`: {nome_tabela: [linhas]}
+    - `functions`: {nome_rpc: callable(store, **params)} para emular funções SQL
+    - `triggers`: {tabela: [callable]} chamados em insert/update pelo query builder
+    """
+
+    # Colunas imutáveis com índice no schema, além de "id"
+    KEY_COLUMNS = {
+        "sugestoes_conciliacao": ("comprovante_id",),
+        "fila_reconciliacao": ("comprovante_id",),
+    }
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {
+            name: [dict(row) for row in rows] for name, rows in (tables or {}).items()
+        }
+        self.functions: Dict[str, Callable[..., Any]] = {}
+        self._indexes: Dict[tuple, tuple] = {}
+        # {tabela: [callable(store, tabela, linha, colunas_alteradas ou None no insert)]}, como triggers BEFORE
+        self.triggers: Dict[str, List[Callable[..., None]]] = {}
+
+    def fire_triggers(self, table: str, row: Dict[str, Any], changed: Optional[set]):
+        for trigger in self.triggers.get(table, []):
+            trigger(self, table, row, changed)
+
+    def project(self, columns: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Aplica a projeção do select, incluindo embeds `alias:tabela(colunas)`.
+        A FK do embed é `<alias>_id` (ou `<tabela no singular>_id`).
+        """
+        projected: Dict[str, Any] = {}
+        for column in _split_top_level(columns):
+            if "(" not in column:
+                if column == "*":
+                    projected.update(row)
+                else:
+                    projected[column] = row.get(column)
+                continue
+            target, inner = column.split("(", 1)
+            alias, _, table = target.rpartition(":")
+            alias = alias or table
+            fk = f"{alias}_id" if alias != table else f"{table.rstrip('s')}_id"
+            related = next(iter(self.lookup(table, "id", row.get(fk))), None)
+            projected[alias] = self.project(inner[:-1], related) if related else None
+        return projected
+
+    def key_columns(self, table: str) -> tuple:
+        return ("id",) + self.KEY_COLUMNS.get(table, ())
+
+    def lookup(self, table: str, column: str, value: Any) -> List[Dict[str, Any]]:
+        """
+        Linhas com column == value via índice hash. Só para colunas imutáveis
+        (KEY_COLUMNS): o índice é refeito quando linhas entram ou saem da tabela.
+        """
+        rows = self.tables.setdefault(table, [])
+        signature = (id(rows), len(rows))
+        cached = self._indexes.get((table, column))
+        if not cached or cached[0] != signature:
+            index: Dict[Any, List[Dict[str, Any]]] = {}
+            for row in rows:
+                index.setdefault(row.get(column), []).append(row)
+            cached = (signature, index)
+            self._indexes[(table, column)] = cached
+        return cached[1].get(value, [])
+
+    def table(self, name: str) -> MemoryQuery:
+        return MemoryQuery(self, name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> MemoryRPC:
+        return MemoryRPC(self, name, params or {})
@@ -0,0 +1,267 @@
+"""
+Provider Load Test - Carga de Sync e Auditoria Contra Providers Fake
+Roda o código de produção (OpenFinanceSyncService, LocalTransactionStore,
+CNPJWSProvider, request_with_retry e a camada de resiliência) contra o
+FakeProviderServer, sem rede e sem Supabase (MemoryStore), e mede
+throughput, latência (p50/p95/p99), erros e o tráfego que chegou a cada
+provider (requests, 429, 503, pico de concorrência).
+
+Cenários:
+- sync: sincroniza todas as contas do dataset (delta + gravação deduplicada)
+- audit: auditorias de despesa como o POST /audit/expense, a partir do
+  banco vazio: transação pelo id no banco local (sincroniza a conta se
+  velha) + fornecedor no CNPJ.ws
+
+Uso:
+    python3 tests/simulation/provider_load_test.py
+    python3 tests/simulation/provider_load_test.py --provider belvo --concurrency 32 --latency-ms 200
+    python3 tests/simulation/provider_load_test.py --error-rate 0.05 --rate-limit 600 --label degradado
+"""
+import sys
+import os
+import json
+import asyncio
+import argparse
+import platform
+import random
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any
+
+# Adicionar path do backend
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "backend"))
+
+# O sync grava no MemoryStore; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "carga")
+
+from app.services.http_client import close_async_clients
+from app.services.circuit_breaker import reset_breakers
+from app.services.resilience import reset_resilience, health_snapshot
+from app.services.open_finance_sync import OpenFinanceSyncService
+from app.services.transaction_cache import LocalTransactionStore, transaction_cache
+from app.services.cnpj.cnpjws_provider import CNPJWSProvider
+from app.services.cnpj.base import CNPJNotFoundError
+
+from memory_store import MemoryStore
+from fake_providers import FakeProviderServer, FakeProvidersConfig, ProviderProfile
+from reconciliation_replay import percentile, git_revision, RESULTS_DIR
+
+SCENARIOS = ("sync", "audit")
+LOAD_RESULTS_DIR = RESULTS_DIR / "providers"
+UNKNOWN_CNPJ_RATE = 0.05
+
+def empty_store() -> MemoryStore:
+    return MemoryStore({"transacoes_bancarias": [], "sincronizacao_contas": []})
+
+class LoadStats:
+    """Latências e desfechos de um cenário"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.elapsed = 0.0
+
+    async def measure(self, coro) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await coro
+        except Exception as e:
+            self.outcomes[f"erro:{type(e).__name__}"] += 1
+            result = None
+        self.latencies.append(time.perf_counter() - start)
+        return result
+
+    def summary(self, server: FakeProviderServer, requests_before: int) -> Dict[str, Any]:
+        ms = [latency * 1000 for latency in self.latencies]
+        return {
+            "items": len(self.latencies),
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput_per_s": round(len(self.latencies) / self.elapsed, 2) if self.elapsed else 0.0,
+            "latency_p50_ms": round(percentile(ms, 50), 1),
+            "latency_p95_ms": round(percentile(ms, 95), 1),
+            "latency_p99_ms": round(percentile(ms, 99), 1),
+            "outcomes": dict(sorted(self.outcomes.items())),
+            "provider_requests": server.requests() - requests_before,
+        }
+
+async def bounded(concurrency: int, jobs) -> float:
+    """Roda as corrotinas com no máximo `concurrency` ao mesmo tempo; devolve o tempo total"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            await job
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(job) for job in jobs))
+    return time.perf_counter() - start
+
+async def run_sync(server: FakeProviderServer, provider: str, concurrency: int) -> Dict[str, Any]:
+    store = empty_store()
+    sync = OpenFinanceSyncService(store, provider=provider)
+    stats = LoadStats()
+    inserted = Counter()
+    requests_before = server.requests()
+
+    async def sync_account(conta_id: str, item: str):
+        result = await stats.measure(sync.sync_account(conta_id, condominio_id=item))
+        if result is not None:
+            _, report = result
+            inserted["transacoes"] += report.novas
+            stats.outcomes["ok"] += 1
+
+    stats.elapsed = await bounded(concurrency, [
+        sync_account(conta_id, item) for conta_id, item in server.dataset.accounts.items()
+    ])
+    summary = stats.summary(server, requests_before)
+    summary["transactions_stored"] = inserted["transacoes"]
+    summary["transactions_per_s"] = round(inserted["transacoes"] / stats.elapsed, 1) if stats.elapsed else 0.0
+    return summary
+
+async def run_audit(server: FakeProviderServer, provider: str, concurrency: int, audits: int, seed: int) -> Dict[str, Any]:
+    store = empty_store()
+    transaction_cache.clear()
+    transactions = LocalTransactionStore(store, provider=provider)
+    cnpjws = CNPJWSProvider(token="carga")      # Versão paga: sem o intervalo de 20 s da pública
+    stats = LoadStats()
+    requests_before = server.requests()
+
+    rng = random.Random(seed)
+    accounts = list(server.dataset.accounts.items())
+    cnpjs = list(server.dataset.cnpjs)
+    expenses = []
+    for _ in range(audits):
+        conta_id, item = rng.choice(accounts)
+        debits = [tx["id"] for tx in server.dataset.transactions(conta_id) if tx["kind"] == "debito"]
+        cnpj = f"{rng.randrange(10**13, 10**14)}" if rng.random() < UNKNOWN_CNPJ_RATE else rng.choice(cnpjs)
+        expenses.append((conta_id, item, rng.choice(debits), cnpj))
+
+    async def audit(conta_id: str, item: str, transaction_id: str, cnpj: str) -> str:
+        transaction = await transactions.get_transaction(conta_id, transaction_id, item)
+        if transaction is None:
+            return "transacao_nao_encontrada"
+        try:
+            supplier = await cnpjws.validate_cnpj(cnpj)
+        except CNPJNotFoundError:
+            return "cnpj_nao_encontrado"
+        return "aprovada" if supplier.status_receita == "ATIVA" else "rejeitada"
+
+    async def measured(*expense):
+        outcome = await stats.measure(audit(*expense))
+        if outcome is not None:
+            stats.outcomes[outcome] += 1
+
+    stats.elapsed = await bounded(concurrency, [measured(*expense) for expense in expenses])
+    return stats.summary(server, requests_before)
+
+async def run_load(params: Dict[str, Any], scenarios: List[str]) -> Dict[str, Any]:
+    profile = ProviderProfile(
+        latency_ms=params["latency_ms"], jitter_ms=params["jitter_ms"],
+        error_rate=params["error_rate"], rate_limit_per_minute=params["rate_limit"]
+    )
+    config = FakeProvidersConfig(
+        pluggy=profile, belvo=profile, cnpjws=profile,
+        items=params["items"], accounts_per_item=params["accounts_per_item"],
+        transactions_per_account=params["transactions"], seed=params["seed"]
+    )
+    server = FakeProviderServer(config)
+    server.install()
+    reset_breakers()
+    reset_resilience()
+
+    results: Dict[str, Any] = {}
+    try:
+        if "sync" in scenarios:
+            results["sync"] = await run_sync(server, params["provider"], params["concurrency"])
+        if "audit" in scenarios:
+            results["audit"] = await run_audit(server, params["provider"], params["concurrency"], params["audits"], params["seed"])
+    finally:
+        await close_async_clients()
+
+    return {
+        "dataset": {"accounts": len(server.dataset.accounts), "transactions": len(server.dataset.accounts) * config.transactions_per_account, "cnpjs": config.cnpjs},
+        "scenarios": results,
+        "providers": server.summary(),
+        "hosts": health_snapshot(),
+    }
+
+def save_run(run: Dict[str, Any]) -> Path:
+    LOAD_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = LOAD_RESULTS_DIR / f"{stamp}_{run['label']}.json"
+    path.write_text(json.dumps(run, indent=2, ensure_ascii=False))
+    return path
+
+def print_report(run: Dict[str, Any]):
+    params, dataset = run["params"], run["dataset"]
+    print("=" * 70)
+    print(f"🏋️  CARGA CONTRA PROVIDERS FAKE: {run['label']} ({params['provider']})")
+    print(f"   {dataset['accounts']} contas | {dataset['transactions']} transações | {dataset['cnpjs']} CNPJs | "
+          f"concorrência {params['concurrency']}")
+    print(f"   Latência {params['latency_ms']}ms + cauda {params['jitter_ms']}ms | erros {params['error_rate']:.1%} | "
+          f"rate limit {params['rate_limit'] or '∞'}/min")
+    print("=" * 70)
+
+    for name, m in run["scenarios"].items():
+        print(f"\n⚙️  {name}")
+        print(f"   Throughput: {m['throughput_per_s']} itens/s ({m['items']} em {m['elapsed_s']}s)")
+        if "transactions_per_s" in m:
+            print(f"   Transações gravadas: {m['transactions_stored']} ({m['transactions_per_s']}/s)")
+        print(f"   Latência: p50 {m['latency_p50_ms']}ms | p95 {m['latency_p95_ms']}ms | p99 {m['latency_p99_ms']}ms")
+        print(f"   Desfechos: {m['outcomes']} | requests aos providers: {m['provider_requests']}")
+
+    print("\n🌐 Providers")
+    for name, p in run["providers"].items():
+        print(f"   {name}: {p['requests']} requests {p['por_status']} | pico de concorrência {p['pico_concorrencia']}")
+    for host in run["hosts"]:
+        print(f"   {host['host']}: circuito {host['circuito']} | limite {host['limite_concorrencia']} | "
+              f"p95 {host['latencia_p95_ms']}ms | orçamento de retries {host['orcamento_retries']}")
+
+async def main() -> bool:
+    parser = argparse.ArgumentParser(description="Carga de sync e auditoria contra Pluggy/Belvo/CNPJ.ws fake")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Lista separada por vírgula")
+    parser.add_argument("--provider", choices=("pluggy", "belvo"), default="pluggy")
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--accounts-per-item", type=int, default=2)
+    parser.add_argument("--transactions", type=int, default=100, help="Transações por conta")
+    parser.add_argument("--audits", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests por minuto por provider (0 = sem limite)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    params = {
+        "provider": args.provider, "items": args.items, "accounts_per_item": args.accounts_per_item,
+        "transactions": args.transactions, "audits": args.audits, "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate,
+        "rate_limit": args.rate_limit, "seed": args.seed,
+    }
+    run = {
+        "label": args.label,
+        "created_at": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "params": params,
+        **await run_load(params, scenarios),
+    }
+    print_report(run)
+
+    if not args.no_save:
+        print(f"\n💾 Resultado salvo em {save_run(run)}")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,393 @@
+"""
+Reconciliation Replay - Harness de Simulação e Benchmark de Conciliação
+Gera meses sintéticos de condomínio e reproduz nos engines de matching
+(RobustValidator, auto_reconcile_transactions, get_suggested_matches),
+medindo throughput, latência (p50/p95/p99), taxa de revisão manual e
+acurácia contra o gabarito. Resultados ficam em results/ para comparar
+regressões entre versões.
+
+Uso:
+    python3 tests/simulation/reconciliation_replay.py
+    python3 tests/simulation/reconciliation_replay.py --months 6 --units 400 --label antes-da-mudanca
+    python3 tests/simulation/reconciliation_replay.py --compare latest --fail-on-regression
+"""
+import sys
+import os
+import json
+import asyncio
+import argparse
+import platform
+import subprocess
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+# Adicionar path do backend
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "backend"))
+
+# Os engines são chamados com o MemoryStore; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "replay")
+
+from app.services.robust_validator import RobustValidator
+from app.api.endpoints.open_finance import auto_reconcile_transactions
+from fastapi import Response
+from app.api.endpoints.reconciliation import get_suggested_matches
+from app.services.match_suggestions import MatchSuggestionService
+
+from memory_store import MemoryStore
+from memory_functions import register_functions
+from synthetic_month import generate_months
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Limites para apontar regressão na comparação
+REGRESSION_THRESHOLDS = {
+    "throughput_per_s": -0.15,        # queda de 15% (ruído de timing fica em ~10%)
+    "latency_p95_ms": 0.25,           # aumento de 25%
+    "accuracy": -0.005,               # queda de 0,5 p.p.
+    "manual_review_rate": 0.005,      # aumento de 0,5 p.p.
+    "false_match_rate": 0.001,        # aumento de 0,1 p.p.
+}
+RELATIVE_METRICS = {"throughput_per_s", "latency_p95_ms"}
+
+# --- Métricas ---
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por nearest-rank"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.4999)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+class EngineStats:
+    """Acumula latências e desfechos de um engine"""
+
+    def __init__(self, name: str, unit: str = "receipt"):
+        self.name = name
+        self.unit = unit
+        self.latencies: List[float] = []
+        self.items = 0
+        self.elapsed = 0.0
+        self.correct = 0
+        self.manual = 0
+        self.false_match = 0
+        self.missed = 0
+        self.extra: Dict[str, Any] = {}
+
+    def timed(self, seconds: float, items: int = 1):
+        self.latencies.append(seconds)
+        self.elapsed += seconds
+        self.items += items
+
+    def outcome(self, predicted: Optional[str], expected: Optional[str], manual: bool):
+        """
+        Classifica um comprovante.
+
+        - manual: precisou de humano (não conta como acerto)
+        - false_match: vinculou à transação errada (o erro perigoso)
+        - missed: rejeitou/ignorou um pagamento real
+        """
+        if manual:
+            self.manual += 1
+        elif predicted == expected:
+            self.correct += 1
+        elif predicted is not None:
+            self.false_match += 1
+        else:
+            self.missed += 1
+
+    def summary(self) -> Dict[str, Any]:
+        total = self.correct + self.manual + self.false_match + self.missed
+        ms = [s * 1000 for s in self.latencies]
+        return {
+            "items": self.items,
+            "latency_unit": self.unit,
+            "elapsed_s": round(self.elapsed, 4),
+            "throughput_per_s": round(self.items / self.elapsed, 1) if self.elapsed else 0.0,
+            "latency_p50_ms": round(percentile(ms, 50), 3),
+            "latency_p95_ms": round(percentile(ms, 95), 3),
+            "latency_p99_ms": round(percentile(ms, 99), 3),
+            "accuracy": round(self.correct / total, 4) if total else 0.0,
+            "manual_review_rate": round(self.manual / total, 4) if total else 0.0,
+            "false_match_rate": round(self.false_match / total, 4) if total else 0.0,
+            "missed_rate": round(self.missed / total, 4) if total else 0.0,
+            **self.extra,
+        }
+
+# --- Conversões de linha do banco para o formato de cada engine ---
+
+def to_validator_transaction(tx: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": tx["id"],
+        "amount": tx["valor"],
+        "date": tx["data_transacao"],
+        "timestamp": tx.get("timestamp"),
+        "description": tx.get("descricao", ""),
+        "payer_document": tx.get("payer_document"),
+        "receiver_document": tx.get("receiver_document"),
+    }
+
+def db_rows(month: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Linhas no formato das tabelas (sem campos que o schema não tem)"""
+    tx_columns = ("id", "extrato_id", "data_transacao", "valor", "tipo", "descricao", "nsu", "status_reconciliacao", "comprovante_id")
+    receipt_columns = ("id", "unidade", "status", "ocr_processado", "ocr_valor", "ocr_data", "ocr_nsu", "data_envio")
+    condominio_id = month["condominio_id"]
+    return {
+        "extratos_bancarios": [{"id": month["extrato_id"], "condominio_id": condominio_id, "fonte": "open_finance"}],
+        "transacoes_bancarias": [{**{c: tx.get(c) for c in tx_columns}, "condominio_id": condominio_id} for tx in month["transactions"]],
+        "comprovantes": [{**{c: r.get(c) for c in receipt_columns}, "condominio_id": condominio_id} for r in month["receipts"]],
+        "fila_reconciliacao": [],
+    }
+
+def month_store(month: Dict[str, Any]) -> MemoryStore:
+    return register_functions(MemoryStore(db_rows(month)))
+
+# --- Replays ---
+
+def replay_robust_validator(months: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stats = EngineStats("robust_validator")
+    refund_hits = 0
+    refund_total = 0
+    levels: Dict[str, int] = {}
+
+    for month in months:
+        validator = RobustValidator()  # Reivindicações valem para o mês inteiro
+        all_txs = [to_validator_transaction(tx) for tx in month["transactions"]]
+        credits = [tx for tx in all_txs if tx["amount"] > 0]
+        debits = [tx for tx in all_txs if tx["amount"] < 0]
+
+        for receipt in sorted(month["receipts"], key=lambda r: r["data_envio"]):
+            start = time.perf_counter()
+            result = validator.validate_payment(
+                receipt_amount=Decimal(str(receipt["ocr_valor"])),
+                receipt_date=date.fromisoformat(receipt["ocr_data"]),
+                receipt_timestamp=datetime.fromisoformat(receipt["ocr_timestamp"]) if receipt["ocr_timestamp"] else None,
+                upload_timestamp=datetime.fromisoformat(receipt["data_envio"]),
+                payer_cpf=receipt["ocr_cpf"],
+                receipt_id=receipt["id"],
+                transactions=credits
+            )
+            stats.timed(time.perf_counter() - start)
+
+            level = result.resolution_level or result.status.lower()
+            levels[level] = levels.get(level, 0) + 1
+            predicted = result.matches[0].transaction_id if result.status == "APPROVED" else None
+            stats.outcome(predicted, month["truth"][receipt["id"]], result.requires_manual_review)
+
+        # Estornos: créditos do mês contra os débitos do mês
+        links = validator.detect_refunds(credits, debits)
+        for link in links:
+            expected = month["refunds"].get(link.credit_id)
+            if expected:
+                refund_total += 1
+                refund_hits += int(link.debit_id == expected)
+
+    stats.extra["resolution_levels"] = dict(sorted(levels.items()))
+    stats.extra["refund_link_accuracy"] = round(refund_hits / refund_total, 4) if refund_total else None
+    return stats.summary()
+
+async def replay_auto_reconcile(months: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Latência por execução (um extrato por mês); throughput em comprovantes/s
+    stats = EngineStats("auto_reconcile", unit="statement")
+
+    for month in months:
+        store = month_store(month)
+        start = time.perf_counter()
+        await auto_reconcile_transactions(month["extrato_id"], store)
+        stats.latencies.append(time.perf_counter() - start)
+        stats.elapsed += stats.latencies[-1]
+        stats.items += len(month["receipts"])
+
+        for receipt in store.tables["comprovantes"]:
+            if receipt["status"] == "aprovado":
+                stats.outcome(receipt.get("transacao_id"), month["truth"][receipt["id"]], manual=False)
+            else:
+                # Sem conciliação automática: vai para revisão humana
+                stats.outcome(None, month["truth"][receipt["id"]], manual=True)
+
+    return stats.summary()
+
+async def replay_suggested_matches(months: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Acurácia = primeira sugestão é a transação correta (ou nenhuma, se não houve pagamento)
+    stats = EngineStats("suggested_matches")
+    top3_hits = 0
+    top3_total = 0
+
+    precompute_seconds = 0.0
+    precomputed = 0
+
+    for month in months:
+        store = month_store(month)
+
+        # Cálculo no fim do OCR (fora do request do admin), em lote
+        start = time.perf_counter()
+        precomputed += MatchSuggestionService(store).refresh_receipts([r["id"] for r in month["receipts"]])
+        precompute_seconds += time.perf_counter() - start
+
+        for receipt in month["receipts"]:
+            start = time.perf_counter()
+            suggestions = await get_suggested_matches(receipt["id"], Response(), limit=10, condominio_id=month["condominio_id"], supabase=store)
+            stats.timed(time.perf_counter() - start)
+
+            expected = month["truth"][receipt["id"]]
+            predicted = suggestions[0].transacao_id if suggestions else None
+            if expected:
+                top3_total += 1
+                top3_hits += int(any(s.transacao_id == expected for s in suggestions[:3]))
+
+            # Múltiplos matches fortes são enfileirados para revisão
+            queued = any(item["comprovante_id"] == receipt["id"] for item in store.tables["fila_reconciliacao"])
+            stats.outcome(predicted, expected, manual=queued)
+
+    stats.extra["top3_recall"] = round(top3_hits / top3_total, 4) if top3_total else None
+    stats.extra["precompute_ms_per_receipt"] = round(precompute_seconds * 1000 / precomputed, 3) if precomputed else None
+    return stats.summary()
+
+ENGINES = ("robust_validator", "auto_reconcile", "suggested_matches")
+
+async def run_replay(seed: int, months: int, units: int, engines: List[str]) -> Dict[str, Any]:
+    generated = generate_months(seed, months, units)
+    dataset = {
+        "months": months,
+        "units": units,
+        "receipts": sum(len(m["receipts"]) for m in generated),
+        "transactions": sum(len(m["transactions"]) for m in generated),
+    }
+
+    results: Dict[str, Any] = {}
+    if "robust_validator" in engines:
+        results["robust_validator"] = replay_robust_validator(generated)
+    if "auto_reconcile" in engines:
+        results["auto_reconcile"] = await replay_auto_reconcile(generated)
+    if "suggested_matches" in engines:
+        results["suggested_matches"] = await replay_suggested_matches(generated)
+
+    return {"dataset": dataset, "engines": results}
+
+# --- Armazenamento e comparação ---
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def save_run(run: Dict[str, Any]) -> Path:
+    RESULTS_DIR.mkdir(exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = RESULTS_DIR / f"{stamp}_{run['label']}.json"
+    path.write_text(json.dumps(run, indent=2, ensure_ascii=False))
+    return path
+
+def find_baseline(params: Dict[str, Any], reference: str) -> Optional[Dict[str, Any]]:
+    """`latest` = execução mais recente com os mesmos parâmetros; senão, caminho do arquivo"""
+    if reference != "latest":
+        return json.loads(Path(reference).read_text())
+    if not RESULTS_DIR.exists():
+        return None
+    for path in sorted(RESULTS_DIR.glob("*.json"), reverse=True):
+        run = json.loads(path.read_text())
+        if run.get("params") == params:
+            return run
+    return None
+
+def compare_runs(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Imprime deltas por engine e retorna as regressões encontradas"""
+    regressions = []
+    print("\n" + "=" * 70)
+    print(f"📊 COMPARAÇÃO: {baseline['label']} ({baseline.get('git_revision')}) → {current['label']} ({current.get('git_revision')})")
+    print("=" * 70)
+
+    for engine, metrics in current["engines"].items():
+        base_metrics = baseline["engines"].get(engine)
+        if not base_metrics:
+            continue
+        print(f"\n   {engine}")
+        for metric, limit in REGRESSION_THRESHOLDS.items():
+            old, new = base_metrics.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            if metric in RELATIVE_METRICS:
+                delta = (new - old) / old if old else 0.0
+                shown = f"{delta:+.1%}"
+            else:
+                delta = new - old
+                shown = f"{delta * 100:+.2f} p.p."
+            regressed = delta < limit if limit < 0 else delta > limit
+            flag = "⚠️ " if regressed else "  "
+            print(f"   {flag}{metric:<22} {old:>12} → {new:<12} ({shown})")
+            if regressed:
+                regressions.append(f"{engine}.{metric}: {old} → {new}")
+    return regressions
+
+def print_report(run: Dict[str, Any]):
+    dataset = run["dataset"]
+    print("=" * 70)
+    print(f"🔁 REPLAY DE CONCILIAÇÃO: {run['label']}")
+    print(f"   {dataset['months']} meses | {dataset['units']} unidades | "
+          f"{dataset['receipts']} comprovantes | {dataset['transactions']} transações")
+    print("=" * 70)
+
+    for engine, m in run["engines"].items():
+        print(f"\n⚙️  {engine}")
+        print(f"   Throughput: {m['throughput_per_s']} comprovantes/s ({m['elapsed_s']}s)")
+        print(f"   Latência por {m['latency_unit']}: p50 {m['latency_p50_ms']}ms | p95 {m['latency_p95_ms']}ms | p99 {m['latency_p99_ms']}ms")
+        print(f"   Acurácia: {m['accuracy']:.2%} | Revisão manual: {m['manual_review_rate']:.2%} | "
+              f"Match errado: {m['false_match_rate']:.2%} | Perdidos: {m['missed_rate']:.2%}")
+        for key in ("resolution_levels", "refund_link_accuracy", "top3_recall", "precompute_ms_per_receipt"):
+            if key in m:
+                print(f"   {key}: {m[key]}")
+
+async def main() -> bool:
+    parser = argparse.ArgumentParser(description="Replay de conciliação com meses sintéticos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--units", type=int, default=120)
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Lista separada por vírgula")
+    parser.add_argument("--label", default="local")
+    parser.add_argument("--compare", help="'latest' ou caminho de um resultado salvo")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    params = {"seed": args.seed, "months": args.months, "units": args.units}
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"Engines desconhecidos: {', '.join(sorted(unknown))}")
+
+    baseline = find_baseline(params, args.compare) if args.compare else None
+
+    run = {
+        "label": args.label,
+        "created_at": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "params": params,
+        **await run_replay(args.seed, args.months, args.units, engines),
+    }
+    print_report(run)
+
+    if not args.no_save:
+        print(f"\n💾 Resultado salvo em {save_run(run)}")
+
+    if args.compare:
+        if not baseline:
+            print("\n⚠️  Nenhuma execução anterior com os mesmos parâmetros para comparar")
+            return True
+        regressions = compare_runs(baseline, run)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressão(ões) detectada(s)")
+            return not args.fail_on_regression
+        print("\n✅ Sem regressões")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
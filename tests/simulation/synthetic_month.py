@@ -0,0 +1,227 @@
+"""
+Synthetic Month - Gerador de Meses Sintéticos de Condomínio
+Gera extrato + comprovantes realistas com gabarito (ground truth):
+valores de cota repetidos, taxas de boleto, horários de PIX, estornos,
+CPFs, comprovantes sem pagamento e reenvios do mesmo comprovante.
+"""
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+
+# Poucas faixas de cota => muitos valores duplicados no mesmo mês
+QUOTA_VALUES = [650.00, 650.00, 650.00, 820.00, 820.00, 1100.00]
+BOLETO_FEES = [2.50, 3.00, 1.50, 5.00]
+DUE_DAY = 10
+
+# Mix de meios de pagamento
+PAYMENT_METHODS = [("pix", 0.55), ("boleto", 0.35), ("ted", 0.10)]
+
+def _random_digits(rng: random.Random, size: int) -> str:
+    return "".join(str(rng.randint(0, 9)) for _ in range(size))
+
+def _pick_method(rng: random.Random) -> str:
+    roll = rng.random()
+    acc = 0.0
+    for method, weight in PAYMENT_METHODS:
+        acc += weight
+        if roll < acc:
+            return method
+    return PAYMENT_METHODS[-1][0]
+
+def build_units(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    """Unidades com morador (CPF) e valor de cota"""
+    return [
+        {
+            "unidade": f"{(i // 8) + 1:02d}{(i % 8) + 1:02d}",
+            "cpf": _random_digits(rng, 11),
+            "quota": rng.choice(QUOTA_VALUES),
+        }
+        for i in range(count)
+    ]
+
+def generate_month(
+    rng: random.Random,
+    units: List[Dict[str, Any]],
+    year: int,
+    month: int,
+    condominio_id: str = "condo_sim",
+    no_payment_rate: float = 0.03,
+    resend_rate: float = 0.02,
+    refund_count: int = 2,
+    other_credits: int = 5
+) -> Dict[str, Any]:
+    """
+    Gera um mês de movimentação.
+
+    Returns:
+        {
+            "label": "2025-11",
+            "condominio_id": ...,
+            "extrato_id": ...,
+            "transactions": [linhas de transacoes_bancarias + timestamp/payer_document],
+            "receipts": [linhas de comprovantes + ocr_timestamp/ocr_cpf],
+            "truth": {receipt_id: transaction_id ou None},
+            "refunds": {credit_id: debit_id}
+        }
+    """
+    label = f"{year}-{month:02d}"
+    extrato_id = f"ext_{label}"
+    transactions: List[Dict[str, Any]] = []
+    receipts: List[Dict[str, Any]] = []
+    truth: Dict[str, Optional[str]] = {}
+    refunds: Dict[str, str] = {}
+
+    def add_transaction(**fields) -> Dict[str, Any]:
+        tx = {
+            "id": f"tx_{label}_{len(transactions):05d}",
+            "extrato_id": extrato_id,
+            "tipo": "credito" if fields["valor"] > 0 else "debito",
+            "status_reconciliacao": "pendente",
+            "comprovante_id": None,
+            "nsu": None,
+            "timestamp": None,
+            "payer_document": None,
+            "receiver_document": None,
+            **fields,
+        }
+        transactions.append(tx)
+        return tx
+
+    def add_receipt(unit: Dict[str, Any], **fields) -> Dict[str, Any]:
+        receipt = {
+            "id": f"rec_{label}_{len(receipts):05d}",
+            "unidade": unit["unidade"],
+            "status": "pendente",
+            "ocr_processado": True,
+            "ocr_nsu": None,
+            "ocr_timestamp": None,
+            "ocr_cpf": None,
+            **fields,
+        }
+        receipts.append(receipt)
+        return receipt
+
+    for unit in units:
+        # Comprovante sem pagamento correspondente (golpe/erro)
+        if rng.random() < no_payment_rate:
+            pay_date = date(year, month, rng.randint(1, DUE_DAY + 5))
+            receipt = add_receipt(
+                unit,
+                ocr_valor=unit["quota"],
+                ocr_data=pay_date.isoformat(),
+                ocr_cpf=unit["cpf"] if rng.random() < 0.7 else None,
+                data_envio=datetime.combine(pay_date, datetime.min.time(), tzinfo=timezone.utc).isoformat(),
+            )
+            truth[receipt["id"]] = None
+            continue
+
+        method = _pick_method(rng)
+        pay_date = date(year, month, min(28, max(1, int(rng.gauss(DUE_DAY - 2, 3)))))
+        paid_at = datetime(year, month, pay_date.day, rng.randint(7, 22), rng.randint(0, 59), rng.randint(0, 59), tzinfo=timezone.utc)
+        quota = unit["quota"]
+
+        if method == "pix":
+            e2e = f"E{_random_digits(rng, 31)}"
+            tx = add_transaction(
+                data_transacao=pay_date.isoformat(),
+                valor=quota,
+                descricao=f"PIX RECEBIDO {unit['unidade']}",
+                nsu=e2e,
+                timestamp=paid_at.isoformat(),
+                payer_document=unit["cpf"] if rng.random() < 0.9 else None,
+            )
+            receipt_nsu = e2e if rng.random() < 0.6 else None
+            # Horário impresso no comprovante difere poucos segundos do banco
+            receipt_ts = paid_at + timedelta(seconds=rng.randint(-90, 90))
+        elif method == "boleto":
+            fee = rng.choice(BOLETO_FEES) if rng.random() < 0.85 else 0.0
+            credit_date = pay_date + timedelta(days=rng.randint(1, 2))
+            tx = add_transaction(
+                data_transacao=credit_date.isoformat(),
+                valor=round(quota - fee, 2),
+                descricao="LIQUIDACAO BOLETO",
+                nsu=_random_digits(rng, 12),
+            )
+            receipt_nsu = tx["nsu"] if rng.random() < 0.4 else None
+            receipt_ts = paid_at if rng.random() < 0.5 else None
+        else:
+            tx = add_transaction(
+                data_transacao=pay_date.isoformat(),
+                valor=quota,
+                descricao="TED RECEBIDA",
+                timestamp=paid_at.replace(minute=0, second=0).isoformat(),
+                payer_document=unit["cpf"] if rng.random() < 0.5 else None,
+            )
+            receipt_nsu = None
+            receipt_ts = paid_at
+
+        uploaded_at = paid_at + timedelta(minutes=rng.randint(5, 72 * 60))
+        receipt = add_receipt(
+            unit,
+            ocr_valor=quota,
+            ocr_data=pay_date.isoformat(),
+            ocr_nsu=receipt_nsu,
+            ocr_timestamp=receipt_ts.isoformat() if receipt_ts else None,
+            ocr_cpf=unit["cpf"] if rng.random() < 0.7 else None,
+            data_envio=uploaded_at.isoformat(),
+        )
+        truth[receipt["id"]] = tx["id"]
+
+        # Morador reenvia o mesmo comprovante: o segundo não tem transação própria
+        if rng.random() < resend_rate:
+            resend = add_receipt(
+                unit,
+                **{k: receipt[k] for k in ("ocr_valor", "ocr_data", "ocr_nsu", "ocr_timestamp", "ocr_cpf")},
+                data_envio=(uploaded_at + timedelta(hours=rng.randint(1, 48))).isoformat(),
+            )
+            truth[resend["id"]] = None
+
+    # Estornos de fornecedor: débito seguido de crédito do mesmo valor/CNPJ
+    for _ in range(refund_count):
+        cnpj = _random_digits(rng, 14)
+        amount = round(rng.uniform(200, 5000), 2)
+        debit_date = date(year, month, rng.randint(1, 20))
+        debit = add_transaction(
+            data_transacao=debit_date.isoformat(),
+            valor=-amount,
+            descricao="PAGAMENTO FORNECEDOR",
+            receiver_document=cnpj,
+        )
+        credit = add_transaction(
+            data_transacao=(debit_date + timedelta(days=rng.randint(0, 5))).isoformat(),
+            valor=amount,
+            descricao="TED RECEBIDA",
+            payer_document=cnpj,
+        )
+        refunds[credit["id"]] = debit["id"]
+
+    # Outros créditos sem comprovante (aluguel de salão, rendimentos)
+    for _ in range(other_credits):
+        add_transaction(
+            data_transacao=date(year, month, rng.randint(1, 28)).isoformat(),
+            valor=rng.choice([150.00, 150.00, 300.00, round(rng.uniform(5, 80), 2)]),
+            descricao=rng.choice(["PIX RECEBIDO", "RENDIMENTO APLICACAO"]),
+        )
+
+    return {
+        "label": label,
+        "condominio_id": condominio_id,
+        "extrato_id": extrato_id,
+        "transactions": transactions,
+        "receipts": receipts,
+        "truth": truth,
+        "refunds": refunds,
+    }
+
+def generate_months(seed: int, months: int, units: int, start: date = date(2025, 1, 1)) -> List[Dict[str, Any]]:
+    """Gera `months` meses consecutivos para o mesmo condomínio (determinístico pela seed)"""
+    rng = random.Random(seed)
+    condo_units = build_units(rng, units)
+    generated = []
+    year, month = start.year, start.month
+    for _ in range(months):
+        generated.append(generate_month(rng, condo_units, year, month))
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+    return generated
@@ -0,0 +1,165 @@
+"""
+Teste de Validação: Auto-Conciliação em Lote
+Valida o hash join (NSU, bucket de centavos + janela de data) e a regra
+de só vincular pares mutuamente únicos, com crédito decidido pelo tipo
+da transação (o sinal do valor só vale para linhas sem tipo) e o NSU
+vinculando sem depender da data do OCR
+"""
+import sys
+import os
+import asyncio
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+from app.services.auto_reconciler import plan_links, AutoReconciler
+from app.services.matching_rules import DEFAULT_RULES
+from memory_store import MemoryStore
+from memory_functions import register_functions
+
+async def test_plan_links():
+    print("\n" + "="*70)
+    print("TESTE 1: Hash Join (NSU + Valor/Data)")
+    print("="*70)
+
+    transactions = [
+        {"id": "tx_nsu", "valor": 650.00, "data_transacao": "2025-12-05", "nsu": "E123"},
+        {"id": "tx_boleto", "valor": 817.50, "data_transacao": "2025-12-07", "nsu": None},   # 820 - 2,50 de taxa
+        {"id": "tx_dup_1", "valor": 650.00, "data_transacao": "2025-12-08", "nsu": None},
+        {"id": "tx_dup_2", "valor": 650.00, "data_transacao": "2025-12-08", "nsu": None},
+        {"id": "tx_debito", "valor": -820.00, "data_transacao": "2025-12-06", "nsu": None},
+    ]
+
+    receipts = [
+        {"id": "rec_nsu", "ocr_valor": 650.00, "ocr_data": "2025-12-05", "ocr_nsu": "E123"},
+        {"id": "rec_boleto", "ocr_valor": 820.00, "ocr_data": "2025-12-05", "ocr_nsu": None},
+        {"id": "rec_dup_1", "ocr_valor": 650.00, "ocr_data": "2025-12-08", "ocr_nsu": None},   # Dois candidatos iguais
+        {"id": "rec_dup_2", "ocr_valor": 650.00, "ocr_data": "2025-12-08", "ocr_nsu": None},
+        {"id": "rec_longe", "ocr_valor": 820.00, "ocr_data": "2025-11-20", "ocr_nsu": None},   # Fora da janela
+    ]
+
+    links, ambiguos, sem_candidato = plan_links(transactions, receipts, DEFAULT_RULES)
+    linked = {link.comprovante_id: (link.transacao_id, link.method) for link in links}
+
+    for receipt_id, (txn_id, method) in linked.items():
+        print(f"   {receipt_id} -> {txn_id} ({method})")
+    print(f"   Ambíguos: {ambiguos} | Sem candidato: {sem_candidato}")
+
+    ok = (
+        linked == {
+            "rec_nsu": ("tx_nsu", "nsu"),
+            "rec_boleto": ("tx_boleto", "valor_data"),
+        }
+        and ambiguos == 2
+        and sem_candidato == 1
+    )
+
+    if ok:
+        print("✅ SUCESSO: Apenas pares únicos vinculados")
+    else:
+        print("❌ FALHA: Vínculos incorretos")
+    return ok
+
+async def test_credit_by_type():
+    print("\n" + "="*70)
+    print("TESTE 2: Crédito pelo Tipo, Não pelo Sinal")
+    print("="*70)
+
+    # Open Finance grava débitos com valor positivo
+    transactions = [
+        {"id": "tx_debito_nsu", "valor": 650.00, "tipo": "debito", "data_transacao": "2025-12-05", "nsu": "E123"},
+        {"id": "tx_debito", "valor": 820.00, "tipo": "debito", "data_transacao": "2025-12-06", "nsu": None},
+        {"id": "tx_credito", "valor": 820.00, "tipo": "credito", "data_transacao": "2025-12-06", "nsu": None},
+        {"id": "tx_sem_tipo", "valor": 310.00, "data_transacao": "2025-12-09", "nsu": None},
+        {"id": "tx_sem_tipo_neg", "valor": -415.00, "data_transacao": "2025-12-09", "nsu": None},
+    ]
+    receipts = [
+        {"id": "rec_nsu", "ocr_valor": 650.00, "ocr_data": "2025-12-05", "ocr_nsu": "E123"},
+        {"id": "rec_820", "ocr_valor": 820.00, "ocr_data": "2025-12-06", "ocr_nsu": None},
+        {"id": "rec_310", "ocr_valor": 310.00, "ocr_data": "2025-12-09", "ocr_nsu": None},
+        {"id": "rec_415", "ocr_valor": 415.00, "ocr_data": "2025-12-09", "ocr_nsu": None},
+    ]
+
+    links, ambiguos, sem_candidato = plan_links(transactions, receipts, DEFAULT_RULES)
+    linked = {link.comprovante_id: link.transacao_id for link in links}
+    print(f"   Vínculos: {linked} | Ambíguos: {ambiguos} | Sem candidato: {sem_candidato}")
+
+    ok = (
+        linked == {"rec_820": "tx_credito", "rec_310": "tx_sem_tipo"}     # Débito de mesmo valor não torna o par ambíguo
+        and ambiguos == 0
+        and sem_candidato == 2                                            # NSU de débito e valor negativo sem tipo
+    )
+
+    if ok:
+        print("✅ SUCESSO: Débitos com valor positivo nunca entram no matching")
+    else:
+        print("❌ FALHA: Débito tratado como crédito")
+    return ok
+
+async def test_nsu_ignores_ocr_date():
+    print("\n" + "="*70)
+    print("TESTE 3: NSU Vincula Sem Depender da Data do OCR")
+    print("="*70)
+
+    def txn(txn_id, valor, day, nsu):
+        return {"id": txn_id, "extrato_id": "ext_1", "condominio_id": "condo_1", "data_transacao": day,
+                "valor": valor, "tipo": "credito", "nsu": nsu, "status_reconciliacao": "pendente"}
+
+    def receipt(receipt_id, valor, day, nsu, condominio_id="condo_1"):
+        return {"id": receipt_id, "condominio_id": condominio_id, "status": "pendente", "ocr_processado": True,
+                "ocr_valor": valor, "ocr_data": day, "ocr_nsu": nsu}
+
+    store = register_functions(MemoryStore({
+        "extratos_bancarios": [{"id": "ext_1", "condominio_id": "condo_1"}],
+        "transacoes_bancarias": [
+            txn("tx_sem_data", 650.00, "2025-12-05", "E111"),
+            txn("tx_data_errada", 820.00, "2025-12-06", "E222"),
+            txn("tx_dup", 430.00, "2025-12-07", "E333"),
+        ],
+        "comprovantes": [
+            receipt("rec_sem_data", 650.00, None, "E111"),              # OCR não leu a data
+            receipt("rec_data_errada", 820.00, "2024-06-12", "E222"),   # Data lida errada
+            receipt("rec_dup_janela", 430.00, "2025-12-07", "E333"),
+            receipt("rec_dup_antigo", 430.00, "2025-03-01", "E333"),    # Mesmo NSU fora da janela
+            receipt("rec_outro_condo", 650.00, None, "E111", condominio_id="condo_2"),
+        ],
+        "fila_reconciliacao": [],
+    }))
+
+    report = AutoReconciler(store).run("ext_1")
+    receipts = {r["id"]: r for r in store.tables["comprovantes"]}
+    print(f"   Vínculos por NSU: {report.vinculos_nsu} | ambíguos: {report.ambiguos}")
+    print(f"   Status: { {rid: r['status'] for rid, r in receipts.items()} }")
+
+    ok = (
+        report.vinculos_nsu == 2 and report.vinculos_valor_data == 0 and report.ambiguos == 1
+        and receipts["rec_sem_data"]["transacao_id"] == "tx_sem_data"
+        and receipts["rec_data_errada"]["transacao_id"] == "tx_data_errada"
+        and receipts["rec_dup_janela"]["status"] == "pendente"          # NSU repetido entre os pendentes: revisão
+        and receipts["rec_dup_antigo"]["status"] == "pendente"
+        and receipts["rec_outro_condo"]["status"] == "pendente"
+    )
+
+    if ok:
+        print("✅ SUCESSO: NSU exato vincula mesmo com a data do OCR ausente ou errada")
+    else:
+        print("❌ FALHA: Vínculo por NSU preso à janela de datas")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE AUTO-CONCILIAÇÃO...")
+
+    success_plan = await test_plan_links()
+    success_credit = await test_credit_by_type()
+    success_nsu = await test_nsu_ignores_ocr_date()
+
+    if success_plan and success_credit and success_nsu:
+        print("\n🎉 TODOS OS TESTES DE AUTO-CONCILIAÇÃO PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
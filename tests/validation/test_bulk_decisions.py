@@ -0,0 +1,210 @@
+"""
+Teste de Validação: Decisões de Conciliação em Lote
+Valida que aprovação/rejeição em lote usa uma única RPC, aplica os itens
+válidos, reporta os inválidos por item, grava a trilha de auditoria e
+respeita o escopo do condomínio (obrigatório)
+"""
+import sys
+import os
+import asyncio
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+# O endpoint é chamado com o MemoryStore; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.services.reconciliation_decisions import ReconciliationDecisionService
+from app.api.endpoints import reconciliation
+from app.services.queue_events import queue_event_bus
+from memory_store import MemoryStore
+from memory_functions import register_functions
+
+class CountingStore(MemoryStore):
+    """Conta as idas ao banco (tabela ou RPC)"""
+
+    def __init__(self, tables):
+        super().__init__(tables)
+        self.round_trips = 0
+
+    def table(self, name):
+        self.round_trips += 1
+        return super().table(name)
+
+    def rpc(self, name, params=None):
+        self.round_trips += 1
+        return super().rpc(name, params)
+
+def build_store() -> CountingStore:
+    receipts = [f"rec_{i}" for i in range(6)]
+    store = CountingStore({
+        "comprovantes": [{"id": r, "condominio_id": "condo_a", "status": "pendente"} for r in receipts]
+                        + [{"id": "rec_aprovado", "condominio_id": "condo_a", "status": "aprovado"}],
+        "transacoes_bancarias": [{"id": f"tx_{i}", "condominio_id": "condo_a", "status_reconciliacao": "pendente"} for i in range(6)]
+                                + [{"id": "tx_conciliada", "condominio_id": "condo_a", "status_reconciliacao": "reconciliado"}],
+        "fila_reconciliacao": [{"id": f"q_{r}", "condominio_id": "condo_a", "comprovante_id": r, "status": "pendente"} for r in receipts],
+    })
+    return register_functions(store)
+
+async def test_bulk_approve():
+    print("\n" + "="*70)
+    print("TESTE 1: Aprovação em Lote")
+    print("="*70)
+
+    store = build_store()
+    approvals = [
+        {"comprovante_id": "rec_0", "transacao_id": "tx_0"},
+        {"comprovante_id": "rec_1", "transacao_id": "tx_1", "motivo_decisao": "conferido"},
+        {"comprovante_id": "rec_aprovado", "transacao_id": "tx_2"},     # já decidido
+        {"comprovante_id": "rec_2", "transacao_id": "tx_conciliada"},   # transação já usada
+        {"comprovante_id": "rec_3", "transacao_id": "tx_3"},            # mesma transação
+        {"comprovante_id": "rec_4", "transacao_id": "tx_3"},            # em dois itens
+        {"comprovante_id": "rec_5", "transacao_id": "tx_inexistente"},
+    ]
+
+    report = ReconciliationDecisionService(store).approve(approvals, "condo_a")
+    outcomes = [r["resultado"] for r in report["resultados"]]
+    receipts = {c["id"]: c for c in store.tables["comprovantes"]}
+    queue = {q["comprovante_id"]: q["status"] for q in store.tables["fila_reconciliacao"]}
+    audit = store.tables["decisoes_reconciliacao"]
+
+    print(f"   Idas ao banco: {store.round_trips} para {len(approvals)} decisões")
+    print(f"   Resultados: {outcomes}")
+    print(f"   Auditoria: {len(audit)} linhas no lote {report['lote_id'][:8]}")
+
+    ok = (
+        store.round_trips == 1
+        and outcomes == [
+            "aplicado", "aplicado", "comprovante_ja_decidido", "transacao_ja_conciliada",
+            "transacao_repetida", "transacao_repetida", "transacao_inexistente"
+        ]
+        and report["aplicados"] == 2 and report["ignorados"] == 5
+        and receipts["rec_1"]["status"] == "aprovado" and receipts["rec_1"]["transacao_id"] == "tx_1"
+        and receipts["rec_3"]["status"] == "pendente"
+        and queue["rec_0"] == "concluido" and queue["rec_3"] == "pendente"
+        and len(audit) == len(approvals) and all(a["lote_id"] == report["lote_id"] for a in audit)
+    )
+
+    if ok:
+        print("✅ SUCESSO: Uma RPC, itens válidos aplicados e inválidos reportados")
+    else:
+        print("❌ FALHA: Aprovação em lote incorreta")
+    return ok
+
+async def test_bulk_reject():
+    print("\n" + "="*70)
+    print("TESTE 2: Rejeição em Lote e Eventos da Fila")
+    print("="*70)
+
+    store = build_store()
+    subscription = queue_event_bus.subscribe()
+
+    report = ReconciliationDecisionService(store).reject([
+        {"comprovante_id": "rec_0", "motivo_decisao": "ilegível"},
+        {"comprovante_id": "rec_1", "motivo_decisao": "duplicado"},
+        {"comprovante_id": "rec_1", "motivo_decisao": "duplicado"},   # repetido no lote
+    ], "condo_a")
+
+    events = []
+    while True:
+        event = await subscription.get(timeout=0.05)
+        if event is None:
+            break
+        events.append(event)
+    subscription.close()
+
+    outcomes = [r["resultado"] for r in report["resultados"]]
+    receipts = {c["id"]: c for c in store.tables["comprovantes"]}
+    print(f"   Resultados: {outcomes} | Eventos: {[(e.type, e.comprovante_id) for e in events]}")
+
+    ok = (
+        outcomes == ["aplicado", "comprovante_repetido", "comprovante_repetido"]
+        and receipts["rec_0"]["status"] == "rejeitado" and receipts["rec_0"]["motivo_decisao"] == "ilegível"
+        and receipts["rec_1"]["status"] == "pendente"
+        and [(e.type, e.comprovante_id) for e in events] == [("remove", "rec_0")]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Rejeições aplicadas e só elas publicadas na fila")
+    else:
+        print("❌ FALHA: Rejeição em lote incorreta")
+    return ok
+
+async def test_tenant_scope():
+    print("\n" + "="*70)
+    print("TESTE 3: Escopo do Condomínio")
+    print("="*70)
+
+    store = register_functions(MemoryStore({
+        "comprovantes": [
+            {"id": "rec_a", "condominio_id": "condo_a", "status": "pendente"},
+            {"id": "rec_b", "condominio_id": "condo_b", "status": "pendente"},
+            {"id": "rec_a2", "condominio_id": "condo_a", "status": "pendente"},
+        ],
+        "transacoes_bancarias": [
+            {"id": "tx_a", "condominio_id": "condo_a", "status_reconciliacao": "pendente"},
+            {"id": "tx_b", "condominio_id": "condo_b", "status_reconciliacao": "pendente"},
+        ],
+        "fila_reconciliacao": [],
+    }))
+
+    report = ReconciliationDecisionService(store).approve([
+        {"comprovante_id": "rec_a", "transacao_id": "tx_a"},
+        {"comprovante_id": "rec_b", "transacao_id": "tx_b"},     # outro condomínio
+        {"comprovante_id": "rec_a2", "transacao_id": "tx_b"},    # transação de outro condomínio
+    ], condominio_id="condo_a")
+
+    # Sem condomínio a RPC não restringiria o lote: recusado antes de chegar ao banco
+    try:
+        ReconciliationDecisionService(store).reject([{"comprovante_id": "rec_b"}], None)
+        service_rejected = False
+    except ValueError:
+        service_rejected = True
+
+    app = FastAPI()
+    app.include_router(reconciliation.router, prefix="/reconciliation")
+    app.dependency_overrides[reconciliation.get_supabase] = lambda: store
+    client = TestClient(app)
+    statuses = [
+        client.post("/reconciliation/approve", json={"comprovante_id": "rec_b", "transacao_id": "tx_b"}).status_code,
+        client.post("/reconciliation/reject/bulk", json={"items": [{"comprovante_id": "rec_b"}]}).status_code,
+        client.get("/reconciliation/queue").status_code,
+    ]
+
+    outcomes = [r["resultado"] for r in report["resultados"]]
+    receipts = {c["id"]: c for c in store.tables["comprovantes"]}
+    print(f"   Resultados: {outcomes}")
+    print(f"   Sem condomínio: serviço recusou={service_rejected} | API: {statuses}")
+
+    ok = (
+        outcomes == ["aplicado", "comprovante_inexistente", "transacao_inexistente"]
+        and receipts["rec_b"]["status"] == "pendente" and receipts["rec_a2"]["status"] == "pendente"
+        and service_rejected and statuses == [422, 422, 422]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Itens de outro condomínio tratados como inexistentes")
+    else:
+        print("❌ FALHA: Decisão atravessou o escopo do condomínio")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE DECISÕES EM LOTE...")
+
+    success_approve = await test_bulk_approve()
+    success_reject = await test_bulk_reject()
+    success_tenant = await test_tenant_scope()
+
+    if success_approve and success_reject and success_tenant:
+        print("\n🎉 TODOS OS TESTES DE DECISÕES EM LOTE PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Teste de Validação: Índice CNAE
+Valida a trie CNAE (classificação hierárquica e compatibilidade CNAE × Serviço)
+"""
+import sys
+import os
+import asyncio
+
+# Adicionar path do backend
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from app.services.cnae.index import get_cnae_index
+from app.services.robust_validator import RobustValidator
+
+async def test_classification():
+    print("\n" + "="*70)
+    print("TESTE 1: Classificação Hierárquica")
+    print("="*70)
+
+    index = get_cnae_index()
+
+    elevador = index.classify("4329-1/03")
+    print(f"   4329-1/03 -> {elevador.nivel}: {elevador.descricao}")
+    print(f"   Seção {elevador.secao} / Divisão {elevador.divisao} / Grupo {elevador.grupo} / Classe {elevador.classe}")
+
+    # Fora dos ramos detalhados: resolve até a divisão
+    farmacia = index.classify("4771701")
+    print(f"   4771701 -> {farmacia.nivel}: {farmacia.descricao}")
+
+    ok = (
+        elevador.nivel == "subclasse"
+        and elevador.secao == "F"
+        and elevador.classe == "43.29-1"
+        and farmacia.nivel == "divisao"
+        and farmacia.secao == "G"
+        and index.classify("00") is None
+    )
+
+    if ok:
+        print("✅ SUCESSO: Hierarquia resolvida")
+    else:
+        print("❌ FALHA: Hierarquia incorreta")
+    return ok
+
+async def test_service_compatibility():
+    print("\n" + "="*70)
+    print("TESTE 2: Compatibilidade CNAE × Serviço")
+    print("="*70)
+
+    validator = RobustValidator()
+
+    cases = [
+        # (cnae principal, secundários, serviço, esperado)
+        ("4329-1/03", [], "elevador", True),
+        ("1091102", [], "elevador", False),            # Padaria
+        ("1091102", ["8121-4/00"], "limpeza", True),   # Compatível pelo secundário
+        ("8130300", [], "Jardinagem", True),
+        ("4321500", [], "servico_inexistente", None),
+    ]
+
+    ok = True
+    for cnae, secundarios, service, expected in cases:
+        valid, reason = validator.validate_cnae_service(cnae, secundarios, service)
+        status = "✅" if valid == expected else "❌"
+        print(f"   {status} {cnae} + {service}: {valid} ({reason})")
+        ok = ok and valid == expected
+
+    # Lote deve concordar com as chamadas individuais
+    batch = validator.validate_cnae_services([(c, s, svc) for c, s, svc, _ in cases])
+    ok = ok and [valid for valid, _ in batch] == [expected for *_, expected in cases]
+
+    if ok:
+        print("✅ SUCESSO: Compatibilidade correta (individual e lote)")
+    else:
+        print("❌ FALHA: Compatibilidade incorreta")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DO ÍNDICE CNAE...")
+
+    success_classification = await test_classification()
+    success_compatibility = await test_service_compatibility()
+
+    if success_classification and success_compatibility:
+        print("\n🎉 TODOS OS TESTES DO ÍNDICE CNAE PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,7 +5,7 @@ Valida Cascade Logic, Fila de Jobs e Audit Log
 import sys
 import os
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone, date
 from decimal import Decimal
 from typing import Dict, Any
 
@@ -168,13 +168,126 @@ async def test_refund_detection():
         print("❌ FALHA: Estorno não detectado")
         return False
 
+async def test_refund_batch_detection():
+    print("\n" + "="*70)
+    print("TESTE 3: Detecção de Estorno em Lote (Índice)")
+    print("="*70)
+    
+    validator = RobustValidator()
+    
+    debits = [
+        {"id": "deb_1", "amount": -5000.00, "date": "2025-11-20", "payer_document": "11.222.333/0001-99"},
+        {"id": "deb_2", "amount": -5000.00, "date": "2025-11-25", "payer_document": "11.222.333/0001-99"},
+        {"id": "deb_3", "amount": -120.50, "date": "2025-11-28", "receiver_document": "44.555.666/0001-77"},
+        {"id": "deb_4", "amount": -300.00, "date": "2025-11-10"},  # Sem documento: ignorado
+    ]
+    
+    credits = [
+        # Estorno do débito mais recente anterior (deb_2)
+        {"id": "cred_1", "amount": 5000.00, "date": "2025-11-26", "payer_document": "11222333000199", "description": "TED RECEBIDA"},
+        # Crédito ANTES do débito: não é estorno
+        {"id": "cred_2", "amount": 120.50, "date": "2025-11-27", "payer_document": "44555666000177", "description": "PIX RECEBIDO"},
+        # Mesmo dia do débito: é estorno
+        {"id": "cred_3", "amount": 120.50, "date": "2025-11-28T15:00:00Z", "payer_document": "44555666000177", "description": "PIX RECEBIDO"},
+        # Débito sem documento não gera vínculo
+        {"id": "cred_4", "amount": 300.00, "date": "2025-11-11", "payer_document": "12345678900", "description": "PIX RECEBIDO"},
+        # Palavra-chave
+        {"id": "cred_5", "amount": 10.00, "date": "2025-11-11", "description": "DEVOLUCAO TARIFA"},
+    ]
+    
+    links = {link.credit_id: link for link in validator.detect_refunds(credits, debits)}
+    
+    for credit_id, link in links.items():
+        print(f"   {credit_id}: estorno={link.is_refund} débito={link.debit_id} ({link.method})")
+    
+    expected = {
+        "cred_1": (True, "deb_2"),
+        "cred_2": (False, None),
+        "cred_3": (True, "deb_3"),
+        "cred_4": (False, None),
+        "cred_5": (True, None),
+    }
+    
+    ok = all((links[cid].is_refund, links[cid].debit_id) == exp for cid, exp in expected.items())
+    
+    # A API unitária deve concordar com a versão em lote
+    for credit in credits:
+        is_refund, _ = validator.detect_refund(credit, debits)
+        ok = ok and is_refund == links[credit["id"]].is_refund
+    
+    if ok:
+        print("✅ SUCESSO: Vínculos de estorno corretos")
+        return True
+    else:
+        print("❌ FALHA: Vínculos de estorno incorretos")
+        return False
+
+async def test_timestamp_batch_resolution():
+    print("\n" + "="*70)
+    print("TESTE 4: Resolução por Timestamp em Lote (Merge-Join)")
+    print("="*70)
+    
+    validator = RobustValidator()
+    
+    # Vários PIX de mesmo valor no dia, incluindo um perto da meia-noite
+    base = datetime(2025, 12, 1, 9, 0, tzinfo=timezone.utc)
+    transactions = [
+        {"id": f"tx_{i}", "amount": 150.00, "date": "2025-12-01",
+         "timestamp": (base + timedelta(hours=i)).isoformat(), "description": "PIX RECEBIDO"}
+        for i in range(5)
+    ]
+    transactions.append({"id": "tx_late", "amount": 150.00, "date": "2025-12-01",
+                         "timestamp": "2025-12-01T23:55:00+00:00", "description": "PIX RECEBIDO"})
+    
+    matches = [
+        validator._check_transaction_match(Decimal("150.00"), date(2025, 12, 1), None, tx)
+        for tx in transactions
+    ]
+    
+    receipts = [
+        ("rec_a", base + timedelta(hours=2, minutes=5)),       # -> tx_2
+        ("rec_b", base + timedelta(hours=2, minutes=20)),      # tx_2 já usado; tx_3 a 40min -> sem match
+        ("rec_c", base + timedelta(minutes=-10)),              # -> tx_0
+        ("rec_d", datetime(2025, 12, 2, 0, 10, tzinfo=timezone.utc)),  # Atravessa a meia-noite -> tx_late
+    ]
+    
+    results = validator.resolve_timestamps_batch(matches, receipts)
+    resolved = {rid: (r.matches[0].transaction_id if r else None) for rid, r in results.items()}
+    print(f"   Resolvidos: {resolved}")
+    
+    ok = resolved == {"rec_a": "tx_2", "rec_b": None, "rec_c": "tx_0", "rec_d": "tx_late"}
+    ok = ok and all(r.resolution_level == "level_2_timestamp" for r in results.values() if r)
+    
+    # Consulta unitária deve concordar (índice por dia, vizinho mais próximo)
+    single = RobustValidator()
+    result = single.validate_payment(
+        receipt_amount=Decimal("150.00"),
+        receipt_date=date(2025, 12, 1),
+        receipt_timestamp=datetime(2025, 12, 2, 0, 10, tzinfo=timezone.utc),
+        upload_timestamp=datetime.now(),
+        payer_cpf=None,
+        receipt_id="rec_d",
+        transactions=transactions
+    )
+    print(f"   Unitário rec_d: {result.matches[0].transaction_id} ({result.reason})")
+    ok = ok and result.resolution_level == "level_2_timestamp" and result.matches[0].transaction_id == "tx_late"
+    
+    if ok:
+        print("✅ SUCESSO: Timestamps resolvidos em lote")
+        return True
+    else:
+        print("❌ FALHA: Resolução em lote incorreta")
+        return False
+
 async def main():
     print("🚀 INICIANDO TESTES ENTERPRISE FEATURES...")
     
     success_cascade = await test_cascade_logic()
     success_refund = await test_refund_detection()
+    success_refund_batch = await test_refund_batch_detection()
+    success_timestamp_batch = await test_timestamp_batch_resolution()
     
-    if success_cascade and success_refund:
+    if success_cascade and success_refund and success_refund_batch and success_timestamp_batch:
         print("\n🎉 TODOS OS TESTES ENTERPRISE PASSARAM!")
         return True
     else:
@@ -0,0 +1,165 @@
+"""
+Teste de Validação: Providers Fake para Teste de Carga
+Valida que os adapters de produção (Pluggy, Belvo, CNPJ.ws) funcionam
+contra o FakeProviderServer sem mudar URLs, que os perfis de carga
+(erro, rate limit) são respeitados e que o driver de carga roda os
+cenários de sync e auditoria de ponta a ponta
+"""
+import sys
+import os
+import asyncio
+from datetime import date, timedelta
+import httpx
+
+# Adicionar path do backend e do harness de simulação
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+# Tudo é servido pelo app fake; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from app.services.adapters.pluggy import PluggyAdapter
+from app.services.adapters.belvo import BelvoAdapter
+from app.services.cnpj.cnpjws_provider import CNPJWSProvider
+from app.services.cnpj.base import CNPJNotFoundError, CNPJRateLimitError
+from app.services.circuit_breaker import reset_breakers
+from app.services.resilience import reset_resilience
+from fake_providers import FakeProviderServer, FakeProvidersConfig, ProviderProfile
+from provider_load_test import run_load
+
+FAST = ProviderProfile(latency_ms=1.0, jitter_ms=0.0)
+
+async def test_adapters_against_fake():
+    print("\n" + "="*70)
+    print("TESTE 1: Adapters de Produção Contra os Providers Fake")
+    print("="*70)
+
+    reset_breakers()
+    reset_resilience()
+    server = FakeProviderServer(FakeProvidersConfig(
+        pluggy=FAST, belvo=FAST, cnpjws=FAST, items=2, transactions_per_account=1200
+    ))
+    server.install()
+    account = next(iter(server.dataset.accounts))
+    since = date.today() - timedelta(days=30)
+    expected = len(server.dataset.window(account, since.isoformat(), None))
+
+    pluggy = await PluggyAdapter("id", "secret").get_transactions(account, since)
+    pluggy_pages = server.requests("pluggy")
+    belvo = await BelvoAdapter("id", "senha").get_transactions(account, since)
+    belvo_pages = server.requests("belvo")
+
+    cnpjws = CNPJWSProvider(token="teste")
+    statuses = {}
+    for cnpj, supplier in server.dataset.cnpjs.items():
+        statuses.setdefault(supplier["situacao"], (await cnpjws.validate_cnpj(cnpj)).status_receita)
+    try:
+        await cnpjws.validate_cnpj("00000000000000")
+        not_found = False
+    except CNPJNotFoundError:
+        not_found = True
+
+    print(f"   Pluggy: {len(pluggy)}/{expected} transações em {pluggy_pages} requests (auth + páginas de 500)")
+    print(f"   Belvo: {len(belvo)}/{expected} transações em {belvo_pages} páginas (next)")
+    print(f"   CNPJ.ws: {statuses} | inexistente → 404: {not_found}")
+
+    ok = (
+        len(pluggy) == expected and len({t.id for t in pluggy}) == expected
+        and pluggy_pages == 1 + 3
+        and len(belvo) == expected and belvo_pages == 2
+        and statuses.get("Ativa") == "ATIVA"
+        and not_found
+    )
+
+    if ok:
+        print("✅ SUCESSO: Código de produção roda contra os fakes sem mudar URLs")
+    else:
+        print("❌ FALHA: Fake incompatível com os adapters")
+    return ok
+
+async def test_load_profiles():
+    print("\n" + "="*70)
+    print("TESTE 2: Perfis de Carga (Taxa de Erro e Rate Limit)")
+    print("="*70)
+
+    server = FakeProviderServer(FakeProvidersConfig(
+        cnpjws=ProviderProfile(latency_ms=0.0, jitter_ms=0.0, error_rate=0.3)
+    ))
+    cnpj = next(iter(server.dataset.cnpjs))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app)) as client:
+        for _ in range(300):
+            await client.get(f"https://publica.cnpj.ws/cnpj/{cnpj}")
+    error_share = server.requests("cnpjws", 503) / server.requests("cnpjws")
+
+    reset_breakers()
+    reset_resilience()
+    limited = FakeProviderServer(FakeProvidersConfig(
+        cnpjws=ProviderProfile(latency_ms=1.0, jitter_ms=0.0, rate_limit_per_minute=5)
+    ))
+    limited.install()
+    cnpjws = CNPJWSProvider(token="teste")
+    rate_limited_at = None
+    for i in range(8):
+        try:
+            await cnpjws.validate_cnpj(cnpj)
+        except CNPJRateLimitError:
+            rate_limited_at = i + 1
+            break
+
+    print(f"   Taxa de erro configurada 30% → {error_share:.1%} de 503 em 300 requests")
+    print(f"   Rate limit 5/min → 429 na consulta {rate_limited_at}")
+
+    ok = 0.22 < error_share < 0.38 and rate_limited_at == 6
+
+    if ok:
+        print("✅ SUCESSO: Falhas e limites injetados como configurado")
+    else:
+        print("❌ FALHA: Perfil de carga não respeitado")
+    return ok
+
+async def test_load_driver():
+    print("\n" + "="*70)
+    print("TESTE 3: Driver de Carga (Sync e Auditoria)")
+    print("="*70)
+
+    params = {
+        "provider": "pluggy", "items": 4, "accounts_per_item": 2, "transactions": 50, "audits": 40,
+        "concurrency": 8, "latency_ms": 5.0, "jitter_ms": 5.0, "error_rate": 0.0, "rate_limit": 0, "seed": 7,
+    }
+    run = await run_load(params, ["sync", "audit"])
+    sync, audit = run["scenarios"]["sync"], run["scenarios"]["audit"]
+
+    print(f"   sync: {sync['outcomes']} | {sync['transactions_stored']} transações | {sync['throughput_per_s']} contas/s")
+    print(f"   audit: {audit['outcomes']} | {audit['throughput_per_s']} auditorias/s | {audit['provider_requests']} requests")
+
+    ok = (
+        sync["outcomes"] == {"ok": 8}
+        and sync["transactions_stored"] == run["dataset"]["transactions"]
+        and audit["items"] == 40
+        and not any(outcome.startswith("erro") or outcome == "transacao_nao_encontrada" for outcome in audit["outcomes"])
+        and run["providers"]["cnpjws"]["requests"] == 40
+    )
+
+    if ok:
+        print("✅ SUCESSO: Cenários rodam offline com métricas por provider")
+    else:
+        print("❌ FALHA: Driver de carga incorreto")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DOS PROVIDERS FAKE...")
+
+    success_adapters = await test_adapters_against_fake()
+    success_profiles = await test_load_profiles()
+    success_driver = await test_load_driver()
+
+    if success_adapters and success_profiles and success_driver:
+        print("\n🎉 TODOS OS TESTES DOS PROVIDERS FAKE PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,218 @@
+"""
+Teste de Validação: Conciliação Incremental (Feed de Alterações)
+Valida o consumo pelo cursor durável, o trabalho proporcional às linhas
+novas (não ao histórico), a regra de par único na vizinhança carregada e
+a saída dos itens conciliados da fila chegando aos workers da API
+"""
+import sys
+import os
+import asyncio
+from datetime import date, timedelta
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+from app.services.incremental_reconciler import IncrementalReconciler, merge_windows, in_windows
+from app.services.matching_rules import DEFAULT_RULES
+from app.services.queue_events import queue_event_bus, QueueEventBus, QueueEventRelay
+from memory_store import MemoryStore
+from memory_functions import register_functions
+
+CONDO = "condo_1"
+
+def history_store(days: int = 365) -> MemoryStore:
+    """Um ano de histórico pendente (já fora do feed) com um pagamento por dia"""
+    start = date(2025, 1, 1)
+    store = MemoryStore({
+        "transacoes_bancarias": [
+            {"id": f"tx_hist_{i}", "condominio_id": CONDO, "data_transacao": (start + timedelta(days=i)).isoformat(),
+             "valor": 1000.00 + i, "nsu": None, "status_reconciliacao": "pendente"}
+            for i in range(days)
+        ],
+        "comprovantes": [],
+        "fila_reconciliacao": [],
+        "cursores_conciliacao": [],
+    })
+    return register_functions(store)
+
+def insert_receipt(store, receipt_id, valor, data):
+    store.table("comprovantes").insert({
+        "id": receipt_id, "condominio_id": CONDO, "status": "pendente", "ocr_processado": True,
+        "ocr_valor": valor, "ocr_data": data, "ocr_nsu": None
+    }).execute()
+
+def insert_transaction(store, txn_id, valor, data):
+    store.table("transacoes_bancarias").insert({
+        "id": txn_id, "condominio_id": CONDO, "data_transacao": data, "valor": valor,
+        "nsu": None, "status_reconciliacao": "pendente"
+    }).execute()
+
+async def test_windows():
+    print("\n" + "="*70)
+    print("TESTE 1: Janelas de Vizinhança")
+    print("="*70)
+
+    windows = merge_windows([10, 12, 30], 2)
+    print(f"   Janelas: {windows}")
+
+    ok = windows == [(8, 14), (28, 32)] and in_windows(14, windows) and not in_windows(20, windows)
+
+    if ok:
+        print("✅ SUCESSO: Janelas unidas corretamente")
+    else:
+        print("❌ FALHA: Janelas incorretas")
+    return ok
+
+async def test_incremental_run():
+    print("\n" + "="*70)
+    print("TESTE 2: Consumo pelo Cursor")
+    print("="*70)
+
+    store = history_store()
+    history = len(store.tables["transacoes_bancarias"])
+
+    # Comprovante de um pagamento antigo (OCR tardio) + pagamento novo com comprovante
+    insert_receipt(store, "rec_hist", 1100.00, "2025-04-11")          # tx_hist_100
+    insert_transaction(store, "tx_novo", 650.00, "2025-12-20")
+    insert_receipt(store, "rec_novo", 650.00, "2025-12-19")
+
+    first = IncrementalReconciler(store).run_once()
+    receipts = {r["id"]: r for r in store.tables["comprovantes"]}
+
+    # Nova instância: retoma do cursor durável, nada a fazer
+    second = IncrementalReconciler(store).run_once()
+
+    print(f"   Histórico: {history} transações | Avaliadas: {first.transacoes_avaliadas}")
+    print(f"   1ª execução: {first.aplicados} conciliados | 2ª: {second.transacoes_alteradas + second.comprovantes_alterados} alterações")
+
+    ok = (
+        first.aplicados == 2
+        and receipts["rec_hist"]["transacao_id"] == "tx_hist_100"
+        and receipts["rec_novo"]["transacao_id"] == "tx_novo"
+        and first.transacoes_avaliadas <= 2 * (4 * DEFAULT_RULES.date_tolerance_days + 2)   # duas janelas de ±2× tolerância
+        and second.transacoes_alteradas == 0 and second.comprovantes_alterados == 0
+    )
+
+    if ok:
+        print("✅ SUCESSO: Só a vizinhança das alterações foi avaliada")
+    else:
+        print("❌ FALHA: Consumo incremental incorreto")
+    return ok
+
+async def test_ambiguity_outside_feed():
+    print("\n" + "="*70)
+    print("TESTE 3: Par Único Considera Linhas Fora do Feed")
+    print("="*70)
+
+    store = history_store(days=0)
+    # Transação antiga (fora do feed) com o mesmo valor, um dia antes
+    store.tables["transacoes_bancarias"].append({
+        "id": "tx_antiga", "condominio_id": CONDO, "data_transacao": "2025-12-09",
+        "valor": 650.00, "nsu": None, "status_reconciliacao": "pendente"
+    })
+    insert_transaction(store, "tx_nova", 650.00, "2025-12-10")
+    insert_receipt(store, "rec", 650.00, "2025-12-10")
+
+    report = IncrementalReconciler(store).run_once()
+    receipt = store.tables["comprovantes"][0]
+    print(f"   Vínculos: {report.vinculos} | status do comprovante: {receipt['status']}")
+
+    ok = report.vinculos == 0 and receipt["status"] == "pendente"
+
+    if ok:
+        print("✅ SUCESSO: Candidato fora do feed tornou o par ambíguo (fica para revisão)")
+    else:
+        print("❌ FALHA: Vinculou par ambíguo")
+    return ok
+
+async def test_batches():
+    print("\n" + "="*70)
+    print("TESTE 4: Lotes e Retomada")
+    print("="*70)
+
+    store = history_store(days=0)
+    for i in range(25):
+        day = (date(2025, 6, 1) + timedelta(days=i)).isoformat()
+        insert_transaction(store, f"tx_{i}", 500.00 + i, day)
+        insert_receipt(store, f"rec_{i}", 500.00 + i, day)
+
+    report = IncrementalReconciler(store, batch_size=10).run()
+    cursors = {c["nome"]: c["ultimo_seq"] for c in store.tables["cursores_conciliacao"]}
+    print(f"   Conciliados: {report.aplicados} | Cursores: {cursors} | pendente: {report.pendente}")
+
+    ok = report.aplicados == 25 and not report.pendente and cursors["comprovantes"] == store.sequence
+
+    if ok:
+        print("✅ SUCESSO: Feed consumido em lotes até o fim")
+    else:
+        print("❌ FALHA: Lotes incorretos")
+    return ok
+
+async def test_removals_reach_api_workers():
+    print("\n" + "="*70)
+    print("TESTE 5: Itens Conciliados Saem da Fila nos Workers da API")
+    print("="*70)
+
+    store = history_store(days=0)
+    for i in range(3):
+        day = (date(2025, 7, 1) + timedelta(days=i)).isoformat()
+        insert_transaction(store, f"tx_{i}", 700.00 + i, day)
+        insert_receipt(store, f"rec_{i}", 700.00 + i, day)
+
+    # Barramento da task Celery com repasse; o canal Redis fica de fora
+    channel = []
+    worker_relay = QueueEventRelay("redis://broker.test:6379/0")
+    worker_relay._publish = channel.append
+    api_relay = QueueEventRelay("redis://broker.test:6379/0")
+    api_bus = QueueEventBus(relay=api_relay)
+    subscription = api_bus.subscribe()
+    invalidated = []
+
+    original = queue_event_bus.relay
+    queue_event_bus.relay = worker_relay
+    try:
+        report = await asyncio.to_thread(IncrementalReconciler(store).run_once)
+    finally:
+        queue_event_bus.relay = original
+    for message in channel:
+        api_relay.deliver(api_bus, message, lambda: invalidated.append(True))
+
+    events = []
+    while (event := await subscription.get(timeout=0.05)) is not None:
+        events.append(event)
+    subscription.close()
+
+    print(f"   Conciliados: {report.aplicados} | mensagens no canal: {len(channel)} | caches descartados: {len(invalidated)}")
+    print(f"   Worker da API: {[(e.type, e.comprovante_id) for e in events]}")
+
+    ok = (
+        report.aplicados == 3
+        and len(channel) == 1 and len(invalidated) == 1          # Um PUBLISH por lote aplicado
+        and sorted((e.type, e.comprovante_id) for e in events) == [("remove", f"rec_{i}") for i in range(3)]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Conciliação no Celery tira os itens da fila dos clientes da API")
+    else:
+        print("❌ FALHA: Remoções ficaram no processo do worker")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE CONCILIAÇÃO INCREMENTAL...")
+
+    success_windows = await test_windows()
+    success_run = await test_incremental_run()
+    success_ambiguity = await test_ambiguity_outside_feed()
+    success_batches = await test_batches()
+    success_relay = await test_removals_reach_api_workers()
+
+    if success_windows and success_run and success_ambiguity and success_batches and success_relay:
+        print("\n🎉 TODOS OS TESTES DE CONCILIAÇÃO INCREMENTAL PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
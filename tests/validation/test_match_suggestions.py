@@ -0,0 +1,159 @@
+"""
+Teste de Validação: Sugestões de Match Pré-Calculadas
+Valida a invalidação incremental (só comprovantes alcançados pelas
+transações novas), a leitura sem efeitos colaterais (comprovante nunca
+calculado responde vazio até o backfill) e o enfileiramento de múltiplos
+matches no cálculo
+"""
+import sys
+import os
+import asyncio
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+# O endpoint é chamado com o MemoryStore; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from fastapi import Response
+from app.services.match_suggestions import MatchSuggestionService
+from app.api.endpoints.reconciliation import get_suggested_matches
+from memory_store import MemoryStore
+from memory_functions import register_functions
+
+class RPCCountingStore(MemoryStore):
+    def __init__(self, tables):
+        super().__init__(tables)
+        self.rpc_calls = 0
+
+    def rpc(self, name, params=None):
+        self.rpc_calls += 1
+        return super().rpc(name, params)
+
+def receipt(receipt_id, valor, data, nsu=None, status="pendente"):
+    return {
+        "id": receipt_id, "condominio_id": "condo_1", "status": status, "ocr_processado": True,
+        "ocr_valor": valor, "ocr_data": data, "ocr_nsu": nsu, "sugestoes_calculadas_em": None
+    }
+
+def transaction(txn_id, valor, data, nsu=None):
+    return {
+        "id": txn_id, "condominio_id": "condo_1", "valor": valor, "data_transacao": data,
+        "descricao": f"PIX {txn_id}", "nsu": nsu, "status_reconciliacao": "pendente"
+    }
+
+def build_store() -> RPCCountingStore:
+    store = RPCCountingStore({
+        "comprovantes": [
+            receipt("rec_perto", 650.00, "2025-12-05"),
+            receipt("rec_outro_valor", 1200.00, "2025-12-05"),
+            receipt("rec_outra_data", 650.00, "2025-10-01"),
+            receipt("rec_nsu", 99.90, "2025-08-01", nsu="E999"),
+            receipt("rec_aprovado", 650.00, "2025-12-05", status="aprovado"),
+        ],
+        "transacoes_bancarias": [],
+        "fila_reconciliacao": [],
+    })
+    return register_functions(store)
+
+async def test_incremental_refresh():
+    print("\n" + "="*70)
+    print("TESTE 1: Invalidação Incremental")
+    print("="*70)
+
+    store = build_store()
+    service = MatchSuggestionService(store)
+    service.refresh_receipts([r["id"] for r in store.tables["comprovantes"]])
+
+    new_transactions = [transaction("tx_650", 650.00, "2025-12-06"), transaction("tx_nsu", 99.90, "2025-12-06", nsu="E999")]
+    store.tables["transacoes_bancarias"].extend(new_transactions)
+
+    store.rpc_calls = 0
+    refreshed = service.refresh_for_transactions(new_transactions, "condo_1")
+    suggested = {row["comprovante_id"] for row in store.tables["sugestoes_conciliacao"]}
+
+    print(f"   Recalculados: {refreshed} (buscas no banco: {store.rpc_calls})")
+    print(f"   Com sugestões: {sorted(suggested)}")
+
+    ok = refreshed == 2 and store.rpc_calls == 2 and suggested == {"rec_perto", "rec_nsu"}
+
+    if ok:
+        print("✅ SUCESSO: Só os comprovantes alcançados foram recalculados")
+    else:
+        print("❌ FALHA: Invalidação incorreta")
+    return ok
+
+async def test_pure_read():
+    print("\n" + "="*70)
+    print("TESTE 2: Leitura Indexada")
+    print("="*70)
+
+    store = build_store()
+    store.tables["transacoes_bancarias"].extend([
+        transaction("tx_a", 650.00, "2025-12-05"),
+        transaction("tx_b", 650.00, "2025-12-05"),
+    ])
+    service = MatchSuggestionService(store)
+
+    # Nunca calculado (anterior ao pré-cálculo): a leitura não calcula nem enfileira nada
+    not_computed = Response()
+    before = await get_suggested_matches("rec_perto", not_computed, limit=10, condominio_id="condo_1", supabase=store)
+    read_side_effects = (store.rpc_calls, len(store.tables["fila_reconciliacao"]))
+
+    # Backfill (task avulsa) calcula os pendentes e enfileira os múltiplos matches
+    backfilled = service.backfill(batch_size=2)
+    queued_on_refresh = [item["tipo"] for item in store.tables["fila_reconciliacao"]]
+
+    computed = Response()
+    first = await get_suggested_matches("rec_perto", computed, limit=10, condominio_id="condo_1", supabase=store)
+    store.rpc_calls = 0
+    store.tables["fila_reconciliacao"].clear()
+    second = await get_suggested_matches("rec_perto", Response(), limit=10, condominio_id="condo_1", supabase=store)
+
+    # Transação conciliada depois do cálculo some da leitura, sem recalcular
+    next(t for t in store.tables["transacoes_bancarias"] if t["id"] == first[0].transacao_id)["status_reconciliacao"] = "reconciliado"
+    third = await get_suggested_matches("rec_perto", Response(), limit=10, condominio_id="condo_1", supabase=store)
+
+    print(f"   Antes do backfill: {before} ({not_computed.headers.get('X-Suggestions-Computed')}) | buscas/fila: {read_side_effects}")
+    print(f"   Backfill: {backfilled} comprovantes | fila: {queued_on_refresh}")
+    print(f"   1ª leitura: {[m.transacao_id for m in first]} ({computed.headers.get('X-Suggestions-Computed')})")
+    print(f"   Leituras seguintes: {store.rpc_calls} buscas, fila {len(store.tables['fila_reconciliacao'])} itens")
+    print(f"   Após conciliação: {[m.transacao_id for m in third]}")
+
+    ok = (
+        before == [] and not_computed.headers.get("X-Suggestions-Computed") == "false"
+        and read_side_effects == (0, 0)
+        and backfilled == 4                                     # Aprovado fica de fora
+        and service.backfill() == 0
+        and len(first) == 2 and computed.headers.get("X-Suggestions-Computed") == "true"
+        and queued_on_refresh == ["multiplos_matches"]
+        and [m.transacao_id for m in second] == [m.transacao_id for m in first]
+        and store.rpc_calls == 0
+        and store.tables["fila_reconciliacao"] == []
+        and [m.transacao_id for m in third] == [first[1].transacao_id]
+        and service.get("rec_perto", limit=1)[0]["transacao_id"] == first[1].transacao_id
+    )
+
+    if ok:
+        print("✅ SUCESSO: Leitura sem busca nem efeitos colaterais")
+    else:
+        print("❌ FALHA: Leitura incorreta")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE SUGESTÕES PRÉ-CALCULADAS...")
+
+    success_incremental = await test_incremental_refresh()
+    success_read = await test_pure_read()
+
+    if success_incremental and success_read:
+        print("\n🎉 TODOS OS TESTES DE SUGESTÕES PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+"""
+Teste de Validação: Regras de Matching por Condomínio
+Valida compilação das regras (centavos + tabela de taxas), uso no
+RobustValidator e os limites do perfil (422 no PUT, padrão no carregamento)
+"""
+import sys
+import os
+import asyncio
+from datetime import date, datetime
+from decimal import Decimal
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+# O endpoint é chamado com o MemoryStore; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.services.matching_rules import MatchingRuleProfile, CompiledRuleSet, DEFAULT_RULES, MatchingRulesService
+from app.services.robust_validator import RobustValidator
+from app.api.endpoints import reconciliation
+from memory_store import MemoryStore
+
+async def test_compiled_rules():
+    print("\n" + "="*70)
+    print("TESTE 1: Regras Compiladas (padrão)")
+    print("="*70)
+
+    cases = [
+        # (comprovante, transação, esperado)
+        (50000, 50000, ("exact", None)),
+        (50000, 49995, ("exact", None)),      # R$ 0,05 de diferença
+        (50000, 49750, ("with_fee", 250)),    # Taxa de R$ 2,50
+        (50000, 49703, ("with_fee", 300)),    # Taxa de R$ 3,00 (dentro da tolerância)
+        (50000, 49000, None),                 # R$ 10,00: sem match
+        (50000, 50250, None),                 # Transação MAIOR que o comprovante
+    ]
+
+    ok = True
+    for receipt_cents, tx_cents, expected in cases:
+        result = DEFAULT_RULES.match_amount(receipt_cents, tx_cents)
+        status = "✅" if result == expected else "❌"
+        print(f"   {status} {receipt_cents} vs {tx_cents}: {result}")
+        ok = ok and result == expected
+
+    lo, hi = DEFAULT_RULES.suggestion_amount_bounds(50000)
+    print(f"   Faixa de sugestão (1%): {lo}-{hi}")
+    ok = ok and (lo, hi) == (49500, 50500)
+
+    if ok:
+        print("✅ SUCESSO: Regras padrão compiladas corretamente")
+    else:
+        print("❌ FALHA: Regras padrão incorretas")
+    return ok
+
+async def test_custom_profile():
+    print("\n" + "="*70)
+    print("TESTE 2: Perfil Customizado no RobustValidator")
+    print("="*70)
+
+    # Condomínio cujo banco cobra R$ 4,20 por boleto e credita com até 4 dias
+    rules = CompiledRuleSet(MatchingRuleProfile(
+        common_fees=[Decimal("4.20")],
+        date_tolerance_days=4
+    ))
+
+    transactions = [{
+        "id": "tx_1",
+        "amount": 495.80,
+        "date": "2025-12-05",
+        "description": "BOLETO CONDOMINIO"
+    }]
+
+    kwargs = dict(
+        receipt_amount=Decimal("500.00"),
+        receipt_date=date(2025, 12, 1),
+        receipt_timestamp=None,
+        upload_timestamp=datetime.now(),
+        payer_cpf=None,
+        receipt_id="rec_1",
+        transactions=transactions
+    )
+
+    default_result = RobustValidator().validate_payment(**kwargs)
+    custom_result = RobustValidator(rules=rules).validate_payment(**kwargs)
+
+    print(f"   Regras padrão: {default_result.status}")
+    print(f"   Regras do condomínio: {custom_result.status}")
+
+    if (
+        default_result.status == "REJECTED"
+        and custom_result.status == "APPROVED"
+        and custom_result.matches[0].fee_detected == Decimal("4.20")
+    ):
+        print("✅ SUCESSO: Perfil do condomínio aplicado")
+        return True
+    else:
+        print("❌ FALHA: Perfil do condomínio não aplicado")
+        return False
+
+async def test_profile_bounds():
+    print("\n" + "="*70)
+    print("TESTE 3: Limites do Perfil (PUT /reconciliation/rules)")
+    print("="*70)
+
+    store = MemoryStore({"regras_conciliacao": []})
+    app = FastAPI()
+    app.include_router(reconciliation.router, prefix="/reconciliation")
+    app.dependency_overrides[reconciliation.get_supabase] = lambda: store
+    client = TestClient(app)
+
+    invalid = [
+        {"value_tolerance": "-0.05"},
+        {"value_tolerance": "100000"},                   # Tabela de taxas com milhões de entradas
+        {"date_tolerance_days": -1},
+        {"date_tolerance_days": 3650},
+        {"common_fees": ["2.50", "-1.00"]},
+        {"suggestion_value_tolerance_pct": "1.5"},
+        {"suggestion_date_window_days": -3},
+        {"review_sla_hours": 0},
+    ]
+    statuses = [client.put("/reconciliation/rules/condo_1", json=body).status_code for body in invalid]
+    valid = client.put("/reconciliation/rules/condo_1", json={"value_tolerance": "0.10", "date_tolerance_days": 5})
+
+    # Linha gravada fora dos limites (antes da validação) carrega o padrão em vez de quebrar
+    store.tables["regras_conciliacao"].append({"condominio_id": "condo_2", "tolerancia_dias": -4})
+    MatchingRulesService.invalidate()
+    loaded = MatchingRulesService(store).get_rules("condo_2")
+
+    print(f"   Perfis inválidos: {statuses}")
+    print(f"   Perfil válido: {valid.status_code} | gravados: {len(store.tables['regras_conciliacao'])}")
+    print(f"   Linha fora dos limites: {'padrão' if loaded is DEFAULT_RULES else 'carregada'}")
+
+    ok = (
+        statuses == [422] * len(invalid)
+        and valid.status_code == 200 and valid.json()["date_tolerance_days"] == 5
+        and store.tables["regras_conciliacao"][0]["tolerancia_dias"] == 5
+        and loaded is DEFAULT_RULES
+    )
+
+    if ok:
+        print("✅ SUCESSO: Perfil fora dos limites é recusado com 422")
+    else:
+        print("❌ FALHA: Limites do perfil")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE REGRAS DE MATCHING...")
+
+    success_compiled = await test_compiled_rules()
+    success_custom = await test_custom_profile()
+    success_bounds = await test_profile_bounds()
+
+    if success_compiled and success_custom and success_bounds:
+        print("\n🎉 TODOS OS TESTES DE REGRAS PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+"""
+Teste de Validação: Métricas de Conciliação
+Valida o formato de exposição do Prometheus, a medição de etapas
+(síncronas e async), o proxy do Supabase (tabela/operação), o
+detalhamento por request e o exportador dos workers do Celery
+"""
+import sys
+import os
+import asyncio
+import urllib.error
+import urllib.request
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+from app.services.metrics import (
+    MetricsRegistry, RECONCILED_TOTAL, STAGE_SECONDS, SUPABASE_SECONDS,
+    instrument_supabase, request_breakdown, stage, start_metrics_server, timed
+)
+from memory_store import MemoryStore
+from memory_functions import register_functions
+
+async def test_exposition_format():
+    print("\n" + "="*70)
+    print("TESTE 1: Formato de Exposição")
+    print("="*70)
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram("teste_segundos", "Teste", ("stage",), buckets=(0.1, 1.0))
+    counter = registry.counter("teste_total", "Teste", ("outcome",))
+    histogram.observe(0.05, stage="ocr")
+    histogram.observe(0.5, stage="ocr")
+    histogram.observe(3, stage="ocr")
+    counter.inc(2, outcome='com "aspas"')
+
+    text = registry.render()
+    print(text)
+
+    ok = (
+        "# TYPE teste_segundos histogram" in text
+        and 'teste_segundos_bucket{stage="ocr",le="0.1"} 1' in text
+        and 'teste_segundos_bucket{stage="ocr",le="1"} 2' in text
+        and 'teste_segundos_bucket{stage="ocr",le="+Inf"} 3' in text
+        and 'teste_segundos_sum{stage="ocr"} 3.55' in text
+        and 'teste_segundos_count{stage="ocr"} 3' in text
+        and 'teste_total{outcome="com \\"aspas\\""} 2' in text
+    )
+
+    if ok:
+        print("✅ SUCESSO: Buckets cumulativos, _sum/_count e labels escapados")
+    else:
+        print("❌ FALHA: Exposição fora do formato")
+    return ok
+
+async def test_stage_timing():
+    print("\n" + "="*70)
+    print("TESTE 2: Etapas Síncronas, Async e Detalhamento por Request")
+    print("="*70)
+
+    @timed("teste_sync")
+    def sync_stage():
+        with stage("teste_interna"):
+            return 1
+
+    @timed("teste_async")
+    async def async_stage():
+        await asyncio.sleep(0)
+        return 2
+
+    before = STAGE_SECONDS.count(stage="teste_sync")
+    with request_breakdown() as breakdown:
+        results = [sync_stage(), sync_stage(), await async_stage()]
+    sync_stage()   # Fora do bloco: só vai para o histograma
+
+    print(f"   Detalhamento: { {k: v[0] for k, v in breakdown.items()} }")
+
+    ok = (
+        results == [1, 1, 2]
+        and STAGE_SECONDS.count(stage="teste_sync") == before + 3
+        and breakdown["teste_sync"][0] == 2 and breakdown["teste_interna"][0] == 2
+        and breakdown["teste_async"][0] == 1
+    )
+
+    if ok:
+        print("✅ SUCESSO: Etapas aninhadas e async medidas por request")
+    else:
+        print("❌ FALHA: Medição de etapas incorreta")
+    return ok
+
+async def test_supabase_proxy():
+    print("\n" + "="*70)
+    print("TESTE 3: Proxy do Supabase")
+    print("="*70)
+
+    store = register_functions(MemoryStore({
+        "comprovantes": [{"id": "rec_1", "status": "pendente"}, {"id": "rec_2", "status": "aprovado"}],
+        "transacoes_bancarias": [],
+        "fila_reconciliacao": [],
+    }))
+    supabase = instrument_supabase(store)
+
+    selects = SUPABASE_SECONDS.count(target="comprovantes", operation="select")
+    updates = SUPABASE_SECONDS.count(target="comprovantes", operation="update")
+    with request_breakdown() as breakdown:
+        pending = supabase.table("comprovantes").select("id").eq("status", "pendente").execute()
+        supabase.table("comprovantes").update({"status": "aprovado"}).eq("id", "rec_1").execute()
+        supabase.rpc("decidir_conciliacoes_em_lote", {"p_decisoes": []}).execute()
+
+    print(f"   Pendentes: {[r['id'] for r in pending.data]} | Chamadas medidas: {breakdown['supabase'][0]}")
+
+    ok = (
+        [r["id"] for r in pending.data] == ["rec_1"]
+        and store.tables["comprovantes"][0]["status"] == "aprovado"
+        and SUPABASE_SECONDS.count(target="comprovantes", operation="select") == selects + 1
+        and SUPABASE_SECONDS.count(target="comprovantes", operation="update") == updates + 1
+        and SUPABASE_SECONDS.count(target="rpc:decidir_conciliacoes_em_lote", operation="rpc") >= 1
+        and breakdown["supabase"][0] == 3
+        and instrument_supabase(supabase) is supabase
+    )
+
+    if ok:
+        print("✅ SUCESSO: Cada execute() medido por tabela e operação")
+    else:
+        print("❌ FALHA: Proxy do Supabase incorreto")
+    return ok
+
+async def test_worker_exporter():
+    print("\n" + "="*70)
+    print("TESTE 4: Exportador do Worker (Celery)")
+    print("="*70)
+
+    # Porta 0: o SO escolhe uma livre
+    server = start_metrics_server(0, host="127.0.0.1")
+    port = server.server_address[1]
+    try:
+        RECONCILED_TOTAL.inc(3, source="incremental", outcome="aplicado")
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as resp:
+            content_type = resp.headers["Content-Type"]
+            text = resp.read().decode()
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/outro", timeout=5)
+            status_outro = 200
+        except urllib.error.HTTPError as e:
+            status_outro = e.code
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    linha = next((l for l in text.splitlines()
+                  if l.startswith('reconciliation_items_total{source="incremental",outcome="aplicado"}')), None)
+    print(f"   Porta: {port} | Content-Type: {content_type} | /outro: {status_outro}")
+    print(f"   Amostra: {linha}")
+
+    ok = (
+        content_type.startswith("text/plain; version=0.0.4")
+        and linha is not None and float(linha.split()[-1]) >= 3
+        and status_outro == 404
+    )
+    if ok:
+        print("✅ SUCESSO: Contadores do processo expostos fora da API")
+    else:
+        print("❌ FALHA: Exportador do worker incorreto")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE MÉTRICAS...")
+
+    success_format = await test_exposition_format()
+    success_stages = await test_stage_timing()
+    success_proxy = await test_supabase_proxy()
+    success_exporter = await test_worker_exporter()
+
+    if success_format and success_stages and success_proxy and success_exporter:
+        print("\n🎉 TODOS OS TESTES DE MÉTRICAS PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
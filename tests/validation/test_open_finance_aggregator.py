@@ -0,0 +1,221 @@
+"""
+Teste de Validação: Agregação Multi-Provider do Open Finance
+Valida a busca concorrente, o timeout e o circuit breaker por provider, o
+merge sem duplicar a mesma conta vista por dois agregadores e as chamadas
+de contas/saldo/paginação do BelvoAdapter
+"""
+import sys
+import os
+import asyncio
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+import httpx
+
+# Adicionar path do backend
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+# Só os adapters são exercitados; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from app.services import http_client
+from app.services.adapters.base import BankDataProvider, StandardTransaction
+from app.services.adapters.belvo import BelvoAdapter
+from app.services.circuit_breaker import get_breaker, reset_breakers, FECHADO, ABERTO
+from app.services.open_finance_aggregator import OpenFinanceAggregator, ProviderAccount
+
+TODAY = date.today()
+LATENCY = 0.2
+
+def tx(provider: str, tx_id: str, days_ago: int, amount: str, tx_type: str = "CREDIT", description: str = "PIX"):
+    return StandardTransaction(
+        id=tx_id, amount=Decimal(amount), date=TODAY - timedelta(days=days_ago), description=description,
+        type=tx_type, provider_original_id=tx_id, provider_name=provider
+    )
+
+class FakeProvider(BankDataProvider):
+    def __init__(self, transactions_by_account, latency: float = LATENCY, fail: bool = False):
+        self.transactions_by_account = transactions_by_account
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    async def create_connect_token(self, user_id):
+        return {}
+
+    async def get_accounts(self, item_id):
+        return []
+
+    async def get_balance(self, account_id):
+        return Decimal("0")
+
+    async def get_transactions(self, account_id, from_date, to_date=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise httpx.ConnectError("provider fora do ar")
+        return list(self.transactions_by_account.get(account_id, []))
+
+async def test_concurrent_merge():
+    print("\n" + "="*70)
+    print("TESTE 1: Busca Concorrente e Merge Sem Duplicar")
+    print("="*70)
+
+    reset_breakers()
+    # Mesma conta bancária (Itaú) por Pluggy e Belvo: duas cotas iguais no mesmo dia
+    pluggy = FakeProvider({
+        "p_itau": [tx("pluggy", "p1", 1, "850.00"), tx("pluggy", "p2", 1, "850.00"), tx("pluggy", "p2", 1, "850.00")],
+        "p_bb": [tx("pluggy", "p3", 2, "1200.00", "DEBIT")],
+    })
+    belvo = FakeProvider({
+        "b_itau": [
+            tx("belvo", "b1", 1, "850.00", description="PIX RECEBIDO"),
+            tx("belvo", "b2", 1, "850.00", description="PIX RECEBIDO"),
+            tx("belvo", "b3", 0, "430.00"),                     # Só a Belvo já coletou
+        ],
+        "b_caixa": [tx("belvo", "b4", 3, "850.00")],             # Outra conta: mesmo valor não é duplicata
+    })
+    aggregator = OpenFinanceAggregator(providers={"pluggy": pluggy, "belvo": belvo})
+    accounts = [
+        ProviderAccount(provider="pluggy", account_id="p_itau", bank_account_key="341/0001/12345-6"),
+        ProviderAccount(provider="pluggy", account_id="p_bb"),
+        ProviderAccount(provider="belvo", account_id="b_itau", bank_account_key="341/0001/12345-6"),
+        ProviderAccount(provider="belvo", account_id="b_caixa"),
+    ]
+
+    start = time.perf_counter()
+    feed = await aggregator.get_transactions(accounts, TODAY - timedelta(days=30))
+    elapsed = time.perf_counter() - start
+
+    ids = [t.id for t in feed.transactions]
+    print(f"   4 contas em {elapsed:.2f}s (serial seria ~{4 * LATENCY:.1f}s)")
+    print(f"   Feed: {ids} | descartadas: {feed.duplicadas}")
+
+    ok = (
+        elapsed < 2 * LATENCY
+        and feed.complete
+        and sorted(ids) == ["b3", "b4", "p1", "p2", "p3"]
+        and feed.duplicadas == 3                                # p2 repetida + b1/b2 já vistas pela Pluggy
+        and [t.date for t in feed.transactions] == sorted(t.date for t in feed.transactions)
+        and all(t.metadata.get("provider_account_id") for t in feed.transactions)
+    )
+
+    if ok:
+        print("✅ SUCESSO: Um único extrato, sem duplicatas entre agregadores")
+    else:
+        print("❌ FALHA: Merge ou concorrência incorretos")
+    return ok
+
+async def test_timeout_and_breaker():
+    print("\n" + "="*70)
+    print("TESTE 2: Timeout e Circuit Breaker por Provider")
+    print("="*70)
+
+    reset_breakers()
+    breaker = get_breaker("open_finance:belvo", failure_threshold=2, reset_timeout=0.3)
+    pluggy = FakeProvider({"p1": [tx("pluggy", "p1", 1, "100.00")]}, latency=0.01)
+    belvo = FakeProvider({"b1": [tx("belvo", "b1", 1, "200.00")]}, latency=1.0)
+    aggregator = OpenFinanceAggregator(providers={"pluggy": pluggy, "belvo": belvo}, timeouts={"belvo": 0.1})
+    accounts = [ProviderAccount(provider="pluggy", account_id="p1"), ProviderAccount(provider="belvo", account_id="b1")]
+    since = TODAY - timedelta(days=30)
+
+    first = await aggregator.get_transactions(accounts, since)
+    await aggregator.get_transactions(accounts, since)
+    state_after_failures = breaker.state
+
+    start = time.perf_counter()
+    short_circuited = await aggregator.get_transactions(accounts, since)
+    short_elapsed = time.perf_counter() - start
+    belvo_calls = belvo.calls
+
+    # Provider volta: depois do reset_timeout, a chamada de teste fecha o circuito
+    belvo.latency = 0.01
+    await asyncio.sleep(0.35)
+    recovered = await aggregator.get_transactions(accounts, since)
+
+    statuses = lambda feed: [s.status for s in feed.fontes]
+    print(f"   1ª: {statuses(first)} | circuito após 2 timeouts: {state_after_failures}")
+    print(f"   3ª: {statuses(short_circuited)} em {short_elapsed * 1000:.0f}ms (chamadas à Belvo: {belvo_calls})")
+    print(f"   Após recuperação: {statuses(recovered)} | circuito: {breaker.state}")
+
+    ok = (
+        statuses(first) == ["ok", "timeout"] and [t.id for t in first.transactions] == ["p1"]
+        and not first.complete
+        and state_after_failures == ABERTO
+        and statuses(short_circuited) == ["ok", "circuito_aberto"] and belvo_calls == 2
+        and short_elapsed < 0.1
+        and statuses(recovered) == ["ok", "ok"] and breaker.state == FECHADO
+        and sorted(t.id for t in recovered.transactions) == ["b1", "p1"]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Provider lento não segura o extrato e é cortado após falhas seguidas")
+    else:
+        print("❌ FALHA: Timeout ou circuit breaker incorretos")
+    return ok
+
+async def test_belvo_adapter():
+    print("\n" + "="*70)
+    print("TESTE 3: BelvoAdapter (Contas, Saldo e Paginação por `next`)")
+    print("="*70)
+
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        path = request.url.path
+        if path == "/api/accounts/":
+            return httpx.Response(200, json={"next": None, "results": [{"id": "acc_1", "balance": {"current": 10.5}}]})
+        if path == "/api/accounts/acc_1/":
+            return httpx.Response(200, json={"id": "acc_1", "balance": {"current": 15230.75, "available": 15000}})
+        if path == "/api/transactions/":
+            page = int(request.url.params.get("page", "1"))
+            results = [{
+                "id": f"t{page}", "amount": 100 * page, "value_date": (TODAY - timedelta(days=page)).isoformat(),
+                "description": "PIX", "type": "INFLOW" if page == 1 else "OUTFLOW",
+            }]
+            next_url = "https://api.belvo.com/api/transactions/?link=link_1&page=2" if page == 1 else None
+            return httpx.Response(200, json={"next": next_url, "results": results})
+        return httpx.Response(404)
+
+    loop = asyncio.get_running_loop()
+    http_client._clients[loop] = {True: httpx.AsyncClient(transport=httpx.MockTransport(handler))}
+    adapter = BelvoAdapter(secret_id="id", secret_password="senha")
+
+    accounts = await adapter.get_accounts("link_1")
+    balance = await adapter.get_balance("acc_1")
+    transactions = await adapter.get_transactions("link_1", TODAY - timedelta(days=10))
+
+    print(f"   Contas: {[a['id'] for a in accounts]} | saldo: {balance}")
+    print(f"   Transações: {[(t.id, t.type, str(t.amount)) for t in transactions]} em {sum(r.url.path == '/api/transactions/' for r in requests)} páginas")
+
+    ok = (
+        [a["id"] for a in accounts] == ["acc_1"]
+        and balance == Decimal("15230.75")
+        and [(t.id, t.type) for t in transactions] == [("t1", "CREDIT"), ("t2", "DEBIT")]
+        and all(r.headers.get("authorization", "").startswith("Basic ") for r in requests)
+    )
+
+    if ok:
+        print("✅ SUCESSO: BelvoAdapter completo no pool compartilhado")
+    else:
+        print("❌ FALHA: BelvoAdapter incorreto")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE AGREGAÇÃO MULTI-PROVIDER...")
+
+    success_merge = await test_concurrent_merge()
+    success_breaker = await test_timeout_and_breaker()
+    success_belvo = await test_belvo_adapter()
+
+    if success_merge and success_breaker and success_belvo:
+        print("\n🎉 TODOS OS TESTES DE AGREGAÇÃO MULTI-PROVIDER PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
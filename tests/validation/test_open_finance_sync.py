@@ -0,0 +1,202 @@
+"""
+Teste de Validação: Sync Incremental do Open Finance
+Valida a marca d'água por conta (delta + sobreposição), o descarte das
+transações inalteradas, a deduplicação pelo id da transação no provider e
+a atualização das transações que o provider alterou depois de gravadas
+"""
+import sys
+import os
+import asyncio
+from datetime import date, timedelta
+from decimal import Decimal
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+# O endpoint é chamado com o MemoryStore; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from app.services.open_finance_sync import OpenFinanceSyncService, OVERLAP_DAYS
+from app.services.open_finance import OpenFinanceService
+from app.api.endpoints import open_finance
+from memory_store import MemoryStore
+
+TODAY = date.today()
+
+def provider_row(tx_id: str, days_ago: int, updated: str, valor: str = "100.00"):
+    """Linha como OpenFinanceService.sync_transactions devolve"""
+    return {
+        "id": tx_id,
+        "data_transacao": TODAY - timedelta(days=days_ago),
+        "valor": Decimal(valor),
+        "tipo": "credito",
+        "descricao": f"PIX {tx_id}",
+        "nsu": tx_id,
+        "metadata": {},
+        "provider_atualizado_em": updated,
+    }
+
+async def test_watermark_and_dedupe():
+    print("\n" + "="*70)
+    print("TESTE 1: Marca d'Água e Deduplicação pelo Id do Provider")
+    print("="*70)
+
+    store = MemoryStore({"transacoes_bancarias": [], "sincronizacao_contas": []})
+    service = OpenFinanceSyncService(store)
+
+    first_since = service.sync_from(service.load_watermark("acc_1"), days_back=30)
+    inserted, first = service.store("acc_1", [
+        provider_row("tx_a", 10, "2025-12-01T10:00:00Z"),
+        provider_row("tx_b", 6, "2025-12-05T10:00:00Z"),
+        provider_row("tx_c", 5, "2025-12-06T10:00:00Z"),
+    ], None, first_since, condominio_id="condo_1")
+
+    watermark = service.load_watermark("acc_1")
+    second_since = service.sync_from(watermark, days_back=30)
+
+    # Segunda execução: sobreposição devolve tx_b/tx_c; tx_c mudou no provider; tx_d/tx_e são novas
+    inserted_again, second = service.store("acc_1", [
+        provider_row("tx_b", 6, "2025-12-05T10:00:00Z"),
+        provider_row("tx_c", 5, "2025-12-08T09:00:00Z"),
+        provider_row("tx_d", 3, "2025-12-08T10:00:00Z"),
+        provider_row("tx_e", 2, "2025-12-08T11:00:00Z"),
+    ], watermark, second_since, condominio_id="condo_1")
+
+    stored = store.tables["transacoes_bancarias"]
+    print(f"   1º sync desde {first_since}: {first.novas} novas | marca {watermark.ultima_data_transacao} / {watermark.ultimo_transacao_id}")
+    print(f"   2º sync desde {second_since}: recebidas {second.recebidas}, inalteradas {second.inalteradas}, novas {second.novas}")
+
+    ok = (
+        first_since == TODAY - timedelta(days=30)
+        and first.novas == 3 and len(inserted) == 3
+        and watermark.ultima_data_transacao == TODAY - timedelta(days=5) and watermark.ultimo_transacao_id == "tx_c"
+        and second_since == TODAY - timedelta(days=5 + OVERLAP_DAYS)
+        and second.inalteradas == 1                              # tx_b: mesmo updatedAt
+        and second.novas == 2 and {r["provider_transacao_id"] for r in inserted_again} == {"tx_d", "tx_e"}
+        and len(stored) == 5
+        and len({r["provider_transacao_id"] for r in stored}) == 5
+        and all(r["provider"] == "pluggy" and r["condominio_id"] == "condo_1" for r in stored)
+        and second.watermark.ultimo_transacao_id == "tx_e"
+        and second.watermark.transacoes_sincronizadas == 5
+        and len(store.tables["sincronizacao_contas"]) == 1
+    )
+
+    if ok:
+        print("✅ SUCESSO: Só o delta é pedido e nenhuma transação é duplicada")
+    else:
+        print("❌ FALHA: Sync incremental incorreto")
+    return ok
+
+async def test_endpoint_fetches_delta():
+    print("\n" + "="*70)
+    print("TESTE 2: Endpoint /open-finance/sync Pede Só o Delta")
+    print("="*70)
+
+    store = MemoryStore({
+        "transacoes_bancarias": [],
+        "sincronizacao_contas": [],
+        "extratos_bancarios": [],
+        "condominio_contas_bancarias": [{"id": "c1", "condominio_id": "condo_1", "pluggy_account_id": "acc_1"}],
+    })
+    requested = []
+    provider = [provider_row("tx_a", 8, "2025-12-01T10:00:00Z"), provider_row("tx_b", 4, "2025-12-02T10:00:00Z")]
+
+    async def fake_sync(self, account_id, days_back=30, from_date=None):
+        requested.append(from_date)
+        return [dict(row) for row in provider if row["data_transacao"] >= from_date]
+
+    original = OpenFinanceService.sync_transactions
+    OpenFinanceService.sync_transactions = fake_sync
+    try:
+        first = await open_finance.sync_transactions("acc_1", days_back=30, background_tasks=None, supabase=store)
+        provider.append(provider_row("tx_c", 1, "2025-12-03T10:00:00Z"))
+        second = await open_finance.sync_transactions("acc_1", days_back=30, background_tasks=None, supabase=store)
+    finally:
+        OpenFinanceService.sync_transactions = original
+
+    print(f"   Janelas pedidas: {[d.isoformat() for d in requested]}")
+    print(f"   1º: {first['inserted']} inseridas | 2º: {second['inserted']} inseridas, {second['total_fetched']} recebidas")
+
+    ok = (
+        requested == [TODAY - timedelta(days=30), TODAY - timedelta(days=4 + OVERLAP_DAYS)]
+        and first["inserted"] == 2
+        and second["inserted"] == 1 and second["total_fetched"] == 2
+        and len(store.tables["transacoes_bancarias"]) == 3
+    )
+
+    if ok:
+        print("✅ SUCESSO: Segunda sincronização parte da marca d'água")
+    else:
+        print("❌ FALHA: Endpoint ainda relê a janela inteira")
+    return ok
+
+async def test_changed_transactions_are_updated():
+    print("\n" + "="*70)
+    print("TESTE 3: Transação Alterada no Provider Atualiza a Linha Gravada")
+    print("="*70)
+
+    store = MemoryStore({"transacoes_bancarias": [], "sincronizacao_contas": []})
+    service = OpenFinanceSyncService(store)
+
+    since = service.sync_from(None, days_back=30)
+    service.store("acc_1", [
+        provider_row("tx_a", 6, "2025-12-05T10:00:00Z"),
+        provider_row("tx_b", 5, "2025-12-06T10:00:00Z", valor="50.00"),
+    ], None, since, condominio_id="condo_1", extrato_id="ext_1")
+
+    # tx_b foi conciliada; depois o banco corrigiu o valor e a descrição (pendente -> lançada)
+    stored = {r["provider_transacao_id"]: r for r in store.tables["transacoes_bancarias"]}
+    stored["tx_b"].update({"status_reconciliacao": "reconciliado", "comprovante_id": "rec_1"})
+
+    watermark = service.load_watermark("acc_1")
+    changed = provider_row("tx_b", 5, "2025-12-09T08:00:00Z", valor="55.00")
+    changed["descricao"] = "PIX tx_b LANCADO"
+    _, second = service.store("acc_1", [
+        provider_row("tx_a", 6, "2025-12-05T10:00:00Z"),
+        changed,
+        provider_row("tx_c", 2, "2025-12-09T09:00:00Z"),
+    ], watermark, service.sync_from(watermark, days_back=30), condominio_id="condo_1", extrato_id="ext_2")
+
+    # Versão antiga chegando depois (sync concorrente atrasado) não desfaz a atualização
+    stale = provider_row("tx_b", 5, "2025-12-07T00:00:00Z", valor="50.00")
+    _, late = service.store("acc_1", [stale], watermark, since, condominio_id="condo_1", extrato_id="ext_3")
+
+    tx_b = next(r for r in store.tables["transacoes_bancarias"] if r["provider_transacao_id"] == "tx_b")
+    print(f"   2º sync: novas {second.novas}, atualizadas {second.atualizadas}, inalteradas {second.inalteradas}")
+    print(f"   tx_b: valor {tx_b['valor']} | {tx_b['descricao']} | {tx_b['status_reconciliacao']} | extrato {tx_b['extrato_id']}")
+    print(f"   Versão atrasada: atualizadas {late.atualizadas}")
+
+    ok = (
+        second.novas == 1 and second.atualizadas == 1 and second.inalteradas == 1
+        and tx_b["valor"] == 55.0 and tx_b["descricao"] == "PIX tx_b LANCADO"
+        and tx_b["provider_atualizado_em"].startswith("2025-12-09T08:00:00")
+        and tx_b["status_reconciliacao"] == "reconciliado" and tx_b["comprovante_id"] == "rec_1"
+        and tx_b["extrato_id"] == "ext_1" and tx_b["condominio_id"] == "condo_1"
+        and late.atualizadas == 0 and late.novas == 0
+        and len(store.tables["transacoes_bancarias"]) == 3
+    )
+
+    if ok:
+        print("✅ SUCESSO: Alteração do provider chega ao banco sem perder a conciliação")
+    else:
+        print("❌ FALHA: Transação alterada no provider ficou com a versão antiga")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE SYNC INCREMENTAL...")
+
+    success_watermark = await test_watermark_and_dedupe()
+    success_endpoint = await test_endpoint_fetches_delta()
+    success_updates = await test_changed_transactions_are_updated()
+
+    if success_watermark and success_endpoint and success_updates:
+        print("\n🎉 TODOS OS TESTES DE SYNC INCREMENTAL PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,284 @@
+"""
+Teste de Validação: Client Assíncrono da Pluggy
+Valida que as chamadas da PluggyService não bloqueiam o event loop
+(várias sincronizações concorrentes num worker), que o pool é
+compartilhado, que a política de retry foi preservada, que todas as
+páginas de transações são lidas (em paralelo, com limite) e o ciclo de
+vida da API key (cache do processo, renovação proativa, single-flight, 401)
+"""
+import sys
+import os
+import asyncio
+import time
+from contextlib import aclosing
+from datetime import date
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+# A API é servida por um MockTransport; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from app.services import http_client
+from app.services.credential_cache import CredentialCache, credential_cache
+from app.services.pluggy_service import PluggyService, MAX_PARALLEL_PAGES
+from app.services.adapters.pluggy import PluggyAdapter
+
+LATENCY = 0.1
+
+class FakePluggy:
+    """API da Pluggy em memória, servida por um MockTransport com latência"""
+
+    def __init__(self, fail_transactions: int = 0, transactions_per_account: int = 1):
+        self.calls = []
+        self.issued_keys = 0
+        self.revoked = set()
+        self.transactions_per_account = transactions_per_account
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.fail_transactions = fail_transactions
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append((request.method, request.url.path))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(LATENCY)
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+
+        if request.url.path == "/auth":
+            self.issued_keys += 1
+            return httpx.Response(200, json={"apiKey": f"key_{self.issued_keys}"})
+        if request.headers.get("X-API-KEY") in self.revoked:
+            return httpx.Response(401, json={"message": "expired"})
+        if request.url.path == "/transactions":
+            if self.fail_transactions:
+                self.fail_transactions -= 1
+                return httpx.Response(503, text="unavailable")
+            account = request.url.params["accountId"]
+            if self.transactions_per_account == 1:
+                return httpx.Response(200, json={"results": [{"id": f"{account}_tx", "amount": 10.0}]})
+            page = int(request.url.params.get("page", 1))
+            size = int(request.url.params.get("pageSize", 20))
+            total = self.transactions_per_account
+            results = [
+                {"id": f"{account}_tx_{i}", "amount": 10.0, "date": "2025-12-01T00:00:00Z", "description": "PIX"}
+                for i in range((page - 1) * size, min(page * size, total))
+            ]
+            return httpx.Response(200, json={
+                "total": total, "totalPages": -(-total // size), "page": page, "results": results
+            })
+        if request.url.path == "/accounts":
+            return httpx.Response(200, json={"results": []})
+        return httpx.Response(404)
+
+def install(fake: FakePluggy):
+    """Troca o client compartilhado do loop corrente por um com o transport fake"""
+    loop = asyncio.get_running_loop()
+    http_client._clients[loop] = {True: httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))}
+    credential_cache.clear()
+
+async def test_concurrent_syncs():
+    print("\n" + "="*70)
+    print("TESTE 1: Sincronizações Concorrentes Sem Bloquear o Loop")
+    print("="*70)
+
+    fake = FakePluggy()
+    install(fake)
+    accounts = [f"acc_{i}" for i in range(30)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(PluggyService().get_transactions(a) for a in accounts))
+    elapsed = time.perf_counter() - start
+
+    print(f"   {len(accounts)} contas em {elapsed:.2f}s (serial seria ~{2 * LATENCY * len(accounts):.1f}s)")
+    print(f"   Requests simultâneas (pico): {fake.max_in_flight}")
+
+    ok = (
+        [r[0]["id"] for r in results] == [f"{a}_tx" for a in accounts]
+        and elapsed < 2 * LATENCY * len(accounts) / 5
+        and fake.max_in_flight >= len(accounts)
+        and http_client.get_async_client() is http_client.get_async_client()
+    )
+
+    if ok:
+        print("✅ SUCESSO: Chamadas concorrentes no mesmo worker, pool compartilhado")
+    else:
+        print("❌ FALHA: Chamadas serializadas ou pool não compartilhado")
+    await http_client.close_async_clients()
+    return ok
+
+async def test_retry_policy():
+    print("\n" + "="*70)
+    print("TESTE 2: Retry em 5xx (GET) e Token Reutilizado")
+    print("="*70)
+
+    fake = FakePluggy(fail_transactions=2)
+    install(fake)
+    service = PluggyService()
+
+    first = await service.get_transactions("acc_retry")
+    exhausted = FakePluggy(fail_transactions=10)
+    install(exhausted)
+    failed = False
+    try:
+        await PluggyService().get_transactions("acc_down")
+    except Exception:
+        failed = True
+
+    auths = [c for c in fake.calls if c[1] == "/auth"]
+    tx_calls = [c for c in fake.calls if c[1] == "/transactions"]
+    print(f"   Chamadas: {len(tx_calls)} em /transactions, {len(auths)} em /auth")
+    print(f"   Serviço fora do ar: {len([c for c in exhausted.calls if c[1] == '/transactions'])} tentativas, erro={failed}")
+
+    ok = (
+        first[0]["id"] == "acc_retry_tx"
+        and len(tx_calls) == 3 and len(auths) == 1
+        and len([c for c in exhausted.calls if c[1] == "/transactions"]) == http_client.RETRY_TOTAL + 1
+        and failed
+    )
+
+    if ok:
+        print("✅ SUCESSO: 3 repetições com backoff, como o urllib3.Retry anterior")
+    else:
+        print("❌ FALHA: Política de retry divergente")
+    await http_client.close_async_clients()
+    return ok
+
+async def test_pagination():
+    print("\n" + "="*70)
+    print("TESTE 3: Paginação Completa com Páginas em Paralelo")
+    print("="*70)
+
+    fake = FakePluggy(transactions_per_account=4200)     # 9 páginas de 500
+    install(fake)
+
+    transactions = await PluggyService().get_transactions("acc_busy")
+    service_peak = fake.max_in_flight
+    pages = [c for c in fake.calls if c[1] == "/transactions"]
+
+    fake.max_in_flight = 0
+    fake.completed = 0
+    adapter = PluggyAdapter("id", "secret")
+    streamed = []
+    async with aclosing(adapter.iter_transaction_pages("acc_busy", date(2025, 11, 1))) as pages_stream:
+        async for page in pages_stream:
+            streamed.append(len(page))
+            if len(streamed) == 3:
+                break       # Consumidor parou: páginas pendentes são canceladas
+    await asyncio.sleep(LATENCY * 2)
+    fetched_after_stop = fake.completed - 1     # Sem o /auth
+
+    print(f"   Transações: {len(transactions)} em {len(pages)} páginas (pico paralelo {service_peak})")
+    print(f"   Adapter: páginas consumidas {streamed}, baixadas {fetched_after_stop}")
+
+    ok = (
+        len(transactions) == 4200
+        and [t["id"] for t in transactions] == [f"acc_busy_tx_{i}" for i in range(4200)]
+        and len(pages) == 9
+        and service_peak <= MAX_PARALLEL_PAGES
+        and streamed == [500, 500, 500]
+        and fetched_after_stop < 9
+    )
+
+    if ok:
+        print("✅ SUCESSO: Nenhuma página perdida, paralelismo limitado, streaming cancelável")
+    else:
+        print("❌ FALHA: Paginação incorreta")
+    await http_client.close_async_clients()
+    return ok
+
+async def test_credential_lifecycle():
+    print("\n" + "="*70)
+    print("TESTE 4: Cache da API Key (TTL, Renovação Proativa, Single-Flight)")
+    print("="*70)
+
+    now = [0.0]
+    cache = CredentialCache(refresh_margin=60, clock=lambda: now[0])
+    fetches = []
+
+    async def fetch():
+        fetches.append(now[0])
+        await asyncio.sleep(0.05)
+        return f"key_{len(fetches)}"
+
+    concurrent = await asyncio.gather(*(cache.get("pluggy", fetch, ttl=600) for _ in range(20)))
+    now[0] = 300
+    cached = await cache.get("pluggy", fetch, ttl=600)              # Longe da expiração
+    now[0] = 560
+    in_margin = await cache.get("pluggy", fetch, ttl=600)           # Na margem: entrega a atual e renova
+    await asyncio.sleep(0.1)
+    refreshed = await cache.get("pluggy", fetch, ttl=600)
+    cache.invalidate("pluggy", "key_1")                             # 401 com chave antiga não derruba a nova
+    still = await cache.get("pluggy", fetch, ttl=600)
+
+    print(f"   20 requests concorrentes: {len(set(concurrent))} chave | autenticações no total: {len(fetches)}")
+    print(f"   Sequência: {cached} -> {in_margin} (margem) -> {refreshed} -> {still}")
+
+    ok = (
+        set(concurrent) == {"key_1"}
+        and cached == "key_1" and in_margin == "key_1"
+        and refreshed == "key_2" and still == "key_2"
+        and len(fetches) == 2
+    )
+
+    if ok:
+        print("✅ SUCESSO: Uma autenticação por renovação, antes de expirar")
+    else:
+        print("❌ FALHA: Ciclo de vida da chave incorreto")
+    return ok
+
+async def test_shared_key_and_401():
+    print("\n" + "="*70)
+    print("TESTE 5: Chave Compartilhada Entre Instâncias e Retry no 401")
+    print("="*70)
+
+    fake = FakePluggy()
+    install(fake)
+
+    await asyncio.gather(*(PluggyService().get_accounts("item") for _ in range(10)))
+    await PluggyAdapter(PluggyService().client_id, "secret").get_accounts("item")
+    auths_before = fake.issued_keys
+
+    fake.revoked.add("key_1")           # Chave revogada no provider antes do TTL
+    accounts = await PluggyService().get_accounts("item")
+    statuses = [c for c in fake.calls if c[1] == "/accounts"]
+
+    print(f"   11 instâncias (service + adapter): {auths_before} autenticação")
+    print(f"   Após revogação: {fake.issued_keys} chaves emitidas, {len(statuses)} chamadas a /accounts")
+
+    ok = (
+        auths_before == 1
+        and fake.issued_keys == 2
+        and accounts == []
+        and len(statuses) == 13          # 11 + a recusada (401) + a repetida
+    )
+
+    if ok:
+        print("✅ SUCESSO: Chave do processo, renovada e repetida uma vez no 401")
+    else:
+        print("❌ FALHA: Reautenticação por instância ou 401 não tratado")
+    await http_client.close_async_clients()
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DO CLIENT PLUGGY...")
+
+    success_concurrency = await test_concurrent_syncs()
+    success_retry = await test_retry_policy()
+    success_pagination = await test_pagination()
+    success_lifecycle = await test_credential_lifecycle()
+    success_shared = await test_shared_key_and_401()
+
+    if success_concurrency and success_retry and success_pagination and success_lifecycle and success_shared:
+        print("\n🎉 TODOS OS TESTES DO CLIENT PLUGGY PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,298 @@
+"""
+Teste de Validação: Webhooks da Pluggy
+Valida a conferência do segredo, a deduplicação de reentregas, o sync
+direcionado só às contas afetadas, o desfazer do registro quando o
+enfileiramento falha, o sync pelo Celery em modo eager (sem Redis) e a
+limpeza das entregas fora da janela de reentrega
+"""
+import sys
+import os
+import asyncio
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+# O router é montado com o MemoryStore; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.endpoints import webhooks
+from app.services.pluggy_webhooks import verify_secret, InvalidWebhookSecretError
+from app.services.sync_scheduler import SyncScheduler
+from app.services.open_finance import OpenFinanceService
+from memory_store import MemoryStore
+from memory_functions import register_functions
+from fake_pluggy_webhooks import FakePluggyWebhookSender
+
+SECRET = "segredo-de-teste"
+
+def make_store():
+    return register_functions(MemoryStore({
+        "webhook_eventos": [],
+        "condominio_contas_bancarias": [
+            {"id": "c1", "condominio_id": "condo_1", "pluggy_item_id": "item_1", "pluggy_account_id": "acc_1", "ativo": True},
+            {"id": "c2", "condominio_id": "condo_2", "pluggy_item_id": "item_2", "pluggy_account_id": "acc_2", "ativo": True},
+            {"id": "c3", "condominio_id": "condo_3", "pluggy_item_id": "item_2", "pluggy_account_id": "acc_3", "ativo": True},
+            {"id": "c4", "condominio_id": "condo_4", "pluggy_item_id": "item_2", "pluggy_account_id": "acc_4", "ativo": False},
+        ],
+        "transacoes_bancarias": [],
+        "sincronizacao_contas": [],
+        "execucoes_sincronizacao": [],
+        "orcamento_provider": [],
+    }))
+
+def make_client(store, enqueued, secret=SECRET, fail=False, celery=False):
+    app = FastAPI()
+    app.include_router(webhooks.router, prefix="/api/v1/webhooks")
+
+    def enqueue(accounts):
+        if fail:
+            raise ConnectionError("broker indisponível")
+        enqueued.extend(accounts)
+
+    app.dependency_overrides[webhooks.get_supabase] = lambda: store
+    app.dependency_overrides[webhooks.get_webhook_secret] = lambda: secret
+    if not celery:
+        app.dependency_overrides[webhooks.get_sync_enqueuer] = lambda: enqueue
+    return TestClient(app)
+
+def fake_provider_sync(account_id):
+    """Uma transação nova por conta, como OpenFinanceService.sync_transactions devolve"""
+    return [{
+        "id": f"{account_id}_tx", "data_transacao": date.today() - timedelta(days=1),
+        "valor": Decimal("80.00"), "tipo": "credito", "descricao": "PIX",
+        "nsu": f"{account_id}_tx", "metadata": {}, "provider_atualizado_em": "2025-12-01T10:00:00Z",
+    }]
+
+async def test_targeted_sync_and_dedupe():
+    print("\n" + "="*70)
+    print("TESTE 1: Sync Só da Conta Afetada e Reentrega Deduplicada")
+    print("="*70)
+
+    store = make_store()
+    enqueued = []
+    sender = FakePluggyWebhookSender(make_client(store, enqueued), SECRET)
+
+    first = sender.transactions_created("item_1", "acc_1", count=2)
+    again = sender.redeliver()
+    item = sender.item_updated("item_2")
+    unknown = sender.item_updated("item_desconhecido")
+
+    print(f"   transactions/created: {first.status_code} {first.json()}")
+    print(f"   reentrega: {again.status_code} {again.json()}")
+    print(f"   item/updated: {item.status_code} {item.json()} | desconhecido: {unknown.json()}")
+
+    # O que foi enfileirado roda no mesmo caminho do agendador
+    async def fake_sync(self, account_id, days_back=30, from_date=None):
+        return fake_provider_sync(account_id)
+
+    original = OpenFinanceService.sync_transactions
+    OpenFinanceService.sync_transactions = fake_sync
+    try:
+        report = await SyncScheduler(store).run_shard(0, enqueued[:1])
+    finally:
+        OpenFinanceService.sync_transactions = original
+
+    ok = (
+        first.status_code == 202 and first.json()["status"] == "aceito" and first.json()["contas"] == 1
+        and again.status_code == 202 and again.json()["status"] == "duplicado"
+        and item.json()["contas"] == 2
+        and unknown.status_code == 202 and unknown.json()["status"] == "ignorado"
+        and [a.conta_id for a in enqueued] == ["acc_1", "acc_2", "acc_3"]      # acc_4 inativa
+        and len(store.tables["webhook_eventos"]) == 3
+        and report.novas == 1 and store.tables["transacoes_bancarias"][0]["provider_conta_id"] == "acc_1"
+    )
+
+    if ok:
+        print("✅ SUCESSO: Cada evento sincroniza só as contas afetadas, uma vez")
+    else:
+        print("❌ FALHA: Sync direcionado ou deduplicação incorretos")
+    return ok
+
+async def test_secret_header():
+    print("\n" + "="*70)
+    print("TESTE 2: Segredo Compartilhado no Header")
+    print("="*70)
+
+    store = make_store()
+    enqueued = []
+    sender = FakePluggyWebhookSender(make_client(store, enqueued), SECRET)
+    forged = FakePluggyWebhookSender(make_client(store, enqueued), "outro-segredo")
+    unconfigured = FakePluggyWebhookSender(make_client(store, enqueued, secret=""), SECRET)
+
+    wrong = forged.transactions_created("item_1", "acc_1")
+    missing = sender.send({"event": "item/updated", "itemId": "item_1"}, secret="")
+    no_secret = unconfigured.item_updated("item_1")
+    valid = sender.item_updated("item_1")
+
+    # Só o segredo exato: prefixo do segredo ou segredo com sufixo não passam
+    near_misses = []
+    for provided in (SECRET[:-1], SECRET + "x", SECRET.upper()):
+        try:
+            verify_secret(provided, SECRET)
+            near_misses.append(provided)
+        except InvalidWebhookSecretError:
+            pass
+
+    print(f"   Segredo errado: {wrong.status_code} | sem header: {missing.status_code} | sem segredo configurado: {no_secret.status_code}")
+    print(f"   Segredo correto: {valid.status_code} | quase iguais aceitos: {near_misses}")
+
+    ok = (
+        wrong.status_code == 401 and missing.status_code == 401 and no_secret.status_code == 401
+        and valid.status_code == 202 and not near_misses
+        and len(store.tables["webhook_eventos"]) == 1
+        and [a.conta_id for a in enqueued] == ["acc_1"]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Só entregas com o segredo cadastrado são aceitas")
+    else:
+        print("❌ FALHA: Verificação do segredo incorreta")
+    return ok
+
+async def test_enqueue_failure_allows_redelivery():
+    print("\n" + "="*70)
+    print("TESTE 3: Falha no Enfileiramento Não Perde o Evento")
+    print("="*70)
+
+    store = make_store()
+    enqueued = []
+    failing = FakePluggyWebhookSender(make_client(store, enqueued, fail=True), SECRET)
+    response = failing.transactions_created("item_1", "acc_1")
+
+    # A Pluggy reentrega a mesma entrega quando o broker volta
+    healthy = FakePluggyWebhookSender(make_client(store, enqueued), SECRET)
+    healthy.deliveries = failing.deliveries
+    retry = healthy.redeliver()
+
+    print(f"   Broker fora: {response.status_code} | reentrega: {retry.status_code} {retry.json()}")
+
+    ok = (
+        response.status_code == 503
+        and retry.status_code == 202 and retry.json()["status"] == "aceito"
+        and [a.conta_id for a in enqueued] == ["acc_1"]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Evento só é marcado como visto depois de enfileirado")
+    else:
+        print("❌ FALHA: Reentrega descartada após falha")
+    return ok
+
+async def test_eager_celery_sync():
+    print("\n" + "="*70)
+    print("TESTE 4: Sync pelo Celery em Modo Eager (Sem Redis)")
+    print("="*70)
+
+    from app.core.celery_app import celery_app
+    from app.tasks import sync_tasks
+
+    store = make_store()
+    sender = FakePluggyWebhookSender(make_client(store, [], celery=True), SECRET)
+
+    async def fake_sync(self, account_id, days_back=30, from_date=None):
+        return fake_provider_sync(account_id)
+
+    # Sem Redis o celery_app já sobe assim; forçado para não depender do ambiente
+    eager = celery_app.conf.task_always_eager
+    original_scheduler = sync_tasks._scheduler
+    original_sync = OpenFinanceService.sync_transactions
+    celery_app.conf.task_always_eager = True
+    sync_tasks._scheduler = lambda: SyncScheduler(store)
+    OpenFinanceService.sync_transactions = fake_sync
+    try:
+        # A task roda dentro do event loop do endpoint
+        response = sender.transactions_created("item_1", "acc_1")
+        again = sender.redeliver()
+    finally:
+        celery_app.conf.task_always_eager = eager
+        sync_tasks._scheduler = original_scheduler
+        OpenFinanceService.sync_transactions = original_sync
+
+    stored = store.tables["transacoes_bancarias"]
+    print(f"   Webhook: {response.status_code} {response.json()} | reentrega: {again.json().get('status')}")
+    print(f"   Transações gravadas pelo sync: {[r['provider_conta_id'] for r in stored]}")
+
+    ok = (
+        response.status_code == 202 and response.json()["status"] == "aceito"
+        and again.json()["status"] == "duplicado"
+        and [r["provider_conta_id"] for r in stored] == ["acc_1"]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Task eager sincroniza a conta mesmo dentro do loop da API")
+    else:
+        print("❌ FALHA: Sync eager perdido dentro do event loop")
+    return ok
+
+async def test_purge_old_events():
+    print("\n" + "="*70)
+    print("TESTE 5: Limpeza de webhook_eventos (Beat)")
+    print("="*70)
+
+    from app.core.celery_app import celery_app
+    from app.tasks import sync_tasks
+
+    store = make_store()
+    sender = FakePluggyWebhookSender(make_client(store, []), SECRET)
+    sender.transactions_created("item_1", "acc_1")
+    sender.item_updated("item_2")
+    # Entregas antigas de semanas atrás (e de outro provider, que não é desta limpeza)
+    old = (datetime.now() - timedelta(days=30)).isoformat()
+    store.tables["webhook_eventos"].extend([
+        {"provider": "pluggy", "evento_id": f"antigo_{i}", "evento": "item/updated", "recebido_em": old}
+        for i in range(3)
+    ] + [{"provider": "belvo", "evento_id": "antigo_belvo", "evento": "x", "recebido_em": old}])
+
+    original_supabase = sync_tasks._supabase
+    sync_tasks._supabase = lambda: store
+    try:
+        report = sync_tasks.purge_webhook_events.apply(kwargs={"retention_days": 7}).get()
+    finally:
+        sync_tasks._supabase = original_supabase
+
+    # Dentro da janela a reentrega continua deduplicada
+    again = sender.redeliver()
+    remaining = sorted(r["evento_id"] for r in store.tables["webhook_eventos"] if r["provider"] == "pluggy")
+    scheduled = {entry["task"] for entry in celery_app.conf.beat_schedule.values()}
+
+    print(f"   Removidas: {report} | Restantes (pluggy): {len(remaining)} | reentrega: {again.json().get('status')}")
+    print(f"   No beat: {'webhooks.purge_events' in scheduled}")
+
+    ok = (
+        report == {"removidas": 3}
+        and len(remaining) == 2 and not any(r.startswith("antigo_") for r in remaining)
+        and any(r["provider"] == "belvo" for r in store.tables["webhook_eventos"])
+        and again.json()["status"] == "duplicado"
+        and "webhooks.purge_events" in scheduled
+    )
+
+    if ok:
+        print("✅ SUCESSO: Só as entregas fora da janela de reentrega foram apagadas")
+    else:
+        print("❌ FALHA: Limpeza de webhook_eventos incorreta")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE WEBHOOKS DA PLUGGY...")
+
+    success_targeted = await test_targeted_sync_and_dedupe()
+    success_secret = await test_secret_header()
+    success_failure = await test_enqueue_failure_allows_redelivery()
+    success_eager = await test_eager_celery_sync()
+    success_purge = await test_purge_old_events()
+
+    if success_targeted and success_secret and success_failure and success_eager and success_purge:
+        print("\n🎉 TODOS OS TESTES DE WEBHOOKS DA PLUGGY PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
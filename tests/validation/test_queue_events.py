@@ -0,0 +1,232 @@
+"""
+Teste de Validação: Eventos da Fila (SSE)
+Valida o barramento pub/sub: entrega a vários assinantes, buffer limitado
+com "resync", retomada via Last-Event-ID, publicação a partir de outra thread
+e o repasse entre processos (task Celery -> workers da API)
+"""
+import sys
+import os
+import asyncio
+import threading
+
+# Adicionar path do backend
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+
+from app.services.queue_events import QueueEventBus, QueueEventRelay
+
+async def drain(subscription, timeout: float = 0.05):
+    events = []
+    while True:
+        event = await subscription.get(timeout=timeout)
+        if event is None:
+            return events
+        events.append(event)
+
+async def test_fan_out():
+    print("\n" + "="*70)
+    print("TESTE 1: Entrega a Vários Assinantes")
+    print("="*70)
+
+    bus = QueueEventBus()
+    subscriptions = [bus.subscribe() for _ in range(50)]
+
+    bus.publish("insert", comprovante_id="rec_1", item={"prioridade": 5})
+    bus.publish("remove", comprovante_id="rec_2")
+
+    received = [await drain(s) for s in subscriptions]
+    for s in subscriptions:
+        s.close()
+
+    print(f"   Assinantes: 50 | Eventos por assinante: {set(len(r) for r in received)}")
+    print(f"   SSE: {received[0][0].to_sse().splitlines()[:2]}")
+
+    ok = (
+        all([e.type for e in r] == ["insert", "remove"] for r in received)
+        and received[0][0].to_sse().startswith(f"id: {bus.epoch}-1\nevent: insert\n")
+        and bus.subscriber_count == 0
+    )
+
+    if ok:
+        print("✅ SUCESSO: Todos os assinantes receberam os eventos em ordem")
+    else:
+        print("❌ FALHA: Entrega incorreta")
+    return ok
+
+async def test_overflow_resync():
+    print("\n" + "="*70)
+    print("TESTE 2: Cliente Lento (Buffer Limitado)")
+    print("="*70)
+
+    bus = QueueEventBus(max_buffer=10)
+    slow = bus.subscribe()
+    fast = bus.subscribe()
+
+    for i in range(25):
+        bus.publish("update", comprovante_id=f"rec_{i}")
+        if i < 9:
+            continue
+        # O cliente rápido consome; o lento não
+        await drain(fast, timeout=0)
+
+    slow_events = await drain(slow)
+    print(f"   Cliente lento: {[e.type for e in slow_events]} (descartados: {slow.dropped})")
+
+    # Depois do resync, volta a receber normalmente
+    bus.publish("insert", comprovante_id="rec_novo")
+    after = await drain(slow)
+    print(f"   Após resync: {[e.type for e in after]}")
+
+    ok = (
+        [e.type for e in slow_events] == ["resync"]
+        and slow.queue.maxsize == 10
+        and [e.comprovante_id for e in after] == ["rec_novo"]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Buffer não cresce e cliente é ressincronizado")
+    else:
+        print("❌ FALHA: Overflow mal tratado")
+    return ok
+
+async def test_last_event_id():
+    print("\n" + "="*70)
+    print("TESTE 3: Retomada via Last-Event-ID")
+    print("="*70)
+
+    bus = QueueEventBus(history_size=5)
+    for i in range(8):
+        bus.publish("insert", comprovante_id=f"rec_{i}")
+
+    # Outro worker numerou os próprios eventos: mesmo seq, outros eventos
+    other = QueueEventBus()
+    for i in range(6):
+        other.publish("remove", comprovante_id=f"outro_{i}")
+
+    # id 6 ainda no histórico (4..8): recebe 7 e 8
+    resumed = bus.subscribe(last_event_id=f"{bus.epoch}-6")
+    missed = [e.id for e in await drain(resumed)]
+
+    # id 1 já saiu do histórico: resync
+    stale = bus.subscribe(last_event_id=f"{bus.epoch}-1")
+    stale_events = [e.type for e in await drain(stale)]
+
+    # id de outro worker (balanceador trocou de worker) / processo reiniciado: resync
+    foreign = bus.subscribe(last_event_id=f"{other.epoch}-6")
+    foreign_events = [e.type for e in await drain(foreign)]
+
+    # id numérico antigo ou lixo: resync
+    legacy = bus.subscribe(last_event_id="6")
+    legacy_events = [e.type for e in await drain(legacy)]
+
+    print(f"   Retomado de 6: {missed} | De 1: {stale_events} | De outro worker: {foreign_events} | Sem época: {legacy_events}")
+
+    ok = (
+        missed == [f"{bus.epoch}-7", f"{bus.epoch}-8"]
+        and stale_events == ["resync"] and foreign_events == ["resync"] and legacy_events == ["resync"]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Eventos perdidos reenviados ou resync")
+    else:
+        print("❌ FALHA: Retomada incorreta")
+    return ok
+
+async def test_cross_thread_publish():
+    print("\n" + "="*70)
+    print("TESTE 4: Publicação de Outra Thread (task Celery eager)")
+    print("="*70)
+
+    bus = QueueEventBus()
+    subscription = bus.subscribe()
+
+    worker = threading.Thread(target=lambda: bus.publish_many("remove", ["rec_a", "rec_b", "rec_c"]))
+    worker.start()
+    worker.join()
+
+    events = await drain(subscription, timeout=0.2)
+    print(f"   Recebidos: {[e.comprovante_id for e in events]}")
+
+    ok = [e.comprovante_id for e in events] == ["rec_a", "rec_b", "rec_c"]
+
+    if ok:
+        print("✅ SUCESSO: Eventos entregues no event loop do assinante")
+    else:
+        print("❌ FALHA: Publicação entre threads")
+    return ok
+
+async def test_cross_process_relay():
+    print("\n" + "="*70)
+    print("TESTE 5: Repasse Entre Processos (Task Celery -> Workers da API)")
+    print("="*70)
+
+    # O canal Redis fica de fora: o que o worker publicaria é entregue à mão
+    channel = []
+    worker_relay = QueueEventRelay("redis://broker.test:6379/0")
+    worker_relay._publish = channel.append
+    worker_bus = QueueEventBus(relay=worker_relay)
+
+    api_relays = [QueueEventRelay("redis://broker.test:6379/0") for _ in range(2)]
+    api_buses = [QueueEventBus(relay=relay) for relay in api_relays]
+    subscriptions = [bus.subscribe() for bus in api_buses]
+    invalidated = []
+
+    def task():
+        worker_bus.publish("resync")                 # Recálculo de prioridades no Celery
+        worker_bus.publish("remove", comprovante_id="rec_9")
+
+    await asyncio.to_thread(task)
+    own = [api_relays[0].encode(api_buses[0].publish("insert", "rec_local", relay=False))]
+
+    delivered = [
+        relay.deliver(bus, message, lambda i=i: invalidated.append(i))
+        for i, (relay, bus) in enumerate(zip(api_relays, api_buses))
+        for message in channel
+    ]
+    ignored = api_relays[0].deliver(api_buses[0], own[0], lambda: invalidated.append("own"))
+
+    received = [await drain(s) for s in subscriptions]
+    for s in subscriptions:
+        s.close()
+
+    # Cliente reconecta num worker diferente com o Last-Event-ID do outro
+    crossed = await drain(api_buses[0].subscribe(last_event_id=received[1][-1].id))
+
+    print(f"   Mensagens no canal: {len(channel)} | entregues: {delivered.count(True)} | caches descartados: {len(invalidated)}")
+    print(f"   Worker 1: {[(e.type, e.comprovante_id) for e in received[0]]}")
+    print(f"   Worker 2: {[(e.type, e.comprovante_id) for e in received[1]]}")
+
+    ok = (
+        len(channel) == 2
+        and all(delivered) and ignored is False
+        and invalidated == [0, 0, 1, 1]
+        and [(e.type, e.comprovante_id) for e in received[0]] == [("insert", "rec_local"), ("resync", None), ("remove", "rec_9")]
+        and [(e.type, e.comprovante_id) for e in received[1]] == [("resync", None), ("remove", "rec_9")]
+        # Ids da sequência do worker que entrega: não servem de Last-Event-ID no outro
+        and [e.id for e in received[1]] == [f"{api_buses[1].epoch}-1", f"{api_buses[1].epoch}-2"]
+        and [e.type for e in crossed] == ["resync"]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Eventos das tasks chegam aos clientes de todos os workers da API")
+    else:
+        print("❌ FALHA: Repasse entre processos")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE EVENTOS DA FILA...")
+
+    success_fan_out = await test_fan_out()
+    success_overflow = await test_overflow_resync()
+    success_resume = await test_last_event_id()
+    success_threads = await test_cross_thread_publish()
+    success_relay = await test_cross_process_relay()
+
+    if success_fan_out and success_overflow and success_resume and success_threads and success_relay:
+        print("\n🎉 TODOS OS TESTES DE EVENTOS PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
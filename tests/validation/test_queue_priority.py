@@ -0,0 +1,153 @@
+"""
+Teste de Validação: Prioridade Composta da Fila
+Valida o score (valor, fraude, idade/SLA, ambiguidade), o SLA por
+condomínio, a suspeita de fraude acima dos itens comuns e o recálculo em
+lote que só grava itens alterados e abertos
+"""
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+from app.services.queue_priority import QueuePriorityService, compute_priority, match_ambiguity, SUSPECT_FLOOR
+from app.services.matching_rules import MatchingRulesService
+from memory_store import MemoryStore
+from memory_functions import register_functions
+
+NOW = datetime(2025, 12, 10, 12, 0, tzinfo=timezone.utc)
+
+def build_store() -> MemoryStore:
+    created = (NOW - timedelta(hours=36)).isoformat()
+    store = MemoryStore({
+        "fila_reconciliacao": [
+            {"id": "q1", "comprovante_id": "rec_1", "prioridade": 5, "tipo": "multiplos_matches", "status": "pendente",
+             "criado_em": created, "matches_sugeridos": [{"match_score": 90}, {"match_score": 88}]},
+            {"id": "q2", "comprovante_id": "rec_2", "prioridade": 5, "tipo": "multiplos_matches", "status": "pendente",
+             "criado_em": created, "matches_sugeridos": [{"match_score": 90}, {"match_score": 88}]},
+            {"id": "q3", "comprovante_id": "rec_3", "prioridade": 10, "tipo": "fraude_suspeita", "status": "aprovado",
+             "criado_em": created, "matches_sugeridos": []},
+        ],
+        "comprovantes": [
+            {"id": "rec_1", "condominio_id": "condo_padrao", "ocr_valor": 650.00, "fraud_score": 0},
+            {"id": "rec_2", "condominio_id": "condo_sla_curto", "ocr_valor": 650.00, "fraud_score": 0},
+            {"id": "rec_3", "condominio_id": "condo_padrao", "ocr_valor": 90000.00, "fraud_score": 95},
+        ],
+        "regras_conciliacao": [
+            {"condominio_id": "condo_sla_curto", "sla_revisao_horas": 24},
+        ],
+    })
+    return register_functions(store)
+
+async def test_score_components():
+    print("\n" + "="*70)
+    print("TESTE 1: Componentes do Score")
+    print("="*70)
+
+    base = compute_priority(valor=650.00, now=NOW)
+    fraud = compute_priority(valor=650.00, fraud_score=90, now=NOW)
+    bigger = compute_priority(valor=65000.00, now=NOW)
+    overdue = compute_priority(valor=650.00, criado_em=(NOW - timedelta(hours=200)).isoformat(), now=NOW)
+    tied = compute_priority(valor=650.00, matches=[{"match_score": 90}, {"match_score": 90}], now=NOW)
+
+    print(f"   Base: {base} | Fraude: {fraud} | Valor alto: {bigger} | Vencido: {overdue} | Empate: {tied}")
+
+    ok = (
+        base < bigger < fraud
+        and overdue == base + 300                    # Idade limitada a 1,5× o SLA
+        and tied == base + 150
+        and match_ambiguity([{"match_score": 95}]) == 0.0
+        and 0 <= compute_priority(valor=10**9, fraud_score=100, criado_em=NOW - timedelta(days=30), now=NOW) <= 1000
+    )
+
+    if ok:
+        print("✅ SUCESSO: Score composto e limitado a 0-1000")
+    else:
+        print("❌ FALHA: Componentes do score incorretos")
+    return ok
+
+async def test_fraud_outranks_routine():
+    print("\n" + "="*70)
+    print("TESTE 3: Suspeita de Fraude Acima dos Itens Comuns")
+    print("="*70)
+
+    # Como o upload enfileira: fraud_score do detector, sem OCR ainda, recém-criado
+    uploaded = (NOW - timedelta(minutes=1)).isoformat()
+    fraud_at_upload = compute_priority(valor=None, fraud_score=75, criado_em=uploaded, now=NOW)
+    # Item rotineiro: R$ 500 com dois matches empatados, a 36h de um SLA de 72h
+    routine = compute_priority(
+        valor=500.00, criado_em=(NOW - timedelta(hours=36)).isoformat(),
+        matches=[{"match_score": 88}, {"match_score": 88}], now=NOW
+    )
+    # O pior caso comum: valor máximo, vencido, empatado
+    worst_routine = compute_priority(
+        valor=10**6, criado_em=(NOW - timedelta(days=30)).isoformat(),
+        matches=[{"match_score": 90}, {"match_score": 90}], now=NOW
+    )
+    # Entre suspeitas, valor e idade continuam ordenando
+    fraud_later = compute_priority(valor=20000.00, fraud_score=75, criado_em=(NOW - timedelta(hours=48)).isoformat(), now=NOW)
+
+    print(f"   Fraude no upload: {fraud_at_upload} | rotineiro R$ 500 empatado: {routine} | pior comum: {worst_routine}")
+    print(f"   Fraude com valor e 48h: {fraud_later}")
+
+    ok = (
+        fraud_at_upload > routine
+        and fraud_at_upload > worst_routine == SUSPECT_FLOOR
+        and fraud_later > fraud_at_upload
+        and fraud_later <= 1000
+    )
+
+    if ok:
+        print("✅ SUCESSO: Comprovante suspeito entra na frente de qualquer item comum")
+    else:
+        print("❌ FALHA: Fraude ranqueada abaixo de item rotineiro")
+    return ok
+
+async def test_rescore():
+    print("\n" + "="*70)
+    print("TESTE 2: Recálculo em Lote")
+    print("="*70)
+
+    MatchingRulesService.invalidate()
+    store = build_store()
+    report = QueuePriorityService(store).rescore(batch_size=1, now=NOW)
+    items = {item["id"]: item for item in store.tables["fila_reconciliacao"]}
+
+    print(f"   Avaliados: {report.avaliados} | Atualizados: {report.atualizados} | Lotes: {report.lotes}")
+    print(f"   Prioridades: { {k: v['prioridade'] for k, v in items.items()} }")
+
+    # Mesmo item, mesma idade: o condomínio com SLA de 24h já estourou o prazo
+    second = QueuePriorityService(store).rescore(now=NOW)
+
+    ok = (
+        report.avaliados == 2 and report.atualizados == 2 and report.lotes == 2
+        and items["q2"]["prioridade"] > items["q1"]["prioridade"]
+        and items["q3"]["prioridade"] == 10                   # Item concluído não é tocado
+        and second.atualizados == 0                           # Nada mudou: nenhuma escrita
+    )
+
+    if ok:
+        print("✅ SUCESSO: Só itens abertos e alterados foram gravados")
+    else:
+        print("❌ FALHA: Recálculo incorreto")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DE PRIORIDADE DA FILA...")
+
+    success_score = await test_score_components()
+    success_fraud = await test_fraud_outranks_routine()
+    success_rescore = await test_rescore()
+
+    if success_score and success_fraud and success_rescore:
+        print("\n🎉 TODOS OS TESTES DE PRIORIDADE DA FILA PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
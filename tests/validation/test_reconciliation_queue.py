@@ -0,0 +1,162 @@
+"""
+Teste de Validação: Fila de Reconciliação Paginada
+Valida paginação keyset (prioridade DESC, criado_em, id), projeção sem
+campos grandes, invalidação do cache de páginas e leitura por condomínio
+(obrigatório)
+"""
+import sys
+import os
+import asyncio
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+from app.services.reconciliation_queue import ReconciliationQueueService, decode_cursor
+from memory_store import MemoryStore
+
+def build_store() -> MemoryStore:
+    # Empates de prioridade e de criado_em para exercitar o desempate por id
+    queue = [
+        ("q1", 10, "2025-12-01T10:00:00+00:00"),
+        ("q2", 5, "2025-12-01T09:00:00+00:00"),
+        ("q3", 5, "2025-12-01T09:00:00+00:00"),
+        ("q4", 5, "2025-12-01T11:00:00+00:00"),
+        ("q5", 0, "2025-12-01T08:00:00+00:00"),
+        ("q6", 10, "2025-12-01T12:00:00+00:00"),
+        ("q7", 0, "2025-12-02T08:00:00+00:00"),
+    ]
+    return MemoryStore({
+        "fila_reconciliacao": [
+            {
+                "id": item_id, "condominio_id": "condo_a", "comprovante_id": f"rec_{item_id}", "prioridade": prioridade,
+                "tipo": "manual", "matches_sugeridos": None, "status": "pendente", "criado_em": criado_em
+            }
+            for item_id, prioridade, criado_em in queue
+        ],
+        "comprovantes": [
+            {"id": f"rec_{item_id}", "unidade": "101", "ocr_valor": 650.0, "ocr_texto_completo": "texto " * 1000}
+            for item_id, _, _ in queue
+        ],
+    })
+
+async def test_keyset_pagination():
+    print("\n" + "="*70)
+    print("TESTE 1: Paginação Keyset")
+    print("="*70)
+
+    ReconciliationQueueService.invalidate()
+    service = ReconciliationQueueService(build_store())
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        page = service.get_page("condo_a", "pendente", limit=3, cursor=cursor)
+        pages += 1
+        seen.extend(item["id"] for item in page["items"])
+        print(f"   Página {pages}: {[item['id'] for item in page['items']]}")
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    first = service.get_page("condo_a", "pendente", limit=3)["items"][0]
+    print(f"   Comprovante embutido: {first['comprovante']}")
+
+    try:
+        decode_cursor("lixo")
+        bad_cursor_rejected = False
+    except ValueError:
+        bad_cursor_rejected = True
+
+    ok = (
+        seen == ["q1", "q6", "q2", "q3", "q4", "q5", "q7"]
+        and pages == 3
+        and first["matches_sugeridos"] == []
+        and "ocr_texto_completo" not in first["comprovante"]
+        and bad_cursor_rejected
+    )
+
+    if ok:
+        print("✅ SUCESSO: Ordem estável, sem repetições e sem texto OCR")
+    else:
+        print("❌ FALHA: Paginação incorreta")
+    return ok
+
+async def test_cache_invalidation():
+    print("\n" + "="*70)
+    print("TESTE 2: Cache de Páginas")
+    print("="*70)
+
+    ReconciliationQueueService.invalidate()
+    store = build_store()
+    service = ReconciliationQueueService(store)
+
+    before = service.get_page("condo_a", "pendente", limit=3)
+
+    # Item concluído direto no banco: página cacheada ainda o mostra (TTL curto)
+    store.table("fila_reconciliacao").update({"status": "concluido"}).eq("id", "q1").execute()
+    cached = service.get_page("condo_a", "pendente", limit=3)
+
+    # Aprovação/rejeição invalidam o cache
+    ReconciliationQueueService.invalidate()
+    after = service.get_page("condo_a", "pendente", limit=3)
+
+    print(f"   Antes: {[i['id'] for i in before['items']]} | Cache: {[i['id'] for i in cached['items']]} | Depois: {[i['id'] for i in after['items']]}")
+
+    ok = cached is before and after["items"][0]["id"] == "q6"
+
+    if ok:
+        print("✅ SUCESSO: Cache servido e invalidado")
+    else:
+        print("❌ FALHA: Cache incorreto")
+    return ok
+
+async def test_tenant_scope():
+    print("\n" + "="*70)
+    print("TESTE 3: Fila por Condomínio")
+    print("="*70)
+
+    ReconciliationQueueService.invalidate()
+    store = build_store()
+    for item in store.tables["fila_reconciliacao"]:
+        item["condominio_id"] = "condo_a" if item["id"] in ("q2", "q5", "q6") else "condo_b"
+    service = ReconciliationQueueService(store)
+
+    # Sem condomínio a fila de todos seria lida: recusado
+    try:
+        service.get_page(None, "pendente", limit=10)
+        unscoped_rejected = False
+    except ValueError:
+        unscoped_rejected = True
+    condo_a = service.get_page("condo_a", "pendente", limit=10)
+    print(f"   Sem condomínio recusado: {unscoped_rejected} | condo_a: {[i['id'] for i in condo_a['items']]}")
+
+    ok = (
+        unscoped_rejected
+        and [i["id"] for i in condo_a["items"]] == ["q6", "q2", "q5"]
+        and all(i["condominio_id"] == "condo_a" for i in condo_a["items"])
+    )
+
+    if ok:
+        print("✅ SUCESSO: Só a fila do condomínio foi lida")
+    else:
+        print("❌ FALHA: Escopo da fila incorreto")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DA FILA DE RECONCILIAÇÃO...")
+
+    success_pagination = await test_keyset_pagination()
+    success_cache = await test_cache_invalidation()
+    success_tenant = await test_tenant_scope()
+
+    if success_pagination and success_cache and success_tenant:
+        print("\n🎉 TODOS OS TESTES DA FILA PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
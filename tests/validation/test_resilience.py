@@ -0,0 +1,266 @@
+"""
+Teste de Validação: Camada de Resiliência das Chamadas Externas
+Valida, pelo request_with_retry, o circuit breaker por host, o limite de
+concorrência adaptativo (429 derruba o limite), o hedge de GETs lentos,
+o orçamento de retries, o circuito contando requests (não tentativas) e o
+estado exposto para o dashboard
+"""
+import sys
+import os
+import asyncio
+import time
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+# Os hosts são servidos por um MockTransport; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from app.services import http_client
+from app.services.http_client import request_with_retry, RETRY_TOTAL
+from app.services.circuit_breaker import CircuitOpenError, reset_breakers, ABERTO, FECHADO
+from app.services.resilience import (
+    RetryBudget, host_state, health_snapshot, reset_resilience, LIMIT_INITIAL, HEDGE_MIN_SAMPLES
+)
+
+class FakeHosts:
+    """Vários hosts num MockTransport: status e latência por host"""
+
+    def __init__(self):
+        self.status = {}
+        self.latency = {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.stall_next = {}        # host -> segundos da próxima chamada
+        self.script = {}            # host -> status das próximas chamadas, em ordem
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.calls.append(host)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.stall_next.pop(host, self.latency.get(host, 0.01)))
+        finally:
+            self.in_flight -= 1
+        scripted = self.script.get(host)
+        status = scripted.pop(0) if scripted else self.status.get(host, 200)
+        return httpx.Response(status, json={"host": host})
+
+def install(fake: FakeHosts):
+    reset_breakers()
+    reset_resilience()
+    loop = asyncio.get_running_loop()
+    http_client._clients[loop] = {True: httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))}
+
+async def test_breaker_per_host():
+    print("\n" + "="*70)
+    print("TESTE 1: Circuit Breaker por Host")
+    print("="*70)
+
+    fake = FakeHosts()
+    install(fake)
+    fake.status["cnpj.fora.test"] = 503
+
+    statuses = [(await request_with_retry("GET", "https://cnpj.fora.test/cnpj/1", retries=0)).status_code for _ in range(5)]
+    calls_before = len(fake.calls)
+    start = time.perf_counter()
+    try:
+        await request_with_retry("GET", "https://cnpj.fora.test/cnpj/1")
+        refused = False
+    except CircuitOpenError:
+        refused = True
+    refused_in = time.perf_counter() - start
+    other = await request_with_retry("GET", "https://pluggy.ok.test/accounts")
+
+    states = {h["host"]: h["circuito"] for h in health_snapshot()}
+    print(f"   5 respostas {statuses[0]} → {states} | recusa em {refused_in * 1000:.1f}ms")
+
+    ok = (
+        statuses == [503] * 5
+        and refused and len(fake.calls) == calls_before + 1     # Só a chamada ao outro host
+        and refused_in < 0.01
+        and other.status_code == 200
+        and states == {"cnpj.fora.test": ABERTO, "pluggy.ok.test": FECHADO}
+    )
+
+    if ok:
+        print("✅ SUCESSO: Host fora do ar recusado na hora, sem afetar os outros")
+    else:
+        print("❌ FALHA: Circuit breaker por host incorreto")
+    return ok
+
+async def test_adaptive_limit():
+    print("\n" + "="*70)
+    print("TESTE 2: Limite de Concorrência Adaptativo")
+    print("="*70)
+
+    fake = FakeHosts()
+    install(fake)
+    host = "api.lento.test"
+    fake.status[host] = 429
+    fake.latency[host] = 0.05
+
+    await asyncio.gather(*(request_with_retry("GET", f"https://{host}/tx") for _ in range(10)))
+    limit_after_429 = int(host_state(host).limiter.limit)
+
+    fake.status[host] = 200
+    fake.max_in_flight = 0
+    await asyncio.gather(*(request_with_retry("GET", f"https://{host}/tx") for _ in range(100)))
+    limiter = host_state(host).limiter
+
+    print(f"   Limite: {LIMIT_INITIAL} → {limit_after_429} após rajada de 429")
+    print(f"   100 GETs: pico de {fake.max_in_flight} em andamento | limite final {limiter.limit:.2f} | em andamento {limiter.in_flight}")
+
+    ok = (
+        limit_after_429 == LIMIT_INITIAL // 2                   # Uma redução por rajada, não uma por 429
+        and fake.max_in_flight <= limit_after_429 + 1
+        and limiter.limit > limit_after_429                     # Volta a crescer com o limite em uso
+        and limiter.in_flight == 0
+    )
+
+    if ok:
+        print("✅ SUCESSO: 429 reduz a concorrência e o limite se recupera aos poucos")
+    else:
+        print("❌ FALHA: Limite adaptativo incorreto")
+    return ok
+
+async def test_hedged_get():
+    print("\n" + "="*70)
+    print("TESTE 3: Hedge de GET Lento")
+    print("="*70)
+
+    fake = FakeHosts()
+    install(fake)
+    host = "api.cauda.test"
+
+    for _ in range(HEDGE_MIN_SAMPLES):
+        await request_with_retry("GET", f"https://{host}/accounts")
+    delay = host_state(host).hedge_delay()
+
+    fake.calls.clear()
+    fake.stall_next[host] = 3.0
+    start = time.perf_counter()
+    response = await request_with_retry("GET", f"https://{host}/accounts")
+    hedged_in = time.perf_counter() - start
+
+    fake.calls.clear()
+    fake.stall_next[host] = 1.0
+    start = time.perf_counter()
+    post = await request_with_retry("POST", f"https://{host}/items", json={})
+    post_in = time.perf_counter() - start
+    post_calls = len(fake.calls)
+    await asyncio.sleep(0)
+    state = host_state(host)
+
+    print(f"   Atraso do hedge: {delay:.2f}s | GET travado respondido em {hedged_in:.2f}s")
+    print(f"   POST lento: {post_calls} chamada em {post_in:.2f}s | em andamento: {state.limiter.in_flight}")
+
+    ok = (
+        response.status_code == 200
+        and delay is not None and delay < hedged_in < 1.5
+        and post.status_code == 200 and post_calls == 1 and post_in >= 1.0     # Não idempotente: sem hedge
+        and state.limiter.in_flight == 0
+    )
+
+    if ok:
+        print("✅ SUCESSO: GET que passa do p95 é respondido pela segunda tentativa")
+    else:
+        print("❌ FALHA: Hedge incorreto")
+    return ok
+
+async def test_retry_budget():
+    print("\n" + "="*70)
+    print("TESTE 4: Orçamento de Retries")
+    print("="*70)
+
+    now = [0.0]
+    budget = RetryBudget(ratio=0.2, min_per_second=0, window=10.0, clock=lambda: now[0])
+    for _ in range(10):
+        budget.deposit()
+    granted = sum(budget.withdraw() for _ in range(5))
+    now[0] = 11.0
+    after_window = budget.withdraw()
+
+    fake = FakeHosts()
+    install(fake)
+    host = "api.degradada.test"
+    fake.status[host] = 503
+    host_state(host).budget = RetryBudget(ratio=0.2, min_per_second=0)
+    response = await request_with_retry("GET", f"https://{host}/transactions")
+
+    print(f"   10 requests → {granted} retries liberados | após a janela: {after_window}")
+    print(f"   Host sem orçamento: {len(fake.calls)} chamada, status {response.status_code}")
+
+    ok = (
+        granted == 2
+        and after_window is False                           # Janela vazia: nenhuma request, nenhum retry
+        and len(fake.calls) == 1 and response.status_code == 503
+    )
+
+    if ok:
+        print("✅ SUCESSO: Repetições limitadas a uma fração do tráfego do host")
+    else:
+        print("❌ FALHA: Orçamento de retries incorreto")
+    return ok
+
+async def test_breaker_counts_requests():
+    print("\n" + "="*70)
+    print("TESTE 5: Circuito Conta Requests, Não Tentativas")
+    print("="*70)
+
+    fake = FakeHosts()
+    install(fake)
+    host = "brasilapi.instavel.test"
+    original_backoff = http_client.backoff_delay
+    http_client.backoff_delay = lambda attempt: 0.0
+    try:
+        # Cada request falha duas vezes e passa no segundo retry: 6 falhas transitórias no total
+        statuses = []
+        for _ in range(3):
+            fake.script[host] = [503, 503]
+            statuses.append((await request_with_retry("GET", f"https://{host}/cnpj/1")).status_code)
+        transient = host_state(host).breaker.snapshot()
+
+        # Uma request que esgota as 4 tentativas é uma falha só
+        fake.status[host] = 503
+        exhausted = await request_with_retry("GET", f"https://{host}/cnpj/1")
+        after_exhausted = host_state(host).breaker.snapshot()
+    finally:
+        http_client.backoff_delay = original_backoff
+
+    print(f"   3 requests com 2 falhas transitórias cada: {statuses} | circuito {transient['state']}, falhas {transient['failures']}")
+    print(f"   Request com {RETRY_TOTAL + 1} tentativas em 503: circuito {after_exhausted['state']}, falhas {after_exhausted['failures']}")
+
+    ok = (
+        statuses == [200, 200, 200] and len(fake.calls) == 9 + RETRY_TOTAL + 1
+        and transient == {"name": f"http:{host}", "state": FECHADO, "failures": 0}
+        and exhausted.status_code == 503
+        and after_exhausted["state"] == FECHADO and after_exhausted["failures"] == 1
+    )
+
+    if ok:
+        print("✅ SUCESSO: Falhas que o retry resolve não abrem o circuito")
+    else:
+        print("❌ FALHA: Circuito contando tentativas")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DA CAMADA DE RESILIÊNCIA...")
+
+    success_breaker = await test_breaker_per_host()
+    success_limit = await test_adaptive_limit()
+    success_hedge = await test_hedged_get()
+    success_budget = await test_retry_budget()
+    success_requests = await test_breaker_counts_requests()
+
+    if success_breaker and success_limit and success_hedge and success_budget and success_requests:
+        print("\n🎉 TODOS OS TESTES DA CAMADA DE RESILIÊNCIA PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,271 @@
+"""
+Teste de Validação: Agendador de Sincronização da Frota
+Valida o espalhamento das contas pela hora, a prioridade de condomínios
+com comprovantes pendentes, a estabilidade dos shards, o orçamento global
+do provider, o histórico de execuções, o backoff das contas com erro e a
+reserva das contas já despachadas
+"""
+import sys
+import os
+import asyncio
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+# O agendador é chamado com o MemoryStore; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from app.services.sync_scheduler import (
+    SyncScheduler, is_due, account_shard, stable_hash, error_backoff, SYNC_PERIOD_SECONDS,
+    ERROR_BACKOFF_BASE, DISPATCH_LEASE_SECONDS
+)
+from app.services.open_finance import OpenFinanceService
+from memory_store import MemoryStore
+from memory_functions import register_functions
+
+TICK = 60
+
+def account(i: int, last_sync=None, condominio_id=None):
+    return {
+        "id": f"c{i:05d}",
+        "condominio_id": condominio_id or f"condo_{i}",
+        "pluggy_account_id": f"acc_{i}",
+        "ultima_sincronizacao": last_sync,
+        "ativo": True,
+    }
+
+def fleet_store(accounts, receipts=None):
+    return register_functions(MemoryStore({
+        "condominio_contas_bancarias": accounts,
+        "comprovantes": receipts or [],
+        "transacoes_bancarias": [],
+        "sincronizacao_contas": [],
+        "execucoes_sincronizacao": [],
+        "orcamento_provider": [],
+    }))
+
+async def test_spread_over_the_hour():
+    print("\n" + "="*70)
+    print("TESTE 1: Contas Espalhadas pela Hora, Uma Vez por Ciclo")
+    print("="*70)
+
+    ids = [f"acc_{i}" for i in range(5000)]
+    start = 1_700_000_000 - 1_700_000_000 % SYNC_PERIOD_SECONDS
+    # Regime: cada conta sincronizou no seu horário do ciclo anterior
+    last_sync = {
+        a: start - SYNC_PERIOD_SECONDS + stable_hash(a) % SYNC_PERIOD_SECONDS for a in ids
+    }
+
+    per_tick = []
+    runs = Counter()
+    for t in range(start + TICK, start + SYNC_PERIOD_SECONDS + TICK, TICK):
+        due = [a for a in ids if is_due(a, last_sync[a], SYNC_PERIOD_SECONDS, t, TICK)]
+        for a in due:
+            last_sync[a] = t
+            runs[a] += 1
+        per_tick.append(len(due))
+
+    expected = len(ids) / (SYNC_PERIOD_SECONDS / TICK)
+    print(f"   Por tick: mín {min(per_tick)}, máx {max(per_tick)} (média esperada {expected:.0f})")
+    print(f"   Contas sincronizadas no ciclo: {len(runs)} de {len(ids)}, máx {max(runs.values())} vez(es)")
+
+    ok = (
+        len(runs) == len(ids)
+        and max(runs.values()) == 1
+        and max(per_tick) < expected * 1.5          # Sem rajada na virada da hora
+    )
+
+    if ok:
+        print("✅ SUCESSO: Carga uniforme ao longo da hora")
+    else:
+        print("❌ FALHA: Contas concentradas ou repetidas no ciclo")
+    return ok
+
+async def test_priority_and_shards():
+    print("\n" + "="*70)
+    print("TESTE 2: Prioridade de Pendentes e Shards Estáveis")
+    print("="*70)
+
+    now = time.time()
+    synced_20_min_ago = datetime.fromtimestamp(now - 20 * 60, tz=timezone.utc).isoformat()
+    accounts = [account(i, synced_20_min_ago) for i in range(200)]
+    accounts.append(account(900, None))                     # Nunca sincronizada
+    receipts = [
+        {"id": f"r{i}", "condominio_id": f"condo_{i}", "status": "pendente"} for i in range(10)
+    ] + [{"id": "r_ok", "condominio_id": "condo_50", "status": "conciliado"}]
+
+    scheduler = SyncScheduler(fleet_store(accounts, receipts), shards=4, tick_seconds=TICK)
+    plan = scheduler.plan(now)
+    due = [a for shard in plan.shards.values() for a in shard]
+    due_ids = {a.conta_id for a in due}
+
+    print(f"   Ativas {plan.ativas}, devidas {plan.devidas}: {sorted(due_ids)}")
+
+    stable = all(account_shard(a.conta_id, 4) == shard for shard, group in plan.shards.items() for a in group)
+    ok = (
+        plan.ativas == 201
+        # Pendentes (ciclo de 15 min) já passaram do período; os demais (1h) não
+        and {f"acc_{i}" for i in range(10)} | {"acc_900"} == due_ids
+        and stable
+        and all(group[0].pendentes > 0 for group in plan.shards.values() if any(a.pendentes for a in group))
+        and account_shard("acc_1", 4) == account_shard("acc_1", 4)
+    )
+
+    if ok:
+        print("✅ SUCESSO: Condomínios com pendências sincronizam a cada 15 min")
+    else:
+        print("❌ FALHA: Planejamento incorreto")
+    return ok
+
+async def test_budget_and_history():
+    print("\n" + "="*70)
+    print("TESTE 3: Orçamento Global do Provider e Histórico de Execuções")
+    print("="*70)
+
+    accounts = [account(i) for i in range(6)]
+    store = fleet_store(accounts)
+    today = date.today()
+
+    called = []
+
+    async def fake_sync(self, account_id, days_back=30, from_date=None):
+        called.append(account_id)
+        if len(called) == 1:
+            raise Exception("item desconectado")
+        return [{
+            "id": f"{account_id}_tx",
+            "data_transacao": today - timedelta(days=1),
+            "valor": Decimal("50.00"),
+            "tipo": "credito",
+            "descricao": "PIX",
+            "nsu": f"{account_id}_tx",
+            "metadata": {},
+            "provider_atualizado_em": "2025-12-01T10:00:00Z",
+        }]
+
+    original = OpenFinanceService.sync_transactions
+    OpenFinanceService.sync_transactions = fake_sync
+    try:
+        scheduler = SyncScheduler(store, shards=2, tick_seconds=TICK, budget_per_minute=4)
+        plan = scheduler.plan()
+        reports = [await scheduler.run_shard(shard, group) for shard, group in sorted(plan.shards.items())]
+    finally:
+        OpenFinanceService.sync_transactions = original
+
+    runs = store.tables["execucoes_sincronizacao"]
+    granted = sum(r.concedidas for r in reports)
+    deferred = sum(r.adiadas for r in reports)
+    synced = [a for a in store.tables["condominio_contas_bancarias"] if a.get("ultima_sincronizacao")]
+    print(f"   Concedidas {granted}, adiadas {deferred}, execuções gravadas {len(runs)}")
+    print(f"   Status: {Counter(r['status'] for r in runs)}")
+
+    errored = [r for r in runs if r["status"] == "erro"]
+    ok = (
+        granted == 4 and deferred == 2
+        and len(runs) == 4
+        and all({"provider", "conta_id", "shard", "iniciado_em", "duracao_ms"} <= set(r) for r in runs)
+        and len(synced) == len([r for r in runs if r["status"] == "sucesso"])
+        and len(store.tables["transacoes_bancarias"]) == sum(r.novas for r in reports)
+        and len(errored) == 1 and errored[0]["conta_id"] == called[0] and "desconectado" in errored[0]["erro"]
+        and len(synced) == 3
+        and store.tables["orcamento_provider"][0]["usado"] == 4
+    )
+
+    if ok:
+        print("✅ SUCESSO: Shards respeitam o orçamento somado e cada execução fica registrada")
+    else:
+        print("❌ FALHA: Orçamento ou histórico incorreto")
+    return ok
+
+def plan_summary(plan):
+    return f"{plan.devidas} devidas, {plan.enfileiradas} na fila, {plan.em_backoff} em backoff"
+
+async def test_error_backoff_and_dispatch_lease():
+    print("\n" + "="*70)
+    print("TESTE 4: Backoff de Erro e Reserva das Contas Despachadas")
+    print("="*70)
+
+    store = fleet_store([account(1), account(2)])
+    scheduler = SyncScheduler(store, shards=1, tick_seconds=TICK)
+    broken = {"acc_1"}
+
+    async def fake_sync(self, account_id, days_back=30, from_date=None):
+        if account_id in broken:
+            raise Exception("item desconectado")
+        return []
+
+    def row(conta_id):
+        return next(a for a in store.tables["condominio_contas_bancarias"] if a["pluggy_account_id"] == conta_id)
+
+    def due_ids(plan):
+        return {a.conta_id for group in plan.shards.values() for a in group}
+
+    original = OpenFinanceService.sync_transactions
+    OpenFinanceService.sync_transactions = fake_sync
+    try:
+        # Despacho reserva as contas: o tick seguinte não reenfileira o shard que está na fila
+        now = time.time()
+        first = scheduler.dispatch(now)
+        queued = scheduler.plan(now + TICK)
+        expired = scheduler.plan(now + DISPATCH_LEASE_SECONDS + TICK)
+
+        await scheduler.run_shard(0, first.shards[0])
+        first_retry = row("acc_1")["proxima_tentativa"]
+        after_error = scheduler.plan(time.time() + TICK)
+        after_backoff = scheduler.plan(time.time() + ERROR_BACKOFF_BASE + TICK)
+
+        # Segundo erro seguido dobra a espera; sucesso zera
+        await scheduler.run_shard(0, list(after_backoff.shards[0]))
+        second_failures = row("acc_1")["falhas_sincronizacao"]
+        second_wait = datetime.fromisoformat(row("acc_1")["proxima_tentativa"]).timestamp() - time.time()
+        broken.clear()
+        await scheduler.run_shard(0, list(after_backoff.shards[0]))
+        recovered = row("acc_1")
+    finally:
+        OpenFinanceService.sync_transactions = original
+
+    print(f"   Despachadas {sorted(due_ids(first))} | tick seguinte: {plan_summary(queued)} | reserva expirada: {sorted(due_ids(expired))}")
+    print(f"   Após o erro: {plan_summary(after_error)} | após {ERROR_BACKOFF_BASE}s: {sorted(due_ids(after_backoff))}")
+    print(f"   2º erro seguido: {second_failures} falhas, espera {second_wait:.0f}s | recuperada: {recovered['falhas_sincronizacao']} falhas")
+
+    ok = (
+        due_ids(first) == {"acc_1", "acc_2"}
+        and queued.devidas == 0 and queued.enfileiradas == 2
+        and due_ids(expired) == {"acc_1", "acc_2"}
+        and first_retry is not None
+        and after_error.devidas == 0 and after_error.em_backoff == 1 and after_error.enfileiradas == 0
+        and due_ids(after_backoff) == {"acc_1"}
+        and second_failures == 2 and abs(second_wait - error_backoff(2)) < 5 and error_backoff(2) == 2 * ERROR_BACKOFF_BASE
+        and recovered["falhas_sincronizacao"] == 0 and recovered["proxima_tentativa"] is None
+        and recovered["sincronizacao_enfileirada_em"] is None and recovered["ultima_sincronizacao"]
+    )
+
+    if ok:
+        print("✅ SUCESSO: Conta com erro espera cada vez mais e shard na fila não é duplicado")
+    else:
+        print("❌ FALHA: Conta com erro ou já despachada reenfileirada a cada tick")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DO AGENDADOR DE SINCRONIZAÇÃO...")
+
+    success_spread = await test_spread_over_the_hour()
+    success_priority = await test_priority_and_shards()
+    success_budget = await test_budget_and_history()
+    success_backoff = await test_error_backoff_and_dispatch_lease()
+
+    if success_spread and success_priority and success_budget and success_backoff:
+        print("\n🎉 TODOS OS TESTES DO AGENDADOR DE SINCRONIZAÇÃO PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,217 @@
+"""
+Teste de Validação: Transações da Conta Servidas do Banco Local
+Valida que a validação de comprovante não chama o provider quando o sync
+está em dia, a janela por conta em memória, o delta buscado só quando o
+sync passou do limite de frescor e a busca de uma transação pelo id
+"""
+import sys
+import os
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+# Adicionar path do backend e do MemoryStore (banco em memória do harness de simulação)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../backend')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../simulation')))
+
+# Os endpoints são chamados com o MemoryStore; as credenciais só satisfazem o Settings
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test")
+
+from app.services.transaction_cache import LocalTransactionStore, TransactionWindowCache, transaction_cache
+from app.services.open_finance_sync import OpenFinanceSyncService
+from app.services.open_finance import OpenFinanceService
+from app.api.endpoints import pluggy_routes
+from memory_store import MemoryStore
+
+TODAY = date.today()
+
+def stored_row(tx_id: str, days_ago: int, valor: str, tipo: str = "credito"):
+    return {
+        "id": f"db_{tx_id}",
+        "provider": "pluggy",
+        "provider_transacao_id": tx_id,
+        "provider_conta_id": "acc_1",
+        "condominio_id": "condo_1",
+        "data_transacao": (TODAY - timedelta(days=days_ago)).isoformat(),
+        "valor": float(valor),
+        "tipo": tipo,
+        "descricao": f"PIX {tx_id}",
+        "metadata": {"category": "Transfer", "payment_data": {"payer": {"documentNumber": {"type": "CPF", "value": "12345678900"}}}},
+    }
+
+def make_store(synced_minutes_ago=None, rows=None):
+    watermarks = []
+    if synced_minutes_ago is not None:
+        watermarks.append({
+            "provider": "pluggy",
+            "conta_id": "acc_1",
+            "condominio_id": "condo_1",
+            "ultima_data_transacao": (TODAY - timedelta(days=1)).isoformat(),
+            "ultimo_transacao_id": "tx_a",
+            "transacoes_sincronizadas": len(rows or []),
+            "sincronizado_em": (datetime.now(timezone.utc) - timedelta(minutes=synced_minutes_ago)).isoformat(),
+        })
+    return MemoryStore({
+        "condominio_contas_bancarias": [{"id": "c1", "condominio_id": "condo_1", "pluggy_account_id": "acc_1", "ativo": True}],
+        "transacoes_bancarias": list(rows or []),
+        "sincronizacao_contas": watermarks,
+    })
+
+class FakeProvider:
+    """Substitui OpenFinanceService.sync_transactions e conta as chamadas ao provider"""
+
+    def __init__(self, rows=None, fail=False):
+        self.rows = rows or []
+        self.fail = fail
+        self.calls = []
+
+    def __enter__(self):
+        provider = self
+
+        async def fake_sync(self, account_id, days_back=30, from_date=None):
+            provider.calls.append(from_date)
+            if provider.fail:
+                raise ConnectionError("Pluggy indisponível")
+            return [dict(row) for row in provider.rows]
+
+        self.original = OpenFinanceService.sync_transactions
+        OpenFinanceService.sync_transactions = fake_sync
+        return self
+
+    def __exit__(self, *exc):
+        OpenFinanceService.sync_transactions = self.original
+
+async def test_fresh_sync_serves_locally():
+    print("\n" + "="*70)
+    print("TESTE 1: Sync em Dia -> Validação Sem Chamar o Provider")
+    print("="*70)
+
+    transaction_cache.clear()
+    store = make_store(synced_minutes_ago=5, rows=[stored_row("tx_a", 1, "350.00"), stored_row("tx_b", 2, "120.00", "debito")])
+    request = pluggy_routes.ReceiptValidationRequest(valor=350.00, data=(TODAY - timedelta(days=1)).isoformat(), condominio_id="condo_1")
+
+    with FakeProvider() as provider:
+        first = await pluggy_routes.validate_receipt(request, supabase=store)
+        # Janela em memória: a segunda leitura não depende do banco
+        store.tables["transacoes_bancarias"].clear()
+        second = await pluggy_routes.validate_receipt(request, supabase=store)
+
+    print(f"   1ª: {first['status']} ({first['match_details']['id']}) | 2ª (memória): {second['status']}")
+    print(f"   Chamadas ao provider: {len(provider.calls)}")
+
+    ok = (
+        first["status"] == "APROVADO" and first["match_details"]["id"] == "tx_a"
+        and second["status"] == "APROVADO"
+        and provider.calls == []
+    )
+
+    if ok:
+        print("✅ SUCESSO: Comprovante validado só com dados locais")
+    else:
+        print("❌ FALHA: Validação ainda depende do provider")
+    return ok
+
+async def test_stale_sync_fetches_delta():
+    print("\n" + "="*70)
+    print("TESTE 2: Sync Vencido -> Delta do Provider Uma Vez")
+    print("="*70)
+
+    transaction_cache.clear()
+    store = make_store(synced_minutes_ago=90, rows=[stored_row("tx_a", 3, "350.00")])
+    local = LocalTransactionStore(store, max_staleness=20 * 60)
+    new_tx = {
+        "id": "tx_new", "data_transacao": TODAY, "valor": Decimal("410.00"), "tipo": "credito",
+        "descricao": "PIX tx_new", "nsu": "tx_new", "metadata": {}, "provider_atualizado_em": "2025-12-01T10:00:00Z",
+    }
+
+    with FakeProvider(rows=[new_tx]) as provider:
+        first = await local.get_transactions("acc_1", TODAY - timedelta(days=5), "condo_1")
+        transaction_cache.clear()
+        second = await local.get_transactions("acc_1", TODAY - timedelta(days=5), "condo_1")
+
+    # Provider fora e sync vencido: serve o que está no banco
+    transaction_cache.clear()
+    stale_store = make_store(synced_minutes_ago=90, rows=[stored_row("tx_a", 3, "350.00")])
+    with FakeProvider(fail=True) as failing:
+        fallback = await LocalTransactionStore(stale_store, max_staleness=20 * 60).get_transactions("acc_1", TODAY - timedelta(days=5))
+
+    print(f"   1ª leitura: {[t['id'] for t in first]} | chamadas: {len(provider.calls)} (delta desde {provider.calls[0]})")
+    print(f"   Provider fora: {[t['id'] for t in fallback]} ({len(failing.calls)} tentativa)")
+
+    ok = (
+        sorted(t["id"] for t in first) == ["tx_a", "tx_new"]
+        and len(provider.calls) == 1                           # 2ª leitura já estava em dia
+        and sorted(t["id"] for t in second) == ["tx_a", "tx_new"]
+        and [t["id"] for t in fallback] == ["tx_a"] and len(failing.calls) == 1
+    )
+
+    if ok:
+        print("✅ SUCESSO: Provider só é chamado quando o sync local passou do limite")
+    else:
+        print("❌ FALHA: Frescor incorreto")
+    return ok
+
+async def test_window_and_lookup():
+    print("\n" + "="*70)
+    print("TESTE 3: Janela em Memória (TTL, Cobertura, Invalidação) e Busca por Id")
+    print("="*70)
+
+    now = [0.0]
+    cache = TransactionWindowCache(ttl=60, clock=lambda: now[0])
+    store = make_store(synced_minutes_ago=1, rows=[stored_row("tx_a", 1, "350.00"), stored_row("tx_old", 20, "99.00", "debito")])
+    local = LocalTransactionStore(store, cache=cache)
+
+    with FakeProvider() as provider:
+        recent = await local.get_transactions("acc_1", TODAY - timedelta(days=5))
+        narrower = cache.get(("pluggy", "acc_1"), TODAY - timedelta(days=2))
+        wider = cache.get(("pluggy", "acc_1"), TODAY - timedelta(days=30))   # Fora da janela carregada
+        now[0] = 61
+        expired = cache.get(("pluggy", "acc_1"), TODAY - timedelta(days=5))
+
+        found = await local.get_transaction("acc_1", "tx_old")
+        missing = await local.get_transaction("acc_1", "tx_inexistente")
+
+    # Sync deste processo que grava transação nova derruba a janela da conta
+    await local.get_transactions("acc_1", TODAY - timedelta(days=5))
+    transaction_cache.put(("pluggy", "acc_1"), TODAY - timedelta(days=5), recent)
+    OpenFinanceSyncService(store).store("acc_1", [{
+        "id": "tx_c", "data_transacao": TODAY, "valor": Decimal("10.00"), "tipo": "credito",
+        "descricao": "PIX", "nsu": "tx_c", "metadata": {}, "provider_atualizado_em": None,
+    }], None, TODAY)
+    invalidated = transaction_cache.get(("pluggy", "acc_1"), TODAY - timedelta(days=5))
+
+    print(f"   Janela: {[t['id'] for t in recent]} | subjanela em memória: {narrower is not None} | mais larga: {wider is not None} | após TTL: {expired is not None}")
+    print(f"   Por id: {found and found['id']} (amount {found and found['amount']}, CPF {found and found['payer_document']}) | inexistente: {missing}")
+
+    ok = (
+        [t["id"] for t in recent] == ["tx_a"]
+        and narrower is not None and wider is None and expired is None
+        and found["id"] == "tx_old" and found["amount"] == -99.0 and found["payer_document"] == "12345678900"
+        and missing is None
+        and provider.calls == []                               # Sync em dia: nem a busca por id inexistente vai ao provider
+        and invalidated is None
+    )
+
+    if ok:
+        print("✅ SUCESSO: Janela em memória coerente e busca por id sem ler o extrato")
+    else:
+        print("❌ FALHA: Cache de janela ou busca por id incorretos")
+    return ok
+
+async def main():
+    print("🚀 INICIANDO TESTES DO CACHE LOCAL DE TRANSAÇÕES...")
+
+    success_fresh = await test_fresh_sync_serves_locally()
+    success_stale = await test_stale_sync_fetches_delta()
+    success_window = await test_window_and_lookup()
+
+    if success_fresh and success_stale and success_window:
+        print("\n🎉 TODOS OS TESTES DO CACHE LOCAL DE TRANSAÇÕES PASSARAM!")
+        return True
+    else:
+        print("\n❌ ALGUNS TESTES FALHARAM")
+        return False
+
+if __name__ == "__main__":
+    asyncio.run(main())